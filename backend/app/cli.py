@@ -0,0 +1,157 @@
+"""
+Maintenance commands for the backend.
+
+Run from backend/:
+    python -m app.cli rebuild-appointment-rollup [--hospital-id UUID] [--from DATE] [--to DATE]
+    python -m app.cli reconcile-stock-summary [--hospital-id UUID] [--repair]
+    python -m app.cli ensure-stock-movement-partitions [--months-ahead N]
+    python -m app.cli archive-stock-movements --keep-months N [--drop]
+"""
+import argparse
+import logging
+import sys
+import uuid
+from datetime import date
+
+from .database import SessionLocal
+from .main import app  # noqa: F401  (registers all models)
+
+logger = logging.getLogger(__name__)
+
+
+def _rebuild_appointment_rollup(args: argparse.Namespace) -> int:
+    from .services.appointment_rollup_service import rebuild_rollup
+
+    db = SessionLocal()
+    try:
+        rows = rebuild_rollup(
+            db,
+            hospital_id=args.hospital_id,
+            date_from=args.date_from,
+            date_to=args.date_to,
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Appointment rollup rebuild failed")
+        return 1
+    finally:
+        db.close()
+    print(f"appointment_daily_rollup: {rows} rows rebuilt")
+    return 0
+
+
+def _reconcile_stock_summary(args: argparse.Namespace) -> int:
+    from .services.stock_summary_service import reconcile_stock_summary
+
+    db = SessionLocal()
+    try:
+        mismatches = reconcile_stock_summary(db, hospital_id=args.hospital_id, repair=args.repair)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Stock summary reconciliation failed")
+        return 1
+    finally:
+        db.close()
+
+    for row in mismatches:
+        print(
+            f"medicine={row['medicine_id']} summary={row['summary_quantity']} "
+            f"batches={row['batch_quantity']}"
+        )
+    if not mismatches:
+        print("medicine_stock_summary: in sync with medicine_batches")
+        return 0
+    if args.repair:
+        print(f"medicine_stock_summary: {len(mismatches)} medicines repaired")
+        return 0
+    print(f"medicine_stock_summary: {len(mismatches)} medicines out of sync (rerun with --repair)")
+    return 1
+
+
+def _ensure_stock_movement_partitions(args: argparse.Namespace) -> int:
+    from .services.stock_movement_service import ensure_partitions
+
+    db = SessionLocal()
+    try:
+        names = ensure_partitions(db, months_ahead=args.months_ahead)
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Stock movement partition upkeep failed")
+        return 1
+    finally:
+        db.close()
+    print(f"stock_movements: partitions in place: {', '.join(names)}")
+    return 0
+
+
+def _archive_stock_movements(args: argparse.Namespace) -> int:
+    from .services.stock_movement_service import archive_stock_movements
+
+    db = SessionLocal()
+    try:
+        archived = archive_stock_movements(db, keep_months=args.keep_months, drop=args.drop)
+    except Exception:
+        db.rollback()
+        logger.exception("Stock movement archive failed")
+        return 1
+    finally:
+        db.close()
+
+    for month in archived:
+        print(
+            f"{month.partition}: {month.movements} movements -> {month.snapshots} snapshots "
+            f"({'dropped' if month.dropped else 'detached'})"
+        )
+    print(f"stock_movements: {len(archived)} months archived")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="HMS backend maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rollup = commands.add_parser(
+        "rebuild-appointment-rollup",
+        help="Recompute appointment_daily_rollup from the appointments table",
+    )
+    rollup.add_argument("--hospital-id", type=uuid.UUID, default=None)
+    rollup.add_argument("--from", dest="date_from", type=date.fromisoformat, default=None)
+    rollup.add_argument("--to", dest="date_to", type=date.fromisoformat, default=None)
+    rollup.set_defaults(handler=_rebuild_appointment_rollup)
+
+    stock = commands.add_parser(
+        "reconcile-stock-summary",
+        help="Check medicine_stock_summary against medicine_batches",
+    )
+    stock.add_argument("--hospital-id", type=uuid.UUID, default=None)
+    stock.add_argument("--repair", action="store_true", help="Rewrite drifted summary rows")
+    stock.set_defaults(handler=_reconcile_stock_summary)
+
+    partitions = commands.add_parser(
+        "ensure-stock-movement-partitions",
+        help="Create the monthly stock_movements partitions for this month and the next ones",
+    )
+    partitions.add_argument("--months-ahead", type=int, default=2)
+    partitions.set_defaults(handler=_ensure_stock_movement_partitions)
+
+    archive = commands.add_parser(
+        "archive-stock-movements",
+        help="Snapshot and detach stock_movements months older than the retention period",
+    )
+    archive.add_argument("--keep-months", type=int, required=True, help="Months kept attached, current included")
+    archive.add_argument("--drop", action="store_true", help="Drop archived partitions instead of keeping them detached")
+    archive.set_defaults(handler=_archive_stock_movements)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
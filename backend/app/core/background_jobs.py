@@ -0,0 +1,315 @@
+"""
+Background job runner: a worker thread pool fed by a durable outbox.
+
+Side effects that the caller does not need to wait for (in-app
+notifications, emails) are enqueued instead of being performed inside the
+request. enqueue() adds a background_jobs row to the caller's session, so
+the job is committed — or rolled back — together with the change that
+caused it. Once that session commits, the runner is woken and a worker
+thread claims the row (FOR UPDATE SKIP LOCKED, so several processes can
+share the table), runs the registered handler in its own session and
+deletes the row in the same transaction as the handler's writes.
+
+A failing job is retried with exponential backoff (settings.JOB_RETRY_SECONDS
+doubled per attempt) until max_attempts, then kept as status 'dead' with its
+last error for inspection. A job whose worker died mid-run is picked up
+again once its lease runs out. Delivery is at-least-once: handlers with
+external effects (SMTP) may repeat them if the process dies between the
+effect and the commit.
+
+submit() runs a one-off callable on the same pool without writing it to
+the outbox — for payloads that must not be stored, such as account
+credentials. It is not retried and is lost if the process stops.
+
+Usage:
+    from ..core.background_jobs import enqueue, job_handler
+
+    @job_handler("inventory.notify_users")
+    def _notify(db: Session, payload: dict) -> None:
+        ...
+
+    enqueue(db, "inventory.notify_users", {...}, hospital_id=hospital_id)
+    db.commit()
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.background_job import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DEAD = "dead"
+
+LEASE_SECONDS = 300
+_ENQUEUED_KEY = "background_jobs_enqueued"
+
+JobHandler = Callable[[Session, dict], None]
+_handlers: dict[str, JobHandler] = {}
+
+
+def job_handler(job_type: str) -> Callable[[JobHandler], JobHandler]:
+    """Register the function that runs jobs of job_type."""
+    def register(handler: JobHandler) -> JobHandler:
+        _handlers[job_type] = handler
+        return handler
+    return register
+
+
+def enqueue(
+    db: Session,
+    job_type: str,
+    payload: dict,
+    hospital_id=None,
+    max_attempts: Optional[int] = None,
+) -> BackgroundJob:
+    """Add a job to the caller's transaction; it runs after db.commit()."""
+    job = BackgroundJob(
+        hospital_id=hospital_id,
+        job_type=job_type,
+        payload=jsonable_encoder(payload),
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+    )
+    db.add(job)
+    db.info[_ENQUEUED_KEY] = True
+    return job
+
+
+_CLAIM_SQL = text("""
+UPDATE background_jobs j
+SET status = 'running', attempts = j.attempts + 1, locked_at = now()
+FROM (
+    SELECT id FROM background_jobs
+    WHERE (status = 'pending' AND run_after <= now())
+       OR (status = 'running' AND locked_at < now() - make_interval(secs => :lease))
+    ORDER BY run_after
+    LIMIT :limit
+    FOR UPDATE SKIP LOCKED
+) due
+WHERE j.id = due.id
+RETURNING j.id, j.job_type, j.payload, j.attempts, j.max_attempts,
+          EXTRACT(EPOCH FROM now() - j.run_after) AS waited
+""")
+
+_FAIL_SQL = text("""
+UPDATE background_jobs
+SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'pending' END,
+    run_after = now() + make_interval(secs => :delay),
+    locked_at = NULL,
+    last_error = :error
+WHERE id = :id
+RETURNING status
+""")
+
+
+class JobRunner:
+    """Dispatcher thread claiming due outbox rows for a pool of workers."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        workers: int = 4,
+        poll_seconds: float = 2.0,
+        retry_seconds: float = 30.0,
+    ):
+        self.session_factory = session_factory
+        self.workers = max(1, workers)
+        self.poll_seconds = poll_seconds
+        self.retry_seconds = retry_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waits: deque = deque(maxlen=1000)
+        self._runs: deque = deque(maxlen=1000)
+        self.completed = 0
+        self.retried = 0
+        self.dead = 0
+        self.submitted = 0
+        self.submit_failures = 0
+
+    # ── Lifecycle ──────────────────────────────────────────────────────────
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="job-worker")
+            self._thread = threading.Thread(target=self._run, name="job-dispatcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop claiming jobs and wait for the ones in flight."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    # ── Work ───────────────────────────────────────────────────────────────
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> None:
+        """Run fn on the pool, outside the outbox; inline when the runner is not started."""
+        with self._lock:
+            self.submitted += 1
+        if self._executor is None:
+            self._call(fn, args, kwargs)
+        else:
+            self._executor.submit(self._call, fn, args, kwargs)
+
+    def run_pending(self, limit: int = 100) -> int:
+        """Claim up to limit due jobs and run them in the calling thread."""
+        jobs = self._claim(limit)
+        for job in jobs:
+            self._execute(job)
+        return len(jobs)
+
+    def _call(self, fn: Callable[..., Any], args: tuple, kwargs: dict) -> None:
+        try:
+            fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self.submit_failures += 1
+            logger.exception(f"Background task {getattr(fn, '__name__', fn)} failed")
+
+    def _claim(self, limit: int) -> list:
+        db = self.session_factory()
+        try:
+            jobs = db.execute(_CLAIM_SQL, {"lease": LEASE_SECONDS, "limit": limit}).all()
+            db.commit()
+            return jobs
+        finally:
+            db.close()
+
+    def _execute(self, job) -> None:
+        with self._lock:
+            self._waits.append(max(float(job.waited), 0.0))
+        started = time.perf_counter()
+        db = self.session_factory()
+        try:
+            handler = _handlers.get(job.job_type)
+            if handler is None:
+                raise LookupError(f"No handler registered for job type {job.job_type!r}")
+            handler(db, job.payload)
+            db.query(BackgroundJob).filter(BackgroundJob.id == job.id).delete(synchronize_session=False)
+            db.commit()
+            with self._lock:
+                self.completed += 1
+                self._runs.append(time.perf_counter() - started)
+        except Exception as e:
+            db.rollback()
+            delay = self.retry_seconds * 2 ** (job.attempts - 1)
+            status = db.execute(_FAIL_SQL, {"id": job.id, "delay": delay, "error": str(e)[:2000]}).scalar()
+            db.commit()
+            with self._lock:
+                if status == JOB_DEAD:
+                    self.dead += 1
+                else:
+                    self.retried += 1
+            if status == JOB_DEAD:
+                logger.error(f"Job {job.job_type} {job.id} dead after {job.attempts} attempts: {e}")
+            else:
+                logger.warning(f"Job {job.job_type} {job.id} failed (attempt {job.attempts}), retrying in {delay:.0f}s: {e}")
+        finally:
+            db.close()
+
+    def _execute_tracked(self, job) -> None:
+        try:
+            self._execute(job)
+        except Exception:
+            logger.exception(f"Job {job.job_type} {job.id} could not be recorded")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            try:
+                while not self._stop.is_set():
+                    with self._lock:
+                        free = self.workers - self._in_flight
+                    if free <= 0:
+                        break
+                    jobs = self._claim(free)
+                    if not jobs:
+                        break
+                    for job in jobs:
+                        with self._lock:
+                            self._in_flight += 1
+                        self._executor.submit(self._execute_tracked, job)
+            except Exception as e:
+                logger.warning(f"Job dispatcher could not claim jobs: {e}")
+                self._stop.wait(self.poll_seconds)
+
+    # ── Metrics ────────────────────────────────────────────────────────────
+
+    def stats(self, db: Optional[Session] = None) -> dict:
+        """Counters and latencies of this process; outbox depth when db is given."""
+        with self._lock:
+            waits, runs = sorted(self._waits), sorted(self._runs)
+            result = {
+                "running": self.running,
+                "workers": self.workers,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "retried": self.retried,
+                "dead": self.dead,
+                "submitted": self.submitted,
+                "submit_failures": self.submit_failures,
+                "wait_ms_avg": round(1000 * sum(waits) / len(waits), 1) if waits else 0.0,
+                "wait_ms_p95": round(1000 * waits[int(0.95 * (len(waits) - 1))], 1) if waits else 0.0,
+                "run_ms_avg": round(1000 * sum(runs) / len(runs), 1) if runs else 0.0,
+                "run_ms_p95": round(1000 * runs[int(0.95 * (len(runs) - 1))], 1) if runs else 0.0,
+            }
+        if db is not None:
+            depth = dict(db.execute(text("SELECT status, count(*) FROM background_jobs GROUP BY status")).all())
+            oldest = db.execute(text("""
+                SELECT EXTRACT(EPOCH FROM now() - min(run_after)) FROM background_jobs
+                WHERE status = 'pending' AND run_after <= now()
+            """)).scalar()
+            result["depth"] = {status: depth.get(status, 0) for status in (JOB_PENDING, JOB_RUNNING, JOB_DEAD)}
+            result["oldest_due_seconds"] = round(float(oldest), 1) if oldest is not None else 0.0
+        return result
+
+
+job_runner = JobRunner(
+    workers=settings.JOB_WORKERS,
+    poll_seconds=settings.JOB_POLL_SECONDS,
+    retry_seconds=settings.JOB_RETRY_SECONDS,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_runner(session: Session) -> None:
+    if session.info.pop(_ENQUEUED_KEY, False):
+        job_runner.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_enqueued(session: Session) -> None:
+    session.info.pop(_ENQUEUED_KEY, None)
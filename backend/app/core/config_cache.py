@@ -0,0 +1,216 @@
+"""
+Per-hospital read-through cache for configuration that changes a few times
+a year: hospital_settings and tax_configurations.
+
+Entries are keyed by (kind, hospital_id) and hold read-only CachedRow
+snapshots, never session-bound ORM objects. Each key carries a version;
+a load that started before an invalidation is not stored, so a reader
+racing with a writer cannot re-cache the old rows. Entries also expire
+after settings.CONFIG_CACHE_TTL_SECONDS as a backstop.
+
+Writers call config_cache.notify(db, kind, hospital_id) before committing.
+The local entry is dropped once that session commits (after_commit hook).
+When settings.CONFIG_CACHE_NOTIFY is on, notify() also queues a
+pg_notify on the hms_config_cache channel inside the same transaction.
+Every worker runs a ConfigCacheListener thread that drops its own copy
+when the notification arrives.
+
+Usage:
+    from ..core.config_cache import HOSPITAL_SETTINGS, CachedRow, config_cache
+
+    row = config_cache.get(HOSPITAL_SETTINGS, hospital_id, lambda: CachedRow(load(db)))
+"""
+import logging
+import select
+import threading
+import time
+import uuid
+from types import MappingProxyType
+from typing import Any, Callable, Optional
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+HOSPITAL_SETTINGS = "hospital_settings"
+TAX_CONFIGURATIONS = "tax_configurations"
+
+NOTIFY_CHANNEL = "hms_config_cache"
+_PENDING_KEY = "config_cache_pending"
+
+_MISSING = object()
+
+
+class CachedRow:
+    """Read-only snapshot of an ORM row's column values."""
+
+    __slots__ = ("_values",)
+
+    def __init__(self, row):
+        values = {attr.key: getattr(row, attr.key) for attr in inspect(row).mapper.column_attrs}
+        object.__setattr__(self, "_values", MappingProxyType(values))
+
+    def __getattr__(self, name: str):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError(f"CachedRow is read-only (tried to set {name!r})")
+
+    def as_dict(self) -> dict:
+        return dict(self._values)
+
+
+def _hospital_uuid(hospital_id) -> uuid.UUID:
+    return hospital_id if isinstance(hospital_id, uuid.UUID) else uuid.UUID(str(hospital_id))
+
+
+class ConfigCache:
+    """Versioned per-hospital cache with hit/miss counters."""
+
+    def __init__(self, ttl_seconds: float = 300):
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict[tuple[str, uuid.UUID], tuple[float, Any]] = {}
+        self._versions: dict[tuple[str, uuid.UUID], int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+
+    def get(self, kind: str, hospital_id, loader: Callable[[], Any]) -> Any:
+        """Cached value for (kind, hospital), calling loader() on a miss."""
+        key = (kind, _hospital_uuid(hospital_id))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            version = self._versions.get(key, 0)
+
+        value = loader()
+        if self.ttl_seconds > 0:
+            with self._lock:
+                if self._versions.get(key, 0) == version:
+                    self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        return value
+
+    def invalidate(self, kind: str, hospital_id, remote: bool = False) -> None:
+        key = (kind, _hospital_uuid(hospital_id))
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._entries.pop(key, None)
+            if remote:
+                self.remote_invalidations += 1
+            else:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in self._entries:
+                self._versions[key] = self._versions.get(key, 0) + 1
+            self._entries.clear()
+
+    def notify(self, db: Session, kind: str, hospital_id) -> None:
+        """
+        Mark (kind, hospital) as changed by the session's current transaction.
+        Call before db.commit(); the entry is dropped when the commit succeeds.
+        """
+        hospital_id = _hospital_uuid(hospital_id)
+        db.info.setdefault(_PENDING_KEY, set()).add((kind, hospital_id))
+        if settings.CONFIG_CACHE_NOTIFY:
+            db.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": NOTIFY_CHANNEL, "payload": f"{kind}:{hospital_id}"},
+            )
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "remote_invalidations": self.remote_invalidations,
+            }
+
+
+config_cache = ConfigCache(settings.CONFIG_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    for kind, hospital_id in session.info.pop(_PENDING_KEY, ()):
+        config_cache.invalidate(kind, hospital_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+# ── Cross-worker invalidation ──────────────────────────────────────────────
+
+class ConfigCacheListener:
+    """Background thread that LISTENs on NOTIFY_CHANNEL and invalidates locally."""
+
+    def __init__(self, cache: ConfigCache, database_url: str, poll_seconds: float = 1.0):
+        self.cache = cache
+        self.dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="config-cache-listener", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _handle(self, payload: str) -> None:
+        kind, _, hospital_id = payload.partition(":")
+        try:
+            self.cache.invalidate(kind, hospital_id, remote=True)
+        except ValueError:
+            logger.warning("Ignoring malformed config cache notification %r", payload)
+
+    def _run(self) -> None:
+        import psycopg2
+
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+                # Changes made while we were not listening were missed.
+                self.cache.clear()
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], self.poll_seconds) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._handle(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.warning(f"Config cache listener disconnected: {e}")
+                self._stop.wait(5)
+            finally:
+                if conn is not None:
+                    conn.close()
@@ -0,0 +1,260 @@
+"""
+Image upload worker pool and the /uploads static mount that serves it.
+
+Decoding and resizing a multi-megapixel photo is CPU-bound; done inside a
+request it would hold the event loop for hundreds of milliseconds. The
+pool runs utils/image_variants.process() in settings.IMAGE_WORKERS
+separate processes instead, so routers await the Future and keep serving.
+
+Every upload is addressed by a SHA-256 of its kind,
+image_variants.PIPELINE_VERSION and its bytes. Its variants live at
+<uploads>/<dir>/<2 hex>/<digest>[-<size>].<ext|webp>, and the URL stored
+on the row (User.avatar_url, Hospital.logo_url) is the unsuffixed main
+file, which is a real image for any client. Uploading the same image
+again is a stat(); concurrent uploads of it share one run. A pool broken
+by a dead worker process is replaced and the upload processed once more.
+
+UploadFiles serves the mount. For a content-addressed URL it picks the
+variant from ?size= (e.g. ?size=thumb) and the Accept header (WebP when
+the browser takes it, with Vary: Accept), and marks the response
+immutable for a year — a changed image gets a new URL, never new bytes.
+Anything else under /uploads is served as before.
+
+Usage in an async router:
+    url = await asyncio.wrap_future(image_processor.submit("photo", content))
+"""
+import glob
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from urllib.parse import parse_qs
+
+from fastapi.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_URL = "/uploads"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+_CONTENT_ADDRESSED = re.compile(r"^(?P<dir>[a-z]+/[0-9a-f]{2})/(?P<digest>[0-9a-f]{64})\.(?P<ext>jpg|png|svg)$")
+
+
+def _process_file(kind: str, content: bytes, uploads_dir: str, digest: str, max_pixels: int) -> dict:
+    """Worker-process entry point."""
+    from ..utils.image_variants import process
+
+    return process(kind, content, uploads_dir, digest, max_pixels)
+
+
+class ImageProcessor:
+    """Process pool writing resized, metadata-free variants of uploads."""
+
+    def __init__(self, uploads_dir: str, workers: int = 1, max_pixels: int = 40_000_000):
+        self.uploads_dir = uploads_dir
+        self.workers = max(1, workers)
+        self.max_pixels = max_pixels
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._process_seconds = 0.0
+        self.hits = 0
+        self.processed = 0
+        self.shared = 0
+        self.rejected = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.restarts = 0
+
+    # ── Addressing ─────────────────────────────────────────────────────────
+
+    def digest(self, kind: str, content: bytes) -> str:
+        from ..utils.image_variants import PIPELINE_VERSION
+
+        return hashlib.sha256(f"{kind}:{PIPELINE_VERSION}:".encode("ascii") + content).hexdigest()
+
+    def url_for(self, kind: str, digest: str, ext: Optional[str] = None) -> str:
+        from ..utils.image_variants import VARIANTS, file_name, relative_dir
+
+        return f"{UPLOADS_URL}/{relative_dir(kind, digest)}/{file_name(digest, '', ext or VARIANTS[kind]['ext'])}"
+
+    def path_for(self, url: str) -> str:
+        return os.path.join(self.uploads_dir, url[len(UPLOADS_URL):].lstrip("/"))
+
+    # ── Processing ─────────────────────────────────────────────────────────
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: the API process holds threads and DB connections
+            # that must not be duplicated into the workers.
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def submit(self, kind: str, content: bytes) -> Future:
+        """Future resolving to the main variant's URL; raises ValueError for undecodable images."""
+        digest = self.digest(kind, content)
+        url = self.url_for(kind, digest)
+        with self._lock:
+            self.bytes_in += len(content)
+            pending = self._in_flight.get(digest)
+            if pending is not None:
+                self.shared += 1
+                return pending
+            if os.path.exists(self.path_for(url)):
+                self.hits += 1
+                done: Future = Future()
+                done.set_result(url)
+                return done
+            result: Future = Future()
+            self._in_flight[digest] = result
+        self._start(kind, content, digest, url, result)
+        return result
+
+    def _start(self, kind: str, content: bytes, digest: str, url: str, result: Future, retried: bool = False) -> None:
+        with self._lock:
+            pool = self._pool()
+        started = time.perf_counter()
+        try:
+            run = pool.submit(_process_file, kind, content, self.uploads_dir, digest, self.max_pixels)
+        except BrokenProcessPool as e:
+            run = Future()
+            run.set_exception(e)
+        run.add_done_callback(
+            lambda f: self._finish(kind, content, digest, url, started, f, result, pool, retried)
+        )
+
+    def _replace_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Drop a broken executor so the next submit starts a fresh one."""
+        with self._lock:
+            if self._executor is not pool:
+                return  # another upload already replaced it
+            self._executor = None
+            self.restarts += 1
+        logger.warning("Image worker pool broke (a worker process died); starting a new one")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _finish(
+        self, kind: str, content: bytes, digest: str, url: str, started: float,
+        run: Future, result: Future, pool: ProcessPoolExecutor, retried: bool,
+    ) -> None:
+        error = run.exception()
+        if isinstance(error, BrokenProcessPool):
+            self._replace_pool(pool)
+            if not retried:
+                self._start(kind, content, digest, url, result, retried=True)
+                return
+        with self._lock:
+            self._in_flight.pop(digest, None)
+            if error is None:
+                self.processed += 1
+                self._process_seconds += time.perf_counter() - started
+                self.bytes_out += run.result()["bytes"]
+            else:
+                self.rejected += 1
+        if error is not None:
+            if not isinstance(error, ValueError):
+                logger.error(f"Image {digest[:12]} failed to process: {error}")
+            result.set_exception(error)
+            return
+        result.set_result(url)
+
+    def store(self, kind: str, content: bytes, ext: str) -> str:
+        """Content-address a file that is served as uploaded (SVG logos); returns its URL."""
+        digest = self.digest(kind, content)
+        url = self.url_for(kind, digest, ext)
+        path = self.path_for(url)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(content)
+            os.replace(temporary, path)
+        return url
+
+    def discard(self, url: Optional[str]) -> int:
+        """Remove the files behind a stored URL (every variant of a content-addressed one)."""
+        if not url or not url.startswith(f"{UPLOADS_URL}/"):
+            return 0
+        path = self.path_for(url)
+        match = _CONTENT_ADDRESSED.match(url[len(UPLOADS_URL) + 1:])
+        paths = glob.glob(os.path.join(os.path.dirname(path), f"{match['digest']}*")) if match else [path]
+        removed = 0
+        for path in paths:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "started": self._executor is not None,
+                "in_flight": len(self._in_flight),
+                "hits": self.hits,
+                "processed": self.processed,
+                "shared_runs": self.shared,
+                "rejected": self.rejected,
+                "pool_restarts": self.restarts,
+                "process_ms_avg": (
+                    round(1000 * self._process_seconds / self.processed, 1) if self.processed else 0.0
+                ),
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+            }
+
+
+class UploadFiles(StaticFiles):
+    """StaticFiles for /uploads that serves the requested variant of processed images."""
+
+    def _variant(self, path: str, scope: Scope) -> tuple[str, bool]:
+        from ..utils.image_variants import VARIANTS, file_name
+
+        match = _CONTENT_ADDRESSED.match(path.replace(os.sep, "/"))
+        if not match or match["ext"] == "svg":
+            return path, bool(match)
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        size = (query.get("size") or [""])[0]
+        sizes = {s for spec in VARIANTS.values() for s in spec["sizes"]}
+        if size not in sizes:
+            size = ""
+        accept = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept":
+                accept = value.decode("latin-1")
+        for ext in (("webp", match["ext"]) if "image/webp" in accept else (match["ext"],)):
+            candidate = f"{match['dir']}/{file_name(match['digest'], size, ext)}"
+            if os.path.exists(os.path.join(self.directory, candidate)):
+                return candidate, True
+        return path, True
+
+    async def get_response(self, path: str, scope: Scope):
+        path, addressed = self._variant(path, scope)
+        response = await super().get_response(path, scope)
+        if addressed and response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE
+            response.headers["Vary"] = "Accept"
+        return response
+
+
+image_processor = ImageProcessor(
+    uploads_dir=settings.UPLOADS_DIR,
+    workers=settings.IMAGE_WORKERS,
+    max_pixels=settings.IMAGE_MAX_PIXELS,
+)
@@ -0,0 +1,331 @@
+"""
+Request and database metrics in Prometheus text format.
+
+MetricsMiddleware times every HTTP request and labels it with the route
+template (e.g. /api/v1/patients/{patient_id}), so one histogram series
+covers every patient id. While a request runs, a RequestStats object sits
+in a context variable. It follows the request into threadpool calls and
+streamed bodies. The engine's before/after_cursor_execute listeners add
+each statement and its time to it. A route whose query count grows with
+its data shows up in hms_http_request_db_queries long before anyone reads
+its code.
+
+Connection pool checkout is timed inside the pool (TimedQueuePool,
+TimedAsyncQueuePool, installed by database.py). That is the time a
+request waits for a free connection, plus the time to open one when the
+pool grows. Pool occupancy and the stats() of the other core singletons
+(caches, job runner, SMTP, PDF and image pools) are read when /metrics is
+scraped, with no bookkeeping of their own.
+
+Everything is per worker process; Prometheus adds up the workers.
+
+Usage:
+    metrics.instrument_engine(engine, "sync")
+    metrics.register_stats("principal_cache", principal_cache.stats)
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+    PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
+"""
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+DB_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+CHECKOUT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+LabelValues = tuple[str, ...]
+
+
+class RequestStats:
+    """Database work done on behalf of one request."""
+
+    __slots__ = ("queries", "db_seconds", "checkout_seconds")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.checkout_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_request() -> Optional[RequestStats]:
+    """Stats of the request being served in this context, if any."""
+    return _current.get()
+
+
+class _Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...], buckets: tuple[float, ...]):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self.series: dict[LabelValues, list] = {}  # values -> [bucket counts..., sum, count]
+
+    def observe(self, values: LabelValues, value: float) -> None:
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def lines(self) -> list[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, series in sorted(self.series.items()):
+            for bound, count in zip(self.buckets, series):
+                out.append(f"{self.name}_bucket{_labels(self.labels, values, le=_number(bound))} {count}")
+            out.append(f"{self.name}_bucket{_labels(self.labels, values, le='+Inf')} {series[-1]}")
+            out.append(f"{self.name}_sum{_labels(self.labels, values)} {_number(series[-2])}")
+            out.append(f"{self.name}_count{_labels(self.labels, values)} {series[-1]}")
+        return out
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: LabelValues, **extra: str) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{v}"' for n, v in extra.items()]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+def _simple(name: str, kind: str, help_text: str, labels: tuple[str, ...], samples: dict) -> list[str]:
+    out = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for values, value in sorted(samples.items()):
+        out.append(f"{name}{_labels(labels, values)} {_number(value)}")
+    return out
+
+
+class Metrics:
+    """Process-wide registry of request, database and pool metrics."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._request_seconds = _Histogram(
+            "hms_http_request_duration_seconds", "Time to serve a request, including a streamed body.",
+            ("method", "route"), DURATION_BUCKETS,
+        )
+        self._request_queries = _Histogram(
+            "hms_http_request_db_queries", "SQL statements executed per request.",
+            ("method", "route"), QUERY_BUCKETS,
+        )
+        self._request_db_seconds = _Histogram(
+            "hms_http_request_db_seconds", "Time spent executing SQL per request.",
+            ("method", "route"), DB_TIME_BUCKETS,
+        )
+        self._checkout_seconds = _Histogram(
+            "hms_db_pool_checkout_seconds", "Wait for a pooled connection (or to open a new one).",
+            ("pool",), CHECKOUT_BUCKETS,
+        )
+        self._requests: dict[LabelValues, int] = {}
+        self._in_flight: dict[LabelValues, int] = {}
+        self._queries: dict[LabelValues, int] = {}
+        self._query_seconds: dict[LabelValues, float] = {}
+        self._pools: dict[str, object] = {}
+        self._stats_sources: dict[str, Callable[[], dict]] = {}
+
+    # ── Wiring ─────────────────────────────────────────────────────────────
+
+    def instrument_engine(self, engine: Engine, name: str) -> None:
+        """Count and time every statement on engine; report its pool as `name`."""
+        self._pools[name] = engine.pool
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if context is not None:
+                context._metrics_started = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = getattr(context, "_metrics_started", None)
+            self.observe_query(time.perf_counter() - started if started is not None else 0.0)
+
+    def register_stats(self, name: str, stats: Callable[[], dict]) -> None:
+        """Export the numeric fields of stats() as hms_<name>_<field> gauges."""
+        self._stats_sources[name] = stats
+
+    # ── Observations ───────────────────────────────────────────────────────
+
+    def observe_query(self, seconds: float) -> None:
+        request = _current.get()
+        if request is not None:
+            request.queries += 1
+            request.db_seconds += seconds
+        source = ("request",) if request is not None else ("background",)
+        with self._lock:
+            self._queries[source] = self._queries.get(source, 0) + 1
+            self._query_seconds[source] = self._query_seconds.get(source, 0.0) + seconds
+
+    def observe_checkout(self, pool: str, seconds: float) -> None:
+        request = _current.get()
+        if request is not None:
+            request.checkout_seconds += seconds
+        with self._lock:
+            self._checkout_seconds.observe((pool,), seconds)
+
+    def start_request(self, method: str) -> None:
+        with self._lock:
+            self._in_flight[(method,)] = self._in_flight.get((method,), 0) + 1
+
+    def finish_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        labels = (method, route)
+        with self._lock:
+            self._in_flight[(method,)] -= 1
+            key = (method, route, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._request_seconds.observe(labels, seconds)
+            self._request_queries.observe(labels, stats.queries)
+            self._request_db_seconds.observe(labels, stats.db_seconds)
+
+    # ── Exposition ─────────────────────────────────────────────────────────
+
+    def _pool_lines(self) -> list[str]:
+        connections: dict[LabelValues, int] = {}
+        sizes: dict[LabelValues, int] = {}
+        for name, pool in self._pools.items():
+            if not isinstance(pool, QueuePool):
+                continue
+            sizes[(name,)] = pool.size()
+            connections[(name, "checked_out")] = pool.checkedout()
+            connections[(name, "idle")] = pool.checkedin()
+            connections[(name, "overflow")] = max(pool.overflow(), 0)
+        return (
+            _simple("hms_db_pool_size", "gauge", "Configured pool size.", ("pool",), sizes)
+            + _simple(
+                "hms_db_pool_connections", "gauge", "Pooled connections by state.", ("pool", "state"), connections,
+            )
+        )
+
+    def _stats_lines(self) -> list[str]:
+        out = []
+        for source, stats in sorted(self._stats_sources.items()):
+            for field, value in stats().items():
+                if isinstance(value, (bool, int, float)):
+                    name = f"hms_{source}_{field}"
+                    out += [f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+        return out
+
+    def render(self) -> str:
+        with self._lock:
+            lines = (
+                _simple(
+                    "hms_http_requests_total", "counter", "Requests served.",
+                    ("method", "route", "status"), self._requests,
+                )
+                + _simple(
+                    "hms_http_requests_in_flight", "gauge", "Requests being served.",
+                    ("method",), self._in_flight,
+                )
+                + self._request_seconds.lines()
+                + self._request_queries.lines()
+                + self._request_db_seconds.lines()
+                + _simple(
+                    "hms_db_queries_total", "counter", "SQL statements executed, inside requests or not.",
+                    ("source",), self._queries,
+                )
+                + _simple(
+                    "hms_db_query_seconds_total", "counter", "Time spent executing SQL.",
+                    ("source",), self._query_seconds,
+                )
+                + self._checkout_seconds.lines()
+            )
+        lines += self._pool_lines()
+        lines += self._stats_lines()
+        return "\n".join(lines) + "\n"
+
+
+def route_label(scope: Scope) -> str:
+    """Route template of a served request; the mount path for static files."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope.get("root_path"):
+        return scope["root_path"]
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so streamed bodies are timed to their last byte."""
+
+    def __init__(self, app: ASGIApp, registry: "Metrics") -> None:
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.registry.start_request(method)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.registry.finish_request(method, route_label(scope), status, time.perf_counter() - started, stats)
+            _current.reset(token)
+
+
+# ── Timed pools ────────────────────────────────────────────────────────────
+
+class _TimedCheckout:
+    metrics_label = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe_checkout(self.metrics_label, time.perf_counter() - started)
+
+
+# SQLAlchemy names a pool's logger after its class; keeping the parent's
+# name leaves these under "sqlalchemy.*", which SQLAlchemy caps at WARN.
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    """QueuePool that reports checkout time to metrics."""
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.QueuePool"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that reports checkout time to metrics."""
+    _sqla_logger_namespace = "sqlalchemy.pool.impl.AsyncAdaptedQueuePool"
+    metrics_label = "async"
+
+
+metrics = Metrics()
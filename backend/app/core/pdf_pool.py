@@ -0,0 +1,242 @@
+"""
+PDF rendering worker pool with a content-addressed disk cache.
+
+Laying out a PDF is CPU-bound pure Python; done inside a request it would
+hold the event loop (and the GIL) for the whole layout. The pool renders
+in settings.PDF_WORKERS separate processes instead, so API workers keep
+serving while documents are drawn.
+
+Every document is addressed by a SHA-256 of its layout name,
+pdf_layouts.LAYOUT_VERSION and the JSON of its data. The file lives at
+<settings.PDF_CACHE_DIR>/<2 hex>/<digest>.pdf, so printing the same
+document again is a stat() and a static file response, and concurrent
+requests for the same document share one render. Files are written to a
+temporary name and renamed into place, so a reader never sees a partial
+PDF. Once the directory grows past settings.PDF_CACHE_MAX_MB, the least
+recently served files are removed. If a worker process dies (OOM
+killer, a crash in native code), the broken pool is replaced and the
+document is rendered once more before the error reaches the caller.
+
+Usage in an async router:
+    path = await asyncio.wrap_future(pdf_renderer.submit("invoice", data))
+    return FileResponse(path, media_type="application/pdf")
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _render_file(kind: str, data: dict, path: str) -> int:
+    """Worker-process entry point: draw one document to path; returns its size."""
+    from ..utils.pdf_layouts import LAYOUTS
+
+    content = LAYOUTS[kind](data)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(content)
+    os.replace(temporary, path)
+    return len(content)
+
+
+class PDFRenderer:
+    """Process pool drawing PDFs into a content-addressed cache directory."""
+
+    def __init__(self, cache_dir: str, workers: int = 2, max_bytes: int = 512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.workers = max(1, workers)
+        self.max_bytes = max_bytes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._cache_bytes: Optional[int] = None
+        self._render_seconds = 0.0
+        self.hits = 0
+        self.renders = 0
+        self.shared = 0
+        self.failures = 0
+        self.pruned = 0
+        self.restarts = 0
+
+    # ── Addressing ─────────────────────────────────────────────────────────
+
+    def digest(self, kind: str, data: dict) -> str:
+        from ..utils.pdf_layouts import LAYOUT_VERSION
+
+        body = json.dumps([kind, LAYOUT_VERSION, data], sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.pdf")
+
+    # ── Rendering ──────────────────────────────────────────────────────────
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn, not fork: the API process holds threads and DB connections
+            # that must not be duplicated into the workers.
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def submit(self, kind: str, data: dict) -> Future:
+        """Future resolving to the cached file's path; already done on a cache hit."""
+        digest = self.digest(kind, data)
+        path = self.path_for(digest)
+        with self._lock:
+            pending = self._in_flight.get(digest)
+            if pending is not None:
+                self.shared += 1
+                return pending
+            if os.path.exists(path):
+                self.hits += 1
+                done: Future = Future()
+                done.set_result(path)
+                try:
+                    os.utime(path)  # recency for pruning
+                except OSError:
+                    pass
+                return done
+            result: Future = Future()
+            self._in_flight[digest] = result
+        self._start(kind, data, digest, path, result)
+        return result
+
+    def _start(self, kind: str, data: dict, digest: str, path: str, result: Future, retried: bool = False) -> None:
+        with self._lock:
+            pool = self._pool()
+        started = time.perf_counter()
+        try:
+            render = pool.submit(_render_file, kind, data, path)
+        except BrokenProcessPool as e:
+            render = Future()
+            render.set_exception(e)
+        render.add_done_callback(
+            lambda f: self._finish(kind, data, digest, path, started, f, result, pool, retried)
+        )
+
+    def _replace_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Drop a broken executor so the next submit starts a fresh one."""
+        with self._lock:
+            if self._executor is not pool:
+                return  # another render already replaced it
+            self._executor = None
+            self.restarts += 1
+        logger.warning("PDF worker pool broke (a worker process died); starting a new one")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def render(self, kind: str, data: dict, timeout: Optional[float] = None) -> str:
+        """Blocking submit(); for callers outside the event loop."""
+        return self.submit(kind, data).result(timeout)
+
+    def _finish(
+        self, kind: str, data: dict, digest: str, path: str, started: float,
+        render: Future, result: Future, pool: ProcessPoolExecutor, retried: bool,
+    ) -> None:
+        error = render.exception()
+        if isinstance(error, BrokenProcessPool):
+            self._replace_pool(pool)
+            if not retried:
+                self._start(kind, data, digest, path, result, retried=True)
+                return
+        with self._lock:
+            self._in_flight.pop(digest, None)
+            if error is None:
+                self.renders += 1
+                self._render_seconds += time.perf_counter() - started
+                if self._cache_bytes is not None:
+                    self._cache_bytes += render.result()
+            else:
+                self.failures += 1
+        if error is not None:
+            logger.error(f"PDF render {digest[:12]} failed: {error}")
+            result.set_exception(error)
+            return
+        result.set_result(path)
+        if self._size() > self.max_bytes:
+            self.prune()
+
+    # ── Disk cache ─────────────────────────────────────────────────────────
+
+    def _files(self) -> list[tuple[float, int, str]]:
+        files = []
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                if name.endswith(".pdf"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _size(self) -> int:
+        with self._lock:
+            known = self._cache_bytes
+        if known is None:
+            known = sum(size for _, size, _ in self._files())
+            with self._lock:
+                self._cache_bytes = known
+        return known
+
+    def prune(self, target_bytes: Optional[int] = None) -> int:
+        """Remove least recently served files until the cache is under target (80% of the cap)."""
+        target = int(self.max_bytes * 0.8) if target_bytes is None else target_bytes
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._cache_bytes = total
+            self.pruned += removed
+        return removed
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.renders + self.shared
+            return {
+                "workers": self.workers,
+                "started": self._executor is not None,
+                "in_flight": len(self._in_flight),
+                "cache_bytes": self._cache_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "renders": self.renders,
+                "shared_renders": self.shared,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "render_ms_avg": round(1000 * self._render_seconds / self.renders, 1) if self.renders else 0.0,
+                "failures": self.failures,
+                "pool_restarts": self.restarts,
+                "pruned": self.pruned,
+            }
+
+
+pdf_renderer = PDFRenderer(
+    cache_dir=settings.PDF_CACHE_DIR,
+    workers=settings.PDF_WORKERS,
+    max_bytes=settings.PDF_CACHE_MAX_MB * 1024 * 1024,
+)
@@ -0,0 +1,130 @@
+"""
+Authenticated-principal cache for dependencies.get_current_user.
+
+Every authenticated request used to run the User + roles + hospital query.
+The cache keeps what handlers actually read from current_user (id,
+hospital_id, username, roles, permissions, is_active), keyed by user id and
+the token's `iat`, so repeat requests with the same token skip the database.
+
+Entries live for settings.AUTH_CACHE_TTL_SECONDS; at most
+settings.AUTH_CACHE_MAX_ENTRIES are kept, least recently used evicted first.
+user_service.update_user / delete_user / reset_password (which also commit
+role assignments made by the users router) and /auth/change-password call
+invalidate_user() after committing. Invalidation is per worker process, so
+other workers may serve the old principal until its TTL runs out.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from ..config import settings
+
+CacheKey = tuple[uuid.UUID, Optional[int]]
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Session-independent view of the authenticated User."""
+    id: uuid.UUID
+    hospital_id: uuid.UUID
+    username: str
+    roles: tuple[str, ...]
+    permissions: tuple[str, ...]
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            hospital_id=user.hospital_id,
+            username=user.username,
+            roles=tuple(user.roles),
+            permissions=tuple(user.permissions),
+            is_active=bool(user.is_active),
+        )
+
+
+class PrincipalCache:
+    """Bounded TTL cache of principals with per-user invalidation."""
+
+    def __init__(self, ttl_seconds: float = 60, max_entries: int = 2048):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[CacheKey, tuple[float, Principal]]" = OrderedDict()
+        self._versions: dict[uuid.UUID, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def get(self, user_id: uuid.UUID, issued_at: Optional[int]) -> Optional[Principal]:
+        key = (user_id, issued_at)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def version(self, user_id: uuid.UUID) -> int:
+        """Invalidation counter for a user; pass it back to put()."""
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def put(self, issued_at: Optional[int], principal: Principal, version: int) -> None:
+        """
+        Cache a principal loaded while version() returned `version`. Dropped if
+        the user was invalidated since, so a load that raced with an update
+        cannot re-cache the old roles.
+        """
+        if self.ttl_seconds <= 0:
+            return
+        key = (principal.id, issued_at)
+        with self._lock:
+            if self._versions.get(principal.id, 0) != version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, principal)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: uuid.UUID | str) -> None:
+        """Drop every cached principal for a user (all tokens)."""
+        if isinstance(user_id, str):
+            user_id = uuid.UUID(user_id)
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, 0) + 1
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
+
+
+principal_cache = PrincipalCache(settings.AUTH_CACHE_TTL_SECONDS, settings.AUTH_CACHE_MAX_ENTRIES)
@@ -0,0 +1,75 @@
+"""
+Rendered-document cache for prescription prints.
+
+A finalized prescription no longer changes, so its printed HTML is the same
+on every reprint (pharmacy counter, OPD desk, patient copy). The cache keeps
+the rendered output keyed by (prescription id, updated_at, language): any
+later write to the prescription bumps updated_at, which makes the old entry
+unreachable rather than stale. Drafts are never cached.
+
+At most settings.PRINT_CACHE_MAX_ENTRIES documents are kept per worker,
+least recently used evicted first. Patient and doctor details are captured
+at render time; a finalized print keeps showing them as they were until the
+entry is evicted or the worker restarts.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from ..config import settings
+
+PrintKey = tuple[uuid.UUID, Optional[datetime], str]
+
+
+class PrintCache:
+    """Bounded LRU cache of rendered documents."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[PrintKey, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: PrintKey) -> Optional[str]:
+        with self._lock:
+            document = self._entries.get(key)
+            if document is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return document
+
+    def put(self, key: PrintKey, document: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = document
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": sum(len(d) for d in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+print_cache = PrintCache(settings.PRINT_CACHE_MAX_ENTRIES)
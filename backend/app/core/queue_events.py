@@ -0,0 +1,122 @@
+"""
+In-process fan-out hub for live queue events.
+
+Queue state-change handlers publish one event per change; every subscribed
+stream (reception desk, doctor screen) whose hospital/doctor scope matches
+receives it.  Subscribers read from their own bounded asyncio.Queue, so a
+slow client never blocks publishers — when its buffer fills up the backlog
+is dropped and a single "queue.resync" event tells the client to refetch.
+
+Usage:
+    from ..core.queue_events import queue_event_hub
+
+    queue_event_hub.publish({"event": "queue.updated", "hospital_id": ..., ...})
+
+    sub = queue_event_hub.subscribe(hospital_id, doctor_id)
+    try:
+        event = await sub.get(timeout=15)
+    finally:
+        queue_event_hub.unsubscribe(sub)
+"""
+import asyncio
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+RESYNC_EVENT = {"event": "queue.resync"}
+
+
+class QueueSubscription:
+    """One connected client: a scope filter plus a bounded event buffer."""
+
+    def __init__(
+        self,
+        hospital_id: str,
+        doctor_id: Optional[str],
+        loop: asyncio.AbstractEventLoop,
+        max_pending: int,
+    ):
+        self.hospital_id = hospital_id
+        self.doctor_id = doctor_id
+        self.loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+    def matches(self, event: dict) -> bool:
+        if event.get("hospital_id") != self.hospital_id:
+            return False
+        if self.doctor_id is None:
+            return True
+        return self.doctor_id in (event.get("doctor_id"), event.get("previous_doctor_id"))
+
+    def _deliver(self, event: dict) -> None:
+        """Runs on the subscriber's event loop."""
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Client is too far behind to patch incrementally; make it refetch.
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(RESYNC_EVENT)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Next event, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class QueueEventHub:
+    """Registry of live subscriptions with thread-safe publish."""
+
+    def __init__(self, max_pending: int = 200):
+        self.max_pending = max_pending
+        self._subscriptions: set[QueueSubscription] = set()
+        self._lock = threading.Lock()
+        self.published_count = 0
+
+    def subscribe(self, hospital_id, doctor_id=None) -> QueueSubscription:
+        """Register a subscriber on the running event loop."""
+        sub = QueueSubscription(
+            hospital_id=str(hospital_id),
+            doctor_id=str(doctor_id) if doctor_id else None,
+            loop=asyncio.get_running_loop(),
+            max_pending=self.max_pending,
+        )
+        with self._lock:
+            self._subscriptions.add(sub)
+        logger.debug("Queue stream subscribed hospital=%s doctor=%s", sub.hospital_id, sub.doctor_id)
+        return sub
+
+    def unsubscribe(self, sub: QueueSubscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(sub)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+    def publish(self, event: dict) -> int:
+        """
+        Fan an event out to every matching subscriber.
+        Safe to call from the event loop or from a worker thread.
+        Returns the number of subscribers it was delivered to.
+        """
+        with self._lock:
+            targets = [s for s in self._subscriptions if s.matches(event)]
+        delivered = 0
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub._deliver, event)
+                delivered += 1
+            except RuntimeError:
+                # Subscriber's loop is closed — the stream is gone.
+                self.unsubscribe(sub)
+        self.published_count += 1
+        return delivered
+
+
+queue_event_hub = QueueEventHub()
@@ -0,0 +1,238 @@
+"""
+Pooled SMTP transport for email_service.
+
+Opening an SMTP session (TCP connect, STARTTLS, AUTH) costs several round
+trips and usually dwarfs sending the message itself. The pool keeps up to
+settings.SMTP_POOL_SIZE authenticated sessions open and reuses them: an
+idle session is handed to the next send until it has been unused for
+settings.SMTP_IDLE_SECONDS or has carried
+settings.SMTP_MAX_MESSAGES_PER_CONNECTION messages (servers cap both).
+
+Transient failures — a dropped or stale session, a 4xx reply — are retried
+on a fresh session, immediately and then with doubling backoff from
+settings.SMTP_RETRY_SECONDS, up to settings.SMTP_RETRIES times. Permanent
+5xx replies fail the message without a retry and leave the session in use.
+settings.SMTP_MAX_PER_SECOND (0 = unlimited) caps the send rate across all
+threads of the process.
+
+Usage:
+    from ..core.smtp_pool import smtp_pool
+
+    error = smtp_pool.send(from_addr, to_addr, raw_message)
+    # None when delivered, else the error text
+"""
+import logging
+import smtplib
+import threading
+import time
+from typing import Callable, Optional
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Session:
+    __slots__ = ("smtp", "sent", "last_used")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+def _is_transient(exc: Exception) -> bool:
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 400 <= exc.smtp_code < 500
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException derives from OSError; only socket-level errors are transient.
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+class SMTPPool:
+    """Bounded set of reusable SMTP sessions with retries and a rate limit."""
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        username: str = "",
+        password: str = "",
+        starttls: bool = True,
+        timeout: float = 30,
+        size: int = 2,
+        idle_seconds: float = 60,
+        max_per_session: int = 100,
+        max_per_second: float = 0,
+        retries: int = 3,
+        retry_seconds: float = 1.0,
+        smtp_factory: Optional[Callable[..., smtplib.SMTP]] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.size = max(1, size)
+        self.idle_seconds = idle_seconds
+        self.max_per_session = max(1, max_per_session)
+        self.min_interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self.retries = max(0, retries)
+        self.retry_seconds = retry_seconds
+        self.smtp_factory = smtp_factory
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle: list[_Session] = []
+        self._lock = threading.Lock()
+        self._next_send_at = 0.0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.sessions_opened = 0
+
+    # ── Sessions ───────────────────────────────────────────────────────────
+
+    def _connect(self) -> _Session:
+        if self.smtp_factory is not None:
+            smtp = self.smtp_factory(self.host, self.port, timeout=self.timeout)
+        elif self.port == 465:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls and self.port != 465:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        with self._lock:
+            self.sessions_opened += 1
+        return _Session(smtp)
+
+    def _acquire(self) -> _Session:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("No SMTP session became free")
+        try:
+            stale = []
+            session = None
+            with self._lock:
+                while self._idle:
+                    candidate = self._idle.pop()
+                    if time.monotonic() - candidate.last_used < self.idle_seconds:
+                        session = candidate
+                        break
+                    stale.append(candidate)
+            for old in stale:
+                self._close(old)
+            return session or self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, session: _Session) -> None:
+        """Return a healthy session to the pool (or close it once it has carried its quota)."""
+        if session.sent >= self.max_per_session:
+            self._discard(session)
+            return
+        session.last_used = time.monotonic()
+        with self._lock:
+            self._idle.append(session)
+        self._slots.release()
+
+    def _discard(self, session: _Session) -> None:
+        self._close(session)
+        self._slots.release()
+
+    @staticmethod
+    def _close(session: _Session) -> None:
+        try:
+            session.smtp.quit()
+        except Exception:
+            session.smtp.close()
+
+    def close(self) -> None:
+        """Close every idle session (sessions in use close when released)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            self._close(session)
+
+    # ── Sending ────────────────────────────────────────────────────────────
+
+    def _throttle(self) -> None:
+        if not self.min_interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            send_at = max(now, self._next_send_at)
+            self._next_send_at = send_at + self.min_interval
+        if send_at > now:
+            time.sleep(send_at - now)
+
+    def send(self, from_addr: str, to_addr: str, raw: str) -> Optional[str]:
+        """Deliver one message over a pooled session; None when delivered, else the error text."""
+        session: Optional[_Session] = None
+        error: Optional[str] = None
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt > 1:
+                    time.sleep(self.retry_seconds * 2 ** (attempt - 2))
+                try:
+                    if session is None:
+                        session = self._acquire()
+                    self._throttle()
+                    session.smtp.sendmail(from_addr, [to_addr], raw)
+                    session.sent += 1
+                    error = None
+                    break
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    if not _is_transient(e):
+                        break  # 5xx, or e.g. rejected credentials while connecting
+                    if session is not None:
+                        self._discard(session)
+                        session = None
+                    if attempt < self.retries:
+                        with self._lock:
+                            self.retried += 1
+            with self._lock:
+                if error:
+                    self.failed += 1
+                else:
+                    self.sent += 1
+        finally:
+            if session is not None:
+                self._release(session)
+        return error
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pool_size": self.size,
+                "idle_sessions": len(self._idle),
+                "sessions_opened": self.sessions_opened,
+                "sent": self.sent,
+                "failed": self.failed,
+                "retried": self.retried,
+            }
+
+
+smtp_pool = SMTPPool(
+    host=settings.SMTP_HOST,
+    port=settings.SMTP_PORT,
+    username=settings.SMTP_USERNAME,
+    password=settings.SMTP_PASSWORD,
+    starttls=settings.SMTP_STARTTLS,
+    timeout=settings.SMTP_TIMEOUT_SECONDS,
+    size=settings.SMTP_POOL_SIZE,
+    idle_seconds=settings.SMTP_IDLE_SECONDS,
+    max_per_session=settings.SMTP_MAX_MESSAGES_PER_CONNECTION,
+    max_per_second=settings.SMTP_MAX_PER_SECOND,
+    retries=settings.SMTP_RETRIES,
+    retry_seconds=settings.SMTP_RETRY_SECONDS,
+)
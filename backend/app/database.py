@@ -1,24 +1,56 @@
 import logging
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import settings
+from .core.metrics import TimedAsyncQueuePool, TimedQueuePool, metrics
 
 logger = logging.getLogger(__name__)
 
+# One connection budget per worker (DB_POOL_SIZE + DB_MAX_OVERFLOW), split
+# between the sync pool and the async pool carved out of it.
+SYNC_POOL_SIZE = max(1, settings.DB_POOL_SIZE - settings.DB_ASYNC_POOL_SIZE)
+SYNC_MAX_OVERFLOW = max(0, settings.DB_MAX_OVERFLOW - settings.DB_ASYNC_MAX_OVERFLOW)
+
 engine = create_engine(
     settings.DATABASE_URL,
     echo=settings.DB_ECHO,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20
+    pool_size=SYNC_POOL_SIZE,
+    max_overflow=SYNC_MAX_OVERFLOW,
+    poolclass=TimedQueuePool,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+# Async engine on the same database via asyncpg, for endpoints that must not
+# block the event loop while waiting on Postgres.
+async_engine = create_async_engine(
+    make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg"),
+    echo=settings.DB_ECHO,
+    pool_pre_ping=True,
+    pool_size=settings.DB_ASYNC_POOL_SIZE,
+    max_overflow=settings.DB_ASYNC_MAX_OVERFLOW,
+    poolclass=TimedAsyncQueuePool,
+)
+
+
+if settings.METRICS_ENABLED:
+    # Per-request query count and DB time for /metrics (core/metrics.py)
+    metrics.instrument_engine(engine, "sync")
+    metrics.instrument_engine(async_engine.sync_engine, "async")
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 # Log database connection pool configuration at import time
-logger.info("Database engine created (pool_size=10, max_overflow=20, pre_ping=True)")
+logger.info(
+    "Database engines created (sync pool_size=%d, max_overflow=%d; async pool_size=%d, max_overflow=%d; pre_ping=True)",
+    SYNC_POOL_SIZE, SYNC_MAX_OVERFLOW, settings.DB_ASYNC_POOL_SIZE, settings.DB_ASYNC_MAX_OVERFLOW,
+)
 
 
 def get_db():
@@ -28,3 +60,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Dependency for async database sessions (AsyncSession)."""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -3,11 +3,15 @@ Dependencies for JWT auth and role-based access — new hms_db UUID/RBAC schema.
 """
 import logging
 import uuid
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
-from .database import get_db
+from .database import get_async_db, get_db
 from .utils.security import decode_access_token
+from .core.principal_cache import Principal, principal_cache
 from .models.user import User, UserRole
 
 logger = logging.getLogger(__name__)
@@ -15,51 +19,41 @@ logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db),
-) -> User:
-    """Get current authenticated user from JWT token (UUID-based)."""
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    token = credentials.credentials
-    payload = decode_access_token(token)
 
+def _token_identity(credentials: HTTPAuthorizationCredentials) -> tuple[uuid.UUID, Optional[int]]:
+    """Decode the bearer token; return the user UUID and the token's iat."""
+    payload = decode_access_token(credentials.credentials)
     if payload is None:
-        raise credentials_exception
+        raise _credentials_exception()
 
     user_id_str = payload.get("user_id")
     if user_id_str is None:
-        raise credentials_exception
+        raise _credentials_exception()
 
     try:
-        user_uuid = uuid.UUID(user_id_str)
+        return uuid.UUID(user_id_str), payload.get("iat")
     except (ValueError, TypeError):
-        raise credentials_exception
+        raise _credentials_exception()
 
-    try:
-        user = (
-            db.query(User)
-            .options(
-                joinedload(User.user_roles).joinedload(UserRole.role),
-                joinedload(User.hospital),
-            )
-            .filter(User.id == user_uuid, User.is_deleted == False)
-            .first()
-        )
-    except Exception as e:
-        logger.error(f"Database error fetching user {user_id_str}: {e}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Could not verify user",
-        )
 
+def _current_user_query():
+    """User with roles and hospital loaded, so no lazy loads are needed later."""
+    return select(User).options(
+        joinedload(User.user_roles).joinedload(UserRole.role),
+        joinedload(User.hospital),
+    )
+
+
+def _check_user(user: Optional[User]) -> Principal:
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
 
     if not user.is_active:
         raise HTTPException(
@@ -67,16 +61,82 @@ async def get_current_user(
             detail="Account is inactive",
         )
 
-    return user
+    return Principal.from_user(user)
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db),
+) -> Principal:
+    """
+    Get current authenticated user from JWT token (UUID-based).
+    Returns a cached Principal (id, hospital_id, username, roles,
+    permissions, is_active); load the User row when more is needed.
+    """
+    user_uuid, issued_at = _token_identity(credentials)
+    principal = principal_cache.get(user_uuid, issued_at)
+    if principal is not None:
+        return principal
+
+    version = principal_cache.version(user_uuid)
+    try:
+        user = db.execute(
+            _current_user_query().where(User.id == user_uuid, User.is_deleted == False)
+        ).unique().scalars().first()
+    except Exception as e:
+        logger.error(f"Database error fetching user {user_uuid}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not verify user",
+        )
+
+    principal = _check_user(user)
+    principal_cache.put(issued_at, principal, version)
+    return principal
 
 
 async def get_current_active_user(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     """Ensure user is active (redundant safety check)."""
     return current_user
 
 
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db),
+) -> Principal:
+    """get_current_user for endpoints running on the async session."""
+    user_uuid, issued_at = _token_identity(credentials)
+    principal = principal_cache.get(user_uuid, issued_at)
+    if principal is not None:
+        return principal
+
+    version = principal_cache.version(user_uuid)
+    try:
+        result = await db.execute(
+            _current_user_query().where(User.id == user_uuid, User.is_deleted == False)
+        )
+        user = result.unique().scalars().first()
+    except Exception as e:
+        logger.error(f"Database error fetching user {user_uuid}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not verify user",
+        )
+
+    principal = _check_user(user)
+    principal_cache.put(issued_at, principal, version)
+    return principal
+
+
+async def get_current_active_user_async(
+    current_user: Principal = Depends(get_current_user_async),
+) -> Principal:
+    """Async-session counterpart of get_current_active_user."""
+    return current_user
+
+
 def _has_role(user: User, *role_names: str) -> bool:
     """Check if user has any of the specified roles."""
     user_roles = {str(r).strip().lower() for r in (user.roles or [])}
@@ -1,9 +1,9 @@
 import logging
 import os
+import secrets
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse, PlainTextResponse
 from sqlalchemy.exc import SQLAlchemyError
 from .config import settings
 
@@ -29,8 +29,18 @@ from .routers import logs as logs_router  # frontend log ingestion endpoint
 logger = get_logger(__name__)
 
 # Import models so they're registered with Base.metadata
-from .models import user, patient, appointment, patient_id_sequence, department, hospital_settings, prescription, inventory as inventory_models, notification  # noqa: F401
+from .models import user, patient, appointment, patient_id_sequence, document_sequence, department, hospital_settings, prescription, inventory as inventory_models, notification, background_job  # noqa: F401
 from .models import tax_config, invoice, payment, refund, settlement, insurance  # noqa: F401
+from .core.config_cache import ConfigCacheListener, config_cache
+from .core.background_jobs import job_runner
+from .core.image_pool import UploadFiles, image_processor
+from .core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, current_request, metrics
+from .core.pdf_pool import pdf_renderer
+from .core.principal_cache import principal_cache
+from .core.print_cache import print_cache
+from .core.smtp_pool import smtp_pool
+from .database import async_engine
+from .services import email_service, inventory_service  # noqa: F401  (register background job handlers)
 
 # NOTE: We do NOT call Base.metadata.create_all() — the new hms_db schema
 # is managed via the SQL migration files (01_schema.sql, 02_seed_data.sql).
@@ -51,13 +61,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files for uploads
-uploads_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
-if os.path.exists(uploads_dir):
-    app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
-    logger.info(f"Mounted uploads directory: {uploads_dir}")
-else:
-    logger.warning(f"Uploads directory not found: {uploads_dir}")
+# Mount static files for uploads (serves processed image variants; see core/image_pool.py)
+uploads_dir = settings.UPLOADS_DIR
+os.makedirs(uploads_dir, exist_ok=True)
+app.mount("/uploads", UploadFiles(directory=uploads_dir), name="uploads")
+logger.info(f"Mounted uploads directory: {uploads_dir}")
 
 
 # ── Request Logging Middleware ───────────────────────────────────────────────
@@ -69,16 +77,31 @@ async def log_requests(request: Request, call_next):
     start = time.time()
     response = await call_next(request)
     duration_ms = (time.time() - start) * 1000
-    # Skip noisy health-check and static file requests
+    # Skip noisy health-check, metrics scrape and static file requests
     path = request.url.path
-    if path not in ("/health", "/") and not path.startswith("/uploads"):
+    if path not in ("/health", "/", "/metrics") and not path.startswith("/uploads"):
+        stats = current_request()
         logger.info(
-            "%s %s → %s (%.0fms)",
-            request.method, path, response.status_code, duration_ms,
+            "%s %s → %s (%.0fms, %d queries)",
+            request.method, path, response.status_code, duration_ms, stats.queries if stats else 0,
         )
     return response
 
 
+# ── Request Metrics ──────────────────────────────────────────────────────────
+# Outermost middleware: per-route latency, DB queries/time and in-flight
+# gauges for GET /metrics (see core/metrics.py).
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+    metrics.register_stats("principal_cache", principal_cache.stats)
+    metrics.register_stats("config_cache", config_cache.stats)
+    metrics.register_stats("jobs", job_runner.stats)
+    metrics.register_stats("smtp_pool", smtp_pool.stats)
+    metrics.register_stats("print_cache", print_cache.stats)
+    metrics.register_stats("pdf", pdf_renderer.stats)
+    metrics.register_stats("images", image_processor.stats)
+
+
 # ---------- Global Exception Handlers ----------
 def _cors_headers(request: Request) -> dict:
     """Build CORS headers matching CORSMiddleware config so error responses include them."""
@@ -152,13 +175,28 @@ app.include_router(tax_configurations.router, prefix="/api/v1")
 
 
 # ── Startup / Shutdown events ──────────────────────────────────────────────
+config_cache_listener = ConfigCacheListener(config_cache, settings.DATABASE_URL)
+
+
 @app.on_event("startup")
 async def on_startup():
+    if settings.CONFIG_CACHE_NOTIFY:
+        config_cache_listener.start()
+    if settings.JOB_RUNNER_ENABLED:
+        job_runner.start()
+    if settings.METRICS_ENABLED and not settings.METRICS_TOKEN:
+        logger.warning("METRICS_ENABLED is set but METRICS_TOKEN is empty; GET /metrics stays disabled")
     logger.info("HMS Backend server started — %s v%s", settings.APP_NAME, settings.APP_VERSION)
 
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    config_cache_listener.stop()
+    job_runner.stop()
+    smtp_pool.close()
+    pdf_renderer.close()
+    image_processor.close()
+    await async_engine.dispose()
     logger.info("HMS Backend server shutting down")
 
 
@@ -176,6 +214,18 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Prometheus scrape endpoint (per worker process); requires METRICS_TOKEN."""
+    if not settings.METRICS_ENABLED or not settings.METRICS_TOKEN:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    if not secrets.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return JSONResponse(status_code=401, content={"detail": "Invalid metrics token"})
+    return PlainTextResponse(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/api/v1/config/hospital")
 async def get_hospital_config():
     """Get hospital configuration (for ID cards, reports, etc.)"""
@@ -4,23 +4,25 @@ from .user import (
 )
 from .patient import Patient
 from .patient_id_sequence import IdSequence
+from .document_sequence import DocumentSequence
 from .department import Department
 from .hospital_settings import HospitalSettings
 from .appointment import (
     Doctor, DoctorSchedule, DoctorLeave, DoctorFee,
-    Appointment, AppointmentStatusLog, AppointmentQueue,
+    Appointment, AppointmentStatusLog, AppointmentQueue, AppointmentDailyRollup,
 )
 from .prescription import (
     Medicine, Prescription, PrescriptionItem,
     PrescriptionTemplate, PrescriptionVersion,
 )
 from .pharmacy import (
-    MedicineBatch, PharmacySale, PharmacySaleItem,
+    MedicineBatch, MedicineStockSummary, PharmacySale, PharmacySaleItem,
 )
 from .optical import OpticalProduct
 from .notification import Notification
+from .background_job import BackgroundJob
 from .inventory import (
     Supplier, PurchaseOrder, PurchaseOrderItem,
-    GoodsReceiptNote, GRNItem, StockMovement,
+    GoodsReceiptNote, GRNItem, StockMovement, StockMovementMonthlySnapshot,
     StockAdjustment, CycleCount, CycleCountItem,
 )
@@ -1,10 +1,11 @@
 ﻿"""
 Appointment models — matches new hms_db UUID schema.
-Includes: Doctor, DoctorSchedule, DoctorLeave, Appointment, AppointmentStatusLog, AppointmentQueue
+Includes: Doctor, DoctorSchedule, DoctorLeave, Appointment, AppointmentStatusLog, AppointmentQueue,
+AppointmentDailyRollup
 """
 import uuid
 from sqlalchemy import (
-    Column, String, Date, Time, Boolean, DateTime, Integer,
+    Column, String, Date, Time, Boolean, DateTime, Integer, SmallInteger,
     ForeignKey, Text, Numeric, UniqueConstraint
 )
 from sqlalchemy.dialects.postgresql import UUID
@@ -219,3 +220,33 @@ class Waitlist(Base):
     doctor = relationship("Doctor", foreign_keys=[doctor_id])
     booked_appointment = relationship("Appointment", foreign_keys=[booked_appointment_id])
 
+
+class AppointmentDailyRollup(Base):
+    """
+    Pre-aggregated appointment counts per hospital / doctor / department / day,
+    split by status, type, start hour and cancel reason. Maintained
+    incrementally by services/appointment_rollup_service.py; used by the
+    appointment reports for long date ranges.
+    """
+    __tablename__ = "appointment_daily_rollup"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    hospital_id = Column(UUID(as_uuid=True), ForeignKey("hospitals.id"), nullable=False)
+    appointment_date = Column(Date, nullable=False)
+    doctor_id = Column(UUID(as_uuid=True))
+    department_id = Column(UUID(as_uuid=True))
+    status = Column(String(20), nullable=False)
+    appointment_type = Column(String(20), nullable=False)
+    start_hour = Column(SmallInteger)
+    cancel_reason = Column(String(255))  # only set for cancelled appointments
+    appointment_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint(
+            "hospital_id", "appointment_date", "doctor_id", "department_id",
+            "status", "appointment_type", "start_hour", "cancel_reason",
+            name="uq_appointment_daily_rollup",
+            postgresql_nulls_not_distinct=True,
+        ),
+    )
@@ -0,0 +1,23 @@
+"""
+DocumentSequence model — counters behind generated document numbers.
+"""
+from sqlalchemy import Column, String, BigInteger, DateTime, PrimaryKeyConstraint
+from sqlalchemy.sql import func
+from ..database import Base
+
+
+class DocumentSequence(Base):
+    """
+    Last number handed out per (scope, period), e.g. ("PO", "20260311") or
+    ("RX:<hospital_id>", ""). Advanced by services/document_number_service.py.
+    """
+    __tablename__ = "document_sequences"
+
+    scope = Column(String(60), nullable=False)
+    period = Column(String(8), nullable=False, default="")
+    last_value = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        PrimaryKeyConstraint("scope", "period", name="pk_document_sequences"),
+    )
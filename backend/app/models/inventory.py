@@ -1,7 +1,8 @@
 """
 Inventory models — matches hms_db schema (Phase 4: Inventory & Support).
 Includes: Supplier, PurchaseOrder, PurchaseOrderItem, GoodsReceiptNote,
-          GRNItem, StockMovement, StockAdjustment, CycleCount, CycleCountItem
+          GRNItem, StockMovement, StockMovementMonthlySnapshot, StockAdjustment,
+          CycleCount, CycleCountItem
 """
 import uuid
 from sqlalchemy import (
@@ -137,7 +138,11 @@ class GRNItem(Base):
 
 
 class StockMovement(Base):
-    """Audit trail of every stock change (in or out)."""
+    """
+    Audit trail of every stock change (in or out). The table is partitioned
+    by month on created_at (primary key (id, created_at) in the database);
+    see services/stock_movement_service.py.
+    """
     __tablename__ = "stock_movements"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -153,12 +158,28 @@ class StockMovement(Base):
     unit_cost = Column(Numeric(12, 2))
     notes = Column(String(255))
     performed_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
     hospital = relationship("Hospital", foreign_keys=[hospital_id])
     performer = relationship("User", foreign_keys=[performed_by])
 
 
+class StockMovementMonthlySnapshot(Base):
+    """Per-item totals and closing balance of an archived stock_movements month."""
+    __tablename__ = "stock_movement_monthly_snapshots"
+
+    hospital_id = Column(UUID(as_uuid=True), ForeignKey("hospitals.id"), primary_key=True)
+    item_type = Column(String(20), primary_key=True)
+    item_id = Column(UUID(as_uuid=True), primary_key=True)
+    month = Column(Date, primary_key=True)  # first day of the month
+    movements = Column(Integer, nullable=False)
+    quantity_in = Column(Integer, nullable=False)
+    quantity_out = Column(Integer, nullable=False)
+    closing_balance = Column(Integer, nullable=False)
+    last_movement_at = Column(DateTime(timezone=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
 class StockAdjustment(Base):
     """Manual stock adjustments with approval workflow."""
     __tablename__ = "stock_adjustments"
@@ -3,10 +3,10 @@ Patient model — matches new hms_db UUID schema.
 """
 import uuid
 from sqlalchemy import (
-    Column, String, Boolean, DateTime, Date, Integer, Text, ForeignKey, UniqueConstraint
+    Column, Computed, String, Boolean, DateTime, Date, Integer, Text, ForeignKey, UniqueConstraint
 )
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR, UUID
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from ..database import Base
 
@@ -55,6 +55,15 @@ class Patient(Base):
     updated_by = Column(UUID(as_uuid=True), ForeignKey("users.id"))
     is_deleted = Column(Boolean, default=False)
     deleted_at = Column(DateTime(timezone=True))
+    # Maintained by Postgres; searched by services/patient_search_service.py
+    search_vector = deferred(Column(
+        TSVECTOR,
+        Computed(
+            "setweight(to_tsvector('simple', first_name || ' ' || last_name), 'A') || "
+            "setweight(to_tsvector('simple', patient_reference_number || ' ' || phone_number), 'B')",
+            persisted=True,
+        ),
+    ))
 
     # Relationships
     hospital = relationship("Hospital", foreign_keys=[hospital_id])
@@ -16,7 +16,7 @@ from ..database import Base
 # Import shared models from inventory
 from .inventory import Supplier, PurchaseOrder, PurchaseOrderItem, StockAdjustment
 
-__all__ = ["Supplier", "PurchaseOrder", "PurchaseOrderItem", "StockAdjustment", "MedicineBatch", "PharmacySale", "PharmacySaleItem"]
+__all__ = ["Supplier", "PurchaseOrder", "PurchaseOrderItem", "StockAdjustment", "MedicineBatch", "PharmacySale", "PharmacySaleItem", "MedicineStockSummary"]
 
 
 # ══════════════════════════════════════════════════
@@ -50,6 +50,22 @@ class MedicineBatch(Base):
     medicine = relationship("Medicine", foreign_keys=[medicine_id])
 
 
+# ──────────────────────────────────────────────────
+# MedicineStockSummary  (per-medicine stock total)
+# ──────────────────────────────────────────────────
+class MedicineStockSummary(Base):
+    """
+    Sum of active batch quantities per medicine, kept in step with
+    medicine_batches by services/stock_summary_service.py.
+    """
+    __tablename__ = "medicine_stock_summary"
+
+    medicine_id = Column(UUID(as_uuid=True), ForeignKey("medicines.id"), primary_key=True)
+    hospital_id = Column(UUID(as_uuid=True), ForeignKey("hospitals.id"), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 # ──────────────────────────────────────────────────
 # PharmacySale  (dispensing / billing)
 # ──────────────────────────────────────────────────
@@ -12,6 +12,7 @@ from ..models.user import User
 from ..dependencies import get_current_active_user
 from ..schemas.appointment import AppointmentStats, EnhancedAppointmentStats
 from ..services.appointment_service import get_appointment_stats, get_enhanced_stats
+from ..services.appointment_rollup_service import should_use_rollup
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/reports/appointments", tags=["Appointment Reports"])
@@ -31,6 +32,7 @@ async def statistics(
         date_from=date_from,
         date_to=date_to,
         doctor_id=doctor_id,
+        use_rollup=should_use_rollup(date_from, date_to),
     )
 
 
@@ -42,4 +44,10 @@ async def enhanced_statistics(
     current_user: User = Depends(get_current_active_user),
 ):
     """Get comprehensive analytics: doctor utilization, department breakdown, trends, peak times, cancellation reasons."""
-    return get_enhanced_stats(db, date_from, date_to)
+    return get_enhanced_stats(
+        db,
+        date_from,
+        date_to,
+        hospital_id=current_user.hospital_id,
+        use_rollup=should_use_rollup(date_from, date_to),
+    )
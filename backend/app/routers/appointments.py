@@ -3,14 +3,15 @@ Appointments router â€“ CRUD, reschedule, cancel, status updates.
 """
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import date, datetime
 
-from ..database import get_db
+from ..database import get_async_db, get_db
 from ..models.user import User
 from ..models.appointment import Doctor
-from ..dependencies import get_current_active_user
+from ..dependencies import get_current_active_user, get_current_active_user_async
 from ..schemas.appointment import (
     AppointmentCreate,
     AppointmentUpdate,
@@ -33,6 +34,7 @@ from ..services.appointment_service import (
     enrich_appointments,
 )
 from ..services.schedule_service import is_doctor_on_leave, get_available_slots
+from ..utils.pagination import COUNT_PATTERN, InvalidCursor
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/appointments", tags=["Appointments"])
@@ -67,13 +69,14 @@ async def book_appointment(
                     str(data.patient_id), current_user.username)
         enriched = enrich_appointment(db, appt)
 
-        # Send confirmation email (async-safe, best effort)
+        # Queue confirmation email (best effort, sent by the job runner)
         try:
-            from ..services.email_service import send_appointment_confirmation_email
+            from ..services.email_service import queue_email
             from ..models.patient import Patient
             patient = db.query(Patient).filter(Patient.id == appt.patient_id).first()
             if patient and getattr(patient, "email", None):
-                send_appointment_confirmation_email(
+                queue_email(
+                    db, "appointment_confirmation", hospital_id=current_user.hospital_id,
                     to_email=patient.email,
                     patient_name=patient.full_name,
                     doctor_name=enriched.get("doctor_name", "TBA"),
@@ -82,8 +85,10 @@ async def book_appointment(
                     appointment_number=appt.appointment_number,
                     consultation_type=appt.appointment_type,
                 )
+                db.commit()
         except Exception as email_err:
-            logger.warning(f"Failed to send confirmation email: {email_err}")
+            db.rollback()
+            logger.warning(f"Failed to queue confirmation email: {email_err}")
 
         return enriched
     except HTTPException:
@@ -107,19 +112,29 @@ async def list_all_appointments(
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    cursor: Optional[str] = Query(None, description="Keyset mode: empty for the first page, then next_cursor"),
+    count: Optional[str] = Query(None, pattern=COUNT_PATTERN),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async),
 ):
-    total, pg, lim, tp, rows = list_appointments(
-        db, page, limit,
-        doctor_id=doctor_id, patient_id=patient_id,
-        status=status_filter, appointment_type=appointment_type,
-        date_from=date_from, date_to=date_to, search=search,
-    )
-    enriched = enrich_appointments(db, rows)
+    def load(session: Session):
+        total, pg, lim, tp, rows, next_cursor = list_appointments(
+            session, page, limit,
+            doctor_id=doctor_id, patient_id=patient_id,
+            status=status_filter, appointment_type=appointment_type,
+            date_from=date_from, date_to=date_to, search=search,
+            cursor=cursor, count=count,
+        )
+        return total, pg, lim, tp, enrich_appointments(session, rows), next_cursor
+
+    try:
+        total, pg, lim, tp, enriched, next_cursor = await db.run_sync(load)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return PaginatedAppointmentResponse(
         total=total, page=pg, limit=lim, total_pages=tp,
         data=[AppointmentListItem(**a) for a in enriched],
+        next_cursor=next_cursor,
     )
 
 
@@ -128,20 +143,26 @@ async def my_appointments(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
     status_filter: Optional[str] = Query(None, alias="status"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async),
 ):
     """Doctor: appointments assigned to me."""
-    # Lookup the Doctor record by user_id (user.id != doctor.id)
-    doctor = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
-    if not doctor:
+    def load(session: Session):
+        # Lookup the Doctor record by user_id (user.id != doctor.id)
+        doctor = session.query(Doctor).filter(Doctor.user_id == current_user.id).first()
+        if not doctor:
+            return None
+        total, pg, lim, tp, rows, _ = list_appointments(
+            session, page, limit, doctor_id=str(doctor.id), status=status_filter,
+        )
+        return total, pg, lim, tp, enrich_appointments(session, rows)
+
+    result = await db.run_sync(load)
+    if result is None:
         return PaginatedAppointmentResponse(
             total=0, page=page, limit=limit, total_pages=0, data=[],
         )
-    total, pg, lim, tp, rows = list_appointments(
-        db, page, limit, doctor_id=str(doctor.id), status=status_filter,
-    )
-    enriched = enrich_appointments(db, rows)
+    total, pg, lim, tp, enriched = result
     return PaginatedAppointmentResponse(
         total=total, page=pg, limit=lim, total_pages=tp,
         data=[AppointmentListItem(**a) for a in enriched],
@@ -155,7 +176,7 @@ async def doctor_today(
     current_user: User = Depends(get_current_active_user),
 ):
     today = date.today()
-    _, _, _, _, rows = list_appointments(
+    _, _, _, _, rows, _ = list_appointments(
         db, 1, 100, doctor_id=doctor_id, date_from=today, date_to=today,
     )
     return enrich_appointments(db, rows)
@@ -198,21 +219,24 @@ async def cancel_appt(
         if not appt:
             raise HTTPException(status_code=404, detail="Appointment not found")
 
-        # Send cancellation email (best effort)
+        # Queue cancellation email (best effort, sent by the job runner)
         try:
-            from ..services.email_service import send_appointment_cancellation_email
+            from ..services.email_service import queue_email
             from ..models.patient import Patient
             patient = db.query(Patient).filter(Patient.id == appt.patient_id).first()
             if patient and getattr(patient, "email", None):
-                send_appointment_cancellation_email(
+                queue_email(
+                    db, "appointment_cancellation", hospital_id=current_user.hospital_id,
                     to_email=patient.email,
                     patient_name=patient.full_name,
                     appointment_number=appt.appointment_number,
                     appointment_date=str(appt.appointment_date),
                     reason=reason or "",
                 )
+                db.commit()
         except Exception as email_err:
-            logger.warning(f"Failed to send cancellation email: {email_err}")
+            db.rollback()
+            logger.warning(f"Failed to queue cancellation email: {email_err}")
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
 
@@ -231,13 +255,14 @@ async def reschedule_appt(
         raise HTTPException(status_code=404, detail="Appointment not found")
     enriched = enrich_appointment(db, appt)
 
-    # Send reschedule email (best effort)
+    # Queue reschedule email (best effort, sent by the job runner)
     try:
-        from ..services.email_service import send_appointment_reschedule_email
+        from ..services.email_service import queue_email
         from ..models.patient import Patient
         patient = db.query(Patient).filter(Patient.id == appt.patient_id).first()
         if patient and getattr(patient, "email", None):
-            send_appointment_reschedule_email(
+            queue_email(
+                db, "appointment_reschedule", hospital_id=current_user.hospital_id,
                 to_email=patient.email,
                 patient_name=patient.full_name,
                 doctor_name=enriched.get("doctor_name", "TBA"),
@@ -245,8 +270,10 @@ async def reschedule_appt(
                 new_date=str(data.new_date),
                 new_time=str(data.new_time or "TBD"),
             )
+            db.commit()
     except Exception as email_err:
-        logger.warning(f"Failed to send reschedule email: {email_err}")
+        db.rollback()
+        logger.warning(f"Failed to queue reschedule email: {email_err}")
 
     return enriched
 
@@ -20,7 +20,8 @@ from ..schemas.auth import (
 from ..models.user import User
 from ..services.auth_service import authenticate_user
 from ..core.security import create_access_token, get_password_hash, verify_password
-from ..dependencies import get_current_active_user
+from ..dependencies import get_current_active_user, require_super_admin
+from ..core.principal_cache import principal_cache
 from ..config import settings
 
 logger = logging.getLogger(__name__)
@@ -136,9 +137,21 @@ async def refresh_token(
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(
     current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
 ):
     """Get current authenticated user including roles and permissions."""
-    return _build_user_response(current_user)
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return _build_user_response(user)
+
+
+@router.get("/cache-stats")
+async def auth_cache_stats(
+    current_user: User = Depends(require_super_admin),
+):
+    """Hit/miss counters of this worker's authenticated-user cache."""
+    return principal_cache.stats()
 
 
 @router.post("/change-password")
@@ -151,7 +164,8 @@ async def change_password(
     Change the authenticated user's password.
     Requires current password verification. Enforces password policy.
     """
-    if not verify_password(payload.current_password, current_user.password_hash):
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if not user or not verify_password(payload.current_password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect",
@@ -170,11 +184,12 @@ async def change_password(
             detail="New password must be at least 8 characters",
         )
 
-    current_user.password_hash = get_password_hash(payload.new_password)
-    current_user.must_change_password = False
+    user.password_hash = get_password_hash(payload.new_password)
+    user.must_change_password = False
     from datetime import datetime, timezone
-    current_user.password_changed_at = datetime.now(timezone.utc)
+    user.password_changed_at = datetime.now(timezone.utc)
     db.commit()
+    principal_cache.invalidate_user(user.id)
 
     logger.info(f"Password changed for user id={current_user.id}")
     return {"success": True, "message": "Password changed successfully"}
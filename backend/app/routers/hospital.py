@@ -1,5 +1,6 @@
+import asyncio
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
 from sqlalchemy.orm import Session
 from ..database import get_db
 from ..schemas.hospital import (
@@ -134,6 +135,31 @@ async def update_logo(
         )
 
 
+@router.post("/logo/upload", response_model=HospitalLogoUpload)
+async def upload_logo(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin_or_super_admin),
+):
+    """Upload a hospital logo image; resized variants are served from /uploads (admin/super_admin only)"""
+    try:
+        logo_url = await asyncio.wrap_future(hospital_service.process_hospital_logo(file))
+        result = hospital_service.save_hospital_logo(db, logo_url)
+        logger.info(f"Hospital logo uploaded by user {current_user.username}")
+        return result
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error uploading logo: {e}", exc_info=True)
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to upload logo. Please try again.",
+        )
+
+
 @router.get("/logo")
 async def get_hospital_logo(db: Session = Depends(get_db)):
     """Get hospital logo URL (public endpoint)"""
@@ -7,7 +7,8 @@ from sqlalchemy.orm import Session
 
 from ..database import get_db
 from ..models.user import User
-from ..dependencies import get_current_active_user, require_admin_or_super_admin
+from ..dependencies import get_current_active_user, require_admin_or_super_admin, require_super_admin
+from ..core.config_cache import config_cache
 from ..services.settings_service import (
     get_hospital_settings,
     update_hospital_settings,
@@ -41,6 +42,14 @@ async def get_settings(
     return result
 
 
+@router.get("/cache-stats")
+async def settings_cache_stats(
+    current_user: User = Depends(require_super_admin),
+):
+    """Hit/miss counters of this worker's settings and tax configuration cache."""
+    return config_cache.stats()
+
+
 @router.put("")
 async def update_settings(
     data: HospitalSettingsUpdate,
@@ -4,9 +4,11 @@ Stock Movements, Adjustments, Cycle Counts, Dashboard.
 """
 import logging
 import uuid
+from datetime import date
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from ..database import get_db
@@ -21,6 +23,10 @@ from ..schemas.inventory import (
     CycleCountCreate, CycleCountUpdate, CycleCountResponse,
 )
 from ..services import inventory_service as svc
+from ..services.export_service import (
+    EXPORT_FORMAT_PATTERN, EXPORT_MEDIA_TYPES, export_headers, stream_export,
+)
+from ..utils.pagination import COUNT_PATTERN, InvalidCursor
 
 logger = logging.getLogger(__name__)
 
@@ -164,7 +170,7 @@ async def list_purchase_orders(
         db, current_user.hospital_id, page, limit,
         status=status_filter, supplier_id=supplier_id, search=search,
     )
-    data = [svc._format_po_response(po, db) for po in result["data"]]
+    data = svc._format_po_responses(result["data"], db)
     return {**result, "data": data}
 
 
@@ -227,7 +233,7 @@ async def list_grns(
         db, current_user.hospital_id, page, limit,
         status=status_filter, supplier_id=supplier_id, search=search,
     )
-    data = [svc._format_grn_response(g, db) for g in result["data"]]
+    data = svc._format_grn_responses(result["data"], db)
     return {**result, "data": data}
 
 
@@ -282,18 +288,47 @@ async def list_stock_movements(
     item_type: Optional[str] = None,
     item_id: Optional[str] = None,
     movement_type: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Keyset mode: empty for the first page, then next_cursor"),
+    count: Optional[str] = Query(None, pattern=COUNT_PATTERN),
     db: Session = Depends(get_db),
     current_user: User = Depends(inventory_view_roles),
 ):
     """List stock movements with pagination and filters."""
-    result = svc.list_stock_movements(
-        db, current_user.hospital_id, page, limit,
-        item_type=item_type, item_id=item_id, movement_type=movement_type,
-    )
-    data = [svc._format_movement_response(m, db) for m in result["data"]]
+    try:
+        result = svc.list_stock_movements(
+            db, current_user.hospital_id, page, limit,
+            item_type=item_type, item_id=item_id, movement_type=movement_type,
+            cursor=cursor, count=count,
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    data = svc._format_movement_responses(result["data"], db)
     return {**result, "data": data}
 
 
+@movements_router.get("/export")
+async def export_stock_movements(
+    fmt: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    item_type: Optional[str] = None,
+    item_id: Optional[uuid.UUID] = None,
+    movement_type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: User = Depends(inventory_view_roles),
+):
+    """Stream every matching stock movement as CSV or NDJSON (same filters as the list, plus date range)."""
+    hospital_id = current_user.hospital_id
+    return StreamingResponse(
+        stream_export(lambda db: svc.export_stock_movements(
+            db, hospital_id, item_type=item_type,
+            item_id=str(item_id) if item_id else None, movement_type=movement_type,
+            date_from=date_from, date_to=date_to,
+        ), fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers=export_headers("stock-movements", fmt),
+    )
+
+
 # ═════════════════════════════════════════════════════════════════════════════
 #  STOCK ADJUSTMENTS
 # ═════════════════════════════════════════════════════════════════════════════
@@ -310,7 +345,7 @@ async def list_adjustments(
     result = svc.list_stock_adjustments(
         db, current_user.hospital_id, page, limit, status=status_filter,
     )
-    data = [svc._format_adjustment_response(a, db) for a in result["data"]]
+    data = svc._format_adjustment_responses(result["data"], db)
     return {**result, "data": data}
 
 
@@ -355,7 +390,7 @@ async def list_cycle_counts(
     result = svc.list_cycle_counts(
         db, current_user.hospital_id, page, limit, status=status_filter,
     )
-    data = [svc._format_cycle_count_response(cc, db) for cc in result["data"]]
+    data = svc._format_cycle_count_responses(result["data"], db)
     return {**result, "data": data}
 
 
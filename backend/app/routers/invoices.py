@@ -1,10 +1,13 @@
 """
 Invoices router — /api/v1/invoices
 """
+import asyncio
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
+from datetime import date
 import uuid
 
 from ..database import get_db
@@ -17,10 +20,16 @@ from ..schemas.invoice import (
     INVOICE_TYPE_ITEM_MAPPING,
 )
 from ..services.invoice_service import (
-    create_invoice, get_invoice_by_id, list_invoices,
+    create_invoice, get_invoice_by_id, list_invoices, export_invoices,
     update_invoice, issue_invoice, void_invoice,
     add_invoice_item, remove_invoice_item, get_or_create_consultation_invoice_for_appointment,
 )
+from ..services.pdf_service import invoice_pdf
+from ..services.print_batch_service import stream_invoice_batch
+from ..services.export_service import (
+    EXPORT_FORMAT_PATTERN, EXPORT_MEDIA_TYPES, export_headers, stream_export,
+)
+from ..utils.pagination import COUNT_PATTERN, InvalidCursor
 
 logger = logging.getLogger(__name__)
 
@@ -178,6 +187,8 @@ async def list_all_invoices(
     status: Optional[str] = None,
     invoice_type: Optional[str] = None,
     patient_id: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Keyset mode: empty for the first page, then next_cursor"),
+    count: Optional[str] = Query(None, pattern=COUNT_PATTERN),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
@@ -188,12 +199,65 @@ async def list_all_invoices(
             db, current_user.hospital_id, page, limit,
             search=search, status=status,
             invoice_type=invoice_type, patient_id=patient_id,
+            cursor=cursor, count=count,
         )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing invoices: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Failed to retrieve invoices")
 
 
+@router.get("/export")
+async def export_all_invoices(
+    fmt: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    invoice_type: Optional[str] = None,
+    patient_id: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: User = Depends(get_current_active_user),
+):
+    """Stream every matching invoice as CSV or NDJSON (same filters as the list, plus invoice date range)."""
+    _require_billing_view(current_user)
+    hospital_id = current_user.hospital_id
+    return StreamingResponse(
+        stream_export(lambda db: export_invoices(
+            db, hospital_id, search=search, status=status, invoice_type=invoice_type,
+            patient_id=patient_id, date_from=date_from, date_to=date_to,
+        ), fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers=export_headers("invoices", fmt),
+    )
+
+
+@router.get("/print-batch")
+async def print_invoice_batch(
+    ids: Optional[list[str]] = Query(None, description="Invoice ids, printed in this order"),
+    status: Optional[str] = None,
+    invoice_type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: User = Depends(get_current_active_user),
+):
+    """Stream many invoices as one printable HTML document, one page each."""
+    _require_billing_view(current_user)
+    if not ids and not (status or invoice_type or date_from or date_to):
+        raise HTTPException(status_code=400, detail="Select invoices by ids or by status, type or date")
+    try:
+        selected = [uuid.UUID(i) for i in ids] if ids else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid invoice id")
+    return StreamingResponse(
+        stream_invoice_batch(
+            current_user.hospital_id, ids=selected, status=status,
+            invoice_type=invoice_type, date_from=date_from, date_to=date_to,
+        ),
+        media_type="text/html",
+    )
+
+
 @router.get("/patient/{patient_id}", response_model=PaginatedInvoiceResponse)
 async def list_patient_invoices(
     patient_id: str,
@@ -225,6 +289,25 @@ async def get_invoice(
     return InvoiceResponse.model_validate(invoice)
 
 
+@router.get("/{invoice_id}/pdf")
+async def get_invoice_pdf(
+    invoice_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    """Download the invoice as a PDF."""
+    _require_billing_view(current_user)
+    invoice = get_invoice_by_id(db, invoice_id)
+    if not invoice or str(invoice.hospital_id) != str(current_user.hospital_id):
+        raise HTTPException(status_code=404, detail="Invoice not found")
+    try:
+        path = await asyncio.wrap_future(invoice_pdf(invoice))
+    except Exception as e:
+        logger.error(f"Error rendering invoice PDF {invoice_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to render invoice PDF")
+    return FileResponse(path, media_type="application/pdf", filename=f"{invoice.invoice_number}.pdf")
+
+
 @router.put("/{invoice_id}", response_model=InvoiceResponse)
 async def update_invoice_header(
     invoice_id: str,
@@ -3,14 +3,21 @@ import uuid
 from math import ceil
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, literal, select
 from datetime import datetime
+from typing import Optional
 
-from ..database import get_db
-from ..dependencies import get_current_active_user
+from ..database import get_async_db, get_db
+from ..core.background_jobs import job_runner
+from ..dependencies import get_current_active_user, get_current_active_user_async, require_super_admin
 from ..models.user import User
 from ..models.notification import Notification
+from ..utils.pagination import (
+    COUNT_ESTIMATE, COUNT_EXACT, COUNT_PATTERN, InvalidCursor,
+    estimate_count, keyset_condition, keyset_order, resolve_count_mode, split_page,
+)
 
 router = APIRouter(prefix="/notifications", tags=["Notifications"])
 
@@ -35,37 +42,65 @@ async def list_notifications(
     page: int = Query(1, ge=1),
     limit: int = Query(15, ge=1, le=100),
     unread_only: bool = Query(False),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    cursor: Optional[str] = Query(None, description="Keyset mode: empty for the first page, then next_cursor"),
+    count: Optional[str] = Query(None, pattern=COUNT_PATTERN),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async),
 ):
-    q = db.query(Notification).filter(
+    count_mode = resolve_count_mode(cursor, count)
+    filters = [
         Notification.hospital_id == current_user.hospital_id,
         Notification.user_id == current_user.id,
-    )
+    ]
+    # Total and unread counts in one round trip; the unread badge is always needed
+    all_count, unread_count = (await db.execute(
+        select(
+            func.count(Notification.id) if count_mode == COUNT_EXACT else literal(None),
+            func.count(Notification.id).filter(Notification.is_read == False),
+        ).where(*filters)
+    )).one()
     if unread_only:
-        q = q.filter(Notification.is_read == False)
-
-    total = q.count()
-    unread_count = db.query(func.count(Notification.id)).filter(
-        Notification.hospital_id == current_user.hospital_id,
-        Notification.user_id == current_user.id,
-        Notification.is_read == False,
-    ).scalar() or 0
-
-    rows = (
-        q.order_by(Notification.created_at.desc())
-        .offset((page - 1) * limit)
-        .limit(limit)
-        .all()
-    )
+        filters.append(Notification.is_read == False)
+    if count_mode == COUNT_EXACT:
+        total = unread_count if unread_only else all_count
+    elif count_mode == COUNT_ESTIMATE:
+        statement = select(Notification.id).where(*filters)
+        total = await db.run_sync(lambda session: estimate_count(session, statement))
+    else:
+        total = None
+
+    next_cursor = None
+    if cursor is not None:
+        try:
+            condition = keyset_condition(Notification.created_at, Notification.id, cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if condition is not None:
+            filters.append(condition)
+        rows = (await db.execute(
+            select(Notification)
+            .where(*filters)
+            .order_by(*keyset_order(Notification.created_at, Notification.id))
+            .limit(limit + 1)
+        )).scalars().all()
+        rows, next_cursor = split_page(rows, limit, Notification.created_at, Notification.id)
+    else:
+        rows = (await db.execute(
+            select(Notification)
+            .where(*filters)
+            .order_by(Notification.created_at.desc())
+            .offset((page - 1) * limit)
+            .limit(limit)
+        )).scalars().all()
 
     return {
         "data": [_serialize(n) for n in rows],
         "total": total,
         "page": page,
         "limit": limit,
-        "total_pages": max(1, ceil(total / limit)),
+        "total_pages": max(1, ceil(total / limit)) if total is not None else None,
         "unread_count": unread_count,
+        "next_cursor": next_cursor,
     }
 
 
@@ -109,3 +144,12 @@ async def mark_all_read(
     )
     db.commit()
     return {"success": True}
+
+
+@router.get("/job-stats")
+async def background_job_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_super_admin),
+):
+    """Outbox depth, and this worker's background job counters and latencies."""
+    return job_runner.stats(db)
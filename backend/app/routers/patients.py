@@ -1,9 +1,11 @@
 """
 Patients router — works with new hms_db UUID schema.
 """
+import asyncio
 import logging
 import uuid
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 from typing import Optional
@@ -27,6 +29,8 @@ from ..services.patient_service import (
     soft_delete_patient,
     list_patients as list_patients_service,
 )
+from ..services.pdf_service import patient_id_card_pdf
+from ..utils.pagination import COUNT_PATTERN, InvalidCursor
 
 logger = logging.getLogger(__name__)
 
@@ -92,6 +96,29 @@ async def get_patient(
     return PatientResponse.model_validate(patient)
 
 
+@router.get("/{patient_id}/id-card/pdf")
+async def get_patient_id_card_pdf(
+    patient_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(patient_read_role_guard),
+):
+    """Download the patient's ID card (front and back) as a PDF."""
+    patient = get_patient_by_id(db, patient_id)
+    if not patient:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Patient not found",
+        )
+    try:
+        path = await asyncio.wrap_future(patient_id_card_pdf(patient))
+    except Exception as e:
+        logger.error(f"Error rendering ID card PDF for patient {patient_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to render ID card PDF")
+    return FileResponse(
+        path, media_type="application/pdf", filename=f"id-card-{patient.patient_reference_number}.pdf",
+    )
+
+
 @router.get("", response_model=PaginatedPatientResponse)
 async def list_patients(
     page: int = Query(1, ge=1),
@@ -103,10 +130,17 @@ async def list_patients(
     status_filter: Optional[str] = Query(None, alias="status"),
     sort_by: Optional[str] = None,
     sort_order: str = Query('desc', pattern='^(asc|desc)$'),
+    cursor: Optional[str] = Query(None, description="Keyset mode: empty for the first page, then next_cursor"),
+    count: Optional[str] = Query(None, pattern=COUNT_PATTERN),
     db: Session = Depends(get_db),
     current_user: User = Depends(patient_read_role_guard),
 ):
     """List all patients with pagination, search, filters and sorting"""
+    if cursor is not None and (sort_by not in (None, 'created_at') or sort_order != 'desc'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor pagination only supports newest-first ordering.",
+        )
     try:
         result = list_patients_service(
             db, page, limit, search,
@@ -117,8 +151,12 @@ async def list_patients(
             status=status_filter,
             sort_by=sort_by,
             sort_order=sort_order,
+            cursor=cursor,
+            count=count,
         )
         return result
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error listing patients: {e}", exc_info=True)
         raise HTTPException(
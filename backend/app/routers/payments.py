@@ -3,6 +3,7 @@ Payments router — /api/v1/payments
 """
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 
@@ -11,7 +12,10 @@ from ..dependencies import get_current_active_user
 from ..models.user import User
 from ..schemas.payment import PaymentCreate, PaymentResponse, PaginatedPaymentResponse
 from ..services.payment_service import (
-    record_payment, list_payments, get_payment_by_id
+    record_payment, list_payments, get_payment_by_id, export_payments
+)
+from ..services.export_service import (
+    EXPORT_FORMAT_PATTERN, EXPORT_MEDIA_TYPES, export_headers, stream_export,
 )
 
 logger = logging.getLogger(__name__)
@@ -85,6 +89,30 @@ async def list_all_payments(
         raise HTTPException(status_code=500, detail="Failed to retrieve payments")
 
 
+@router.get("/export")
+async def export_all_payments(
+    fmt: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    search: Optional[str] = None,
+    payment_mode: Optional[str] = None,
+    invoice_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    date_range: Optional[str] = Query(None, description="24h | 7d | 30d | 1y"),
+    current_user: User = Depends(get_current_active_user),
+):
+    """Stream every matching payment as CSV or NDJSON (same filters as the list)."""
+    _require_billing_view(current_user)
+    hospital_id = current_user.hospital_id
+    return StreamingResponse(
+        stream_export(lambda db: export_payments(
+            db, hospital_id, search=search, payment_mode=payment_mode, invoice_id=invoice_id,
+            date_from=date_from, date_to=date_to, date_range=date_range,
+        ), fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers=export_headers("payments", fmt),
+    )
+
+
 @router.get("/invoice/{invoice_id}", response_model=PaginatedPaymentResponse)
 async def list_invoice_payments(
     invoice_id: str,
@@ -6,15 +6,17 @@ import logging
 from datetime import date
 from decimal import Decimal
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..database import get_async_db, get_db
 from ..models.user import User
-from ..dependencies import get_current_active_user, require_admin_or_super_admin
+from ..dependencies import get_current_active_user, get_current_active_user_async, require_admin_or_super_admin
 from ..schemas.pharmacy import (
     # Medicine
     MedicineCreate, MedicineUpdate, MedicineResponse, MedicineListResponse,
+    CatalogImportResult,
     # Batch
     BatchCreate, BatchUpdate, BatchResponse,
     # Sale
@@ -25,6 +27,7 @@ from ..schemas.pharmacy import (
     PharmacyDashboard,
 )
 from ..services import pharmacy_service as svc
+from ..services.catalog_import_service import import_medicine_catalog
 
 logger = logging.getLogger(__name__)
 
@@ -38,11 +41,11 @@ router = APIRouter(prefix="/pharmacy", tags=["Pharmacy"])
 # ═══ Dashboard ═══
 @router.get("/dashboard", response_model=PharmacyDashboard)
 async def pharmacy_dashboard(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async),
 ):
     """Get pharmacy dashboard statistics."""
-    return svc.get_pharmacy_dashboard(db, current_user.hospital_id)
+    return await db.run_sync(svc.get_pharmacy_dashboard, current_user.hospital_id)
 
 
 # ═══ Medicines ═══
@@ -97,6 +100,31 @@ async def create_medicine(
         raise HTTPException(status_code=500, detail="Failed to create medicine")
 
 
+@router.post("/medicines/import", response_model=CatalogImportResult)
+async def import_medicines(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin_or_super_admin),
+):
+    """
+    Import a medicine catalog with opening stock from CSV or XLSX.
+
+    One row per medicine (keyed by sku) and optional opening batch
+    (batch_number, expiry_date, quantity, ...). Existing medicines and
+    batches are updated; rows that fail validation are listed in `errors`
+    by spreadsheet row number and the rest are imported.
+    """
+    try:
+        return import_medicine_catalog(db, current_user.hospital_id, current_user.id, file.file, file.filename)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error importing medicine catalog: {e}", exc_info=True)
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to import medicine catalog")
+
+
 @router.put("/medicines/{medicine_id}", response_model=MedicineResponse)
 async def update_medicine(
     medicine_id: str,
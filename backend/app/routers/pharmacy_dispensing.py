@@ -171,6 +171,13 @@ class DispenseRequest(BaseModel):
 class PreviewRequest(BaseModel):
     items: list[DispenseItemInput]
 
+class BulkDispensePrescription(DispenseRequest):
+    prescription_id: str
+
+class BulkDispenseRequest(BaseModel):
+    prescriptions: list[BulkDispensePrescription] = Field(min_length=1, max_length=100)
+    mode: str = Field("per_prescription", pattern="^(per_prescription|all_or_nothing)$")
+
 @router.post("/prescriptions/{prescription_id}/preview-dispensing")
 async def preview_dispensing_totals(
     prescription_id: str,
@@ -311,6 +318,65 @@ async def dispense_prescription(
         raise HTTPException(status_code=500, detail="Failed to dispense prescription")
 
 
+@router.post("/prescriptions/dispense-batch")
+async def dispense_prescriptions(
+    request: BulkDispenseRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    """
+    Dispense several finalized prescriptions in one request.
+
+    Each entry takes the same items / skipped_items / notes as the single
+    dispense endpoint, plus its prescription_id. All lines are validated
+    together and stock is allocated in one statement.
+
+    **mode:**
+    - per_prescription (default): prescriptions that fail validation or are
+      short of stock are listed under "failed"; the others are dispensed
+    - all_or_nothing: any failure returns 400 and nothing is dispensed
+
+    **Response:**
+    - dispensed: one result per dispensed prescription (as the single endpoint)
+    - failed: prescription_id, prescription_number and error per failure
+    """
+    try:
+        for entry in request.prescriptions:
+            if not entry.items and not (entry.notes and entry.notes.strip()):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Provide notes for prescription {entry.prescription_id} "
+                           "when closing dispensing without any dispensed items",
+                )
+
+        result = svc.dispense_prescriptions(
+            db=db,
+            hospital_id=current_user.hospital_id,
+            user_id=current_user.id,
+            requests=[entry.model_dump() for entry in request.prescriptions],
+            mode=request.mode,
+        )
+
+        return {
+            "success": True,
+            "message": (
+                f"Dispensed {len(result['dispensed'])} of {len(request.prescriptions)} prescriptions"
+            ),
+            "data": result,
+        }
+
+    except ValueError as ve:
+        logger.warning(f"Bulk dispensing validation error: {ve}")
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(ve))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error dispensing prescriptions: {e}", exc_info=True)
+        db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to dispense prescriptions")
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 # Get Available Batches
 # ═══════════════════════════════════════════════════════════════════════════
@@ -2,8 +2,10 @@
 Prescriptions router — CRUD for prescriptions, items, templates, medicines.
 Follows the same patterns as appointments.py router.
 """
+import asyncio
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 from datetime import date, datetime, timezone
@@ -12,7 +14,9 @@ import uuid as uuid_mod
 from ..database import get_db
 from ..models.user import User
 from ..models.appointment import Doctor, Appointment, AppointmentQueue
-from ..dependencies import get_current_active_user
+from ..core.pdf_pool import pdf_renderer
+from ..core.print_cache import print_cache
+from ..dependencies import get_current_active_user, require_super_admin
 from ..schemas.prescription import (
     PrescriptionCreate,
     PrescriptionUpdate,
@@ -47,8 +51,12 @@ from ..services.prescription_service import (
     delete_template,
     increment_template_usage,
 )
+from ..services.pdf_service import prescription_pdf
+from ..services.prescription_print_service import render_prescription_html
+from ..services.print_batch_service import stream_prescription_batch
 from ..services.invoice_service import get_or_create_consultation_invoice_for_appointment
 from ..services.appointment_service import create_appointment
+from ..utils.pagination import COUNT_PATTERN, InvalidCursor
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/prescriptions", tags=["Prescriptions"])
@@ -86,21 +94,27 @@ async def list_all_prescriptions(
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Keyset mode: empty for the first page, then next_cursor"),
+    count: Optional[str] = Query(None, pattern=COUNT_PATTERN),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
     """List prescriptions with filtering and pagination."""
-    total, pg, lim, tp, rows = list_prescriptions(
-        db, page, limit,
-        hospital_id=current_user.hospital_id,
-        doctor_id=doctor_id, patient_id=patient_id,
-        status=status_filter, date_from=date_from, date_to=date_to,
-        search=search,
-    )
+    try:
+        total, pg, lim, tp, rows, next_cursor = list_prescriptions(
+            db, page, limit,
+            hospital_id=current_user.hospital_id,
+            doctor_id=doctor_id, patient_id=patient_id,
+            status=status_filter, date_from=date_from, date_to=date_to,
+            search=search, cursor=cursor, count=count,
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     enriched = enrich_prescriptions(db, rows)
     return PaginatedPrescriptionResponse(
         total=total, page=pg, limit=lim, total_pages=tp,
         data=[PrescriptionListItem(**rx) for rx in enriched],
+        next_cursor=next_cursor,
     )
 
 
@@ -118,7 +132,7 @@ async def my_prescriptions(
         return PaginatedPrescriptionResponse(
             total=0, page=page, limit=limit, total_pages=0, data=[],
         )
-    total, pg, lim, tp, rows = list_prescriptions(
+    total, pg, lim, tp, rows, _ = list_prescriptions(
         db, page, limit, hospital_id=current_user.hospital_id,
         doctor_id=str(doctor.id), status=status_filter,
     )
@@ -138,7 +152,7 @@ async def patient_prescriptions(
     current_user: User = Depends(get_current_active_user),
 ):
     """Get all prescriptions for a patient."""
-    total, pg, lim, tp, rows = list_prescriptions(
+    total, pg, lim, tp, rows, _ = list_prescriptions(
         db, page, limit, hospital_id=current_user.hospital_id,
         patient_id=patient_id,
     )
@@ -158,6 +172,41 @@ async def get_prescription_languages(
     return [{"code": code, "name": name} for code, name in SUPPORTED_LANGUAGES.items()]
 
 
+@router.get("/print-batch")
+async def print_prescription_batch(
+    ids: Optional[list[str]] = Query(None, description="Prescription ids, printed in this order"),
+    doctor_id: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    lang: str = Query("en", description="Language code for print labels"),
+    current_user: User = Depends(get_current_active_user),
+):
+    """Stream many prescriptions as one printable HTML document, one page each."""
+    if not ids and not (doctor_id or status_filter or date_from or date_to):
+        raise HTTPException(status_code=400, detail="Select prescriptions by ids or by doctor, status or date")
+    try:
+        selected = [uuid_mod.UUID(i) for i in ids] if ids else None
+        doctor = uuid_mod.UUID(doctor_id) if doctor_id else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid prescription or doctor id")
+    return StreamingResponse(
+        stream_prescription_batch(
+            current_user.hospital_id, lang, ids=selected, doctor_id=doctor,
+            status=status_filter, date_from=date_from, date_to=date_to,
+        ),
+        media_type="text/html",
+    )
+
+
+@router.get("/print-cache-stats")
+async def prescription_print_cache_stats(
+    current_user: User = Depends(require_super_admin),
+):
+    """Hit/miss counters of this worker's print cache and PDF renderer."""
+    return {"print_cache": print_cache.stats(), "pdf": pdf_renderer.stats()}
+
+
 @router.get("/{prescription_id}", response_model=PrescriptionResponse)
 async def get_prescription_detail(
     prescription_id: str,
@@ -357,143 +406,23 @@ async def get_rx_versions(
 async def get_prescription_pdf(
     prescription_id: str,
     lang: str = Query("en", description="Language code for print labels"),
+    format: str = Query("html", pattern="^(html|pdf)$", description="html (printable page) or pdf"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
-    """Generate prescription as printable HTML with multi-language support."""
-    from ..config import settings as app_settings
-    from ..models.patient import Patient
-    from ..utils.prescription_translations import get_labels, SUPPORTED_LANGUAGES
-
-    if lang not in SUPPORTED_LANGUAGES:
-        lang = "en"
-
-    t = get_labels(lang)
-
+    """Generate prescription as printable HTML or a PDF file, with multi-language support."""
     rx = get_prescription(db, prescription_id)
     if not rx:
         raise HTTPException(status_code=404, detail="Prescription not found")
 
-    enriched = enrich_prescription(db, rx)
-    patient = db.query(Patient).filter(Patient.id == rx.patient_id).first()
-
-    doctor = db.query(Doctor).filter(Doctor.id == rx.doctor_id).first()
-    doctor_name = doctor.user.full_name if doctor and doctor.user else "—"
-    doctor_spec = doctor.specialization if doctor else ""
-    doctor_reg = doctor.registration_number if doctor else ""
-
-    def fmt_date(d):
-        if not d:
-            return "—"
-        if hasattr(d, "strftime"):
-            return d.strftime("%B %d, %Y")
-        return str(d)
-
-    items_html = ""
-    for idx, item in enumerate(enriched.get("items", []), 1):
-        items_html += f"""
-        <tr>
-            <td style="padding:8px;border-bottom:1px solid #e2e8f0;text-align:center;">{idx}</td>
-            <td style="padding:8px;border-bottom:1px solid #e2e8f0;">
-                <strong>{item['medicine_name']}</strong>
-                {f'<br/><span style="color:#64748b;font-size:12px;">{item.get("generic_name","")}</span>' if item.get('generic_name') else ''}
-            </td>
-            <td style="padding:8px;border-bottom:1px solid #e2e8f0;text-align:center;">{item['dosage']}</td>
-            <td style="padding:8px;border-bottom:1px solid #e2e8f0;text-align:center;">{item['frequency']}</td>
-            <td style="padding:8px;border-bottom:1px solid #e2e8f0;text-align:center;">
-                {f"{item['duration_value']} {item.get('duration_unit','')}" if item.get('duration_value') else '—'}
-            </td>
-            <td style="padding:8px;border-bottom:1px solid #e2e8f0;">{item.get('instructions','') or '—'}</td>
-        </tr>"""
-
-    from fastapi.responses import HTMLResponse
-    html = f"""<!DOCTYPE html>
-<html lang="{lang}">
-<head>
-<meta charset="UTF-8">
-<title>{t['prescription']} - {rx.prescription_number}</title>
-<style>
-body {{ font-family: 'Noto Sans', Arial, sans-serif; margin:0; padding:40px; color:#1e293b; }}
-.header {{ text-align:center; margin-bottom:30px; padding-bottom:20px; border-bottom:3px solid #137fec; }}
-.header h1 {{ margin:0; color:#137fec; font-size:24px; }}
-.header p {{ margin:4px 0; color:#64748b; font-size:13px; }}
-.rx-info {{ display:flex; justify-content:space-between; margin-bottom:20px; }}
-.rx-info div {{ font-size:13px; }}
-.patient-box {{ background:#f1f5f9; padding:16px; border-radius:8px; margin-bottom:20px; }}
-.patient-box p {{ margin:4px 0; font-size:13px; }}
-table {{ width:100%; border-collapse:collapse; margin-bottom:20px; }}
-th {{ background:#f1f5f9; padding:10px 8px; text-align:left; font-size:13px; font-weight:600; border-bottom:2px solid #e2e8f0; }}
-td {{ font-size:13px; }}
-.diagnosis {{ background:#eff6ff; padding:16px; border-radius:8px; margin-bottom:20px; }}
-.advice {{ background:#f0fdf4; padding:16px; border-radius:8px; margin-bottom:20px; }}
-.footer {{ margin-top:60px; display:flex; justify-content:space-between; }}
-.signature {{ text-align:right; }}
-.signature p {{ margin:4px 0; font-size:13px; }}
-@media print {{ body {{ padding:20px; }} }}
-</style>
-<link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Noto+Sans:wght@400;600;700&family=Noto+Sans+Devanagari:wght@400;600;700&family=Noto+Sans+Kannada:wght@400;600;700&family=Noto+Sans+Malayalam:wght@400;600;700&family=Noto+Sans+Tamil:wght@400;600;700&family=Noto+Sans+Telugu:wght@400;600;700&display=swap">
-</head>
-<body>
-<div class="header">
-    <h1>{app_settings.HOSPITAL_NAME}</h1>
-    <p>{app_settings.HOSPITAL_ADDRESS}, {app_settings.HOSPITAL_CITY}</p>
-    <p>{t['phone']}: {app_settings.HOSPITAL_PHONE} | {t['email']}: {app_settings.HOSPITAL_EMAIL}</p>
-</div>
-
-<div class="rx-info">
-    <div>
-        <strong>{t['prn']}:</strong> {patient.patient_reference_number if patient else '—'}<br/>
-        <strong>{t['date']}:</strong> {fmt_date(rx.created_at)}
-    </div>
-    <div style="text-align:right;">
-        <strong>{t['status']}:</strong> {rx.status.upper()}<br/>
-        <strong>{t['valid_until']}:</strong> {fmt_date(rx.valid_until) if rx.valid_until else '—'}
-    </div>
-</div>
-
-<div class="patient-box">
-    <p><strong>{t['patient']}:</strong> {patient.full_name if patient else '—'}</p>
-    <p><strong>{t['prn']}:</strong> {patient.patient_reference_number if patient else '—'} |
-       <strong>{t['age']}:</strong> {patient.age_years if patient and patient.age_years else '—'} |
-       <strong>{t['gender']}:</strong> {patient.gender if patient else '—'} |
-       <strong>{t['blood_group']}:</strong> {patient.blood_group if patient and patient.blood_group else '—'}</p>
-    {f'<p><strong>{t["allergies"]}:</strong> <span style="color:#dc2626;">{patient.known_allergies}</span></p>' if patient and patient.known_allergies else ''}
-</div>
-
-{f'<div class="diagnosis"><strong>{t["diagnosis"]}:</strong> {rx.diagnosis}</div>' if rx.diagnosis else ''}
-{f'<div class="diagnosis"><strong>{t["clinical_notes"]}:</strong> {rx.clinical_notes}</div>' if rx.clinical_notes else ''}
-
-<table>
-<thead>
-<tr>
-    <th style="width:5%;">{t['sl_no']}</th>
-    <th style="width:25%;">{t['medicine']}</th>
-    <th style="width:12%;text-align:center;">{t['dosage']}</th>
-    <th style="width:12%;text-align:center;">{t['frequency']}</th>
-    <th style="width:15%;text-align:center;">{t['duration']}</th>
-    <th style="width:25%;">{t['instructions']}</th>
-</tr>
-</thead>
-<tbody>{items_html}</tbody>
-</table>
-
-{f'<div class="advice"><strong>{t["advice"]}:</strong> {rx.advice}</div>' if rx.advice else ''}
-
-<div class="footer">
-    <div>
-        <p style="font-size:11px;color:#94a3b8;">{t['computer_generated']}</p>
-    </div>
-    <div class="signature">
-        <p style="margin-bottom:40px;"><strong>{t['prescribing_doctor']}</strong></p>
-        <p><strong>Dr. {doctor_name}</strong></p>
-        <p style="color:#64748b;">{doctor_spec}</p>
-        <p style="color:#64748b;">{t['reg_no']} {doctor_reg}</p>
-    </div>
-</div>
-</body>
-</html>"""
-
-    return HTMLResponse(content=html)
+    if format == "html":
+        return HTMLResponse(content=render_prescription_html(db, rx, lang))
+    try:
+        path = await asyncio.wrap_future(prescription_pdf(db, rx, lang))
+    except Exception as e:
+        logger.error(f"Error rendering prescription PDF {prescription_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to render prescription PDF")
+    return FileResponse(path, media_type="application/pdf", filename=f"{rx.prescription_number}.pdf")
 
 
 # ═══════════════════════════════════════════════════════════════════════════
@@ -3,8 +3,10 @@ Refunds router — /api/v1/refunds
 """
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
+from datetime import date
 
 from ..database import get_db
 from ..dependencies import get_current_active_user
@@ -15,7 +17,10 @@ from ..schemas.refund import (
 )
 from ..services.refund_service import (
     request_refund, list_refunds, get_refund_by_id,
-    approve_refund, reject_refund, process_refund,
+    approve_refund, reject_refund, process_refund, export_refunds,
+)
+from ..services.export_service import (
+    EXPORT_FORMAT_PATTERN, EXPORT_MEDIA_TYPES, export_headers, stream_export,
 )
 
 logger = logging.getLogger(__name__)
@@ -85,6 +90,29 @@ async def list_all_refunds(
         raise HTTPException(status_code=500, detail="Failed to retrieve refunds")
 
 
+@router.get("/export")
+async def export_all_refunds(
+    fmt: str = Query("csv", alias="format", pattern=EXPORT_FORMAT_PATTERN),
+    status: Optional[str] = None,
+    invoice_id: Optional[str] = None,
+    patient_id: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    current_user: User = Depends(get_current_active_user),
+):
+    """Stream every matching refund as CSV or NDJSON (same filters as the list, plus request date range)."""
+    _require_billing_staff(current_user)
+    hospital_id = current_user.hospital_id
+    return StreamingResponse(
+        stream_export(lambda db: export_refunds(
+            db, hospital_id, status=status, invoice_id=invoice_id, patient_id=patient_id,
+            date_from=date_from, date_to=date_to,
+        ), fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers=export_headers("refunds", fmt),
+    )
+
+
 @router.get("/{refund_id}", response_model=RefundResponse)
 async def get_refund(
     refund_id: str,
@@ -1,6 +1,7 @@
 """
 Users router — works with new hms_db UUID/RBAC schema.
 """
+import asyncio
 import logging
 import uuid
 from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
@@ -23,6 +24,7 @@ from ..services.user_service import (
     reset_password,
     delete_user,
     list_users,
+    process_user_photo,
     save_user_photo,
     get_user_by_id,
 )
@@ -86,11 +88,14 @@ async def create_new_user(
             created_by_id=current_user.id,
         )
 
-        # Send welcome email if requested
+        # Send the credentials email if requested. It carries the password, so
+        # it runs on the job pool without being written to the outbox.
         if send_email:
             try:
-                from ..services.email_service import send_welcome_email
-                send_welcome_email(
+                from ..core.background_jobs import job_runner
+                from ..services.email_service import send_password_email
+                job_runner.submit(
+                    send_password_email,
                     to_email=user.email,
                     username=user.username,
                     password=user_data.password,
@@ -238,7 +243,8 @@ async def update_existing_user(
                         status_code=status.HTTP_400_BAD_REQUEST,
                         detail=f"Role '{new_role_name}' not found",
                     )
-                # Remove existing user_roles and assign the new one
+                # Remove existing user_roles and assign the new one;
+                # update_user() below commits and drops the cached principal
                 db.query(UserRole).filter(UserRole.user_id == target_user.id).delete()
                 new_user_role = UserRole(
                     user_id=target_user.id,
@@ -345,10 +351,13 @@ async def upload_my_photo(
 ):
     """Upload own profile photo — any authenticated user"""
     try:
-        result = save_user_photo(db, current_user.id, file)
+        avatar_url = await asyncio.wrap_future(process_user_photo(file))
+        result = save_user_photo(db, current_user.id, avatar_url)
         return result
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error uploading photo for user {current_user.id}: {e}", exc_info=True)
         raise HTTPException(
@@ -366,10 +375,13 @@ async def upload_user_photo(
 ):
     """Upload user profile photo (Admin or Super Admin)"""
     try:
-        result = save_user_photo(db, user_id, file)
+        avatar_url = await asyncio.wrap_future(process_user_photo(file))
+        result = save_user_photo(db, user_id, avatar_url)
         return result
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
         logger.error(f"Error uploading photo for user {user_id}: {e}", exc_info=True)
         raise HTTPException(
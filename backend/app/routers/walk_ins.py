@@ -1,25 +1,31 @@
 ﻿"""
 Walk-in registration router - handles walk-in patient flow.
 """
+import json
 import logging
 import uuid
 from datetime import date, datetime, time, timedelta, timezone
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from fastapi.responses import StreamingResponse
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, func, case
+from sqlalchemy import and_, func
 from typing import Optional
 
-from ..database import get_db
+from ..database import SessionLocal, get_async_db, get_db
 from ..models.user import User
 from ..models.patient import Patient
 from ..models.appointment import Appointment, AppointmentQueue, Doctor
-from ..dependencies import get_current_active_user
+from ..dependencies import get_current_active_user, get_current_active_user_async, get_current_user, security
+from ..core.queue_events import queue_event_hub
 from ..schemas.appointment import WalkInRegister, WalkInAssignDoctor
 from pydantic import BaseModel
 from ..services.appointment_service import (
     generate_appointment_number,
     enrich_appointment,
 )
+from ..services import queue_service
 from ..services.schedule_service import get_available_slots, is_doctor_on_leave
 from ..services.waitlist_service import (
     add_to_waitlist,
@@ -30,6 +36,9 @@ from ..services.waitlist_service import (
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/walk-ins", tags=["Walk-in Registration"])
 
+# Seconds between SSE comment frames so proxies keep idle streams open.
+QUEUE_STREAM_KEEPALIVE_SECONDS = 15
+
 
 class ConsultationNotesPayload(BaseModel):
     """Payload for saving consultation notes."""
@@ -86,6 +95,34 @@ def _require_queue_actor(db: Session, user: User, qe: "AppointmentQueue"):
     )
 
 
+def _resolve_queue_doctor(db: Session, user: User, doctor_id: Optional[str]) -> Optional[uuid.UUID]:
+    """Doctors are pinned to their own queue; others may filter by doctor_id."""
+    if "doctor" in _user_roles(user):
+        doc = db.query(Doctor).filter(Doctor.user_id == user.id).first()
+        return doc.id if doc else None
+    if doctor_id:
+        try:
+            return uuid.UUID(doctor_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid doctor_id")
+    return None
+
+
+def _publish_queue_change(
+    db: Session,
+    queue_id: uuid.UUID,
+    event_type: str = "queue.updated",
+    previous_doctor_id: Optional[uuid.UUID] = None,
+) -> None:
+    """Push a committed queue change to live queue streams. Never fails the request."""
+    try:
+        event = queue_service.build_queue_event(db, queue_id, event_type, previous_doctor_id)
+        if event:
+            queue_event_hub.publish(event)
+    except Exception as e:
+        logger.warning(f"Queue event publish failed for {queue_id}: {e}")
+
+
 def _next_queue_number(db: Session, doctor_id: uuid.UUID, queue_date: date) -> int:
     """Get next queue number for a doctor on a given date."""
     max_num = (
@@ -244,6 +281,8 @@ async def register_walk_in(
 
         db.commit()
         db.refresh(appt)
+        if queue_entry:
+            _publish_queue_change(db, queue_entry.id, "queue.added")
 
         enriched = enrich_appointment(db, appt)
         enriched["queue_number"] = queue_entry.queue_number if queue_entry else None
@@ -265,8 +304,8 @@ async def register_walk_in(
 async def get_queue_status(
     doctor_id: Optional[str] = Query(None),
     queue_date: Optional[str] = Query(None, description="Date in YYYY-MM-DD format. Defaults to today."),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_active_user_async),
 ):
     """
     Get the walk-in queue for a specific date.
@@ -283,144 +322,63 @@ async def get_queue_status(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid queue_date format. Use YYYY-MM-DD")
 
-    today = date.today()
+    def load(session: Session) -> dict:
+        # Auto-detect doctor role → filter to own queue
+        resolved_doctor_id = _resolve_queue_doctor(session, current_user, doctor_id)
+        return queue_service.get_queue_status(
+            session, target_date, resolved_doctor_id, hospital_id=current_user.hospital_id,
+        )
 
-    # Auto-detect doctor role → filter to own queue
-    resolved_doctor_id: Optional[uuid.UUID] = None
-    is_doctor_role = any(
-        r in (current_user.roles if hasattr(current_user, "roles") else [])
-        for r in ("doctor",)
-    )
-    if is_doctor_role:
-        doc = db.query(Doctor).filter(Doctor.user_id == current_user.id).first()
-        if doc:
-            resolved_doctor_id = doc.id
-    elif doctor_id:
-        try:
-            resolved_doctor_id = uuid.UUID(doctor_id)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid doctor_id")
+    return await db.run_sync(load)
 
-    # Query queue entries for the target date
-    query = (
-        db.query(AppointmentQueue)
-        .join(Appointment, Appointment.id == AppointmentQueue.appointment_id)
-        .filter(
-            AppointmentQueue.queue_date == target_date,
-            Appointment.appointment_date == target_date,
-        )
-    )
-    if resolved_doctor_id:
-        query = query.filter(AppointmentQueue.doctor_id == resolved_doctor_id)
-
-    # Order by urgency (emergency=0, urgent=1, normal=2) then queue_number
-    priority_order = case(
-        (Appointment.priority == "emergency", 0),
-        (Appointment.priority == "urgent", 1),
-        else_=2,
-    )
-    queue_entries = query.order_by(priority_order, AppointmentQueue.queue_number.asc()).all()
 
-    # Build rich items with patient names, doctor names, priority, etc.
-    items = []
-    for qe in queue_entries:
-        appt = db.query(Appointment).filter(Appointment.id == qe.appointment_id).first()
-        patient_name = None
-        doctor_name = None
-        priority = "normal"
-        chief_complaint = None
-        check_in_time = None
-        doctor_id_str = None
-
-        patient_id_str = None
-        patient_reference_number = None
-        patient_phone = None
-        patient_gender = None
-        patient_date_of_birth = None
-        patient_age = None
-        patient_blood_group = None
-        patient_email = None
-        patient_known_allergies = None
-        patient_chronic_conditions = None
-        patient_emergency_contact_name = None
-        patient_emergency_contact_phone = None
-        patient_emergency_contact_relation = None
-
-        if appt:
-            priority = appt.priority or "normal"
-            chief_complaint = appt.chief_complaint
-            check_in_time = appt.check_in_at.isoformat() if appt.check_in_at else None
-
-            patient = db.query(Patient).filter(Patient.id == appt.patient_id).first()
-            if patient:
-                patient_name = patient.full_name
-                patient_id_str = str(patient.id)
-                patient_reference_number = patient.patient_reference_number
-                patient_phone = patient.phone_number
-                patient_gender = patient.gender
-                patient_date_of_birth = patient.date_of_birth.isoformat() if patient.date_of_birth else None
-                patient_blood_group = patient.blood_group
-                patient_email = patient.email
-                patient_known_allergies = patient.known_allergies
-                patient_chronic_conditions = patient.chronic_conditions
-                patient_emergency_contact_name = patient.emergency_contact_name
-                patient_emergency_contact_phone = patient.emergency_contact_phone
-                patient_emergency_contact_relation = patient.emergency_contact_relation
-                # Compute age from date_of_birth or stored age_years
-                if patient.date_of_birth:
-                    age_delta = date.today() - patient.date_of_birth
-                    patient_age = age_delta.days // 365
-                elif patient.age_years is not None:
-                    patient_age = patient.age_years
-
-            if appt.doctor_id:
-                doctor_id_str = str(appt.doctor_id)
-                doc = db.query(Doctor).filter(Doctor.id == appt.doctor_id).first()
-                if doc and doc.user:
-                    doctor_name = doc.user.full_name
+def _sse_frame(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
 
-        items.append({
-            "queue_id": str(qe.id),
-            "appointment_id": str(qe.appointment_id),
-            "queue_number": qe.queue_number,
-            "position": qe.position,
-            "status": qe.status,
-            "priority": priority,
-            "patient_name": patient_name,
-            "patient_id": patient_id_str,
-            "patient_reference_number": patient_reference_number,
-            "patient_phone": patient_phone,
-            "patient_gender": patient_gender,
-            "patient_date_of_birth": patient_date_of_birth,
-            "patient_age": patient_age,
-            "patient_blood_group": patient_blood_group,
-            "patient_email": patient_email,
-            "patient_known_allergies": patient_known_allergies,
-            "patient_chronic_conditions": patient_chronic_conditions,
-            "patient_emergency_contact_name": patient_emergency_contact_name,
-            "patient_emergency_contact_phone": patient_emergency_contact_phone,
-            "patient_emergency_contact_relation": patient_emergency_contact_relation,
-            "doctor_id": doctor_id_str,
-            "doctor_name": doctor_name,
-            "chief_complaint": chief_complaint,
-            "check_in_at": check_in_time,
-            "called_at": qe.called_at.isoformat() if qe.called_at else None,
-            "consultation_start_at": appt.consultation_start_at.isoformat() if appt and appt.consultation_start_at else None,
-            "consultation_end_at": appt.consultation_end_at.isoformat() if appt and appt.consultation_end_at else None,
-        })
 
-    total_waiting = sum(1 for i in items if i["status"] in ("waiting", "called", "sent_to_doctor"))
-    total_in_progress = sum(1 for i in items if i["status"] == "in_consultation")
-    total_completed = sum(1 for i in items if i["status"] == "completed")
+@router.get("/queue/stream")
+async def stream_queue_events(
+    request: Request,
+    doctor_id: Optional[str] = Query(None),
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """
+    Live queue feed (Server-Sent Events) replacing GET /queue polling.
+    Sends one `queue.snapshot` of today's queue, then incremental
+    `queue.added` / `queue.updated` / `queue.removed` events for the caller's
+    hospital (doctors: their own queue only). A `queue.resync` event means
+    the client fell behind and should refetch GET /queue.
+    The DB session is released before streaming starts, so an open stream
+    holds no connection.
+    """
+    db = SessionLocal()
+    try:
+        current_user = await get_current_user(credentials, db)
+        resolved_doctor_id = _resolve_queue_doctor(db, current_user, doctor_id)
+        hospital_id = current_user.hospital_id
+        snapshot = queue_service.get_queue_status(db, date.today(), resolved_doctor_id, hospital_id=hospital_id)
+    finally:
+        db.close()
 
-    return {
-        "doctor_id": str(resolved_doctor_id) if resolved_doctor_id else None,
-        "queue_date": target_date.isoformat(),
-        "total_waiting": total_waiting,
-        "total_in_progress": total_in_progress,
-        "total_completed": total_completed,
-        "items": items,
-    }
+    sub = queue_event_hub.subscribe(hospital_id, resolved_doctor_id)
+
+    async def event_stream():
+        try:
+            yield _sse_frame("queue.snapshot", snapshot)
+            while not await request.is_disconnected():
+                event = await sub.get(timeout=QUEUE_STREAM_KEEPALIVE_SECONDS)
+                if event is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse_frame(event["event"], event)
+        finally:
+            queue_event_hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.patch("/queue/{queue_id}/call")
@@ -449,6 +407,7 @@ async def call_patient(
 
     # Appointment status stays as-is (scheduled) until consultation actually starts
     db.commit()
+    _publish_queue_change(db, qe.id)
     return {"ok": True, "queue_id": str(qe.id), "status": "called"}
 
 
@@ -486,6 +445,7 @@ async def send_to_doctor_queue(
 
     qe.status = "sent_to_doctor"
     db.commit()
+    _publish_queue_change(db, qe.id)
     return {"ok": True, "queue_id": str(qe.id), "status": "sent_to_doctor"}
 
 
@@ -518,6 +478,7 @@ async def start_consultation(
         appt.consultation_start_at = datetime.now(timezone.utc)
 
     db.commit()
+    _publish_queue_change(db, qe.id)
     return {"ok": True, "queue_id": str(qe.id), "status": "in_consultation"}
 
 
@@ -550,6 +511,7 @@ async def complete_patient(
         appt.consultation_end_at = datetime.now(timezone.utc)
 
     db.commit()
+    _publish_queue_change(db, qe.id)
     return {"ok": True, "queue_id": str(qe.id), "status": "completed"}
 
 
@@ -578,6 +540,7 @@ async def skip_patient(
         appt.status = "no-show"
 
     db.commit()
+    _publish_queue_change(db, qe.id)
     return {"ok": True, "queue_id": str(qe.id), "status": "skipped"}
 
 
@@ -703,6 +666,10 @@ async def assign_doctor_to_walkin(
 
     today = date.today()
     # Remove old queue entry if reassigning
+    old_entries = [
+        (str(q.id), q.doctor_id, q.queue_date)
+        for q in db.query(AppointmentQueue).filter(AppointmentQueue.appointment_id == appt_uuid).all()
+    ]
     db.query(AppointmentQueue).filter(
         AppointmentQueue.appointment_id == appt_uuid,
     ).delete()
@@ -721,6 +688,17 @@ async def assign_doctor_to_walkin(
     db.commit()
     db.refresh(appt)
 
+    for old_queue_id, old_doctor_id, old_queue_date in old_entries:
+        queue_event_hub.publish({
+            "event": "queue.removed",
+            "hospital_id": str(appt.hospital_id),
+            "doctor_id": str(old_doctor_id),
+            "queue_date": old_queue_date.isoformat(),
+            "queue_id": old_queue_id,
+        })
+    previous_doctor_id = old_entries[0][1] if old_entries else None
+    _publish_queue_change(db, queue_entry.id, "queue.added", previous_doctor_id)
+
     enriched = enrich_appointment(db, appt)
     enriched["queue_number"] = queue_entry.queue_number
     enriched["queue_position"] = queue_entry.position
@@ -859,81 +837,7 @@ async def get_upcoming_queue(
     today = date.today()
     end_date = today + timedelta(days=days)
 
-    query = (
-        db.query(AppointmentQueue)
-        .join(Appointment, Appointment.id == AppointmentQueue.appointment_id)
-        .filter(
-            AppointmentQueue.queue_date > today,
-            AppointmentQueue.queue_date <= end_date,
-            AppointmentQueue.status.notin_(["completed", "skipped"]),
-        )
-    )
-    if resolved_doctor_id:
-        query = query.filter(AppointmentQueue.doctor_id == resolved_doctor_id)
-
-    queue_entries = query.order_by(
-        AppointmentQueue.queue_date.asc(),
-        AppointmentQueue.queue_number.asc(),
-    ).all()
-
-    # Group by date and enrich with patient/appointment info
-    from collections import defaultdict
-    grouped: dict = defaultdict(list)
-
-    for qe in queue_entries:
-        appt = db.query(Appointment).filter(Appointment.id == qe.appointment_id).first()
-        if not appt:
-            continue
-
-        patient = db.query(Patient).filter(Patient.id == appt.patient_id).first()
-        patient_age = None
-        if patient and patient.date_of_birth:
-            patient_age = (today - patient.date_of_birth).days // 365
-        elif patient and patient.age_years is not None:
-            patient_age = patient.age_years
-
-        # Resolve referring doctor name if this is a referral
-        referring_doctor_name = None
-        if appt.parent_appointment_id:
-            parent = db.query(Appointment).filter(Appointment.id == appt.parent_appointment_id).first()
-            if parent and parent.doctor_id:
-                ref_doc = db.query(Doctor).filter(Doctor.id == parent.doctor_id).first()
-                if ref_doc and ref_doc.user:
-                    referring_doctor_name = ref_doc.user.full_name
-
-        doctor_name = None
-        if appt.doctor_id:
-            doc = db.query(Doctor).filter(Doctor.id == appt.doctor_id).first()
-            if doc and doc.user:
-                doctor_name = doc.user.full_name
-
-        date_key = qe.queue_date.isoformat()
-        grouped[date_key].append({
-            "queue_id": str(qe.id),
-            "appointment_id": str(qe.appointment_id),
-            "queue_number": qe.queue_number,
-            "status": qe.status,
-            "appointment_type": appt.appointment_type,
-            "priority": appt.priority or "normal",
-            "patient_name": patient.full_name if patient else None,
-            "patient_id": str(patient.id) if patient else None,
-            "patient_reference_number": patient.patient_reference_number if patient else None,
-            "patient_gender": patient.gender if patient else None,
-            "patient_age": patient_age,
-            "chief_complaint": appt.chief_complaint,
-            "doctor_id": str(appt.doctor_id) if appt.doctor_id else None,
-            "doctor_name": doctor_name,
-            "referring_doctor_name": referring_doctor_name,
-        })
-
-    # Build sorted list of date groups
-    date_groups = []
-    for d in sorted(grouped.keys()):
-        date_groups.append({
-            "date": d,
-            "count": len(grouped[d]),
-            "items": grouped[d],
-        })
+    date_groups = queue_service.get_upcoming_queue(db, today, end_date, resolved_doctor_id)
 
     return {
         "doctor_id": str(resolved_doctor_id) if resolved_doctor_id else None,
@@ -1070,6 +974,8 @@ async def refer_patient_to_doctor(
 
         db.commit()
         db.refresh(referral_appt)
+        _publish_queue_change(db, new_queue.id, "queue.added")
+        _publish_queue_change(db, qe.id)
 
         # Build response
         to_doctor_name = to_doctor.user.full_name if to_doctor.user else "Doctor"
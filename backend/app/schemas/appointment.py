@@ -276,11 +276,12 @@ class AppointmentListItem(BaseModel):
 
 
 class PaginatedAppointmentResponse(BaseModel):
-    total: int
+    total: Optional[int]  # None when counting was skipped (?count=none)
     page: int
     limit: int
-    total_pages: int
+    total_pages: Optional[int]
     data: list[AppointmentListItem]
+    next_cursor: Optional[str] = None  # cursor mode only; None on the last page
 
 
 # ---- Walk-in Schemas ----
@@ -219,10 +219,11 @@ class InvoiceResponse(BaseModel):
 
 class PaginatedInvoiceResponse(BaseModel):
     items: list[InvoiceListItem]
-    total: int
+    total: Optional[int]  # None when counting was skipped (?count=none)
     page: int
     limit: int
-    pages: int
+    pages: Optional[int]
+    next_cursor: Optional[str] = None  # cursor mode only; None on the last page
 
 
 class InvoiceTypeItemMappingResponse(BaseModel):
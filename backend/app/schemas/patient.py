@@ -233,8 +233,9 @@ class PatientListItem(BaseModel):
 
 
 class PaginatedPatientResponse(BaseModel):
-    total: int
+    total: Optional[int]  # None when counting was skipped (?count=none)
     page: int
     limit: int
-    total_pages: int
-    data: list[PatientListItem]
\ No newline at end of file
+    total_pages: Optional[int]
+    data: list[PatientListItem]
+    next_cursor: Optional[str] = None  # cursor mode only; None on the last page
\ No newline at end of file
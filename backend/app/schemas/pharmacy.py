@@ -142,6 +142,42 @@ class BatchCreate(BaseModel):
     purchase_order_id: Optional[str] = None
 
 
+class MedicineImportRow(MedicineCreate):
+    """One catalog import row: a medicine (keyed by sku) and optionally its opening batch."""
+    sku: str = Field(..., min_length=1, max_length=50)
+    batch_number: Optional[str] = Field(None, max_length=50)
+    mfg_date: Optional[date] = None
+    expiry_date: Optional[date] = None
+    quantity: int = Field(default=0, ge=0)
+    batch_purchase_price: Optional[Decimal] = Field(None, ge=0)
+    batch_selling_price: Optional[Decimal] = Field(None, ge=0)
+
+    @model_validator(mode="after")
+    def check_batch(self) -> "MedicineImportRow":
+        if self.batch_number and not self.expiry_date:
+            raise ValueError("expiry_date is required with batch_number")
+        if self.quantity and not self.batch_number:
+            raise ValueError("opening stock (quantity) needs a batch_number")
+        return self
+
+
+class CatalogImportError(BaseModel):
+    row: int
+    errors: list[str]
+
+
+class CatalogImportResult(BaseModel):
+    rows: int
+    imported_rows: int
+    medicines_created: int
+    medicines_updated: int
+    batches_created: int
+    batches_updated: int
+    opening_stock_units: int
+    error_count: int
+    errors: list[CatalogImportError]
+
+
 class BatchUpdate(BaseModel):
     batch_number: Optional[str] = Field(None, max_length=50)
     mfg_date: Optional[date] = None
@@ -304,11 +304,12 @@ class PrescriptionListItem(BaseModel):
 
 
 class PaginatedPrescriptionResponse(BaseModel):
-    total: int
+    total: Optional[int]  # None when counting was skipped (?count=none)
     page: int
     limit: int
-    total_pages: int
+    total_pages: Optional[int]
     data: list[PrescriptionListItem]
+    next_cursor: Optional[str] = None  # cursor mode only; None on the last page
 
 
 # ═══════════════════════════════════════════════════════════════════════════
@@ -0,0 +1,194 @@
+"""
+Appointment rollup service — maintains appointment_daily_rollup.
+
+Every appointment counts once under its rollup key
+(hospital, date, doctor, department, status, type, start hour, cancel reason).
+A before_flush hook turns each inserted / changed / deleted Appointment into
+-1 on its old key and +1 on its new key, applied in the same transaction as
+the appointment write. That covers create_appointment, update_status,
+cancel_appointment and reschedule_appointment as well as the walk-in queue
+handlers that set appointment status directly.
+
+database_hole/appointment_rollup_alter.sql backfills the table from existing
+appointments. `rebuild_rollup` recomputes a date range from the raw table
+(repair); run it with `python -m app.cli rebuild-appointment-rollup`.
+"""
+import logging
+import uuid
+from collections import Counter
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import Integer, case, cast, event, extract, func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from ..models.appointment import Appointment, AppointmentDailyRollup
+
+logger = logging.getLogger(__name__)
+
+# Reports over ranges at least this long read the rollup instead of raw rows.
+ROLLUP_MIN_RANGE_DAYS = 28
+
+_KEY_COLUMNS = (
+    "hospital_id", "appointment_date", "doctor_id", "department_id",
+    "status", "appointment_type", "start_hour", "cancel_reason",
+)
+
+
+def should_use_rollup(date_from: Optional[date], date_to: Optional[date]) -> bool:
+    """Open-ended or long ranges go to the rollup; short ones stay on the raw table."""
+    if date_from is None or date_to is None:
+        return True
+    return (date_to - date_from).days + 1 >= ROLLUP_MIN_RANGE_DAYS
+
+
+def _rollup_key(
+    hospital_id, appointment_date, doctor_id, department_id,
+    status, appointment_type, start_time, cancel_reason, is_deleted,
+) -> Optional[tuple]:
+    """Rollup key for one appointment, or None if it is not counted."""
+    if is_deleted or hospital_id is None or appointment_date is None:
+        return None
+    return (
+        hospital_id,
+        appointment_date,
+        doctor_id,
+        department_id,
+        status,
+        appointment_type,
+        start_time.hour if start_time is not None else None,
+        cancel_reason if status == "cancelled" and cancel_reason else None,
+    )
+
+
+def _key_from_object(appt: Appointment) -> Optional[tuple]:
+    return _rollup_key(
+        appt.hospital_id, appt.appointment_date, appt.doctor_id, appt.department_id,
+        appt.status or "scheduled", appt.appointment_type, appt.start_time,
+        appt.cancel_reason, appt.is_deleted,
+    )
+
+
+def _stored_keys(session: Session, appointment_ids: list) -> dict:
+    """Rollup keys of appointments as currently stored (before this flush)."""
+    if not appointment_ids:
+        return {}
+    rows = session.execute(
+        select(
+            Appointment.id, Appointment.hospital_id, Appointment.appointment_date,
+            Appointment.doctor_id, Appointment.department_id, Appointment.status,
+            Appointment.appointment_type, Appointment.start_time,
+            Appointment.cancel_reason, Appointment.is_deleted,
+        ).where(Appointment.id.in_(appointment_ids))
+    ).all()
+    return {row[0]: _rollup_key(*row[1:]) for row in rows}
+
+
+def apply_rollup_deltas(session: Session, deltas: Counter) -> None:
+    """Add each key's delta to its rollup row, creating rows as needed."""
+    for key, delta in deltas.items():
+        if key is None or delta == 0:
+            continue
+        stmt = pg_insert(AppointmentDailyRollup).values(
+            id=uuid.uuid4(),
+            appointment_count=delta,
+            **dict(zip(_KEY_COLUMNS, key)),
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_appointment_daily_rollup",
+            set_={
+                "appointment_count": AppointmentDailyRollup.appointment_count + stmt.excluded.appointment_count,
+                "updated_at": func.now(),
+            },
+        )
+        session.execute(stmt)
+
+
+@event.listens_for(Session, "before_flush")
+def _track_appointment_changes(session: Session, flush_context, instances) -> None:
+    new = [o for o in session.new if isinstance(o, Appointment)]
+    dirty = [o for o in session.dirty if isinstance(o, Appointment) and session.is_modified(o)]
+    deleted = [o for o in session.deleted if isinstance(o, Appointment)]
+    if not (new or dirty or deleted):
+        return
+
+    deltas: Counter = Counter()
+    for appt in new:
+        deltas[_key_from_object(appt)] += 1
+
+    stored = _stored_keys(session, [a.id for a in dirty + deleted if a.id is not None])
+    for appt in dirty:
+        old_key = stored.get(appt.id)
+        new_key = _key_from_object(appt)
+        if old_key != new_key:
+            deltas[old_key] -= 1
+            deltas[new_key] += 1
+    for appt in deleted:
+        deltas[stored.get(appt.id)] -= 1
+
+    apply_rollup_deltas(session, deltas)
+
+
+def rebuild_rollup(
+    db: Session,
+    hospital_id: Optional[uuid.UUID] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> int:
+    """
+    Recompute rollup rows for a range from the appointments table.
+    Blocks concurrent incremental updates for the duration of the rebuild.
+    Returns the number of rollup rows written. Caller commits.
+    """
+    db.execute(text("LOCK TABLE appointment_daily_rollup IN SHARE ROW EXCLUSIVE MODE"))
+
+    delete_q = db.query(AppointmentDailyRollup)
+    source_filters = [Appointment.is_deleted == False]
+    if hospital_id:
+        delete_q = delete_q.filter(AppointmentDailyRollup.hospital_id == hospital_id)
+        source_filters.append(Appointment.hospital_id == hospital_id)
+    if date_from:
+        delete_q = delete_q.filter(AppointmentDailyRollup.appointment_date >= date_from)
+        source_filters.append(Appointment.appointment_date >= date_from)
+    if date_to:
+        delete_q = delete_q.filter(AppointmentDailyRollup.appointment_date <= date_to)
+        source_filters.append(Appointment.appointment_date <= date_to)
+    delete_q.delete(synchronize_session=False)
+
+    start_hour = cast(extract("hour", Appointment.start_time), Integer)
+    cancel_reason = case(
+        (Appointment.status == "cancelled", func.nullif(Appointment.cancel_reason, "")),
+        else_=None,
+    )
+    grouped = (
+        select(
+            func.gen_random_uuid(),
+            Appointment.hospital_id,
+            Appointment.appointment_date,
+            Appointment.doctor_id,
+            Appointment.department_id,
+            Appointment.status,
+            Appointment.appointment_type,
+            start_hour,
+            cancel_reason,
+            func.count(Appointment.id),
+        )
+        .where(*source_filters)
+        .group_by(
+            Appointment.hospital_id, Appointment.appointment_date, Appointment.doctor_id,
+            Appointment.department_id, Appointment.status, Appointment.appointment_type,
+            start_hour, cancel_reason,
+        )
+    )
+    result = db.execute(
+        insert(AppointmentDailyRollup).from_select(
+            ["id", *_KEY_COLUMNS, "appointment_count"],
+            grouped,
+        )
+    )
+    logger.info(
+        "Appointment rollup rebuilt hospital=%s from=%s to=%s rows=%s",
+        hospital_id, date_from, date_to, result.rowcount,
+    )
+    return result.rowcount
@@ -8,12 +8,16 @@ from datetime import date, datetime, timezone, time
 from math import ceil
 from typing import Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, or_
+from sqlalchemy import Integer, and_, cast, extract, func, or_
 
-from ..models.appointment import Appointment, AppointmentQueue, AppointmentStatusLog, Doctor
+from ..models.appointment import (
+    Appointment, AppointmentDailyRollup, AppointmentQueue, AppointmentStatusLog, Doctor,
+)
 from ..models.patient import Patient
 from ..models.user import User
 from ..models.invoice import Invoice
+from ..utils.pagination import count_query, keyset_page, resolve_count_mode
+from . import appointment_rollup_service  # noqa: F401  (registers the rollup flush hook)
 
 logger = logging.getLogger(__name__)
 
@@ -131,9 +135,10 @@ def create_appointment(
             )
         )
 
+    db.flush()
+    _log_status_change(db, appt.id, None, "scheduled", created_by)
     db.commit()
     db.refresh(appt)
-    _log_status_change(db, appt.id, None, "scheduled", created_by)
     return appt
 
 
@@ -172,6 +177,8 @@ def list_appointments(
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
 ):
     """List appointments with filters and pagination."""
     q = db.query(Appointment).filter(Appointment.is_deleted == False)
@@ -213,7 +220,12 @@ def list_appointments(
             )
         )
     
-    total = q.count()
+    total = count_query(q, resolve_count_mode(cursor, count))
+    if cursor is not None:
+        # Keyset mode pages by creation time, newest first
+        rows, next_cursor = keyset_page(q, Appointment.created_at, Appointment.id, cursor, limit)
+        total_pages = None if total is None else (ceil(total / limit) if total > 0 else 0)
+        return total, page, limit, total_pages, rows, next_cursor
     offset = (page - 1) * limit
     rows = (
         q.order_by(Appointment.appointment_date.desc(), Appointment.start_time.asc())
@@ -222,7 +234,7 @@ def list_appointments(
         .all()
     )
     total_pages = ceil(total / limit) if total > 0 else 0
-    return total, page, limit, total_pages, rows
+    return total, page, limit, total_pages, rows, None
 
 
 # ── Update ─────────────────────────────────────────────────────────────────
@@ -272,9 +284,9 @@ def update_status(
         pass  # No special timestamp
     elif new_status == "in-progress":
         appt.check_in_at = appt.check_in_at or datetime.now(timezone.utc)
+    _log_status_change(db, appt.id, old_status, new_status, performed_by, notes)
     db.commit()
     db.refresh(appt)
-    _log_status_change(db, appt.id, old_status, new_status, performed_by, notes)
     return appt
 
 
@@ -294,10 +306,10 @@ def cancel_appointment(
     old_status = appt.status
     appt.status = "cancelled"
     appt.cancel_reason = reason
+    _log_status_change(db, appt.id, old_status, "cancelled", cancelled_by, reason)
     
     db.commit()
     db.refresh(appt)
-    _log_status_change(db, appt.id, old_status, "cancelled", cancelled_by, reason)
     return appt
 
 
@@ -322,10 +334,10 @@ def reschedule_appointment(
     appt.status = "rescheduled"
     appt.reschedule_count = (appt.reschedule_count or 0) + 1
     appt.reschedule_reason = reason
+    _log_status_change(db, appt.id, old_status, "rescheduled", performed_by, reason)
     
     db.commit()
     db.refresh(appt)
-    _log_status_change(db, appt.id, old_status, "rescheduled", performed_by, reason)
     return appt
 
 
@@ -464,52 +476,98 @@ def enrich_appointments(db: Session, appointments: list[Appointment]) -> list[di
 
 
 # ── Stats ──────────────────────────────────────────────────────────────────
-
-def get_appointment_stats(
+# Reports are computed with grouped SQL aggregates; only compact
+# (group key, count) rows come back, never the appointment rows themselves.
+# Long ranges can read appointment_daily_rollup instead of the raw table; both
+# sources expose the same columns so every aggregate below runs on either.
+
+class _StatsSource:
+    """Columns and count expression for the raw table or the daily rollup."""
+
+    def __init__(self, use_rollup: bool = False):
+        model = AppointmentDailyRollup if use_rollup else Appointment
+        self.use_rollup = use_rollup
+        self.model = model
+        self.status = model.status
+        self.appointment_type = model.appointment_type
+        self.doctor_id = model.doctor_id
+        self.department_id = model.department_id
+        self.appointment_date = model.appointment_date
+        self.cancel_reason = model.cancel_reason
+        if use_rollup:
+            self.hour = AppointmentDailyRollup.start_hour
+        else:
+            self.hour = cast(extract("hour", Appointment.start_time), Integer)
+
+    def count(self, *conditions):
+        """COUNT(*) over raw rows, SUM(appointment_count) over rollup rows."""
+        if self.use_rollup:
+            total = func.sum(AppointmentDailyRollup.appointment_count)
+            if conditions:
+                total = total.filter(and_(*conditions))
+            return func.coalesce(total, 0)
+        total = func.count(Appointment.id)
+        if conditions:
+            total = total.filter(and_(*conditions))
+        return total
+
+    def filters(
+        self,
+        hospital_id: Optional[uuid.UUID] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        doctor_id: Optional[str | uuid.UUID] = None,
+    ) -> list:
+        """WHERE clauses shared by every stats aggregate."""
+        if self.use_rollup:
+            # Deleted appointments never reach the rollup; drained keys linger at 0.
+            filters = [AppointmentDailyRollup.appointment_count > 0]
+        else:
+            filters = [Appointment.is_deleted == False]
+        if hospital_id:
+            filters.append(self.model.hospital_id == hospital_id)
+        if date_from:
+            filters.append(self.appointment_date >= date_from)
+        if date_to:
+            filters.append(self.appointment_date <= date_to)
+        if doctor_id:
+            if isinstance(doctor_id, str):
+                doctor_id = uuid.UUID(doctor_id)
+            filters.append(self.doctor_id == doctor_id)
+        return filters
+
+
+def _stats_summary(
     db: Session,
-    hospital_id: Optional[uuid.UUID] = None,
-    date_from: Optional[date] = None,
-    date_to: Optional[date] = None,
-    doctor_id: Optional[str | uuid.UUID] = None,
+    source: _StatsSource,
+    filters: list,
+    no_show_status: str,
+    walk_in_type: str,
+    pending_statuses: tuple,
 ) -> dict:
-    """Get appointment statistics."""
-    q = db.query(Appointment).filter(Appointment.is_deleted == False)
-    
-    if hospital_id:
-        q = q.filter(Appointment.hospital_id == hospital_id)
-    if date_from:
-        q = q.filter(Appointment.appointment_date >= date_from)
-    if date_to:
-        q = q.filter(Appointment.appointment_date <= date_to)
-    if doctor_id:
-        if isinstance(doctor_id, str):
-            doctor_id = uuid.UUID(doctor_id)
-        q = q.filter(Appointment.doctor_id == doctor_id)
-    
-    appointments = q.all()
-    total = len(appointments)
-    
-    if total == 0:
-        return {
-            "total_appointments": 0,
-            "total_scheduled": 0,
-            "total_walk_ins": 0,
-            "total_completed": 0,
-            "total_cancelled": 0,
-            "total_no_shows": 0,
-            "total_pending": 0,
-            "completion_rate": 0,
-            "cancellation_rate": 0,
-            "no_show_rate": 0,
-        }
-    
-    completed = sum(1 for a in appointments if a.status == "completed")
-    cancelled = sum(1 for a in appointments if a.status == "cancelled")
-    no_shows = sum(1 for a in appointments if a.status == "no_show")
-    pending = sum(1 for a in appointments if a.status in ("scheduled", "confirmed"))
-    scheduled = sum(1 for a in appointments if a.appointment_type == "scheduled")
-    walk_ins = sum(1 for a in appointments if a.appointment_type == "walk_in")
-    
+    """Headline totals and rates from one GROUP BY (status, appointment_type)."""
+    rows = (
+        db.query(source.status, source.appointment_type, source.count())
+        .filter(*filters)
+        .group_by(source.status, source.appointment_type)
+        .all()
+    )
+    total = completed = cancelled = no_shows = pending = scheduled = walk_ins = 0
+    for status, appointment_type, count in rows:
+        total += count
+        if status == "completed":
+            completed += count
+        elif status == "cancelled":
+            cancelled += count
+        if status == no_show_status:
+            no_shows += count
+        if status in pending_statuses:
+            pending += count
+        if appointment_type == "scheduled":
+            scheduled += count
+        elif appointment_type == walk_in_type:
+            walk_ins += count
+
     return {
         "total_appointments": total,
         "total_scheduled": scheduled,
@@ -524,6 +582,26 @@ def get_appointment_stats(
     }
 
 
+def get_appointment_stats(
+    db: Session,
+    hospital_id: Optional[uuid.UUID] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    doctor_id: Optional[str | uuid.UUID] = None,
+    use_rollup: bool = False,
+) -> dict:
+    """Get appointment statistics."""
+    source = _StatsSource(use_rollup)
+    return _stats_summary(
+        db,
+        source,
+        source.filters(hospital_id, date_from, date_to, doctor_id),
+        no_show_status="no_show",
+        walk_in_type="walk_in",
+        pending_statuses=("scheduled", "confirmed"),
+    )
+
+
 # ── Status log ─────────────────────────────────────────────────────────────
 
 def _log_status_change(
@@ -534,113 +612,120 @@ def _log_status_change(
     changed_by: uuid.UUID,
     notes: Optional[str] = None,
 ):
-    """Log appointment status change."""
-    try:
-        log = AppointmentStatusLog(
-            appointment_id=appointment_id,
-            from_status=from_status,
-            to_status=to_status,
-            changed_by=changed_by,
-            notes=notes,
-        )
-        db.add(log)
-        db.commit()
-    except Exception as e:
-        logger.error(f"Failed to log status change: {e}")
+    """Log appointment status change; committed with the caller's change."""
+    db.add(AppointmentStatusLog(
+        appointment_id=appointment_id,
+        from_status=from_status,
+        to_status=to_status,
+        changed_by=changed_by,
+        notes=notes,
+    ))
 
 
 def get_enhanced_stats(
     db: Session,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
+    hospital_id: Optional[uuid.UUID] = None,
+    use_rollup: bool = False,
 ) -> dict:
     """Get comprehensive appointment analytics."""
-    from sqlalchemy import func as sqlfunc, extract
-
-    query = db.query(Appointment).filter(Appointment.is_deleted == False)
-    if date_from:
-        query = query.filter(Appointment.appointment_date >= date_from)
-    if date_to:
-        query = query.filter(Appointment.appointment_date <= date_to)
-
-    appointments = query.all()
+    source = _StatsSource(use_rollup)
+    filters = source.filters(hospital_id, date_from, date_to)
+    result = _stats_summary(
+        db,
+        source,
+        filters,
+        no_show_status="no-show",
+        walk_in_type="walk-in",
+        pending_statuses=("pending", "confirmed", "scheduled"),
+    )
+    for rate in ("completion_rate", "cancellation_rate", "no_show_rate"):
+        result[rate] = float(result[rate])
 
-    # Base stats
-    total = len(appointments)
-    completed = sum(1 for a in appointments if a.status == "completed")
-    cancelled = sum(1 for a in appointments if a.status == "cancelled")
-    no_shows = sum(1 for a in appointments if a.status == "no-show")
-    pending = sum(1 for a in appointments if a.status in ("pending", "confirmed", "scheduled"))
-    scheduled_type = sum(1 for a in appointments if a.appointment_type == "scheduled")
-    walk_in_type = sum(1 for a in appointments if a.appointment_type == "walk-in")
+    total_count = source.count()
+    completed_count = source.count(source.status == "completed")
+    cancelled_count = source.count(source.status == "cancelled")
 
     # Doctor stats
-    doctor_map = {}
-    for a in appointments:
-        did = str(a.doctor_id) if a.doctor_id else "unassigned"
-        if did not in doctor_map:
-            doctor_map[did] = {"doctor_id": did, "total": 0, "completed": 0, "cancelled": 0}
-        doctor_map[did]["total"] += 1
-        if a.status == "completed":
-            doctor_map[did]["completed"] += 1
-        elif a.status == "cancelled":
-            doctor_map[did]["cancelled"] += 1
+    doctor_rows = (
+        db.query(source.doctor_id, total_count, completed_count, cancelled_count)
+        .filter(*filters)
+        .group_by(source.doctor_id)
+        .order_by(total_count.desc())
+        .all()
+    )
+    doctor_stats = [
+        {
+            "doctor_id": str(doctor_id) if doctor_id else "unassigned",
+            "total": total,
+            "completed": completed,
+            "cancelled": cancelled,
+        }
+        for doctor_id, total, completed, cancelled in doctor_rows
+    ]
 
     # Department stats
-    dept_map = {}
-    for a in appointments:
-        did = str(a.department_id) if a.department_id else "unassigned"
-        if did not in dept_map:
-            dept_map[did] = {"department_id": did, "total": 0, "completed": 0}
-        dept_map[did]["total"] += 1
-        if a.status == "completed":
-            dept_map[did]["completed"] += 1
+    dept_rows = (
+        db.query(source.department_id, total_count, completed_count)
+        .filter(*filters)
+        .group_by(source.department_id)
+        .order_by(total_count.desc())
+        .all()
+    )
+    department_stats = [
+        {
+            "department_id": str(department_id) if department_id else "unassigned",
+            "total": total,
+            "completed": completed,
+        }
+        for department_id, total, completed in dept_rows
+    ]
 
     # Daily trends
-    daily_map = {}
-    for a in appointments:
-        d = str(a.appointment_date)
-        if d not in daily_map:
-            daily_map[d] = {"date": d, "total": 0, "completed": 0, "cancelled": 0}
-        daily_map[d]["total"] += 1
-        if a.status == "completed":
-            daily_map[d]["completed"] += 1
-        elif a.status == "cancelled":
-            daily_map[d]["cancelled"] += 1
+    daily_rows = (
+        db.query(source.appointment_date, total_count, completed_count, cancelled_count)
+        .filter(*filters)
+        .group_by(source.appointment_date)
+        .order_by(source.appointment_date)
+        .all()
+    )
+    daily_trends = [
+        {"date": str(day), "total": total, "completed": completed, "cancelled": cancelled}
+        for day, total, completed, cancelled in daily_rows
+    ]
 
     # Peak hours
-    hour_map = {}
-    for a in appointments:
-        if a.start_time:
-            h = a.start_time.hour
-            if h not in hour_map:
-                hour_map[h] = {"hour": h, "count": 0}
-            hour_map[h]["count"] += 1
+    hour_rows = (
+        db.query(source.hour, total_count)
+        .filter(*filters, source.hour.isnot(None))
+        .group_by(source.hour)
+        .order_by(source.hour)
+        .all()
+    )
+    peak_hours = [{"hour": hour, "count": count} for hour, count in hour_rows]
 
     # Cancellation reasons
-    reason_map = {}
-    for a in appointments:
-        if a.status == "cancelled" and a.cancel_reason:
-            r = a.cancel_reason
-            if r not in reason_map:
-                reason_map[r] = {"reason": r, "count": 0}
-            reason_map[r]["count"] += 1
+    reason_rows = (
+        db.query(source.cancel_reason, total_count)
+        .filter(
+            *filters,
+            source.status == "cancelled",
+            source.cancel_reason.isnot(None),
+            source.cancel_reason != "",
+        )
+        .group_by(source.cancel_reason)
+        .order_by(total_count.desc())
+        .all()
+    )
+    cancellation_reasons = [{"reason": reason, "count": count} for reason, count in reason_rows]
 
-    return {
-        "total_appointments": total,
-        "total_scheduled": scheduled_type,
-        "total_walk_ins": walk_in_type,
-        "total_completed": completed,
-        "total_cancelled": cancelled,
-        "total_no_shows": no_shows,
-        "total_pending": pending,
-        "completion_rate": round(completed / total * 100, 1) if total else 0.0,
-        "cancellation_rate": round(cancelled / total * 100, 1) if total else 0.0,
-        "no_show_rate": round(no_shows / total * 100, 1) if total else 0.0,
+    result.update({
         "average_wait_time": 0.0,
-        "doctor_stats": list(doctor_map.values()),
-        "department_stats": list(dept_map.values()),
-        "daily_trends": sorted(daily_map.values(), key=lambda x: x["date"]),
-        "peak_hours": sorted(hour_map.values(), key=lambda x: x["hour"]),
-        "cancellation_reasons": list(reason_map.values()),
-    }
+        "doctor_stats": doctor_stats,
+        "department_stats": department_stats,
+        "daily_trends": daily_trends,
+        "peak_hours": peak_hours,
+        "cancellation_reasons": cancellation_reasons,
+    })
+    return result
@@ -0,0 +1,329 @@
+"""
+Catalog import service — bulk load of medicines and opening stock.
+
+Onboarding a hospital loads tens of thousands of medicines with their
+opening batches. import_medicine_catalog() streams a CSV or XLSX upload
+row by row and works through it in chunks of CHUNK_SIZE rows:
+
+1. every row is validated against MedicineImportRow; failures go to the
+   per-row error report and the rest of the chunk carries on;
+2. medicines are upserted on (hospital_id, sku) and batches on
+   (medicine_id, batch_number), each with one INSERT ... ON CONFLICT;
+3. new batches add their quantity to medicine_stock_summary and get an
+   opening-stock StockMovement, written with one multi-row INSERT.
+
+Each chunk is committed on its own, so memory and lock time stay flat and
+a re-run of the same file updates rather than duplicates. Opening stock is
+only taken from batches the import creates: re-importing a batch updates
+its dates and prices, never its quantity.
+
+Expected columns are the MedicineCreate fields (sku required) plus
+batch_number, expiry_date, mfg_date, quantity, batch_purchase_price and
+batch_selling_price; headers are matched case-insensitively.
+"""
+import codecs
+import csv
+import logging
+import uuid
+from collections import Counter
+from datetime import date, datetime
+from itertools import islice
+from typing import BinaryIO, Iterator
+
+from pydantic import ValidationError
+from sqlalchemy import insert, text
+from sqlalchemy.orm import Session
+
+from ..models.inventory import StockMovement
+from ..schemas.pharmacy import MedicineImportRow
+from .pharmacy_service import _normalize_medicine_payload
+from .stock_summary_service import apply_stock_deltas, get_medicine_stock_map
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2000
+IMPORT_FORMATS = (".csv", ".xlsx")
+
+# (column, array type, required). Optional columns keep their stored value
+# when the file leaves them blank.
+_MEDICINE_COLUMNS = (
+    ("name", "varchar", True),
+    ("generic_name", "varchar", True),
+    ("category", "varchar", False),
+    ("manufacturer", "varchar", False),
+    ("composition", "text", False),
+    ("strength", "varchar", False),
+    ("unit_of_measure", "varchar", True),
+    ("hsn_code", "varchar", False),
+    ("sku", "varchar", True),
+    ("barcode", "varchar", False),
+    ("requires_prescription", "boolean", True),
+    ("selling_price", "numeric", True),
+    ("purchase_price", "numeric", False),
+    ("reorder_level", "int", True),
+    ("max_stock_level", "int", False),
+    ("storage_instructions", "varchar", False),
+    ("is_active", "boolean", True),
+)
+_BATCH_COLUMNS = (
+    ("medicine_id", "uuid"),
+    ("batch_number", "varchar"),
+    ("manufactured_date", "date"),
+    ("expiry_date", "date"),
+    ("initial_quantity", "int"),
+    ("current_quantity", "int"),
+    ("purchase_price", "numeric"),
+    ("selling_price", "numeric"),
+    ("is_expired", "boolean"),
+    ("is_active", "boolean"),
+)
+
+
+def _unnest(columns) -> str:
+    arrays = ", ".join(f"CAST(:{c[0]} AS {c[1]}[])" for c in columns)
+    return f"unnest({arrays}) AS r({', '.join(c[0] for c in columns)})"
+
+
+# Rows go to PostgreSQL as one array per column: the statement text is the
+# same for every chunk, so nothing is compiled per row.
+_UPSERT_MEDICINES_SQL = text(f"""
+INSERT INTO medicines (hospital_id, {', '.join(c[0] for c in _MEDICINE_COLUMNS)})
+SELECT CAST(:hospital_id AS uuid), r.*
+FROM {_unnest(_MEDICINE_COLUMNS)}
+ON CONFLICT (hospital_id, sku) WHERE sku IS NOT NULL AND sku <> '' DO UPDATE SET
+    {', '.join(
+        f"{c} = EXCLUDED.{c}" if required else f"{c} = COALESCE(EXCLUDED.{c}, medicines.{c})"
+        for c, _, required in _MEDICINE_COLUMNS if c != "sku"
+    )},
+    updated_at = now()
+RETURNING id, sku, (xmax = 0) AS inserted
+""")
+
+_UPSERT_BATCHES_SQL = text(f"""
+INSERT INTO medicine_batches ({', '.join(c[0] for c in _BATCH_COLUMNS)})
+SELECT r.*
+FROM {_unnest(_BATCH_COLUMNS)}
+ON CONFLICT (medicine_id, batch_number) DO UPDATE SET
+    manufactured_date = COALESCE(EXCLUDED.manufactured_date, medicine_batches.manufactured_date),
+    expiry_date = EXCLUDED.expiry_date,
+    purchase_price = EXCLUDED.purchase_price,
+    selling_price = EXCLUDED.selling_price,
+    updated_at = now()
+RETURNING id, medicine_id, current_quantity, purchase_price, (xmax = 0) AS inserted
+""")
+
+
+def _columns(rows: list[dict], columns) -> dict[str, list]:
+    return {c[0]: [row[c[0]] for row in rows] for c in columns}
+
+
+# ── Reading ────────────────────────────────────────────────────────────────
+
+def _header(value) -> str:
+    return str(value or "").strip().lower().replace(" ", "_")
+
+
+def _cell(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Spreadsheet numbers: the schema parses numeric text, but a numeric
+        # SKU or batch number must not fail as "not a string".
+        return str(int(value)) if float(value).is_integer() else str(value)
+    return value
+
+
+def _csv_rows(file: BinaryIO) -> Iterator[list]:
+    # utf-8-sig drops the BOM spreadsheet programs put in front of CSV exports.
+    yield from csv.reader(codecs.getreader("utf-8-sig")(file))
+
+
+def _xlsx_rows(file: BinaryIO) -> Iterator[tuple]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("XLSX import needs the openpyxl package; upload the catalog as CSV") from None
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_catalog_rows(file: BinaryIO, filename: str) -> Iterator[tuple[int, dict]]:
+    """Yield (spreadsheet row number, {column: value}) for every non-blank row."""
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        rows = _csv_rows(file)
+    elif name.endswith(".xlsx"):
+        rows = _xlsx_rows(file)
+    else:
+        raise ValueError(f"Unsupported catalog format; upload one of {', '.join(IMPORT_FORMATS)}")
+
+    header = [_header(h) for h in next(rows, [])]
+    missing = [column for column in ("sku", "name", "selling_price") if column not in header]
+    if missing:
+        raise ValueError(f"Catalog is missing the columns: {', '.join(missing)}")
+    for number, values in enumerate(rows, start=2):
+        row = {key: _cell(value) for key, value in zip(header, values) if key}
+        if any(value is not None for value in row.values()):
+            yield number, {key: value for key, value in row.items() if value is not None}
+
+
+# ── Writing ────────────────────────────────────────────────────────────────
+
+def _medicine_values(row: MedicineImportRow) -> dict:
+    payload = _normalize_medicine_payload(row.model_dump())
+    values = {column: payload.get(column) for column, _, _ in _MEDICINE_COLUMNS}
+    values["generic_name"] = values["generic_name"] or values["name"]
+    return values
+
+
+def _upsert_medicines(db: Session, hospital_id: uuid.UUID, rows: list[dict]) -> tuple[dict[str, uuid.UUID], int]:
+    """Upsert medicines on (hospital_id, sku); returns ({sku: id}, number created)."""
+    params = {"hospital_id": str(hospital_id), **_columns(rows, _MEDICINE_COLUMNS)}
+    ids, created = {}, 0
+    for row in db.execute(_UPSERT_MEDICINES_SQL, params):
+        ids[row.sku] = row.id
+        created += row.inserted
+    return ids, created
+
+
+def _upsert_batches(db: Session, rows: list[dict]) -> list:
+    """Upsert batches on (medicine_id, batch_number); returns every row, flagged `inserted` if new."""
+    params = _columns(rows, _BATCH_COLUMNS)
+    params["medicine_id"] = [str(m) for m in params["medicine_id"]]
+    return list(db.execute(_UPSERT_BATCHES_SQL, params))
+
+
+def _import_chunk(
+    db: Session,
+    hospital_id: uuid.UUID,
+    user_id: uuid.UUID,
+    chunk: list[tuple[int, dict]],
+    note: str,
+    report: dict,
+) -> None:
+    valid: list[tuple[int, MedicineImportRow]] = []
+    for number, raw in chunk:
+        try:
+            valid.append((number, MedicineImportRow.model_validate(raw)))
+        except ValidationError as e:
+            report["errors"].append({
+                "row": number,
+                "errors": [
+                    f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}"
+                    for err in e.errors()
+                ],
+            })
+    if not valid:
+        return
+
+    # A SKU listed twice in one chunk is one medicine; the last row wins.
+    medicines = {row.sku: _medicine_values(row) for _, row in valid}
+    medicine_ids, created = _upsert_medicines(db, hospital_id, list(medicines.values()))
+    report["medicines_created"] += created
+    report["medicines_updated"] += len(medicines) - created
+
+    batches: dict[tuple, dict] = {}
+    imported = 0
+    for number, row in valid:
+        if not row.batch_number:
+            imported += 1
+            continue
+        key = (medicine_ids[row.sku], row.batch_number)
+        if key in batches:
+            report["errors"].append({
+                "row": number, "errors": [f"batch_number: {row.batch_number} is listed twice for {row.sku}"],
+            })
+            continue
+        imported += 1
+        batches[key] = {
+            "medicine_id": key[0],
+            "batch_number": row.batch_number,
+            "manufactured_date": row.mfg_date,
+            "expiry_date": row.expiry_date,
+            "initial_quantity": row.quantity,
+            "current_quantity": row.quantity,
+            "purchase_price": row.batch_purchase_price if row.batch_purchase_price is not None else row.purchase_price,
+            "selling_price": row.batch_selling_price if row.batch_selling_price is not None else row.selling_price,
+            "is_expired": row.expiry_date < date.today(),
+            "is_active": True,
+        }
+    report["imported_rows"] += imported
+    if not batches:
+        return
+
+    new_batches = [b for b in _upsert_batches(db, list(batches.values())) if b.inserted]
+    report["batches_created"] += len(new_batches)
+    report["batches_updated"] += len(batches) - len(new_batches)
+    stocked = [b for b in new_batches if b.current_quantity > 0]
+    if not stocked:
+        return
+
+    deltas: Counter = Counter()
+    for batch in stocked:
+        deltas[batch.medicine_id] += batch.current_quantity
+    apply_stock_deltas(db, deltas)
+    report["opening_stock_units"] += sum(deltas.values())
+
+    # balance_after walks each medicine's new batches up to its current stock.
+    stock = get_medicine_stock_map(db, deltas)
+    balance = {medicine_id: stock.get(medicine_id, 0) - delta for medicine_id, delta in deltas.items()}
+    movements = []
+    for batch in stocked:
+        balance[batch.medicine_id] += batch.current_quantity
+        movements.append({
+            "hospital_id": hospital_id,
+            "item_type": "medicine",
+            "item_id": batch.medicine_id,
+            "batch_id": batch.id,
+            "movement_type": "stock_in",
+            "reference_type": "opening_stock",
+            "quantity": batch.current_quantity,
+            "balance_after": balance[batch.medicine_id],
+            "unit_cost": batch.purchase_price,
+            "notes": note,
+            "performed_by": user_id,
+        })
+    db.execute(insert(StockMovement.__table__), movements)
+
+
+def import_medicine_catalog(
+    db: Session,
+    hospital_id: uuid.UUID,
+    user_id: uuid.UUID,
+    file: BinaryIO,
+    filename: str,
+    chunk_size: int = CHUNK_SIZE,
+) -> dict:
+    """
+    Import a medicine catalog (CSV or XLSX) with opening stock. Valid rows
+    are written and committed chunk by chunk; invalid ones are listed in
+    the returned report with their row number. Raises ValueError if the
+    file itself cannot be read.
+    """
+    report = {
+        "rows": 0, "imported_rows": 0,
+        "medicines_created": 0, "medicines_updated": 0,
+        "batches_created": 0, "batches_updated": 0,
+        "opening_stock_units": 0, "errors": [],
+    }
+    note = f"Opening stock: catalog import {filename}"[:255]
+    rows = read_catalog_rows(file, filename)
+    while chunk := list(islice(rows, chunk_size)):
+        report["rows"] += len(chunk)
+        _import_chunk(db, hospital_id, user_id, chunk, note, report)
+        db.commit()
+        logger.debug(f"Catalog import: {report['rows']} rows processed")
+
+    report["error_count"] = len(report["errors"])
+    logger.info(
+        f"Catalog import {filename}: {report['imported_rows']}/{report['rows']} rows, "
+        f"{report['medicines_created']} medicines and {report['batches_created']} batches created, "
+        f"{report['error_count']} rows rejected"
+    )
+    return report
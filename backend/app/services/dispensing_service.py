@@ -10,17 +10,22 @@ import uuid
 import logging
 from datetime import datetime, timezone, date
 from decimal import Decimal
-from typing import Optional
+from typing import NamedTuple, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func, or_
+from sqlalchemy import and_, func, insert, or_
 
 from ..models.prescription import Prescription, PrescriptionItem, Medicine
 from ..models.pharmacy import (
     PharmacySale, PharmacySaleItem, MedicineBatch,
 )
+from ..models.inventory import StockMovement
 from ..models.patient import Patient
 from ..models.appointment import Doctor
+from ..models.user import User
 from .prescription_service import calculate_prescribed_quantity
+from .stock_allocation_service import (
+    BatchAllocation, InsufficientStock, StockDemand, allocate_stock, balances_after, usable_batch_conditions,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -247,11 +252,8 @@ def get_pending_prescriptions(
         .all()
     )
     
-    # Enrich with patient name, doctor name, item counts
-    enriched = []
-    for rx in rows:
-        item = _enrich_prescription_for_dispensing(db, rx)
-        enriched.append(item)
+    # Enrich with patient name, doctor name, items and stock for the whole page
+    enriched = enrich_prescriptions_for_dispensing(db, rows)
     
     total_pages = ceil(total / limit) if total > 0 else 0
     
@@ -264,485 +266,664 @@ def get_pending_prescriptions(
     }
 
 
-def _enrich_prescription_for_dispensing(db: Session, rx: Prescription) -> dict:
-    """Add patient name, doctor name, and item details for dispensing view."""
-    queue_status = "dispensed" if rx.status == "dispensed" else "finalized"
+def _load_available_batches(db: Session, medicine_ids: set) -> dict:
+    """Active in-stock batches per medicine, FEFO ordered, in one query."""
+    if not medicine_ids:
+        return {}
+    batches = (
+        db.query(MedicineBatch)
+        .filter(
+            MedicineBatch.medicine_id.in_(medicine_ids),
+            MedicineBatch.is_active == True,
+            MedicineBatch.quantity > 0,
+        )
+        .order_by(MedicineBatch.medicine_id, MedicineBatch.expiry_date.asc())
+        .all()
+    )
+    by_medicine: dict = {}
+    for batch in batches:
+        by_medicine.setdefault(batch.medicine_id, []).append(batch)
+    return by_medicine
 
-    d = {
-        "id": str(rx.id),
-        "prescription_number": rx.prescription_number,
-        "status": queue_status,
-        "is_finalized": rx.is_finalized,
-        "finalized_at": str(rx.finalized_at) if rx.finalized_at else None,
-        "created_at": str(rx.created_at),
-        "hospital_id": str(rx.hospital_id),
-        "patient_id": str(rx.patient_id),
-        "doctor_id": str(rx.doctor_id),
-        "appointment_id": str(rx.appointment_id) if rx.appointment_id else None,
-        "diagnosis": rx.diagnosis,
-        "clinical_notes": rx.clinical_notes,
-        "advice": rx.advice,
-        "vitals_bp": rx.vitals_bp,
-        "vitals_pulse": rx.vitals_pulse,
-        "vitals_temp": rx.vitals_temp,
-        "vitals_weight": rx.vitals_weight,
-        "vitals_spo2": rx.vitals_spo2,
+
+def _load_dispensing_records(db: Session, rx_ids: list) -> dict:
+    """Dispensing records (sales) linked to each prescription through its items."""
+    if not rx_ids:
+        return {}
+    rows = (
+        db.query(
+            PrescriptionItem.prescription_id,
+            PharmacySale.id,
+            PharmacySale.invoice_number,
+            PharmacySale.sale_date,
+        )
+        .join(PharmacySaleItem, PharmacySaleItem.prescription_item_id == PrescriptionItem.id)
+        .join(PharmacySale, PharmacySale.id == PharmacySaleItem.sale_id)
+        .filter(PrescriptionItem.prescription_id.in_(rx_ids))
+        .distinct()
+        .order_by(PrescriptionItem.prescription_id, PharmacySale.sale_date.asc())
+        .all()
+    )
+    records: dict = {}
+    for rx_id, sale_id, dispensing_number, dispensed_at in rows:
+        records.setdefault(rx_id, []).append({
+            "id": str(sale_id),
+            "dispensing_number": dispensing_number,
+            "dispensed_at": str(dispensed_at) if dispensed_at else None,
+        })
+    return records
+
+
+def _dispensing_item(item: PrescriptionItem, batches: list) -> dict:
+    """Prescription item with its prescribed quantity and available stock."""
+    prescribed_quantity = calculate_prescribed_quantity(
+        item.frequency,
+        item.duration_value,
+        item.duration_unit,
+        item.quantity,
+    ) or 0
+
+    return {
+        "id": str(item.id),
+        "prescription_item_id": str(item.id),
+        "medicine_id": str(item.medicine_id) if item.medicine_id else None,
+        "medicine_name": item.medicine_name,
+        "generic_name": item.generic_name,
+        "dosage": item.dosage,
+        "frequency": item.frequency,
+        "duration_value": item.duration_value,
+        "duration_unit": item.duration_unit,
+        "route": item.route,
+        "instructions": item.instructions,
+        "quantity": prescribed_quantity,
+        "dispensed_quantity": item.dispensed_quantity,
+        "allow_substitution": item.allow_substitution,
+        "is_dispensed": item.is_dispensed,
+        "available_batches": [
+            {
+                "id": str(batch.id),
+                "batch_number": batch.batch_number,
+                "expiry_date": str(batch.expiry_date),
+                "quantity": batch.quantity,
+                "selling_price": float(batch.selling_price) if batch.selling_price else 0,
+            }
+            for batch in batches
+        ],
+        "available_quantity": sum(batch.quantity or 0 for batch in batches),
     }
-    
-    # Patient info
-    patient = db.query(Patient).filter(Patient.id == rx.patient_id).first()
-    if patient:
-        d["patient_name"] = patient.full_name
-        d["patient_reference_number"] = patient.patient_reference_number
-        d["patient_age"] = _resolve_patient_age_years(patient)
-        d["patient_gender"] = patient.gender
-        d["patient_phone"] = patient.phone_number
-        d["patient_blood_group"] = patient.blood_group
-    else:
-        d["patient_name"] = None
-        d["patient_reference_number"] = None
-        d["patient_age"] = None
-        d["patient_gender"] = None
-        d["patient_phone"] = None
-        d["patient_blood_group"] = None
-    
-    # Doctor info
-    doctor = db.query(Doctor).filter(Doctor.id == rx.doctor_id).first()
-    if doctor and doctor.user:
-        d["doctor_name"] = doctor.user.full_name
-        d["doctor_specialization"] = doctor.specialization
-    else:
-        d["doctor_name"] = None
-        d["doctor_specialization"] = None
-    
-    # Items with dispensing status
-    items = db.query(PrescriptionItem).filter(
-        PrescriptionItem.prescription_id == rx.id
-    ).order_by(PrescriptionItem.display_order).all()
-    
-    d["items"] = []
-    total_items = len(items)
-    dispensed_items = 0
-    
-    for item in items:
-        prescribed_quantity = calculate_prescribed_quantity(
-            item.frequency,
-            item.duration_value,
-            item.duration_unit,
-            item.quantity,
-        ) or 0
 
-        item_dict = {
-            "id": str(item.id),
-            "prescription_item_id": str(item.id),
-            "medicine_id": str(item.medicine_id) if item.medicine_id else None,
-            "medicine_name": item.medicine_name,
-            "generic_name": item.generic_name,
-            "dosage": item.dosage,
-            "frequency": item.frequency,
-            "duration_value": item.duration_value,
-            "duration_unit": item.duration_unit,
-            "route": item.route,
-            "instructions": item.instructions,
-            "quantity": prescribed_quantity,
-            "dispensed_quantity": item.dispensed_quantity,
-            "allow_substitution": item.allow_substitution,
-            "is_dispensed": item.is_dispensed,
+
+def enrich_prescriptions_for_dispensing(db: Session, prescriptions: list[Prescription]) -> list[dict]:
+    """
+    Batch enrich prescriptions for the dispensing view.
+
+    Patients, doctors, items, per-medicine batch stock and linked dispensing
+    records are each loaded once for the whole list, so a queue page costs
+    five queries regardless of its size.
+    """
+    if not prescriptions:
+        return []
+
+    rx_ids = [rx.id for rx in prescriptions]
+
+    # Batch load patients
+    patient_ids = {rx.patient_id for rx in prescriptions if rx.patient_id}
+    patients = {p.id: p for p in db.query(Patient).filter(Patient.id.in_(patient_ids)).all()} if patient_ids else {}
+
+    # Batch load doctors with their user names
+    doctor_ids = {rx.doctor_id for rx in prescriptions if rx.doctor_id}
+    doctors = {}
+    if doctor_ids:
+        doctor_rows = (
+            db.query(Doctor, User)
+            .outerjoin(User, User.id == Doctor.user_id)
+            .filter(Doctor.id.in_(doctor_ids))
+            .all()
+        )
+        doctors = {doc.id: (doc, user) for doc, user in doctor_rows}
+
+    # Batch load items
+    items_by_rx: dict = {}
+    for item in (
+        db.query(PrescriptionItem)
+        .filter(PrescriptionItem.prescription_id.in_(rx_ids))
+        .order_by(PrescriptionItem.prescription_id, PrescriptionItem.display_order)
+        .all()
+    ):
+        items_by_rx.setdefault(item.prescription_id, []).append(item)
+
+    # Batch load stock for every medicine on the page
+    batches_by_medicine = _load_available_batches(
+        db,
+        {item.medicine_id for items in items_by_rx.values() for item in items if item.medicine_id},
+    )
+
+    # Batch load linked dispensing records
+    dispensing_records = _load_dispensing_records(db, rx_ids)
+
+    result = []
+    for rx in prescriptions:
+        queue_status = "dispensed" if rx.status == "dispensed" else "finalized"
+        d = {
+            "id": str(rx.id),
+            "prescription_number": rx.prescription_number,
+            "status": queue_status,
+            "is_finalized": rx.is_finalized,
+            "finalized_at": str(rx.finalized_at) if rx.finalized_at else None,
+            "created_at": str(rx.created_at),
+            "hospital_id": str(rx.hospital_id),
+            "patient_id": str(rx.patient_id),
+            "doctor_id": str(rx.doctor_id),
+            "appointment_id": str(rx.appointment_id) if rx.appointment_id else None,
+            "diagnosis": rx.diagnosis,
+            "clinical_notes": rx.clinical_notes,
+            "advice": rx.advice,
+            "vitals_bp": rx.vitals_bp,
+            "vitals_pulse": rx.vitals_pulse,
+            "vitals_temp": rx.vitals_temp,
+            "vitals_weight": rx.vitals_weight,
+            "vitals_spo2": rx.vitals_spo2,
         }
-        
-        # Get available stock for this medicine across all active batches (FEFO ordered).
-        if item.medicine_id:
-            batches = db.query(MedicineBatch).filter(
-                MedicineBatch.medicine_id == item.medicine_id,
-                MedicineBatch.is_active == True,
-                MedicineBatch.quantity > 0,
-            ).order_by(MedicineBatch.expiry_date.asc()).all()
-
-            if batches:
-                item_dict["available_batches"] = [
-                    {
-                        "id": str(batch.id),
-                        "batch_number": batch.batch_number,
-                        "expiry_date": str(batch.expiry_date),
-                        "quantity": batch.quantity,
-                        "selling_price": float(batch.selling_price) if batch.selling_price else 0,
-                    }
-                    for batch in batches
-                ]
-                item_dict["available_quantity"] = sum(batch.quantity or 0 for batch in batches)
-            else:
-                item_dict["available_batches"] = []
-                item_dict["available_quantity"] = 0
+
+        # Patient info
+        patient = patients.get(rx.patient_id)
+        d["patient_name"] = patient.full_name if patient else None
+        d["patient_reference_number"] = patient.patient_reference_number if patient else None
+        d["patient_age"] = _resolve_patient_age_years(patient)
+        d["patient_gender"] = patient.gender if patient else None
+        d["patient_phone"] = patient.phone_number if patient else None
+        d["patient_blood_group"] = patient.blood_group if patient else None
+
+        # Doctor info
+        doctor, user = doctors.get(rx.doctor_id, (None, None))
+        if doctor and user:
+            d["doctor_name"] = user.full_name
+            d["doctor_specialization"] = doctor.specialization
         else:
-            item_dict["available_batches"] = []
-            item_dict["available_quantity"] = 0
-        
-        d["items"].append(item_dict)
-        
-        if item.is_dispensed:
-            dispensed_items += 1
-    
-    d["total_items"] = total_items
-    d["dispensed_items"] = dispensed_items
-    d["pending_items"] = total_items - dispensed_items
-    
-    return d
+            d["doctor_name"] = None
+            d["doctor_specialization"] = None
+
+        # Items with dispensing status and available stock
+        items = items_by_rx.get(rx.id, [])
+        d["items"] = [
+            _dispensing_item(item, batches_by_medicine.get(item.medicine_id, []) if item.medicine_id else [])
+            for item in items
+        ]
+        dispensed_items = sum(1 for item in items if item.is_dispensed)
+        d["total_items"] = len(items)
+        d["dispensed_items"] = dispensed_items
+        d["pending_items"] = len(items) - dispensed_items
+        d["dispensing_records"] = dispensing_records.get(rx.id, [])
+
+        result.append(d)
+
+    return result
+
+
+def _enrich_prescription_for_dispensing(db: Session, rx: Prescription) -> dict:
+    """Add patient name, doctor name, and item details for dispensing view."""
+    return enrich_prescriptions_for_dispensing(db, [rx])[0]
 
 
 # ═══════════════════════════════════════════════════════════════════════════
 # Dispensing Logic
 # ═══════════════════════════════════════════════════════════════════════════
 
-def dispense_prescription(
+DISPENSE_MODES = ("per_prescription", "all_or_nothing")
+
+
+class _DispensePlan(NamedTuple):
+    """One prescription's validated dispensing, not yet applied."""
+    rx: Prescription
+    notes: Optional[str]
+    demands: list[StockDemand]
+    lines: list[tuple[PrescriptionItem, Decimal]]  # (item, requested unit price) per demand
+    item_changes: dict  # PrescriptionItem -> {attribute: new value}
+    items_dispensed: int
+    items_skipped: int
+    status: str
+
+
+def _as_uuid(value) -> uuid.UUID:
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def _load_for_dispensing(
     db: Session,
-    prescription_id: str | uuid.UUID,
     hospital_id: uuid.UUID,
-    user_id: uuid.UUID,
-    items_to_dispense: list[dict],
-    skipped_items: Optional[list[dict]] = None,
-    notes: Optional[str] = None,
-) -> dict:
+    requests: list[dict],
+) -> tuple[dict, dict, dict]:
+    """Prescriptions, their items and the requested batches, one query each."""
+    rx_ids = [r["prescription_id"] for r in requests]
+    prescriptions = {
+        rx.id: rx
+        for rx in db.query(Prescription).filter(
+            Prescription.id.in_(rx_ids),
+            Prescription.hospital_id == hospital_id,
+            Prescription.is_deleted == False,
+        )
+    }
+    items_by_rx: dict[uuid.UUID, list[PrescriptionItem]] = {rx_id: [] for rx_id in prescriptions}
+    if prescriptions:
+        for item in db.query(PrescriptionItem).filter(
+            PrescriptionItem.prescription_id.in_(list(prescriptions))
+        ):
+            items_by_rx[item.prescription_id].append(item)
+
+    batch_ids = {
+        _as_uuid(item["batch_id"])
+        for r in requests for item in r.get("items") or [] if item.get("batch_id")
+    }
+    batches = {}
+    if batch_ids:
+        batches = {
+            b.id: b
+            for b in db.query(MedicineBatch).filter(
+                MedicineBatch.id.in_(batch_ids),
+                MedicineBatch.is_active == True,
+            )
+        }
+    return prescriptions, items_by_rx, batches
+
+
+def _plan_dispense(
+    rx: Prescription,
+    rx_items: list[PrescriptionItem],
+    batches: dict,
+    request: dict,
+) -> _DispensePlan:
     """
-    Dispense medicines from a prescription.
-    
-    Args:
-        prescription_id: Prescription UUID
-        hospital_id: Hospital UUID
-        user_id: Pharmacist user UUID
-        items_to_dispense: List of dicts with:
-            - prescription_item_id: UUID
-            - medicine_id: UUID
-            - batch_id: UUID
-            - quantity: int
-            - unit_price: Decimal
-        notes: Optional notes for this dispensing
-    
-    Returns:
-        dict with dispensing_id, status, and details
-    
-    Raises:
-        ValueError: If prescription not found, not finalized, or insufficient stock
+    Validate one prescription's dispensing request against its loaded items
+    and batches. Raises ValueError; nothing is changed until the plan is applied.
     """
-    
-    if isinstance(prescription_id, str):
-        prescription_id = uuid.UUID(prescription_id)
-    
-    # Get prescription
-    rx = db.query(Prescription).filter(
-        Prescription.id == prescription_id,
-        Prescription.hospital_id == hospital_id,
-        Prescription.is_deleted == False,
-    ).first()
-    
-    if not rx:
-        raise ValueError("Prescription not found")
-    
     if not rx.is_finalized:
         raise ValueError("Prescription must be finalized before dispensing")
-    
-    # Create pharmacy_dispensing record
-    dispensing = PharmacySale(
-        hospital_id=hospital_id,
-        invoice_number=_generate_dispensing_number(db, hospital_id),
-        patient_id=rx.patient_id,
-        sale_type="prescription",
-        status="dispensed",
-        created_by=user_id,  # Use created_by (which maps to dispensed_by in DB)
-        notes=notes,
-        created_at=datetime.now(timezone.utc),
-    )
-    db.add(dispensing)
-    db.flush()
-    
-    total_amount = Decimal("0")
-    tax_amount = Decimal("0")
-    processed_items_count = 0
-    skipped_items_count = 0
-    
-    seen_prescription_items: set[uuid.UUID] = set()
 
-    # Process each item
-    for item_data in items_to_dispense:
+    items_by_id = {item.id: item for item in rx_items}
+    state = {
+        item.id: {
+            "quantity": item.quantity,
+            "dispensed_quantity": item.dispensed_quantity,
+            "is_dispensed": item.is_dispensed,
+        }
+        for item in rx_items
+    }
+
+    def prescribed(item: PrescriptionItem, fallback: int) -> int:
+        # Some older prescriptions have null/0 quantity and rely on
+        # frequency+duration; the derived quantity is persisted.
+        qty = calculate_prescribed_quantity(
+            item.frequency, item.duration_value, item.duration_unit, state[item.id]["quantity"],
+        ) or 0
+        if qty <= 0:
+            qty = max(fallback, 1)
+        if not state[item.id]["quantity"] or state[item.id]["quantity"] <= 0:
+            state[item.id]["quantity"] = qty
+        return qty
+
+    seen: set[uuid.UUID] = set()
+    demands: list[StockDemand] = []
+    lines: list[tuple[PrescriptionItem, Decimal]] = []
+
+    for item_data in request.get("items") or []:
         prescription_item_id = item_data.get("prescription_item_id")
         medicine_id = item_data.get("medicine_id")
         batch_id = item_data.get("batch_id")
         quantity = item_data.get("quantity", 0)
-        requested_unit_price = Decimal(str(item_data.get("unit_price", 0)))
-        
         if not prescription_item_id or not medicine_id or not batch_id or quantity <= 0:
             continue
+        prescription_item_id = _as_uuid(prescription_item_id)
+        medicine_id = _as_uuid(medicine_id)
+        batch_id = _as_uuid(batch_id)
 
-        # Convert UUIDs
-        if isinstance(prescription_item_id, str):
-            prescription_item_id = uuid.UUID(prescription_item_id)
-        if isinstance(medicine_id, str):
-            medicine_id = uuid.UUID(medicine_id)
-        if isinstance(batch_id, str):
-            batch_id = uuid.UUID(batch_id)
-
-        if prescription_item_id in seen_prescription_items:
+        if prescription_item_id in seen:
             raise ValueError("Duplicate prescription item in dispensing request")
-        seen_prescription_items.add(prescription_item_id)
-
-        # Get prescription item
-        rx_item = db.query(PrescriptionItem).filter(
-            PrescriptionItem.id == prescription_item_id,
-            PrescriptionItem.prescription_id == prescription_id,
-        ).first()
+        seen.add(prescription_item_id)
 
+        rx_item = items_by_id.get(prescription_item_id)
         if not rx_item:
             logger.warning(f"Prescription item {prescription_item_id} not found")
             continue
-
         if not rx_item.medicine_id:
             raise ValueError(f"Prescription item {rx_item.medicine_name} is missing medicine linkage")
-
         if rx_item.medicine_id != medicine_id:
             raise ValueError(
                 f"Medicine mismatch for {rx_item.medicine_name}. "
                 "Selected medicine does not match prescription item."
             )
 
-        # Validate quantity doesn't exceed prescribed quantity.
-        # Some older prescriptions may have null/0 quantity and rely on frequency+duration,
-        # so derive and persist a usable prescribed quantity before validating.
-        already_dispensed = rx_item.dispensed_quantity or 0
-        prescribed_qty = calculate_prescribed_quantity(
-            rx_item.frequency,
-            rx_item.duration_value,
-            rx_item.duration_unit,
-            rx_item.quantity,
-        ) or 0
-
-        if prescribed_qty <= 0:
-            # Last-resort fallback: allow current dispensing request to establish baseline.
-            prescribed_qty = max(already_dispensed + quantity, 1)
-
-        if not rx_item.quantity or rx_item.quantity <= 0:
-            rx_item.quantity = prescribed_qty
-
+        already_dispensed = state[rx_item.id]["dispensed_quantity"] or 0
+        # Last-resort fallback: the current request establishes the baseline.
+        prescribed_qty = prescribed(rx_item, already_dispensed + quantity)
         remaining_qty = prescribed_qty - already_dispensed
-
         if remaining_qty <= 0:
             logger.info(
                 f"Skipping {rx_item.medicine_name}: already fully dispensed "
                 f"(Prescribed: {prescribed_qty}, Dispensed: {already_dispensed})"
             )
             continue
-        
         if quantity > remaining_qty:
             raise ValueError(
                 f"Cannot dispense {quantity} units of {rx_item.medicine_name}. "
                 f"Prescribed: {prescribed_qty}, Already dispensed: {already_dispensed}, "
                 f"Remaining: {remaining_qty}. You can dispense less than or equal to {remaining_qty} units."
             )
-        
-        if quantity <= 0:
-            logger.warning(f"Skipping item {rx_item.medicine_name} with quantity {quantity}")
-            continue
-
-        # Get batch and validate stock
-        batch = db.query(MedicineBatch).filter(
-            MedicineBatch.id == batch_id,
-            MedicineBatch.medicine_id == medicine_id,
-            MedicineBatch.is_active == True,
-        ).first()
 
-        if not batch:
+        batch = batches.get(batch_id)
+        if not batch or batch.medicine_id != medicine_id:
             raise ValueError(f"Batch not found for medicine {rx_item.medicine_name}")
-
         if batch.expiry_date and batch.expiry_date < date.today():
             raise ValueError(
                 f"Selected batch {batch.batch_number} for {rx_item.medicine_name} is expired"
             )
 
-        # Allocate requested quantity from selected batch first, then other FEFO batches.
-        remaining_to_allocate = quantity
-        batch_allocations: list[tuple[MedicineBatch, int]] = []
-
-        selected_alloc = min(batch.quantity or 0, remaining_to_allocate)
-        if selected_alloc > 0:
-            batch_allocations.append((batch, selected_alloc))
-            remaining_to_allocate -= selected_alloc
-
-        if remaining_to_allocate > 0:
-            additional_batches = db.query(MedicineBatch).filter(
-                MedicineBatch.medicine_id == medicine_id,
-                MedicineBatch.is_active == True,
-                MedicineBatch.id != batch.id,
-                MedicineBatch.quantity > 0,
-                MedicineBatch.expiry_date >= date.today(),
-            ).order_by(MedicineBatch.expiry_date.asc()).all()
-
-            for extra_batch in additional_batches:
-                if remaining_to_allocate <= 0:
-                    break
-                alloc_qty = min(extra_batch.quantity or 0, remaining_to_allocate)
-                if alloc_qty <= 0:
-                    continue
-                batch_allocations.append((extra_batch, alloc_qty))
-                remaining_to_allocate -= alloc_qty
-
-        if remaining_to_allocate > 0:
-            total_available = sum(alloc_qty for _, alloc_qty in batch_allocations)
-            raise ValueError(
-                f"Insufficient stock for {rx_item.medicine_name}. "
-                f"Required: {quantity}, Available across active batches: {total_available}"
-            )
-
-        for alloc_batch, alloc_qty in batch_allocations:
-            # Reduce batch stock
-            alloc_batch.quantity -= alloc_qty
-
-            # Use actual batch selling price for accurate financial traceability.
-            effective_unit_price = Decimal(str(alloc_batch.selling_price)) if alloc_batch.selling_price is not None else requested_unit_price
-            line_total = effective_unit_price * alloc_qty
-            total_amount += line_total
-
-            # Create one dispensing line per allocated batch.
-            dispensing_item = PharmacySaleItem(
-                sale_id=dispensing.id,
-                prescription_item_id=prescription_item_id,
-                medicine_id=medicine_id,
-                batch_id=alloc_batch.id,
-                quantity=alloc_qty,
-                unit_price=effective_unit_price,
-                total_price=line_total,
-                medicine_name=rx_item.medicine_name,
-            )
-            db.add(dispensing_item)
-
-        processed_items_count += 1
+        # Taken from the selected batch first, then other FEFO batches.
+        demands.append(StockDemand(medicine_id, quantity, batch.id))
+        lines.append((rx_item, Decimal(str(item_data.get("unit_price", 0)))))
 
-        # Update prescription item dispensing status
-        rx_item.dispensed_quantity = already_dispensed + quantity
-        
-        # Cap at prescribed quantity and mark as dispensed if complete
-        if rx_item.dispensed_quantity >= prescribed_qty:
-            rx_item.is_dispensed = True
-            rx_item.dispensed_quantity = prescribed_qty  # Ensure exact match
+        dispensed_quantity = already_dispensed + quantity
+        if dispensed_quantity >= prescribed_qty:
+            state[rx_item.id].update(is_dispensed=True, dispensed_quantity=prescribed_qty)
         else:
             # Item remains open unless explicitly skipped in this request.
-            pass
+            state[rx_item.id]["dispensed_quantity"] = dispensed_quantity
 
-        logger.info(
-            f"Dispensed {quantity} of {rx_item.medicine_name} "
-            f"(Batch: {batch.batch_number}, Remaining prescribed: {prescribed_qty - rx_item.dispensed_quantity})"
-        )
-    # Apply explicit skipped items to close remaining undispensed lines.
-    for skipped in (skipped_items or []):
+    # Explicit skips close remaining undispensed lines.
+    items_skipped = 0
+    for skipped in request.get("skipped_items") or []:
         skipped_item_id = skipped.get("prescription_item_id")
         if not skipped_item_id:
             continue
-
-        if isinstance(skipped_item_id, str):
-            skipped_item_id = uuid.UUID(skipped_item_id)
-
-        rx_item = db.query(PrescriptionItem).filter(
-            PrescriptionItem.id == skipped_item_id,
-            PrescriptionItem.prescription_id == prescription_id,
-        ).first()
-
+        rx_item = items_by_id.get(_as_uuid(skipped_item_id))
         if not rx_item:
             raise ValueError(f"Skipped item {skipped_item_id} not found in prescription")
+        prescribed_qty = prescribed(rx_item, state[rx_item.id]["dispensed_quantity"] or 0)
+        if not state[rx_item.id]["is_dispensed"]:
+            state[rx_item.id].update(is_dispensed=True, dispensed_quantity=prescribed_qty)
+            items_skipped += 1
 
-        prescribed_qty = calculate_prescribed_quantity(
-            rx_item.frequency,
-            rx_item.duration_value,
-            rx_item.duration_unit,
-            rx_item.quantity,
-        ) or 0
-        if prescribed_qty <= 0:
-            prescribed_qty = max(rx_item.dispensed_quantity or 0, 1)
-
-        if not rx_item.quantity or rx_item.quantity <= 0:
-            rx_item.quantity = prescribed_qty
-
-        if not rx_item.is_dispensed:
-            rx_item.is_dispensed = True
-            rx_item.dispensed_quantity = prescribed_qty
-            skipped_items_count += 1
-
-    # Validate strict no-partial workflow: every line must be closed by dispense or skip.
-    all_rx_items = db.query(PrescriptionItem).filter(
-        PrescriptionItem.prescription_id == prescription_id
-    ).all()
+    # Strict no-partial workflow: every line must be closed by dispense or skip.
     open_items: list[str] = []
-
-    for rx_item in all_rx_items:
+    for rx_item in rx_items:
+        current = state[rx_item.id]
+        current_dispensed = current["dispensed_quantity"] or 0
         prescribed_qty = calculate_prescribed_quantity(
-            rx_item.frequency,
-            rx_item.duration_value,
-            rx_item.duration_unit,
-            rx_item.quantity,
+            rx_item.frequency, rx_item.duration_value, rx_item.duration_unit, current["quantity"],
         ) or 0
-        current_dispensed = rx_item.dispensed_quantity or 0
-
         if prescribed_qty <= 0:
             prescribed_qty = max(current_dispensed, 1)
-
-        if not rx_item.is_dispensed and current_dispensed < prescribed_qty:
+        if not current["is_dispensed"] and current_dispensed < prescribed_qty:
             open_items.append(rx_item.medicine_name)
-
     if open_items:
         raise ValueError(
             "Partial dispensing is not allowed. Dispense or skip all remaining items before confirming. "
             f"Open items: {', '.join(open_items[:3])}{'...' if len(open_items) > 3 else ''}"
         )
-    
-    if processed_items_count == 0:
-        # All items were skipped (out of stock, patient refused, etc.).
-        # Keep prescription pending/completed and preserve the audit trail
-        # on the dispensing record notes, without mutating doctor clinical notes.
-        all_already_done = all(
-            (i.is_dispensed or (i.dispensed_quantity or 0) >= (i.quantity or 0))
-            for i in db.query(PrescriptionItem).filter(
-                PrescriptionItem.prescription_id == prescription_id
-            ).all()
+
+    if demands:
+        status = "dispensed"
+    else:
+        # All items were skipped (out of stock, patient refused, etc.): no
+        # dispensing record; the prescription stays open unless already done.
+        all_done = all(
+            s["is_dispensed"] or (s["dispensed_quantity"] or 0) >= (s["quantity"] or 0)
+            for s in state.values()
         )
-        if all_already_done:
-            rx.status = "dispensed"
-        else:
-            rx.status = "finalized"
-        # Remove the empty dispensing record we created — nothing was actually dispensed
-        db.delete(dispensing)
-        db.commit()
-        return {
-            "dispensing_id": None,
-            "dispensing_number": None,
-            "prescription_id": str(prescription_id),
-            "prescription_number": rx.prescription_number,
-            "status": rx.status,
-            "total_amount": 0.0,
-            "items_dispensed": 0,
+        status = "dispensed" if all_done else "finalized"
+
+    item_changes = {}
+    for rx_item in rx_items:
+        changed = {
+            key: value for key, value in state[rx_item.id].items()
+            if getattr(rx_item, key) != value
         }
+        if changed:
+            item_changes[rx_item] = changed
+    return _DispensePlan(
+        rx, request.get("notes"), demands, lines, item_changes, len(demands), items_skipped, status,
+    )
+
+
+def _allocate_plans(
+    db: Session,
+    plans: list[_DispensePlan],
+    failures: list[tuple[dict, Prescription, str]],
+    all_or_nothing: bool,
+) -> tuple[list[_DispensePlan], list[BatchAllocation], list[tuple[_DispensePlan, PrescriptionItem, Decimal]]]:
+    """
+    Allocate every plan's lines in one statement. A plan that falls short
+    is failed and the rest retried, unless all_or_nothing, which stops there.
+    """
+    while True:
+        owners = [(plan, rx_item, price) for plan in plans for rx_item, price in plan.lines]
+        try:
+            allocations = allocate_stock(db, [d for plan in plans for d in plan.demands])
+            return plans, allocations, owners
+        except InsufficientStock as e:
+            short: dict[uuid.UUID, str] = {}
+            for shortage in e.shortages:
+                plan, rx_item, _ = owners[shortage.line]
+                short.setdefault(plan.rx.id, (
+                    f"Insufficient stock for {rx_item.medicine_name}. "
+                    f"Required: {shortage.requested}, Available across active batches: {shortage.available}"
+                ))
+            for plan in plans:
+                if plan.rx.id in short:
+                    failures.append(({"prescription_id": plan.rx.id}, plan.rx, short[plan.rx.id]))
+            if all_or_nothing:
+                return [], [], []
+            plans = [plan for plan in plans if plan.rx.id not in short]
+
+
+def _dispense_batch(
+    db: Session,
+    hospital_id: uuid.UUID,
+    user_id: uuid.UUID,
+    requests: list[dict],
+    all_or_nothing: bool,
+) -> tuple[list[dict], list[tuple[dict, Optional[Prescription], str]]]:
+    """
+    Validate, allocate and write the dispensing of several prescriptions.
+
+    Prescriptions, items and batches are loaded with one query each, all
+    lines are allocated in one statement, and the dispensing records, their
+    items and the stock movements are written with one multi-row INSERT
+    each. Returns (results, failures) without committing; with
+    all_or_nothing nothing is written once anything fails.
+    """
+    requests = [{**r, "prescription_id": _as_uuid(r["prescription_id"])} for r in requests]
+    if len({r["prescription_id"] for r in requests}) != len(requests):
+        raise ValueError("A prescription can only be dispensed once per request")
+
+    prescriptions, items_by_rx, batches = _load_for_dispensing(db, hospital_id, requests)
+    plans: list[_DispensePlan] = []
+    failures: list[tuple[dict, Optional[Prescription], str]] = []
+    for request in requests:
+        rx = prescriptions.get(request["prescription_id"])
+        try:
+            if not rx:
+                raise ValueError("Prescription not found")
+            plans.append(_plan_dispense(rx, items_by_rx[rx.id], batches, request))
+        except ValueError as e:
+            failures.append((request, rx, str(e)))
+            if all_or_nothing:
+                return [], failures
+
+    plans, allocations, owners = _allocate_plans(db, plans, failures, all_or_nothing)
+    if not plans:
+        return [], failures
+
+    sales: dict[uuid.UUID, dict] = {}
+    for plan in plans:
+        if plan.demands:
+            sales[plan.rx.id] = {
+                "id": uuid.uuid4(),
+                "hospital_id": hospital_id,
+                "invoice_number": _generate_dispensing_number(db, hospital_id),
+                "patient_id": plan.rx.patient_id,
+                "sale_type": "prescription",
+                "status": "dispensed",
+                "subtotal": Decimal("0"),
+                "tax_amount": Decimal("0"),
+                "total_amount": Decimal("0"),
+                "created_by": user_id,
+                "notes": plan.notes,
+                "created_at": datetime.now(timezone.utc),
+            }
+
+    sale_items: list[dict] = []
+    movements: list[dict] = []
+    for allocation, balance_after in zip(allocations, balances_after(db, allocations)):
+        plan, rx_item, requested_unit_price = owners[allocation.line]
+        sale = sales[plan.rx.id]
+        # Use actual batch selling price for accurate financial traceability.
+        unit_price = (
+            Decimal(str(allocation.selling_price))
+            if allocation.selling_price is not None else requested_unit_price
+        )
+        line_total = unit_price * allocation.quantity
+        sale["subtotal"] += line_total
+        sale["total_amount"] += line_total
+        # One dispensing line per allocated batch.
+        sale_items.append({
+            "sale_id": sale["id"],
+            "prescription_item_id": rx_item.id,
+            "medicine_id": allocation.medicine_id,
+            "batch_id": allocation.batch_id,
+            "quantity": allocation.quantity,
+            "unit_price": unit_price,
+            "total_price": line_total,
+            "medicine_name": rx_item.medicine_name,
+        })
+        movements.append({
+            "hospital_id": hospital_id,
+            "item_type": "medicine",
+            "item_id": allocation.medicine_id,
+            "batch_id": allocation.batch_id,
+            "movement_type": "dispensing",
+            "reference_type": "dispensing",
+            "reference_id": sale["id"],
+            "quantity": -allocation.quantity,
+            "balance_after": balance_after,
+            "unit_cost": unit_price,
+            "notes": f"Prescription dispensing: {sale['invoice_number']}",
+            "performed_by": user_id,
+        })
 
-    # Update prescription status
-    rx.status = "dispensed"
+    if sales:
+        db.execute(insert(PharmacySale), list(sales.values()))
+        db.execute(insert(PharmacySaleItem), sale_items)
+        db.execute(insert(StockMovement), movements)
+
+    results = []
+    for plan in plans:
+        for rx_item, changes in plan.item_changes.items():
+            for key, value in changes.items():
+                setattr(rx_item, key, value)
+        plan.rx.status = plan.status
+        sale = sales.get(plan.rx.id)
+        results.append({
+            "dispensing_id": str(sale["id"]) if sale else None,
+            "dispensing_number": sale["invoice_number"] if sale else None,
+            "prescription_id": str(plan.rx.id),
+            "prescription_number": plan.rx.prescription_number,
+            "status": plan.status,
+            "total_amount": float(sale["total_amount"]) if sale else 0.0,
+            "items_dispensed": plan.items_dispensed,
+            "items_skipped": plan.items_skipped,
+        })
+    return results, failures
+
+
+def dispense_prescription(
+    db: Session,
+    prescription_id: str | uuid.UUID,
+    hospital_id: uuid.UUID,
+    user_id: uuid.UUID,
+    items_to_dispense: list[dict],
+    skipped_items: Optional[list[dict]] = None,
+    notes: Optional[str] = None,
+) -> dict:
+    """
+    Dispense medicines from a prescription.
+    
+    Args:
+        prescription_id: Prescription UUID
+        hospital_id: Hospital UUID
+        user_id: Pharmacist user UUID
+        items_to_dispense: List of dicts with:
+            - prescription_item_id: UUID
+            - medicine_id: UUID
+            - batch_id: UUID
+            - quantity: int
+            - unit_price: Decimal
+        notes: Optional notes for this dispensing
     
-    # Update dispensing totals
-    dispensing.total_amount = total_amount
-    dispensing.subtotal = total_amount
-    dispensing.tax_amount = tax_amount
-    dispensing.net_amount = total_amount
+    Returns:
+        dict with dispensing_id, status, and details
     
+    Raises:
+        ValueError: If prescription not found, not finalized, or insufficient stock
+    """
+    results, failures = _dispense_batch(db, hospital_id, user_id, [{
+        "prescription_id": prescription_id,
+        "items": items_to_dispense,
+        "skipped_items": skipped_items,
+        "notes": notes,
+    }], all_or_nothing=True)
+    if failures:
+        raise ValueError(failures[0][2])
     db.commit()
-    db.refresh(dispensing)
-    
+
+    result = results[0]
     logger.info(
-        f"Dispensing completed for prescription {rx.prescription_number}. "
-        f"Status: {rx.status}"
+        f"Dispensing completed for prescription {result['prescription_number']}. "
+        f"Status: {result['status']}"
+    )
+    return result
+
+
+def dispense_prescriptions(
+    db: Session,
+    hospital_id: uuid.UUID,
+    user_id: uuid.UUID,
+    requests: list[dict],
+    mode: str = "per_prescription",
+) -> dict:
+    """
+    Dispense several prescriptions in one request.
+
+    Each request is a dict with prescription_id, items, skipped_items and
+    notes, as for dispense_prescription(). In "per_prescription" mode a
+    prescription that fails validation or is short of stock is reported
+    under "failed" and the others are dispensed; in "all_or_nothing" mode
+    any failure raises ValueError and nothing is dispensed. Committed once.
+    """
+    if mode not in DISPENSE_MODES:
+        raise ValueError(f"Unknown dispensing mode: {mode}")
+    results, failures = _dispense_batch(
+        db, hospital_id, user_id, requests, all_or_nothing=mode == "all_or_nothing",
+    )
+    if failures and mode == "all_or_nothing":
+        request, rx, message = failures[0]
+        label = rx.prescription_number if rx else request["prescription_id"]
+        raise ValueError(f"Prescription {label}: {message}")
+    db.commit()
+
+    logger.info(
+        f"Bulk dispensing: {len(results)} prescriptions dispensed, {len(failures)} failed"
     )
-    
     return {
-        "dispensing_id": str(dispensing.id),
-        "dispensing_number": dispensing.invoice_number,
-        "prescription_id": str(prescription_id),
-        "prescription_number": rx.prescription_number,
-        "status": rx.status,
-        "total_amount": float(total_amount),
-        "items_dispensed": processed_items_count,
-        "items_skipped": skipped_items_count,
+        "mode": mode,
+        "dispensed": results,
+        "failed": [
+            {
+                "prescription_id": str(request["prescription_id"]),
+                "prescription_number": rx.prescription_number if rx else None,
+                "error": message,
+            }
+            for request, rx, message in failures
+        ],
     }
 
 
@@ -834,16 +1015,17 @@ def get_available_batches(
     """
     Get available batches for a medicine (FEFO - First Expiry First Out).
     
-    Returns batches sorted by expiry date (earliest first).
+    Returns the batches allocate_stock() can dispense from (active, in stock,
+    not expired), sorted by expiry date (earliest first).
     """
     if isinstance(medicine_id, str):
         medicine_id = uuid.UUID(medicine_id)
     
     batches = db.query(MedicineBatch).filter(
         MedicineBatch.medicine_id == medicine_id,
-        MedicineBatch.is_active == True,
         MedicineBatch.quantity >= min_quantity,
-    ).order_by(MedicineBatch.expiry_date.asc()).all()
+        *usable_batch_conditions(),
+    ).order_by(MedicineBatch.expiry_date.asc(), MedicineBatch.created_at.asc()).all()
     
     result = []
     for batch in batches:
@@ -0,0 +1,189 @@
+"""
+Document number service — allocates PO/GRN/ADJ/CC numbers, pharmacy invoice
+numbers and prescription numbers from counters in document_sequences.
+
+Each counter row is advanced with a single upsert ... RETURNING in its own
+short transaction, so the row lock is held for one statement rather than
+for the caller's whole transaction. Every worker process reserves a block
+of numbers per round trip (settings.DOCUMENT_NUMBER_BLOCK_SIZE) and hands
+them out from memory.
+
+Numbers are unique and increase within a worker, but are not gap-free:
+numbers left in a block when a worker stops, or used by a transaction that
+rolls back, are not reissued. Strictly gap-free numbering needs the counter
+locked until the document commits, which serializes every writer.
+
+Usage:
+    from .document_number_service import next_daily_number
+
+    po_number = next_daily_number(db, "PO", PurchaseOrder.po_number)   # PO-20260311-0001
+"""
+import logging
+import threading
+import uuid
+from datetime import date
+from typing import Callable, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.document_sequence import DocumentSequence
+from ..models.hospital_settings import HospitalSettings
+from ..models.pharmacy import PharmacySale
+
+logger = logging.getLogger(__name__)
+
+SeedFn = Callable[[Connection], int]
+ReserveHook = Callable[[Connection, int], None]
+
+
+def _reserve(
+    engine: Engine,
+    scope: str,
+    period: str,
+    count: int,
+    seed: Optional[SeedFn] = None,
+    on_reserve: Optional[ReserveHook] = None,
+) -> tuple[int, int]:
+    """Advance one counter by `count` in its own transaction; return the reserved range."""
+    with engine.begin() as conn:
+        last = conn.execute(
+            update(DocumentSequence)
+            .where(DocumentSequence.scope == scope, DocumentSequence.period == period)
+            .values(last_value=DocumentSequence.last_value + count, updated_at=func.now())
+            .returning(DocumentSequence.last_value)
+        ).scalar()
+        if last is None:
+            # First number for this scope/period: start after any numbers
+            # already issued by the previous generator.
+            start = int(seed(conn)) if seed else 0
+            stmt = pg_insert(DocumentSequence).values(scope=scope, period=period, last_value=start + count)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[DocumentSequence.scope, DocumentSequence.period],
+                set_={"last_value": DocumentSequence.last_value + count, "updated_at": func.now()},
+            )
+            last = conn.execute(stmt.returning(DocumentSequence.last_value)).scalar()
+        if on_reserve:
+            on_reserve(conn, last)
+    return last - count + 1, last
+
+
+class DocumentNumberAllocator:
+    """
+    Per-process block cache over document_sequences counters.
+    Blocks and locks are kept per scope, holding only the current period's
+    block, so daily counters do not leave an entry behind for every past day.
+    """
+
+    def __init__(self, block_size: int = 20):
+        self.block_size = max(1, block_size)
+        self._blocks: dict[str, tuple[str, list[int]]] = {}  # scope -> (period, [next, last])
+        self._locks: dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.reservations = 0
+
+    def _lock_for(self, scope: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(scope, threading.Lock())
+
+    def next_value(
+        self,
+        engine: Engine,
+        scope: str,
+        period: str = "",
+        seed: Optional[SeedFn] = None,
+        on_reserve: Optional[ReserveHook] = None,
+    ) -> int:
+        """
+        Next number for (scope, period), reserving a new block when the cached
+        one runs out or belongs to another period (its unused numbers are skipped).
+        """
+        with self._lock_for(scope):
+            cached_period, block = self._blocks.get(scope, (None, None))
+            if block is None or cached_period != period or block[0] > block[1]:
+                first, last = _reserve(engine, scope, period, self.block_size, seed, on_reserve)
+                block = [first, last]
+                self._blocks[scope] = (period, block)
+                self.reservations += 1
+            value = block[0]
+            block[0] += 1
+            return value
+
+    def reset(self) -> None:
+        """Drop cached blocks (their unused numbers are skipped)."""
+        with self._locks_guard:
+            self._blocks.clear()
+
+
+document_number_allocator = DocumentNumberAllocator(settings.DOCUMENT_NUMBER_BLOCK_SIZE)
+
+
+def _engine_for(db: Session) -> Engine:
+    bind = db.get_bind()
+    return getattr(bind, "engine", bind)
+
+
+# ── Number formats ─────────────────────────────────────────────────────────
+
+def next_daily_number(db: Session, prefix: str, number_column) -> str:
+    """Next per-day number like PO-20260311-0001 for the given prefix."""
+    today = date.today().strftime("%Y%m%d")
+
+    def seed(conn: Connection) -> int:
+        last = conn.execute(
+            select(number_column)
+            .where(number_column.like(f"{prefix}-{today}-%"))
+            .order_by(number_column.desc())
+            .limit(1)
+        ).scalar()
+        return int(last.split("-")[-1]) if last else 0
+
+    seq = document_number_allocator.next_value(_engine_for(db), prefix, today, seed)
+    return f"{prefix}-{today}-{seq:04d}"
+
+
+def next_pharmacy_invoice_number(db: Session, hospital_id: uuid.UUID) -> str:
+    """Next counter-sale number for a hospital: INV-000001."""
+
+    def seed(conn: Connection) -> int:
+        return conn.execute(
+            select(func.count(PharmacySale.id)).where(PharmacySale.hospital_id == hospital_id)
+        ).scalar() or 0
+
+    seq = document_number_allocator.next_value(_engine_for(db), f"INV:{hospital_id}", "", seed)
+    return f"INV-{seq:06d}"
+
+
+def next_prescription_number(db: Session, hospital_id: uuid.UUID) -> str:
+    """
+    Next prescription number: {PREFIX}-{YY}-{NNNNN}, e.g. RX-26-00001.
+    Continues from hospital_settings.prescription_sequence, which is kept at
+    the highest reserved number so settings screens stay accurate.
+    """
+    hospital_settings = db.query(
+        HospitalSettings.prescription_prefix,
+    ).filter(HospitalSettings.hospital_id == hospital_id).first()
+    if not hospital_settings:
+        logger.warning(f"No hospital settings found for hospital_id={hospital_id}, using defaults")
+    prefix = (hospital_settings.prescription_prefix if hospital_settings else None) or "RX"
+
+    def seed(conn: Connection) -> int:
+        return conn.execute(
+            select(HospitalSettings.prescription_sequence).where(HospitalSettings.hospital_id == hospital_id)
+        ).scalar() or 0
+
+    def record_high_water(conn: Connection, last: int) -> None:
+        conn.execute(
+            update(HospitalSettings)
+            .where(HospitalSettings.hospital_id == hospital_id)
+            .values(prescription_sequence=func.greatest(func.coalesce(HospitalSettings.prescription_sequence, 0), last))
+        )
+
+    seq = document_number_allocator.next_value(
+        _engine_for(db), f"RX:{hospital_id}", "", seed, record_high_water,
+    )
+    year_code = date.today().strftime("%y")
+    return f"{prefix}-{year_code}-{seq:05d}"
@@ -1,44 +1,38 @@
 import logging
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from sqlalchemy.orm import Session
+
 from ..config import settings
+from ..core.background_jobs import enqueue, job_handler
+from ..core.smtp_pool import smtp_pool
 
 logger = logging.getLogger(__name__)
 
+SEND_EMAIL_JOB = "email.send"
+
+
+def _mime(to_email: str, subject: str, html_body: str) -> str:
+    msg = MIMEMultipart("alternative")
+    msg["Subject"] = subject
+    msg["From"] = f"{settings.SMTP_FROM_NAME} <{settings.SMTP_FROM_EMAIL}>"
+    msg["To"] = to_email
+    msg.attach(MIMEText(html_body, "html"))
+    return msg.as_string()
+
 
 def send_email(to_email: str, subject: str, html_body: str) -> bool:
-    """Send an email using SMTP"""
+    """Send an email over a pooled SMTP session"""
     if not settings.SMTP_HOST:
         logger.warning("SMTP not configured (SMTP_HOST is empty). Email not sent to %s.", to_email)
         return False
 
-    try:
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
-        msg["From"] = f"{settings.SMTP_FROM_NAME} <{settings.SMTP_FROM_EMAIL}>"
-        msg["To"] = to_email
-
-        html_part = MIMEText(html_body, "html")
-        msg.attach(html_part)
-
-        if settings.SMTP_PORT == 465:
-            server = smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30)
-        else:
-            server = smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=30)
-            server.starttls()
-
-        if settings.SMTP_USERNAME and settings.SMTP_PASSWORD:
-            server.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
-
-        server.sendmail(settings.SMTP_FROM_EMAIL, to_email, msg.as_string())
-        server.quit()
-
-        logger.info(f"Email sent successfully to {to_email}")
-        return True
-    except Exception as e:
-        logger.error(f"Failed to send email to {to_email}: {e}", exc_info=True)
+    error = smtp_pool.send(settings.SMTP_FROM_EMAIL, to_email, _mime(to_email, subject, html_body))
+    if error:
+        logger.error(f"Failed to send email to {to_email}: {error}")
         return False
+    logger.info(f"Email sent successfully to {to_email}")
+    return True
 
 
 def send_password_email(
@@ -363,3 +357,34 @@ def send_waitlist_notification_email(
     </html>
     """
     return send_email(to_email, subject, html_body)
+
+
+# ── Queued delivery ────────────────────────────────────────────────────────
+# Emails that must not hold up the request are queued as background jobs and
+# rendered and sent by the job runner, which retries SMTP failures. Only the
+# template name and its fields are stored, so never queue credentials.
+
+EMAIL_TEMPLATES = {
+    "patient_id_card": send_patient_id_card_email,
+    "appointment_confirmation": send_appointment_confirmation_email,
+    "appointment_cancellation": send_appointment_cancellation_email,
+    "appointment_reschedule": send_appointment_reschedule_email,
+    "appointment_reminder": send_appointment_reminder_email,
+    "waitlist_notification": send_waitlist_notification_email,
+}
+
+
+def queue_email(db: Session, template: str, hospital_id=None, **fields) -> None:
+    """Queue one of EMAIL_TEMPLATES; it is sent after the caller commits."""
+    if template not in EMAIL_TEMPLATES:
+        raise ValueError(f"Unknown email template: {template}")
+    enqueue(db, SEND_EMAIL_JOB, {"template": template, "fields": fields}, hospital_id=hospital_id)
+
+
+@job_handler(SEND_EMAIL_JOB)
+def _send_queued_email(db: Session, payload: dict) -> None:
+    if not settings.SMTP_HOST:
+        logger.warning(f"SMTP not configured (SMTP_HOST is empty). Dropping queued {payload['template']} email.")
+        return
+    if not EMAIL_TEMPLATES[payload["template"]](**payload["fields"]):
+        raise RuntimeError(f"SMTP delivery of {payload['template']} email failed")
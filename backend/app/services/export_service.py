@@ -0,0 +1,82 @@
+"""
+Streaming CSV / NDJSON exports.
+
+Each export is a column query (plain tuples, no ORM objects) built by the
+owning service from the same filters as its list endpoint. stream_export()
+runs it on its own session — the request's session is closed before a
+StreamingResponse body is sent — through a server-side cursor
+(yield_per), and emits the rows in chunks. Memory stays flat whatever the
+row count.
+
+Usage in a router:
+    return StreamingResponse(
+        stream_export(lambda db: svc.export_invoices(db, hospital_id, ...), fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers=export_headers("invoices", fmt),
+    )
+"""
+import csv
+import io
+import json
+import logging
+import uuid
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Callable, Iterator
+
+from sqlalchemy.orm import Query, Session
+
+from ..database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT_PATTERN = "^(csv|ndjson)$"
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",  # Starlette appends "; charset=utf-8"
+    "ndjson": "application/x-ndjson",
+}
+YIELD_PER = 1000
+
+
+def _json_value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+def export_headers(name: str, fmt: str) -> dict:
+    filename = f"{name}-{date.today():%Y%m%d}.{fmt}"
+    return {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+
+def stream_export(build_query: Callable[[Session], Query], fmt: str) -> Iterator[str]:
+    """Yield the rows of build_query(db) as CSV (with header) or NDJSON, YIELD_PER rows per chunk."""
+    db = SessionLocal()
+    try:
+        query = build_query(db)
+        columns = [c["name"] for c in query.column_descriptions]
+        result = db.execute(query.statement, execution_options={"yield_per": YIELD_PER})
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if fmt == "csv" else None
+        if writer:
+            writer.writerow(columns)
+        rows = 0
+        for partition in result.partitions():
+            if writer:
+                # csv writes None as "" and str() for everything else
+                writer.writerows(partition)
+            else:
+                for row in partition:
+                    buffer.write(json.dumps(dict(zip(columns, map(_json_value, row)))))
+                    buffer.write("\n")
+            rows += len(partition)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+        logger.info(f"Exported {rows} rows as {fmt}")
+    finally:
+        db.close()
@@ -1,24 +1,19 @@
 import os
-import shutil
 import logging
+from concurrent.futures import Future
 from sqlalchemy.orm import Session
 from typing import Optional
 from fastapi import UploadFile, HTTPException, status
+from ..core.image_pool import image_processor
 from ..models.user import Hospital  # Use new Hospital model from user.py
 from ..schemas.hospital import HospitalCreate, HospitalUpdate
 
 logger = logging.getLogger(__name__)
 
-UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "uploads", "hospital")
-ALLOWED_LOGO_EXTENSIONS = {".jpg", ".jpeg", ".png", ".svg"}
+ALLOWED_LOGO_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".svg"}
 MAX_LOGO_SIZE_MB = 2
 
 
-def ensure_upload_directory():
-    if not os.path.exists(UPLOAD_DIR):
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-
 def get_hospital_details(db: Session) -> Optional[Hospital]:
     return db.query(Hospital).first()
 
@@ -84,8 +79,8 @@ def delete_logo(db: Session) -> dict:
     return {"message": "Logo deleted successfully"}
 
 
-def save_hospital_logo(db: Session, file: UploadFile, user_id: int) -> dict:
-    ensure_upload_directory()
+def process_hospital_logo(file: UploadFile) -> Future:
+    """Validate a logo upload and queue it for processing; Future of the logo URL."""
     file_ext = os.path.splitext(file.filename)[1].lower()
     if file_ext not in ALLOWED_LOGO_EXTENSIONS:
         raise HTTPException(
@@ -100,22 +95,26 @@ def save_hospital_logo(db: Session, file: UploadFile, user_id: int) -> dict:
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"File too large. Maximum size: {MAX_LOGO_SIZE_MB}MB",
         )
+    content = file.file.read()
+    if file_ext == ".svg":
+        # Vector logos are already small and scale freely; stored as uploaded
+        done: Future = Future()
+        done.set_result(image_processor.store("logo", content, "svg"))
+        return done
+    return image_processor.submit("logo", content)
+
+
+def save_hospital_logo(db: Session, logo_url: str) -> dict:
+    """Point the hospital at a processed logo (process_hospital_logo) and drop the old one."""
     db_hospital = db.query(Hospital).first()
     if not db_hospital:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hospital not found")
-    filename = f"hospital_logo{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to save logo: {str(e)}",
-        )
-    db_hospital.logo_url = f"/uploads/hospital/{filename}"
+    old_logo_url = db_hospital.logo_url
+    db_hospital.logo_url = logo_url
     db.commit()
     db.refresh(db_hospital)
+    if old_logo_url and old_logo_url != logo_url:
+        image_processor.discard(old_logo_url)
     return {"logo_url": db_hospital.logo_url, "message": "Logo uploaded successfully"}
 
 
@@ -5,11 +5,13 @@ stock movements, adjustments, and cycle counts.
 import logging
 import math
 import uuid
+from collections import defaultdict
 from datetime import date, datetime, timedelta
-from typing import Optional
+from decimal import Decimal
+from typing import Iterable, Optional
 
-from sqlalchemy import func, or_
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session, aliased, joinedload
 
 from ..models.inventory import (
     Supplier, PurchaseOrder, PurchaseOrderItem,
@@ -28,72 +30,93 @@ from ..schemas.inventory import (
     StockAdjustmentCreate, StockAdjustmentUpdate,
     CycleCountCreate, CycleCountUpdate,
 )
+from ..core.background_jobs import enqueue, job_handler
+from .document_number_service import next_daily_number
+from .stock_allocation_service import InsufficientStock, StockDemand, allocate_stock
+from .stock_movement_service import last_balance
+from .stock_summary_service import get_medicine_stock, get_medicine_stock_map
+from ..utils.pagination import count_query, keyset_page, resolve_count_mode
 
 logger = logging.getLogger(__name__)
 
+NOTIFY_USERS_JOB = "inventory.notify_users"
 
-# ─── Helpers ────────────────────────────────────────────────────────────────
-
-def _resolve_item_name(db: Session, item_type: str, item_id: uuid.UUID) -> Optional[str]:
-    """Look up a medicine / optical product name for display."""
-    if item_type == "medicine":
-        med = db.query(Medicine.name).filter(Medicine.id == item_id).first()
-        return med[0] if med else None
-    if item_type == "optical_product":
-        optical = db.query(OpticalProduct.name).filter(OpticalProduct.id == item_id).first()
-        return optical[0] if optical else None
-    return None
-
-
-def _resolve_item_name_with_fallback(
-    db: Session,
-    item_type: str,
-    item_id: uuid.UUID,
-    hospital_id: Optional[uuid.UUID] = None,
-    unit_price: Optional[float] = None,
-) -> Optional[str]:
-    """Resolve item name by id first, then by unique hospital price match for legacy rows."""
-    by_id = _resolve_item_name(db, item_type, item_id)
-    if by_id:
-        return by_id
-    if hospital_id is None or unit_price is None:
-        return None
-
-    if item_type == "medicine":
-        by_purchase_price = db.query(Medicine.name).filter(
-            Medicine.hospital_id == hospital_id,
-            Medicine.is_active == True,
-            Medicine.purchase_price == unit_price,
-        ).limit(2).all()
-        if len(by_purchase_price) == 1:
-            return by_purchase_price[0][0]
-
-        by_selling_price = db.query(Medicine.name).filter(
-            Medicine.hospital_id == hospital_id,
-            Medicine.is_active == True,
-            Medicine.selling_price == unit_price,
-        ).limit(2).all()
-        if len(by_selling_price) == 1:
-            return by_selling_price[0][0]
-
-    if item_type == "optical_product":
-        by_purchase_price = db.query(OpticalProduct.name).filter(
-            OpticalProduct.hospital_id == hospital_id,
-            OpticalProduct.is_active == True,
-            OpticalProduct.purchase_price == unit_price,
-        ).limit(2).all()
-        if len(by_purchase_price) == 1:
-            return by_purchase_price[0][0]
 
-        by_selling_price = db.query(OpticalProduct.name).filter(
-            OpticalProduct.hospital_id == hospital_id,
-            OpticalProduct.is_active == True,
-            OpticalProduct.selling_price == unit_price,
-        ).limit(2).all()
-        if len(by_selling_price) == 1:
-            return by_selling_price[0][0]
+# ─── Helpers ────────────────────────────────────────────────────────────────
 
-    return None
+ItemKey = tuple[str, uuid.UUID]
+LineKey = tuple[str, uuid.UUID, Decimal]
+
+_ITEM_CATALOGS = {"medicine": Medicine, "optical_product": OpticalProduct}
+
+
+def resolve_item_names(db: Session, items: Iterable[ItemKey]) -> dict[ItemKey, str]:
+    """Display names for (item_type, item_id) pairs, one query per catalog (medicines, optical products)."""
+    ids_by_type: dict[str, set[uuid.UUID]] = defaultdict(set)
+    for item_type, item_id in items:
+        if item_type in _ITEM_CATALOGS and item_id is not None:
+            ids_by_type[item_type].add(item_id)
+    names: dict[ItemKey, str] = {}
+    for item_type, ids in ids_by_type.items():
+        model = _ITEM_CATALOGS[item_type]
+        for item_id, name in db.query(model.id, model.name).filter(model.id.in_(ids)):
+            names[(item_type, item_id)] = name
+    return names
+
+
+def resolve_line_item_names(
+    db: Session, hospital_id: uuid.UUID, lines: Iterable[LineKey],
+) -> dict[LineKey, str]:
+    """
+    Names for (item_type, item_id, unit_price) PO / GRN lines. Lines whose id
+    matches no catalog item (legacy rows) fall back to the hospital's one
+    active item with that purchase price, else that selling price — one
+    extra query per catalog, only when there are such lines.
+    """
+    lines = set(lines)
+    by_id = resolve_item_names(db, ((item_type, item_id) for item_type, item_id, _ in lines))
+    names: dict[LineKey, str] = {}
+    unresolved: dict[str, set[Decimal]] = defaultdict(set)
+    for line in lines:
+        item_type, item_id, unit_price = line
+        if (item_type, item_id) in by_id:
+            names[line] = by_id[(item_type, item_id)]
+        elif item_type in _ITEM_CATALOGS and unit_price is not None:
+            unresolved[item_type].add(unit_price)
+
+    for item_type, prices in unresolved.items():
+        model = _ITEM_CATALOGS[item_type]
+        by_purchase: dict[Decimal, list[str]] = defaultdict(list)
+        by_selling: dict[Decimal, list[str]] = defaultdict(list)
+        rows = db.query(model.name, model.purchase_price, model.selling_price).filter(
+            model.hospital_id == hospital_id,
+            model.is_active == True,
+            or_(model.purchase_price.in_(prices), model.selling_price.in_(prices)),
+        )
+        for name, purchase_price, selling_price in rows:
+            by_purchase[purchase_price].append(name)
+            by_selling[selling_price].append(name)
+        for line in lines:
+            if line[0] != item_type or line in names:
+                continue
+            for candidates in (by_purchase.get(line[2], ()), by_selling.get(line[2], ())):
+                if len(candidates) == 1:
+                    names[line] = candidates[0]
+                    break
+    return names
+
+
+def _document_item_names(db: Session, documents) -> dict[LineKey, str]:
+    """Line item names for a batch of purchase orders / GRNs, resolved per hospital."""
+    lines_by_hospital: dict[uuid.UUID, set[LineKey]] = defaultdict(set)
+    for doc in documents:
+        lines_by_hospital[doc.hospital_id].update(
+            (it.item_type, it.item_id, it.unit_price) for it in doc.items
+        )
+    names: dict[LineKey, str] = {}
+    for hospital_id, lines in lines_by_hospital.items():
+        names.update(resolve_line_item_names(db, hospital_id, lines))
+    return names
 
 
 def _resolve_item_id(db: Session, item_type: str, item_id: str, item_name: Optional[str] = None) -> uuid.UUID:
@@ -147,29 +170,12 @@ def _resolve_item_id(db: Session, item_type: str, item_id: str, item_name: Optio
 
 def _generate_number(db: Session, prefix: str, model_class, number_field: str) -> str:
     """Generate the next sequential number like PO-20260311-0001."""
-    today = date.today().strftime("%Y%m%d")
-    pattern = f"{prefix}-{today}-%"
-    col = getattr(model_class, number_field)
-    last = (
-        db.query(col)
-        .filter(col.like(pattern))
-        .order_by(col.desc())
-        .first()
-    )
-    if last:
-        seq = int(last[0].split("-")[-1]) + 1
-    else:
-        seq = 1
-    return f"{prefix}-{today}-{seq:04d}"
+    return next_daily_number(db, prefix, getattr(model_class, number_field))
 
 
 def _get_medicine_batch_stock(db: Session, medicine_id: uuid.UUID) -> int:
-    """Single source of truth for medicine stock: sum of active batch quantities."""
-    total = db.query(func.coalesce(func.sum(MedicineBatch.quantity), 0)).filter(
-        MedicineBatch.medicine_id == medicine_id,
-        MedicineBatch.is_active == True,
-    ).scalar() or 0
-    return int(total)
+    """Medicine stock (sum of active batch quantities) from the maintained summary."""
+    return get_medicine_stock(db, medicine_id)
 
 
 def _apply_medicine_batch_delta(
@@ -192,13 +198,17 @@ def _apply_medicine_batch_delta(
         if not batch:
             raise ValueError("Specified batch not found for medicine")
 
-        new_qty = (batch.quantity or 0) + delta
-        if new_qty < 0:
-            raise ValueError("Adjustment would result in negative batch stock")
+        if delta < 0:
+            try:
+                allocate_stock(
+                    db, [StockDemand(medicine_id, -delta, batch.id, batch_only=True)], include_expired=True,
+                )
+            except InsufficientStock:
+                raise ValueError("Adjustment would result in negative batch stock") from None
+            return batch.id
 
-        if delta > 0:
-            batch.initial_quantity = (batch.initial_quantity or 0) + delta
-        batch.quantity = new_qty
+        batch.initial_quantity = (batch.initial_quantity or 0) + delta
+        batch.quantity = (batch.quantity or 0) + delta
         return batch.id
 
     # No batch specified: positive deltas go to a system-managed adjustment batch.
@@ -228,26 +238,13 @@ def _apply_medicine_batch_delta(
             db.flush()
         return batch.id
 
-    # No batch specified: negative deltas are consumed FEFO across active batches.
-    remaining = -delta
-    batches = db.query(MedicineBatch).filter(
-        MedicineBatch.medicine_id == medicine_id,
-        MedicineBatch.is_active == True,
-        MedicineBatch.quantity > 0,
-    ).order_by(MedicineBatch.expiry_date.asc(), MedicineBatch.created_at.asc()).all()
-
-    available = sum(int(b.quantity or 0) for b in batches)
-    if available < remaining:
-        raise ValueError("Insufficient stock across batches for adjustment")
-
-    for b in batches:
-        if remaining <= 0:
-            break
-        take = min(int(b.quantity or 0), remaining)
-        b.quantity = int(b.quantity or 0) - take
-        remaining -= take
-
-    return None
+    # No batch specified: negative deltas are consumed FEFO across active batches,
+    # expired ones included (write-offs).
+    try:
+        allocations = allocate_stock(db, [StockDemand(medicine_id, -delta)], include_expired=True)
+    except InsufficientStock:
+        raise ValueError("Insufficient stock across batches for adjustment") from None
+    return allocations[0].batch_id if len(allocations) == 1 else None
 
 
 def _paginate(total: int, page: int, limit: int) -> dict:
@@ -280,39 +277,57 @@ def _notify_hospital_users(
     extra_user_ids: Optional[list[uuid.UUID]] = None,
     exclude_user_ids: Optional[list[uuid.UUID]] = None,
 ) -> None:
-    """Create in-app notifications for selected active users in the same hospital."""
+    """Queue in-app notifications for selected active users in the same hospital."""
+    enqueue(db, NOTIFY_USERS_JOB, {
+        "hospital_id": hospital_id,
+        "title": title,
+        "message": message,
+        "notification_type": notification_type,
+        "priority": priority,
+        "reference_type": reference_type,
+        "reference_id": reference_id,
+        "role_names": role_names,
+        "extra_user_ids": extra_user_ids,
+        "exclude_user_ids": exclude_user_ids,
+    }, hospital_id=hospital_id)
+    db.commit()
+
+
+@job_handler(NOTIFY_USERS_JOB)
+def _deliver_hospital_notification(db: Session, payload: dict) -> None:
+    """Background job: resolve the recipients and insert their notifications."""
+    hospital_id = uuid.UUID(payload["hospital_id"])
     q = db.query(User.id).filter(
         User.hospital_id == hospital_id,
         User.is_active == True,
         User.is_deleted == False,
     )
-    if role_names:
+    if payload["role_names"]:
         q = q.join(UserRole, UserRole.user_id == User.id).join(Role, Role.id == UserRole.role_id).filter(
-            Role.name.in_(role_names),
+            Role.name.in_(payload["role_names"]),
             Role.is_active == True,
         )
 
     recipient_ids = {row[0] for row in q.distinct().all()}
-    if extra_user_ids:
-        recipient_ids.update(extra_user_ids)
-    if exclude_user_ids:
-        recipient_ids.difference_update(exclude_user_ids)
-
+    recipient_ids.update(uuid.UUID(u) for u in payload["extra_user_ids"] or ())
+    recipient_ids.difference_update(uuid.UUID(u) for u in payload["exclude_user_ids"] or ())
     if not recipient_ids:
         return
 
-    for user_id in recipient_ids:
-        db.add(Notification(
+    reference_id = uuid.UUID(payload["reference_id"]) if payload["reference_id"] else None
+    db.add_all(
+        Notification(
             hospital_id=hospital_id,
             user_id=user_id,
-            title=title,
-            message=message,
-            type=notification_type,
-            priority=priority,
-            reference_type=reference_type,
+            title=payload["title"],
+            message=payload["message"],
+            type=payload["notification_type"],
+            priority=payload["priority"],
+            reference_type=payload["reference_type"],
             reference_id=reference_id,
-        ))
-    db.commit()
+        )
+        for user_id in recipient_ids
+    )
 
 
 # ═══════════════════════════════════════════════════════════════════════════
@@ -450,7 +465,12 @@ def list_purchase_orders(
 ) -> dict:
     q = (
         db.query(PurchaseOrder)
-        .options(joinedload(PurchaseOrder.supplier), joinedload(PurchaseOrder.items))
+        .options(
+            joinedload(PurchaseOrder.supplier),
+            joinedload(PurchaseOrder.items),
+            joinedload(PurchaseOrder.creator),
+            joinedload(PurchaseOrder.approver),
+        )
         .filter(PurchaseOrder.hospital_id == hospital_id)
     )
     if status:
@@ -499,21 +519,17 @@ def update_purchase_order(
     return po
 
 
-def _format_po_response(po: PurchaseOrder, db: Session) -> dict:
+def _format_po_response(po: PurchaseOrder, db: Session, names: Optional[dict] = None) -> dict:
     """Build a PurchaseOrderResponse-compatible dict."""
+    if names is None:
+        names = _document_item_names(db, [po])
     items = []
     for it in po.items:
         items.append({
             "id": str(it.id),
             "item_type": it.item_type,
             "item_id": str(it.item_id),
-            "item_name": _resolve_item_name_with_fallback(
-                db,
-                it.item_type,
-                it.item_id,
-                po.hospital_id,
-                float(it.unit_price),
-            ),
+            "item_name": names.get((it.item_type, it.item_id, it.unit_price)),
             "quantity_ordered": it.quantity_ordered,
             "quantity_received": it.quantity_received or 0,
             "unit_price": float(it.unit_price),
@@ -538,6 +554,11 @@ def _format_po_response(po: PurchaseOrder, db: Session) -> dict:
     }
 
 
+def _format_po_responses(pos: list[PurchaseOrder], db: Session) -> list[dict]:
+    names = _document_item_names(db, pos)
+    return [_format_po_response(po, db, names) for po in pos]
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 #  GOODS RECEIPT NOTES
 # ═══════════════════════════════════════════════════════════════════════════
@@ -606,7 +627,13 @@ def list_grns(
 ) -> dict:
     q = (
         db.query(GoodsReceiptNote)
-        .options(joinedload(GoodsReceiptNote.supplier), joinedload(GoodsReceiptNote.items))
+        .options(
+            joinedload(GoodsReceiptNote.supplier),
+            joinedload(GoodsReceiptNote.items),
+            joinedload(GoodsReceiptNote.purchase_order),
+            joinedload(GoodsReceiptNote.creator),
+            joinedload(GoodsReceiptNote.verifier),
+        )
         .filter(GoodsReceiptNote.hospital_id == hospital_id)
     )
     if status:
@@ -689,18 +716,7 @@ def _process_grn_acceptance(db: Session, grn: GoodsReceiptNote):
         if accepted <= 0:
             continue
 
-        # Calculate current balance
-        last_movement = (
-            db.query(StockMovement)
-            .filter(
-                StockMovement.hospital_id == grn.hospital_id,
-                StockMovement.item_type == item.item_type,
-                StockMovement.item_id == item.item_id,
-            )
-            .order_by(StockMovement.created_at.desc())
-            .first()
-        )
-        current_balance = last_movement.balance_after if last_movement else 0
+        current_balance = last_balance(db, grn.hospital_id, item.item_type, item.item_id)
 
         movement = StockMovement(
             hospital_id=grn.hospital_id,
@@ -787,20 +803,16 @@ def _update_po_receipt_status(db: Session, po_id: uuid.UUID):
     db.commit()
 
 
-def _format_grn_response(grn: GoodsReceiptNote, db: Session) -> dict:
+def _format_grn_response(grn: GoodsReceiptNote, db: Session, names: Optional[dict] = None) -> dict:
+    if names is None:
+        names = _document_item_names(db, [grn])
     items = []
     for it in grn.items:
         items.append({
             "id": str(it.id),
             "item_type": it.item_type,
             "item_id": str(it.item_id),
-            "item_name": _resolve_item_name_with_fallback(
-                db,
-                it.item_type,
-                it.item_id,
-                grn.hospital_id,
-                float(it.unit_price),
-            ),
+            "item_name": names.get((it.item_type, it.item_id, it.unit_price)),
             "batch_number": it.batch_number,
             "manufactured_date": it.manufactured_date,
             "expiry_date": it.expiry_date,
@@ -832,16 +844,22 @@ def _format_grn_response(grn: GoodsReceiptNote, db: Session) -> dict:
     }
 
 
+def _format_grn_responses(grns: list[GoodsReceiptNote], db: Session) -> list[dict]:
+    names = _document_item_names(db, grns)
+    return [_format_grn_response(grn, db, names) for grn in grns]
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 #  STOCK MOVEMENTS
 # ═══════════════════════════════════════════════════════════════════════════
 
-def list_stock_movements(
+def _filtered_stock_movements(
     db: Session, hospital_id: uuid.UUID,
-    page: int = 1, limit: int = 10,
     item_type: Optional[str] = None, item_id: Optional[str] = None,
     movement_type: Optional[str] = None,
-) -> dict:
+    date_from: Optional[date] = None, date_to: Optional[date] = None,
+):
+    """Stock movement query with the list / export filters applied."""
     q = db.query(StockMovement).filter(StockMovement.hospital_id == hospital_id)
     if item_type:
         q = q.filter(StockMovement.item_type == item_type)
@@ -849,10 +867,35 @@ def list_stock_movements(
         q = q.filter(StockMovement.item_id == uuid.UUID(item_id))
     if movement_type:
         q = q.filter(StockMovement.movement_type == movement_type)
-    total = q.count()
+    # Plain range bounds on created_at, so only the matching monthly partitions are scanned.
+    if date_from:
+        q = q.filter(StockMovement.created_at >= date_from)
+    if date_to:
+        q = q.filter(StockMovement.created_at < date_to + timedelta(days=1))
+    return q
+
+
+def list_stock_movements(
+    db: Session, hospital_id: uuid.UUID,
+    page: int = 1, limit: int = 10,
+    item_type: Optional[str] = None, item_id: Optional[str] = None,
+    movement_type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
+) -> dict:
+    q = _filtered_stock_movements(
+        db, hospital_id, item_type=item_type, item_id=item_id, movement_type=movement_type,
+    )
+    total = count_query(q, resolve_count_mode(cursor, count))
+    q = q.options(joinedload(StockMovement.performer))
+    if cursor is not None:
+        movements, next_cursor = keyset_page(q, StockMovement.created_at, StockMovement.id, cursor, limit)
+        pages = _paginate(total, page, limit) if total is not None else {
+            "total": None, "page": page, "limit": limit, "total_pages": None,
+        }
+        return {**pages, "data": movements, "next_cursor": next_cursor}
     movements = (
-        q.options(joinedload(StockMovement.performer))
-        .order_by(StockMovement.created_at.desc())
+        q.order_by(StockMovement.created_at.desc())
         .offset((page - 1) * limit)
         .limit(limit)
         .all()
@@ -860,12 +903,49 @@ def list_stock_movements(
     return {**_paginate(total, page, limit), "data": movements}
 
 
-def _format_movement_response(m: StockMovement, db: Session) -> dict:
+def export_stock_movements(db: Session, hospital_id: uuid.UUID, **filters):
+    """Column query for the stock movement export, oldest first; takes the _filtered_stock_movements filters."""
+    performer = aliased(User)
+    item_name = func.coalesce(
+        select(Medicine.name).where(
+            StockMovement.item_type == "medicine", Medicine.id == StockMovement.item_id,
+        ).correlate(StockMovement).scalar_subquery(),
+        select(OpticalProduct.name).where(
+            StockMovement.item_type == "optical_product", OpticalProduct.id == StockMovement.item_id,
+        ).correlate(StockMovement).scalar_subquery(),
+    )
+    batch = aliased(MedicineBatch)
+    return (
+        _filtered_stock_movements(db, hospital_id, **filters)
+        .outerjoin(performer, StockMovement.performed_by == performer.id)
+        .outerjoin(batch, StockMovement.batch_id == batch.id)
+        .with_entities(
+            StockMovement.created_at,
+            StockMovement.movement_type,
+            StockMovement.item_type,
+            StockMovement.item_id,
+            item_name.label("item_name"),
+            batch.batch_number,
+            StockMovement.quantity,
+            StockMovement.balance_after,
+            StockMovement.unit_cost,
+            StockMovement.reference_type,
+            StockMovement.reference_id,
+            StockMovement.notes,
+            func.nullif(func.concat_ws(" ", performer.first_name, performer.last_name), "").label("performed_by_name"),
+        )
+        .order_by(StockMovement.created_at, StockMovement.id)
+    )
+
+
+def _format_movement_response(m: StockMovement, db: Session, names: Optional[dict] = None) -> dict:
+    if names is None:
+        names = resolve_item_names(db, [(m.item_type, m.item_id)])
     return {
         "id": str(m.id),
         "item_type": m.item_type,
         "item_id": str(m.item_id),
-        "item_name": _resolve_item_name(db, m.item_type, m.item_id),
+        "item_name": names.get((m.item_type, m.item_id)),
         "batch_id": str(m.batch_id) if m.batch_id else None,
         "movement_type": m.movement_type,
         "reference_type": m.reference_type,
@@ -879,6 +959,11 @@ def _format_movement_response(m: StockMovement, db: Session) -> dict:
     }
 
 
+def _format_movement_responses(movements: list[StockMovement], db: Session) -> list[dict]:
+    names = resolve_item_names(db, ((m.item_type, m.item_id) for m in movements))
+    return [_format_movement_response(m, db, names) for m in movements]
+
+
 def get_stock_level(
     db: Session, hospital_id: uuid.UUID,
     item_type: str, item_id: uuid.UUID,
@@ -887,17 +972,7 @@ def get_stock_level(
     if item_type == "medicine":
         return _get_medicine_batch_stock(db, item_id)
 
-    last = (
-        db.query(StockMovement.balance_after)
-        .filter(
-            StockMovement.hospital_id == hospital_id,
-            StockMovement.item_type == item_type,
-            StockMovement.item_id == item_id,
-        )
-        .order_by(StockMovement.created_at.desc())
-        .first()
-    )
-    return last[0] if last else 0
+    return last_balance(db, hospital_id, item_type, item_id)
 
 
 def get_low_stock_items(db: Session, hospital_id: uuid.UUID, limit: int = 20) -> list:
@@ -908,19 +983,7 @@ def get_low_stock_items(db: Session, hospital_id: uuid.UUID, limit: int = 20) ->
         .all()
     )
 
-    med_ids = [m.id for m in medicines]
-    stock_map: dict[uuid.UUID, int] = {}
-    if med_ids:
-        rows = (
-            db.query(MedicineBatch.medicine_id, func.coalesce(func.sum(MedicineBatch.quantity), 0))
-            .filter(
-                MedicineBatch.medicine_id.in_(med_ids),
-                MedicineBatch.is_active == True,
-            )
-            .group_by(MedicineBatch.medicine_id)
-            .all()
-        )
-        stock_map = {row[0]: int(row[1]) for row in rows}
+    stock_map = get_medicine_stock_map(db, [m.id for m in medicines])
 
     low_stock = []
     for med in medicines:
@@ -957,12 +1020,13 @@ def get_expiring_items(db: Session, hospital_id: uuid.UUID, days: int = 90) -> l
         .limit(50)
         .all()
     )
+    names = resolve_item_names(db, ((it.item_type, it.item_id) for it in items))
     results = []
     for it in items:
         results.append({
             "item_id": str(it.item_id),
             "item_type": it.item_type,
-            "item_name": _resolve_item_name(db, it.item_type, it.item_id),
+            "item_name": names.get((it.item_type, it.item_id)),
             "batch_number": it.batch_number,
             "expiry_date": it.expiry_date,
             "quantity": it.quantity_accepted or it.quantity_received,
@@ -1082,13 +1146,15 @@ def approve_stock_adjustment(
     return adj
 
 
-def _format_adjustment_response(adj: StockAdjustment, db: Session) -> dict:
+def _format_adjustment_response(adj: StockAdjustment, db: Session, names: Optional[dict] = None) -> dict:
+    if names is None:
+        names = resolve_item_names(db, [(adj.item_type, adj.item_id)])
     return {
         "id": str(adj.id),
         "adjustment_number": adj.adjustment_number,
         "item_type": adj.item_type,
         "item_id": str(adj.item_id),
-        "item_name": _resolve_item_name(db, adj.item_type, adj.item_id),
+        "item_name": names.get((adj.item_type, adj.item_id)),
         "batch_id": str(adj.batch_id) if adj.batch_id else None,
         "adjustment_type": adj.adjustment_type,
         "quantity": adj.quantity,
@@ -1100,6 +1166,11 @@ def _format_adjustment_response(adj: StockAdjustment, db: Session) -> dict:
     }
 
 
+def _format_adjustment_responses(adjustments: list[StockAdjustment], db: Session) -> list[dict]:
+    names = resolve_item_names(db, ((a.item_type, a.item_id) for a in adjustments))
+    return [_format_adjustment_response(a, db, names) for a in adjustments]
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 #  CYCLE COUNTS
 # ═══════════════════════════════════════════════════════════════════════════
@@ -1245,14 +1316,16 @@ def update_cycle_count(
     return cc
 
 
-def _format_cycle_count_response(cc: CycleCount, db: Session) -> dict:
+def _format_cycle_count_response(cc: CycleCount, db: Session, names: Optional[dict] = None) -> dict:
+    if names is None:
+        names = resolve_item_names(db, ((it.item_type, it.item_id) for it in cc.items))
     items = []
     for it in cc.items:
         items.append({
             "id": str(it.id),
             "item_type": it.item_type,
             "item_id": str(it.item_id),
-            "item_name": _resolve_item_name(db, it.item_type, it.item_id),
+            "item_name": names.get((it.item_type, it.item_id)),
             "batch_id": str(it.batch_id) if it.batch_id else None,
             "system_quantity": it.system_quantity,
             "counted_quantity": it.counted_quantity,
@@ -1272,6 +1345,11 @@ def _format_cycle_count_response(cc: CycleCount, db: Session) -> dict:
     }
 
 
+def _format_cycle_count_responses(counts: list[CycleCount], db: Session) -> list[dict]:
+    names = resolve_item_names(db, ((it.item_type, it.item_id) for cc in counts for it in cc.items))
+    return [_format_cycle_count_response(cc, db, names) for cc in counts]
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 #  DASHBOARD STATS
 # ═══════════════════════════════════════════════════════════════════════════
@@ -1359,12 +1437,9 @@ def get_medicine_for_invoice(db: Session, medicine_id: uuid.UUID) -> Optional[di
     
     tax_config = None
     if medicine.tax_config_id:
-        from ..models.tax_config import TaxConfiguration
-        tax = db.query(TaxConfiguration).filter(
-            TaxConfiguration.id == medicine.tax_config_id,
-            TaxConfiguration.is_active == True,
-        ).first()
-        if tax:
+        from .tax_service import get_cached_tax_config
+        tax = get_cached_tax_config(db, medicine.hospital_id, medicine.tax_config_id)
+        if tax and tax.is_active:
             tax_config = {
                 "id": str(tax.id),
                 "name": tax.name,
@@ -11,23 +11,26 @@ from math import ceil
 from datetime import date
 from typing import Optional
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, func
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy import or_, func, tuple_
 
 from ..models.pharmacy import MedicineBatch
 from ..models.prescription import Medicine
 from ..models.invoice import Invoice, InvoiceItem
 from ..models.inventory import StockMovement
-from ..models.hospital_settings import HospitalSettings
 from ..models.patient import Patient
 from ..models.appointment import Appointment, Doctor
-from ..models.tax_config import TaxConfiguration
 from ..schemas.invoice import (
     InvoiceCreate, InvoiceUpdate, InvoiceResponse,
     InvoiceListItem, PaginatedInvoiceResponse,
     InvoiceItemCreate, InvoiceItemResponse,
 )
-from ..services.tax_service import calculate_item_tax
+from ..services.settings_service import get_cached_hospital_settings
+from ..services.tax_service import calculate_item_tax, get_cached_tax_config
+from ..services.stock_allocation_service import (
+    InsufficientStock, StockDemand, allocate_stock, balances_after,
+)
+from ..utils.pagination import count_query, keyset_page, resolve_count_mode
 
 logger = logging.getLogger(__name__)
 
@@ -195,7 +198,7 @@ def _update_invoice_status(db: Session, invoice: Invoice) -> None:
 
 
 def _is_opd_credit_allowed(db: Session, hospital_id: uuid.UUID) -> bool:
-    settings = db.query(HospitalSettings).filter(HospitalSettings.hospital_id == hospital_id).first()
+    settings = get_cached_hospital_settings(db, hospital_id)
     if not settings:
         # Safe default for legacy setups: keep existing behavior unless explicitly disabled.
         return True
@@ -252,21 +255,18 @@ def get_invoice_by_id(db: Session, invoice_id: str | uuid.UUID) -> Optional[Invo
     return _load_invoice(db, invoice_id)
 
 
-def list_invoices(
+def _filtered_invoices(
     db: Session,
     hospital_id: uuid.UUID,
-    page: int = 1,
-    limit: int = 10,
     search: Optional[str] = None,
     status: Optional[str] = None,
     invoice_type: Optional[str] = None,
     patient_id: Optional[str] = None,
-) -> PaginatedInvoiceResponse:
-    query = (
-        db.query(Invoice)
-        .options(joinedload(Invoice.patient))
-        .filter(Invoice.hospital_id == hospital_id, Invoice.is_deleted == False)
-    )
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """Invoice query with the list / export filters applied."""
+    query = db.query(Invoice).filter(Invoice.hospital_id == hospital_id, Invoice.is_deleted == False)
     if status:
         query = query.filter(Invoice.status == status)
     if invoice_type:
@@ -286,8 +286,35 @@ def list_invoices(
                 func.concat(Patient.first_name, " ", Patient.last_name).ilike(f"%{search}%"),
             )
         )
-    total = query.count()
-    rows = query.order_by(Invoice.created_at.desc()).offset((page - 1) * limit).limit(limit).all()
+    if date_from:
+        query = query.filter(Invoice.invoice_date >= date_from)
+    if date_to:
+        query = query.filter(Invoice.invoice_date <= date_to)
+    return query
+
+
+def list_invoices(
+    db: Session,
+    hospital_id: uuid.UUID,
+    page: int = 1,
+    limit: int = 10,
+    search: Optional[str] = None,
+    status: Optional[str] = None,
+    invoice_type: Optional[str] = None,
+    patient_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
+) -> PaginatedInvoiceResponse:
+    query = _filtered_invoices(
+        db, hospital_id, search=search, status=status,
+        invoice_type=invoice_type, patient_id=patient_id,
+    ).options(joinedload(Invoice.patient))
+    total = count_query(query, resolve_count_mode(cursor, count))
+    next_cursor = None
+    if cursor is not None:
+        rows, next_cursor = keyset_page(query, Invoice.created_at, Invoice.id, cursor, limit)
+    else:
+        rows = query.order_by(Invoice.created_at.desc()).offset((page - 1) * limit).limit(limit).all()
 
     items = []
     for inv in rows:
@@ -314,7 +341,35 @@ def list_invoices(
         total=total,
         page=page,
         limit=limit,
-        pages=ceil(total / limit) if total else 1,
+        pages=None if total is None else (ceil(total / limit) if total else 1),
+        next_cursor=next_cursor,
+    )
+
+
+def export_invoices(db: Session, hospital_id: uuid.UUID, **filters):
+    """Column query for the invoice export, oldest first; takes the _filtered_invoices filters."""
+    patient = aliased(Patient)
+    return (
+        _filtered_invoices(db, hospital_id, **filters)
+        .outerjoin(patient, Invoice.patient_id == patient.id)
+        .with_entities(
+            Invoice.invoice_number,
+            Invoice.invoice_date,
+            Invoice.invoice_type,
+            Invoice.status,
+            patient.patient_reference_number,
+            func.concat_ws(" ", patient.first_name, patient.last_name).label("patient_name"),
+            Invoice.subtotal,
+            Invoice.discount_amount,
+            Invoice.tax_amount,
+            Invoice.total_amount,
+            Invoice.paid_amount,
+            Invoice.balance_amount,
+            Invoice.currency,
+            Invoice.due_date,
+            Invoice.created_at,
+        )
+        .order_by(Invoice.created_at, Invoice.id)
     )
 
 
@@ -373,6 +428,7 @@ def _deduct_invoice_medicine_stock(db: Session, invoice: Invoice) -> None:
         )
         return
 
+    lines = []
     for line in invoice.items:
         if line.item_type != "medicine":
             continue
@@ -393,42 +449,61 @@ def _deduct_invoice_medicine_stock(db: Session, invoice: Invoice) -> None:
                 f"Medicine line quantity must be whole number for stock deduction (item {line.id})"
             )
 
-        medicine_id = line.reference_id
-        remaining = int(qty_decimal)
-
         if not (line.batch_number or "").strip():
             raise ValueError(
                 f"Medicine line item {line.id} missing batch_number; cannot deduct stock"
             )
+        lines.append((line, int(qty_decimal)))
+
+    if not lines:
+        return
 
-        batch = db.query(MedicineBatch).filter(
-            MedicineBatch.medicine_id == medicine_id,
-            MedicineBatch.batch_number == line.batch_number,
+    batches = {
+        (medicine_id, batch_number): (batch_id, expiry_date)
+        for batch_id, medicine_id, batch_number, expiry_date in db.query(
+            MedicineBatch.id, MedicineBatch.medicine_id, MedicineBatch.batch_number, MedicineBatch.expiry_date,
+        ).filter(
+            tuple_(MedicineBatch.medicine_id, MedicineBatch.batch_number).in_(
+                [(line.reference_id, line.batch_number) for line, _ in lines]
+            ),
             MedicineBatch.is_active == True,
             MedicineBatch.is_expired == False,
-        ).first()
-        if not batch:
+        )
+    }
+    demands = []
+    for line, quantity in lines:
+        batch_id, expiry_date = batches.get((line.reference_id, line.batch_number), (None, None))
+        if not batch_id:
             raise ValueError(
                 f"Batch '{line.batch_number}' not found for medicine line item {line.id}"
             )
-
-        available = int(batch.quantity or 0)
-        if remaining > available:
+        if expiry_date < date.today():
             raise ValueError(
-                f"Insufficient stock in batch {line.batch_number}: requested {remaining}, available {available}"
+                f"Batch '{line.batch_number}' for medicine line item {line.id} expired on {expiry_date}"
             )
+        demands.append(StockDemand(line.reference_id, quantity, batch_id, batch_only=True))
+
+    # Every line's batch is locked and decremented in one statement.
+    try:
+        allocations = allocate_stock(db, demands)
+    except InsufficientStock as e:
+        shortage = e.shortages[0]
+        raise ValueError(
+            f"Insufficient stock in batch {lines[shortage.line][0].batch_number}: "
+            f"requested {shortage.requested}, available {shortage.available}"
+        ) from None
 
-        batch.quantity = available - remaining
-        balance_after = _get_medicine_total_stock(db, medicine_id)
+    for allocation, balance_after in zip(allocations, balances_after(db, allocations)):
+        line = lines[allocation.line][0]
         db.add(StockMovement(
             hospital_id=invoice.hospital_id,
             item_type="medicine",
-            item_id=medicine_id,
-            batch_id=batch.id,
+            item_id=allocation.medicine_id,
+            batch_id=allocation.batch_id,
             movement_type="sale",
             reference_type="invoice_issue",
             reference_id=invoice.id,
-            quantity=-remaining,
+            quantity=-allocation.quantity,
             balance_after=balance_after,
             unit_cost=line.unit_price,
             notes=f"Invoice issue {invoice.invoice_number}",
@@ -436,14 +511,6 @@ def _deduct_invoice_medicine_stock(db: Session, invoice: Invoice) -> None:
         ))
 
 
-def _get_medicine_total_stock(db: Session, medicine_id: uuid.UUID) -> int:
-    total = db.query(func.sum(MedicineBatch.quantity)).filter(
-        MedicineBatch.medicine_id == medicine_id,
-        MedicineBatch.is_active == True,
-    ).scalar() or 0
-    return int(total)
-
-
 def void_invoice(db: Session, invoice: Invoice) -> Invoice:
     if invoice.status in ("paid", "void"):
         raise ValueError(f"Cannot void an invoice with status '{invoice.status}'")
@@ -476,9 +543,7 @@ def _add_item_to_invoice(db: Session, invoice: Invoice, item_data: InvoiceItemCr
     # Resolve tax_rate from tax config if provided
     if item_data.tax_config_id:
         try:
-            tc = db.query(TaxConfiguration).filter(
-                TaxConfiguration.id == uuid.UUID(item_data.tax_config_id)
-            ).first()
+            tc = get_cached_tax_config(db, invoice.hospital_id, item_data.tax_config_id)
             if tc:
                 tax_rate = tc.rate_percentage
         except (ValueError, Exception):
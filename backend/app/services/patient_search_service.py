@@ -0,0 +1,72 @@
+"""
+Patient search — indexed lookup over patient name, phone and PRN.
+
+patients.search_vector is a generated tsvector (first/last name weighted A,
+PRN and phone weighted B) with a GIN index, so a search is one index scan
+instead of ILIKE '%term%' over five columns. Every word of the search must
+match the start of a word in the vector: "raj kum" finds "Rajesh Kumar",
+"98765" finds phones starting with 98765 and "HCM26" finds PRNs starting
+with HCM26. Text in the middle of a word ("jesh" in "Rajesh") does not match.
+Results are ranked with ts_rank, so name matches come before phone/PRN
+matches.
+
+Exact lookups skip the text index and use btree equality:
+  - a complete PRN (12 letters and digits)
+  - a phone number of 10+ digits (spaces, dashes, brackets and a leading
+    +country code are ignored)
+  - an email address (anything containing @), compared case-insensitively
+"""
+import re
+from typing import NamedTuple, Optional
+
+from sqlalchemy import false, func
+from sqlalchemy.sql.elements import ColumnElement
+
+from ..models.patient import Patient
+
+TS_CONFIG = "simple"
+
+_PRN_RE = re.compile(r"^(?=.*[A-Z])(?=.*\d)[A-Z\d]{12}$")
+_PHONE_RE = re.compile(r"^\+?[\d\s\-().]+$")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_PHONE_DIGITS = 10
+
+
+class PatientMatch(NamedTuple):
+    """WHERE clause for a search and the expression to rank its rows by (None for exact lookups)."""
+    condition: ColumnElement
+    rank: Optional[ColumnElement] = None
+
+
+def _prefix_tsquery(search: str) -> Optional[str]:
+    """'Raj kum' -> 'raj:* & kum:*'; None when the search has no words."""
+    words = _WORD_RE.findall(search.lower())
+    return " & ".join(f"{w}:*" for w in words) if words else None
+
+
+def build_patient_match(search: str) -> PatientMatch:
+    """Translate a free-text search into an indexed condition plus rank."""
+    term = search.strip()
+
+    if "@" in term:
+        return PatientMatch(func.lower(Patient.email) == term.lower())
+
+    if _PRN_RE.match(term.upper()):
+        return PatientMatch(Patient.patient_reference_number == term.upper())
+
+    if _PHONE_RE.match(term):
+        digits = re.sub(r"\D", "", term)
+        if len(digits) >= _PHONE_DIGITS:
+            # Stored numbers carry no country code; try the local part too.
+            candidates = {digits, digits[-_PHONE_DIGITS:]}
+            return PatientMatch(Patient.phone_number.in_(candidates))
+
+    tsquery = _prefix_tsquery(term)
+    if tsquery is None:
+        return PatientMatch(false())
+    query = func.to_tsquery(TS_CONFIG, tsquery)
+    return PatientMatch(
+        Patient.search_vector.op("@@")(query),
+        func.ts_rank(Patient.search_vector, query),
+    )
+
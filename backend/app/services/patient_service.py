@@ -3,7 +3,6 @@ Patient service — works with new hms_db UUID schema.
 """
 import uuid
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func
 from math import ceil
 from typing import Optional
 from ..config import settings
@@ -11,6 +10,8 @@ from ..models.patient import Patient
 from ..models.user import Hospital
 from ..schemas.patient import PatientCreate, PatientUpdate, PaginatedPatientResponse, PatientListItem
 from ..services.patient_id_service import generate_patient_id
+from ..services.patient_search_service import build_patient_match
+from ..utils.pagination import count_query, keyset_page, resolve_count_mode
 
 
 def generate_prn(db: Session, hospital_id: uuid.UUID, gender: str = "Unknown") -> str:
@@ -86,47 +87,17 @@ def list_patients(
     status: Optional[str] = None,
     sort_by: Optional[str] = None,
     sort_order: str = 'desc',
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
 ) -> PaginatedPatientResponse:
     query = db.query(Patient).filter(Patient.is_active == True, Patient.is_deleted == False)
     if hospital_id:
         query = query.filter(Patient.hospital_id == hospital_id)
-    if search:
-        search = search.strip()
-        # Full-name concat match (e.g. "Alex Johnson")
-        full_name = func.concat(Patient.first_name, ' ', Patient.last_name)
-        # Only include email in search when the term looks like an email (contains @)
-        # This prevents domain-only searches like 'gmail' from matching unintended patients
-        include_email = '@' in search
-        base_conditions = [
-            Patient.first_name.ilike(f"%{search}%"),
-            Patient.last_name.ilike(f"%{search}%"),
-            Patient.phone_number.ilike(f"%{search}%"),
-            Patient.patient_reference_number.ilike(f"%{search}%"),
-            full_name.ilike(f"%{search}%"),
-        ]
-        if include_email:
-            base_conditions.append(Patient.email.ilike(f"%{search}%"))
-        search_filter = or_(*base_conditions)
-        # Multi-word: each word must match at least one field
-        words = search.split()
-        if len(words) > 1:
-            per_word_filters = []
-            for word in words:
-                w = word.strip()
-                if not w:
-                    continue
-                word_conditions = [
-                    Patient.first_name.ilike(f"%{w}%"),
-                    Patient.last_name.ilike(f"%{w}%"),
-                    Patient.phone_number.ilike(f"%{w}%"),
-                    Patient.patient_reference_number.ilike(f"%{w}%"),
-                ]
-                if '@' in w:
-                    word_conditions.append(Patient.email.ilike(f"%{w}%"))
-                per_word_filters.append(or_(*word_conditions))
-            if per_word_filters:
-                search_filter = or_(search_filter, and_(*per_word_filters))
-        query = query.filter(search_filter)
+    search_rank = None
+    if search and search.strip():
+        match = build_patient_match(search)
+        query = query.filter(match.condition)
+        search_rank = match.rank
     # Server-side filters (applied before pagination — fixes empty page bug)
     if gender:
         query = query.filter(Patient.gender.ilike(gender))
@@ -137,7 +108,16 @@ def list_patients(
     if status:
         is_deleted = status == 'inactive'
         query = query.filter(Patient.is_deleted == is_deleted)
-    total = query.count()
+    total = count_query(query, resolve_count_mode(cursor, count))
+    if cursor is not None:
+        # Keyset mode: newest first, continuing after the cursor row
+        patients, next_cursor = keyset_page(query, Patient.created_at, Patient.id, cursor, limit)
+        return PaginatedPatientResponse(
+            total=total, page=page, limit=limit,
+            total_pages=ceil(total / limit) if total is not None and limit > 0 else None,
+            data=[PatientListItem.model_validate(p) for p in patients],
+            next_cursor=next_cursor,
+        )
     offset = (page - 1) * limit
     # Build ORDER BY — only allow known safe column names to prevent injection
     _sortable = {
@@ -146,9 +126,13 @@ def list_patients(
         'first_name': Patient.first_name,
         'patient_reference_number': Patient.patient_reference_number,
     }
-    sort_col = _sortable.get(sort_by, Patient.created_at)
-    order_clause = sort_col.asc() if sort_order == 'asc' else sort_col.desc()
-    patients = query.order_by(order_clause).offset(offset).limit(limit).all()
+    if search_rank is not None and sort_by in (None, 'relevance'):
+        # Best matches first when searching without an explicit sort
+        order_clauses = [search_rank.desc(), Patient.created_at.desc()]
+    else:
+        sort_col = _sortable.get(sort_by, Patient.created_at)
+        order_clauses = [sort_col.asc() if sort_order == 'asc' else sort_col.desc()]
+    patients = query.order_by(*order_clauses).offset(offset).limit(limit).all()
     total_pages = ceil(total / limit) if limit > 0 else 0
     return PaginatedPatientResponse(
         total=total, page=page, limit=limit, total_pages=total_pages,
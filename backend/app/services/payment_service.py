@@ -10,12 +10,13 @@ from math import ceil
 from datetime import date, datetime, timedelta, timezone
 from typing import Optional
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_, func
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy import or_, func, select
 
 from ..models.payment import Payment
 from ..models.invoice import Invoice
 from ..models.patient import Patient
+from ..models.refund import Refund
 from ..schemas.payment import (
     PaymentCreate, PaymentResponse, PaymentListItem, PaginatedPaymentResponse
 )
@@ -125,27 +126,18 @@ def record_payment(
     return payment
 
 
-def list_payments(
+def _filtered_payments(
     db: Session,
     hospital_id: uuid.UUID,
-    page: int = 1,
-    limit: int = 10,
     search: Optional[str] = None,
     payment_mode: Optional[str] = None,
     invoice_id: Optional[str] = None,
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     date_range: Optional[str] = None,
-) -> PaginatedPaymentResponse:
-    query = (
-        db.query(Payment)
-        .options(
-            joinedload(Payment.invoice),
-            joinedload(Payment.patient),
-            joinedload(Payment.refunds),
-        )
-        .filter(Payment.hospital_id == hospital_id)
-    )
+):
+    """Payment query with the list / export filters applied."""
+    query = db.query(Payment).filter(Payment.hospital_id == hospital_id)
     if payment_mode:
         query = query.filter(Payment.payment_mode == payment_mode)
     if invoice_id:
@@ -191,6 +183,29 @@ def list_payments(
                 query = query.filter(Payment.payment_date <= date.fromisoformat(date_to))
             except ValueError:
                 pass
+    return query
+
+
+def list_payments(
+    db: Session,
+    hospital_id: uuid.UUID,
+    page: int = 1,
+    limit: int = 10,
+    search: Optional[str] = None,
+    payment_mode: Optional[str] = None,
+    invoice_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    date_range: Optional[str] = None,
+) -> PaginatedPaymentResponse:
+    query = _filtered_payments(
+        db, hospital_id, search=search, payment_mode=payment_mode, invoice_id=invoice_id,
+        date_from=date_from, date_to=date_to, date_range=date_range,
+    ).options(
+        joinedload(Payment.invoice),
+        joinedload(Payment.patient),
+        joinedload(Payment.refunds),
+    )
     total = query.count()
     rows = query.order_by(Payment.created_at.desc()).offset((page - 1) * limit).limit(limit).all()
 
@@ -232,5 +247,38 @@ def list_payments(
     )
 
 
+def export_payments(db: Session, hospital_id: uuid.UUID, **filters):
+    """Column query for the payment export, oldest first; takes the _filtered_payments filters."""
+    invoice = aliased(Invoice)
+    patient = aliased(Patient)
+    refunded = (
+        select(func.coalesce(func.sum(Refund.amount), 0))
+        .where(Refund.payment_id == Payment.id, Refund.status == "processed")
+        .correlate(Payment)
+        .scalar_subquery()
+    )
+    return (
+        _filtered_payments(db, hospital_id, **filters)
+        .outerjoin(invoice, Payment.invoice_id == invoice.id)
+        .outerjoin(patient, Payment.patient_id == patient.id)
+        .with_entities(
+            Payment.payment_number,
+            Payment.payment_date,
+            Payment.payment_time,
+            invoice.invoice_number,
+            patient.patient_reference_number,
+            func.concat_ws(" ", patient.first_name, patient.last_name).label("patient_name"),
+            Payment.amount,
+            refunded.label("refunded_amount"),
+            Payment.currency,
+            Payment.payment_mode,
+            Payment.payment_reference,
+            Payment.status,
+            Payment.created_at,
+        )
+        .order_by(Payment.created_at, Payment.id)
+    )
+
+
 def get_payment_by_id(db: Session, payment_id: str | uuid.UUID) -> Optional[Payment]:
     return _load_payment(db, payment_id)
@@ -0,0 +1,206 @@
+"""
+PDF documents: prescriptions, invoices and patient ID cards.
+
+Each *_pdf_data() function flattens what a layout draws into a JSON-safe
+dict (dates and amounts already formatted); the matching *_pdf() function
+hands it to core/pdf_pool.py and returns a Future of the cached file path.
+The layouts themselves live in utils/pdf_layouts.py and run in the worker
+processes.
+
+Finalized prescriptions remember their file path in core/print_cache.py,
+so a reprint skips enrich_prescription as well as the render.
+"""
+import os
+from concurrent.futures import Future
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..core.pdf_pool import pdf_renderer
+from ..core.print_cache import print_cache
+from ..models.invoice import Invoice
+from ..models.patient import Patient
+from ..models.prescription import Prescription
+from ..utils.prescription_translations import SUPPORTED_LANGUAGES, get_labels
+from .prescription_print_service import long_date
+from .prescription_service import enrich_prescription
+
+
+def _hospital() -> dict:
+    return {
+        "name": settings.HOSPITAL_NAME,
+        "address": settings.HOSPITAL_ADDRESS,
+        "city": settings.HOSPITAL_CITY,
+        "state": settings.HOSPITAL_STATE,
+        "country": settings.HOSPITAL_COUNTRY,
+        "pin_code": settings.HOSPITAL_PIN_CODE,
+        "phone": settings.HOSPITAL_PHONE,
+        "email": settings.HOSPITAL_EMAIL,
+        "website": settings.HOSPITAL_WEBSITE,
+    }
+
+
+def _money(value) -> str:
+    return f"{Decimal(value or 0):,.2f}"
+
+
+def _done(path: str) -> Future:
+    future: Future = Future()
+    future.set_result(path)
+    return future
+
+
+# ── Prescriptions ─────────────────────────────────────────────────────────
+
+def prescription_pdf_data(db: Session, rx: Prescription, lang: str = "en") -> dict:
+    if lang not in SUPPORTED_LANGUAGES or (lang != "en" and not settings.PDF_FONT_PATH):
+        lang = "en"  # the built-in PDF fonts only cover Latin script
+    d = enrich_prescription(db, rx)
+    items = [
+        {
+            "medicine_name": item["medicine_name"],
+            "generic_name": item.get("generic_name"),
+            "dosage": item.get("dosage"),
+            "frequency": item.get("frequency"),
+            "duration": (
+                f"{item['duration_value']} {item.get('duration_unit') or ''}".strip()
+                if item.get("duration_value") else "—"
+            ),
+            "instructions": item.get("instructions"),
+        }
+        for item in d["items"]
+    ]
+    return {
+        "font_path": settings.PDF_FONT_PATH,
+        "labels": get_labels(lang),
+        "hospital": _hospital(),
+        "rx": {
+            "prescription_number": d["prescription_number"],
+            "status": d["status"] or "",
+            "date": long_date(d["created_at"]),
+            "valid_until": long_date(d["valid_until"]),
+            "diagnosis": d["diagnosis"],
+            "clinical_notes": d["clinical_notes"],
+            "advice": d["advice"],
+            "patient_name": d["patient_name"],
+            "patient_reference_number": d["patient_reference_number"],
+            "patient_age": d["patient_age"],
+            "patient_gender": d["patient_gender"],
+            "patient_blood_group": d["patient_blood_group"],
+            "patient_known_allergies": d["patient_known_allergies"],
+            "doctor_name": d["doctor_name"],
+            "doctor_specialization": d["doctor_specialization"],
+            "doctor_registration_number": d["doctor_registration_number"],
+            "items": items,
+        },
+    }
+
+
+def prescription_pdf(db: Session, rx: Prescription, lang: str = "en") -> Future:
+    """Future of the prescription's PDF path."""
+    key = (rx.id, rx.updated_at, f"pdf:{lang}")
+    if rx.is_finalized:
+        path = print_cache.get(key)
+        if path is not None and os.path.exists(path):
+            return _done(path)
+
+    future = pdf_renderer.submit("prescription", prescription_pdf_data(db, rx, lang))
+    if rx.is_finalized:
+        def remember(done: Future) -> None:
+            if done.exception() is None:
+                print_cache.put(key, done.result())
+        future.add_done_callback(remember)
+    return future
+
+
+# ── Invoices ──────────────────────────────────────────────────────────────
+
+def invoice_print_fields(invoice: Invoice) -> dict:
+    """Invoice loaded with patient and items, flattened to the strings a print shows."""
+    patient = invoice.patient
+    items = sorted(invoice.items or [], key=lambda i: (i.display_order or 0, str(i.created_at)))
+    return {
+        "invoice_number": invoice.invoice_number,
+        "invoice_type": invoice.invoice_type or "",
+        "invoice_date": long_date(invoice.invoice_date),
+        "due_date": long_date(invoice.due_date),
+        "status": invoice.status or "",
+        "patient_name": f"{patient.first_name} {patient.last_name}".strip() if patient else "",
+        "patient_reference_number": patient.patient_reference_number if patient else None,
+        "currency": invoice.currency or "INR",
+        "items": [
+            {
+                "description": item.description,
+                "quantity": f"{Decimal(item.quantity or 0).normalize():f}",
+                "unit_price": _money(item.unit_price),
+                "discount_amount": _money(item.discount_amount),
+                "tax_amount": _money(item.tax_amount),
+                "total_price": _money(item.total_price),
+            }
+            for item in items
+        ],
+        "subtotal": _money(invoice.subtotal),
+        "discount_amount": _money(
+            (invoice.discount_amount or 0) + sum(i.discount_amount or 0 for i in items)
+        ),
+        "tax_amount": _money(invoice.tax_amount),
+        "total_amount": _money(invoice.total_amount),
+        "paid_amount": _money(invoice.paid_amount),
+        "balance_amount": _money(invoice.balance_amount),
+        "notes": invoice.notes,
+    }
+
+
+def invoice_pdf_data(invoice: Invoice) -> dict:
+    """Invoice loaded with patient and items (invoice_service.get_invoice_by_id)."""
+    return {
+        "font_path": settings.PDF_FONT_PATH,
+        "hospital": _hospital(),
+        "invoice": invoice_print_fields(invoice),
+    }
+
+
+def invoice_pdf(invoice: Invoice) -> Future:
+    """Future of the invoice's PDF path."""
+    return pdf_renderer.submit("invoice", invoice_pdf_data(invoice))
+
+
+# ── Patient ID cards ──────────────────────────────────────────────────────
+
+def patient_id_card_pdf_data(patient: Patient) -> dict:
+    dob = patient.date_of_birth
+    if dob:
+        today = date.today()
+        age = f"{today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))} years"
+    else:
+        age = f"{patient.age_years} years" if patient.age_years else "N/A"
+
+    emergency = ""
+    if patient.emergency_contact_name:
+        emergency = patient.emergency_contact_name
+        if patient.emergency_contact_relation:
+            emergency += f" ({patient.emergency_contact_relation})"
+        if patient.emergency_contact_phone:
+            emergency += f" | {patient.emergency_contact_country_code or ''} {patient.emergency_contact_phone}"
+
+    return {
+        "font_path": settings.PDF_FONT_PATH,
+        "hospital": _hospital(),
+        "patient": {
+            "full_name": " ".join(p for p in (patient.title, patient.first_name, patient.last_name) if p),
+            "patient_reference_number": patient.patient_reference_number,
+            "date_of_birth": dob.strftime("%d %b %Y") if dob else "N/A",
+            "age": age,
+            "gender": patient.gender,
+            "blood_group": patient.blood_group or "N/A",
+            "mobile": f"{patient.phone_country_code or ''} {patient.phone_number}".strip(),
+            "emergency": emergency,
+        },
+    }
+
+
+def patient_id_card_pdf(patient: Patient) -> Future:
+    """Future of the patient's ID card PDF path (front and back pages)."""
+    return pdf_renderer.submit("patient_id_card", patient_id_card_pdf_data(patient))
@@ -10,6 +10,7 @@ from datetime import date, timedelta, datetime, timezone
 from typing import Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import func, or_, and_
+from sqlalchemy.exc import IntegrityError
 
 from ..models.prescription import Medicine
 from ..models.pharmacy import (
@@ -18,6 +19,12 @@ from ..models.pharmacy import (
     PharmacySale, PharmacySaleItem,
     StockAdjustment,
 )
+from .document_number_service import next_pharmacy_invoice_number
+from .stock_allocation_service import (
+    InsufficientStock, StockDemand, allocate_stock, balances_after,
+)
+from .stock_movement_service import last_balance
+from .stock_summary_service import get_medicine_stock, get_medicine_stock_map
 
 logger = logging.getLogger(__name__)
 
@@ -43,9 +50,24 @@ def _normalize_medicine_payload(data: dict) -> dict:
     if normalized.get("description") and not normalized.get("composition"):
         normalized["composition"] = normalized.get("description")
 
+    # The form sends "" for an empty SKU; only real SKUs are unique per hospital.
+    if "sku" in normalized:
+        normalized["sku"] = (normalized["sku"] or "").strip() or None
+
     return normalized
 
 
+def _commit_medicine(db: Session, med: Medicine) -> None:
+    """Commit a medicine change, reporting a duplicate SKU as a ValueError."""
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        if "uq_medicines_hospital_sku" in str(e.orig):
+            raise ValueError(f"SKU '{med.sku}' is already used by another medicine") from e
+        raise
+
+
 # ══════════════════════════════════════════════════
 # Medicine CRUD
 # ══════════════════════════════════════════════════
@@ -58,7 +80,7 @@ def create_medicine(db: Session, hospital_id: uuid.UUID, data: dict, user_id: uu
         payload["unit_of_measure"] = "Nos"
     med = Medicine(hospital_id=hospital_id, **payload)
     db.add(med)
-    db.commit()
+    _commit_medicine(db, med)
     db.refresh(med)
     return med
 
@@ -100,16 +122,7 @@ def list_medicines(
     items = query.order_by(Medicine.name).offset((page - 1) * limit).limit(limit).all()
 
     # Enrich with total stock
-    med_ids = [m.id for m in items]
-    stock_map: dict[uuid.UUID, int] = {}
-    if med_ids:
-        stock_rows = (
-            db.query(MedicineBatch.medicine_id, func.coalesce(func.sum(MedicineBatch.quantity), 0))
-            .filter(MedicineBatch.medicine_id.in_(med_ids), MedicineBatch.is_active == True)
-            .group_by(MedicineBatch.medicine_id)
-            .all()
-        )
-        stock_map = {row[0]: int(row[1]) for row in stock_rows}
+    stock_map = get_medicine_stock_map(db, [m.id for m in items])
 
     return {
         "total": total,
@@ -127,9 +140,10 @@ def update_medicine(db: Session, medicine_id: str | uuid.UUID, data: dict) -> Op
         return None
     normalized_data = _normalize_medicine_payload(data)
     for key, value in normalized_data.items():
-        if hasattr(med, key) and value is not None:
+        # A blank SKU clears it; other fields ignore nulls.
+        if hasattr(med, key) and (value is not None or key == "sku"):
             setattr(med, key, value)
-    db.commit()
+    _commit_medicine(db, med)
     db.refresh(med)
     return med
 
@@ -468,17 +482,7 @@ def receive_purchase_order(
             )
             db.add(batch)
 
-        last_movement = (
-            db.query(StockMovement)
-            .filter(
-                StockMovement.hospital_id == po.hospital_id,
-                StockMovement.item_type == "medicine",
-                StockMovement.item_id == item.item_id,
-            )
-            .order_by(StockMovement.created_at.desc())
-            .first()
-        )
-        current_balance = last_movement.balance_after if last_movement else 0
+        current_balance = last_balance(db, po.hospital_id, "medicine", item.item_id)
 
         movement = StockMovement(
             hospital_id=po.hospital_id,
@@ -515,10 +519,7 @@ def receive_purchase_order(
 # ══════════════════════════════════════════════════
 
 def _generate_invoice_number(db: Session, hospital_id: uuid.UUID) -> str:
-    count = db.query(func.count(PharmacySale.id)).filter(
-        PharmacySale.hospital_id == hospital_id
-    ).scalar() or 0
-    return f"INV-{count + 1:06d}"
+    return next_pharmacy_invoice_number(db, hospital_id)
 
 
 def create_sale(
@@ -546,12 +547,47 @@ def create_sale(
     subtotal = Decimal("0")
     tax_total = Decimal("0")
 
+    lines = []
+    demands = []
     for item_data in items_data:
+        medicine_id = uuid.UUID(item_data["medicine_id"])
         med = get_medicine_by_id(db, item_data["medicine_id"])
         qty = item_data["quantity"]
         unit_price = Decimal(str(item_data["unit_price"]))
         disc_pct = Decimal(str(item_data.get("discount_percent", 0)))
         tax_pct = Decimal(str(item_data.get("tax_percent", 0)))
+        batch_id = uuid.UUID(item_data["batch_id"]) if item_data.get("batch_id") else None
+
+        demands.append(StockDemand(medicine_id, qty, batch_id, batch_only=batch_id is not None))
+        lines.append((medicine_id, med, unit_price, disc_pct, tax_pct))
+
+    # One locked FEFO allocation for the whole sale; a line may span batches.
+    try:
+        allocations = allocate_stock(db, demands)
+    except InsufficientStock as e:
+        medicine_id, med = lines[e.shortages[0].line][:2]
+        # ✅ Check if expired batches exist and provide helpful error message
+        expired_batch = db.query(MedicineBatch).filter(
+            MedicineBatch.medicine_id == medicine_id,
+            MedicineBatch.expiry_date <= date.today(),
+            MedicineBatch.quantity > 0,
+        ).first()
+
+        if expired_batch:
+            raise ValueError(
+                f"All available batches of {med.name if med else 'this medicine'} are expired. "
+                f"Cannot dispense expired medicine (Batch: {expired_batch.batch_number}, "
+                f"Expiry: {expired_batch.expiry_date}). Please remove from inventory."
+            ) from None
+
+        raise ValueError(f"Insufficient stock in batch for {med.name if med else 'unknown'}") from None
+
+    # ✅ FIX BUG #2: Create stock movement record for pharmacy sale
+    from ..models.inventory import StockMovement
+
+    for allocation, balance_after in zip(allocations, balances_after(db, allocations)):
+        medicine_id, med, unit_price, disc_pct, tax_pct = lines[allocation.line]
+        qty = allocation.quantity
 
         line_subtotal = unit_price * qty
         line_discount = line_subtotal * disc_pct / 100
@@ -559,66 +595,16 @@ def create_sale(
         line_tax = line_after_disc * tax_pct / 100
         line_total = line_after_disc + line_tax
 
-        batch = None
-        batch_id = item_data.get("batch_id")
-        if batch_id:
-            batch_id_uuid = uuid.UUID(batch_id)
-            batch = db.query(MedicineBatch).filter(MedicineBatch.id == batch_id_uuid).first()
-        else:
-            # ✅ FIX BUG #7: Add expiry date validation - block expired batches
-            batch = db.query(MedicineBatch).filter(
-                MedicineBatch.medicine_id == uuid.UUID(item_data["medicine_id"]),
-                MedicineBatch.is_active == True,
-                MedicineBatch.quantity >= qty,
-                MedicineBatch.expiry_date > date.today(),  # ✅ BLOCK EXPIRED BATCHES
-            ).order_by(MedicineBatch.expiry_date.asc()).first()
-            batch_id_uuid = batch.id if batch else None
-
-        if not batch or batch.quantity < qty:
-            # ✅ Check if expired batches exist and provide helpful error message
-            expired_batch = db.query(MedicineBatch).filter(
-                MedicineBatch.medicine_id == uuid.UUID(item_data["medicine_id"]),
-                MedicineBatch.expiry_date <= date.today(),
-                MedicineBatch.quantity > 0,
-            ).first()
-            
-            if expired_batch:
-                raise ValueError(
-                    f"All available batches of {med.name if med else 'this medicine'} are expired. "
-                    f"Cannot dispense expired medicine (Batch: {expired_batch.batch_number}, "
-                    f"Expiry: {expired_batch.expiry_date}). Please remove from inventory."
-                )
-            
-            raise ValueError(f"Insufficient stock in batch for {med.name if med else 'unknown'}")
-
-        batch.quantity -= qty
-
-        # ✅ FIX BUG #2: Create stock movement record for pharmacy sale
-        from ..models.inventory import StockMovement
-
-        # Get current balance from last movement
-        last_movement = (
-            db.query(StockMovement)
-            .filter(
-                StockMovement.hospital_id == hospital_id,
-                StockMovement.item_type == "medicine",
-                StockMovement.item_id == uuid.UUID(item_data["medicine_id"]),
-            )
-            .order_by(StockMovement.created_at.desc())
-            .first()
-        )
-        current_balance = last_movement.balance_after if last_movement else 0
-        
         movement = StockMovement(
             hospital_id=hospital_id,
             item_type="medicine",
-            item_id=uuid.UUID(item_data["medicine_id"]),
-            batch_id=batch_id_uuid,
+            item_id=medicine_id,
+            batch_id=allocation.batch_id,
             movement_type="sale",
             reference_type="dispensing",
             reference_id=sale.id,
             quantity=-qty,
-            balance_after=current_balance - qty,
+            balance_after=balance_after,
             unit_cost=float(unit_price),
             notes=f"Pharmacy sale: {sale.invoice_number}",
             performed_by=user_id,
@@ -627,8 +613,8 @@ def create_sale(
 
         si = PharmacySaleItem(
             sale_id=sale.id,
-            medicine_id=uuid.UUID(item_data["medicine_id"]),
-            batch_id=batch_id_uuid,
+            medicine_id=medicine_id,
+            batch_id=allocation.batch_id,
             medicine_name=med.name if med else "Unknown",
             quantity=qty,
             unit_price=unit_price,
@@ -722,12 +708,16 @@ def create_stock_adjustment(
         ).first()
         if not batch:
             raise ValueError("Batch not found")
-        new_qty = (batch.quantity or 0) + qty
-        if new_qty < 0:
-            raise ValueError("Adjustment would result in negative stock")
-        if qty > 0:
+        if qty < 0:
+            try:
+                allocate_stock(
+                    db, [StockDemand(medicine_id, -qty, batch.id, batch_only=True)], include_expired=True,
+                )
+            except InsufficientStock:
+                raise ValueError("Adjustment would result in negative stock") from None
+        else:
             batch.initial_quantity = (batch.initial_quantity or 0) + qty
-        batch.quantity = new_qty
+            batch.quantity = (batch.quantity or 0) + qty
     elif qty > 0:
         # No batch specified for stock-in adjustment: write into system adjustment batch.
         system_batch_number = f"SYS-ADJ-{datetime.now(timezone.utc).strftime('%Y%m%d')}"
@@ -756,24 +746,11 @@ def create_stock_adjustment(
         movement_batch_id = batch.id
     elif qty < 0:
         # No batch specified for stock-out adjustment: consume FEFO across active batches.
-        remaining = -qty
-        batches = db.query(MedicineBatch).filter(
-            MedicineBatch.medicine_id == medicine_id,
-            MedicineBatch.is_active == True,
-            MedicineBatch.quantity > 0,
-        ).order_by(MedicineBatch.expiry_date.asc(), MedicineBatch.created_at.asc()).all()
-
-        available = sum(int(b.quantity or 0) for b in batches)
-        if available < remaining:
-            raise ValueError("Insufficient stock across batches for adjustment")
-
-        for b in batches:
-            if remaining <= 0:
-                break
-            take = min(int(b.quantity or 0), remaining)
-            b.quantity = int(b.quantity or 0) - take
-            remaining -= take
-        movement_batch_id = None
+        try:
+            allocations = allocate_stock(db, [StockDemand(medicine_id, -qty)], include_expired=True)
+        except InsufficientStock:
+            raise ValueError("Insufficient stock across batches for adjustment") from None
+        movement_batch_id = allocations[0].batch_id if len(allocations) == 1 else None
 
     # Create adjustment record using inventory model (auto-approved for pharmacy)
     adj = StockAdjustment(
@@ -792,12 +769,7 @@ def create_stock_adjustment(
     db.add(adj)
     db.flush()
 
-    balance_after = int(
-        db.query(func.coalesce(func.sum(MedicineBatch.quantity), 0)).filter(
-            MedicineBatch.medicine_id == medicine_id,
-            MedicineBatch.is_active == True,
-        ).scalar() or 0
-    )
+    balance_after = get_medicine_stock(db, medicine_id)
 
     movement_type = "adjustment"
     if adj_type == "damage":
@@ -0,0 +1,156 @@
+"""
+Prescription print rendering.
+
+The printable prescription is the Jinja2 template
+templates/prescription_print.html, compiled once per language: each
+language gets its own template object with the translated labels
+(utils/prescription_translations.TRANSLATIONS) and the hospital letterhead
+bound as globals, so a render only fills in the prescription. Values are
+HTML-escaped.
+
+The data comes from prescription_service.enrich_prescription, which already
+loads the patient, doctor and items. Finalized prescriptions are served
+from core/print_cache.py when they have been printed before, without
+touching the database. Batch prints (print_batch_service.py) render the
+same page fragment from enrich_prescriptions_for_print().
+
+Usage:
+    rx = get_prescription(db, prescription_id)
+    html = render_prescription_html(db, rx, lang)
+"""
+import os
+import threading
+from datetime import date, datetime
+
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..core.print_cache import print_cache
+from ..models.appointment import Doctor
+from ..models.patient import Patient
+from ..models.prescription import Prescription, PrescriptionItem
+from ..models.user import User
+from ..utils.prescription_translations import SUPPORTED_LANGUAGES, get_labels
+from .prescription_service import enrich_prescription
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+PRESCRIPTION_TEMPLATE = "prescription_print.html"
+
+
+def long_date(value) -> str:
+    if not value:
+        return "—"
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%B %d, %Y")
+    return str(value)
+
+
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
+)
+_env.filters["long_date"] = long_date
+
+_templates: dict[tuple[str, str], Template] = {}
+_templates_lock = threading.Lock()
+
+
+def _template(lang: str, name: str = PRESCRIPTION_TEMPLATE) -> Template:
+    """Compiled print template for a language, labels bound as globals."""
+    key = (name, lang)
+    template = _templates.get(key)
+    if template is None:
+        with _templates_lock:
+            template = _templates.get(key)
+            if template is None:
+                # A separate compiled copy per language: Environment.get_template
+                # would hand every language the same object. Included page
+                # fragments come from the environment's cache and see these
+                # globals through the render context.
+                source, filename, _ = _env.loader.get_source(_env, name)
+                template = _env.template_class.from_code(
+                    _env, _env.compile(source, name, filename),
+                    _env.make_globals({"lang": lang, "t": get_labels(lang), "hospital": settings}),
+                )
+                _templates[key] = template
+    return template
+
+
+def render_prescription_html(db: Session, rx: Prescription, lang: str = "en") -> str:
+    """Printable HTML for a prescription; finalized ones are rendered once per language."""
+    if lang not in SUPPORTED_LANGUAGES:
+        lang = "en"
+    key = (rx.id, rx.updated_at, lang)
+    if rx.is_finalized:
+        html = print_cache.get(key)
+        if html is not None:
+            return html
+
+    html = _template(lang).render(rx=enrich_prescription(db, rx))
+    if rx.is_finalized:
+        print_cache.put(key, html)
+    return html
+
+
+def enrich_prescriptions_for_print(db: Session, prescriptions: list[Prescription]) -> list[dict]:
+    """
+    The fields the print template reads from enrich_prescription, for many
+    prescriptions in three queries (patients, doctors with their users, items).
+    """
+    if not prescriptions:
+        return []
+    patient_ids = {rx.patient_id for rx in prescriptions}
+    doctor_ids = {rx.doctor_id for rx in prescriptions if rx.doctor_id}
+    patients = {p.id: p for p in db.query(Patient).filter(Patient.id.in_(patient_ids))}
+    # Name columns only: loading User would also pull its eager roles.
+    doctors = {
+        row.id: row for row in db.query(
+            Doctor.id, Doctor.specialization, Doctor.registration_number,
+            func.concat_ws(" ", User.first_name, User.last_name).label("name"),
+        )
+        .outerjoin(User, User.id == Doctor.user_id)
+        .filter(Doctor.id.in_(doctor_ids))
+    } if doctor_ids else {}
+    items: dict = {rx.id: [] for rx in prescriptions}
+    for item in (
+        db.query(PrescriptionItem)
+        .filter(PrescriptionItem.prescription_id.in_(items.keys()))
+        .order_by(PrescriptionItem.prescription_id, PrescriptionItem.display_order)
+    ):
+        items[item.prescription_id].append({
+            "medicine_name": item.medicine_name,
+            "generic_name": item.generic_name,
+            "dosage": item.dosage,
+            "frequency": item.frequency,
+            "duration_value": item.duration_value,
+            "duration_unit": item.duration_unit,
+            "instructions": item.instructions,
+        })
+
+    enriched = []
+    for rx in prescriptions:
+        patient = patients.get(rx.patient_id)
+        doctor = doctors.get(rx.doctor_id)
+        enriched.append({
+            "prescription_number": rx.prescription_number,
+            "status": rx.status,
+            "created_at": rx.created_at,
+            "valid_until": rx.valid_until,
+            "diagnosis": rx.diagnosis,
+            "clinical_notes": rx.clinical_notes,
+            "advice": rx.advice,
+            "patient_name": patient.full_name if patient else None,
+            "patient_reference_number": patient.patient_reference_number if patient else None,
+            "patient_gender": patient.gender if patient else None,
+            "patient_age": patient.age_years if patient else None,
+            "patient_blood_group": patient.blood_group if patient else None,
+            "patient_known_allergies": patient.known_allergies if patient else None,
+            "doctor_name": doctor.name if doctor else None,
+            "doctor_specialization": doctor.specialization if doctor else None,
+            "doctor_registration_number": doctor.registration_number if doctor else None,
+            "items": items[rx.id],
+        })
+    return enriched
@@ -19,8 +19,10 @@ from ..models.prescription import (
 from ..models.appointment import Doctor, Appointment
 from ..models.patient import Patient
 from ..models.user import User
-from ..models.hospital_settings import HospitalSettings
 from ..models.pharmacy import PharmacySale, PharmacySaleItem
+from ..utils.pagination import count_query, keyset_page, resolve_count_mode
+from .document_number_service import next_prescription_number
+from .stock_summary_service import get_medicine_stock_map
 
 logger = logging.getLogger(__name__)
 
@@ -66,31 +68,9 @@ def generate_prescription_number(db: Session, hospital_id: uuid.UUID) -> str:
     Generate unique sequential prescription number: {PREFIX}-{YY}-{NNNNN}
     
     Format: RX-26-00001, RX-26-00002, etc.
-    Uses hospital_settings.prescription_sequence with row-level locking.
+    Allocated by document_number_service without locking hospital_settings.
     """
-    # Get hospital settings with row-level lock to prevent race conditions
-    settings = db.query(HospitalSettings).filter(
-        HospitalSettings.hospital_id == hospital_id
-    ).with_for_update().first()
-    
-    if not settings:
-        # Fallback if no settings exist - use default
-        logger.warning(f"No hospital settings found for hospital_id={hospital_id}, using defaults")
-        prefix = "RX"
-        sequence = 1
-    else:
-        # Get prefix and increment sequence atomically
-        prefix = settings.prescription_prefix or "RX"
-        sequence = settings.prescription_sequence + 1
-        # Update the sequence counter
-        settings.prescription_sequence = sequence
-        db.flush()  # Ensure the update is visible within this transaction
-    
-    # Format: PREFIX-YY-NNNNN (e.g., RX-26-00001)
-    year_code = date.today().strftime("%y")  # 2-digit year
-    formatted_sequence = f"{sequence:05d}"  # 5-digit sequence with leading zeros
-    
-    return f"{prefix}-{year_code}-{formatted_sequence}"
+    return next_prescription_number(db, hospital_id)
 
 
 # ═══════════════════════════════════════════════════════════════════════════
@@ -213,10 +193,8 @@ def get_prescription_by_number(db: Session, rx_number: str) -> Optional[Prescrip
     ).first()
 
 
-def list_prescriptions(
+def _filtered_prescriptions(
     db: Session,
-    page: int = 1,
-    limit: int = 10,
     hospital_id: Optional[uuid.UUID] = None,
     doctor_id: Optional[str | uuid.UUID] = None,
     patient_id: Optional[str | uuid.UUID] = None,
@@ -225,7 +203,7 @@ def list_prescriptions(
     date_to: Optional[date] = None,
     search: Optional[str] = None,
 ):
-    """List prescriptions with filters and pagination."""
+    """Prescription query with the list / batch print filters applied."""
     q = db.query(Prescription).filter(Prescription.is_deleted == False)
 
     if hospital_id:
@@ -262,7 +240,35 @@ def list_prescriptions(
             )
         )
 
-    total = q.count()
+    return q
+
+
+def list_prescriptions(
+    db: Session,
+    page: int = 1,
+    limit: int = 10,
+    hospital_id: Optional[uuid.UUID] = None,
+    doctor_id: Optional[str | uuid.UUID] = None,
+    patient_id: Optional[str | uuid.UUID] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
+):
+    """List prescriptions with filters and pagination."""
+    q = _filtered_prescriptions(
+        db, hospital_id=hospital_id, doctor_id=doctor_id, patient_id=patient_id,
+        status=status, date_from=date_from, date_to=date_to, search=search,
+    )
+
+    total = count_query(q, resolve_count_mode(cursor, count))
+    if cursor is not None:
+        # Keyset mode pages by creation time, newest first
+        rows, next_cursor = keyset_page(q, Prescription.created_at, Prescription.id, cursor, limit)
+        total_pages = None if total is None else (ceil(total / limit) if total > 0 else 0)
+        return total, page, limit, total_pages, rows, next_cursor
     offset = (page - 1) * limit
     rows = (
         q.order_by(Prescription.created_at.desc())
@@ -271,7 +277,7 @@ def list_prescriptions(
         .all()
     )
     total_pages = ceil(total / limit) if total > 0 else 0
-    return total, page, limit, total_pages, rows
+    return total, page, limit, total_pages, rows, None
 
 
 def update_prescription(
@@ -478,15 +484,11 @@ def enrich_prescription(db: Session, rx: Prescription) -> dict:
     else:
         d["appointment_number"] = None
 
-    # Doctor name
-    if rx.doctor_id:
-        doctor = db.query(Doctor).filter(Doctor.id == rx.doctor_id).first()
-        if doctor and doctor.user:
-            d["doctor_name"] = doctor.user.full_name
-        else:
-            d["doctor_name"] = None
-    else:
-        d["doctor_name"] = None
+    # Doctor name, plus the specialization and registration the print shows
+    doctor = db.query(Doctor).filter(Doctor.id == rx.doctor_id).first() if rx.doctor_id else None
+    d["doctor_name"] = doctor.user.full_name if doctor and doctor.user else None
+    d["doctor_specialization"] = doctor.specialization if doctor else None
+    d["doctor_registration_number"] = doctor.registration_number if doctor else None
 
     # Items
     items = db.query(PrescriptionItem).filter(
@@ -747,21 +749,7 @@ def list_medicines(
         ).offset(offset).limit(limit).all()
     
     # Attach live stock summary for prescribing UI warnings.
-    from ..models.pharmacy import MedicineBatch
-
-    med_ids = [m.id for m in rows]
-    stock_map: dict[uuid.UUID, int] = {}
-    if med_ids:
-        stock_rows = (
-            db.query(MedicineBatch.medicine_id, func.coalesce(func.sum(MedicineBatch.quantity), 0))
-            .filter(
-                MedicineBatch.medicine_id.in_(med_ids),
-                MedicineBatch.is_active == True,
-            )
-            .group_by(MedicineBatch.medicine_id)
-            .all()
-        )
-        stock_map = {row[0]: int(row[1]) for row in stock_rows}
+    stock_map = get_medicine_stock_map(db, [m.id for m in rows])
 
     total_pages = ceil(total / limit) if total > 0 else 0
     return total, page, limit, total_pages, rows, stock_map
@@ -0,0 +1,158 @@
+"""
+Batch printing: many prescriptions or invoices as one streamed document.
+
+The selection is either an id list (printed in the given order) or the
+same filters as the list endpoints (printed oldest first). It is read in
+chunks of PRINT_BATCH_CHUNK — keyset-paged on (created_at, id) for filters,
+slices of the list for ids — and each chunk is enriched in a fixed number
+of batched queries. The documents are rendered one after another into a
+single HTML page (one printed page per document, via CSS page breaks)
+and sent as they are produced. Only one chunk is held in memory, whatever
+the batch size.
+
+Like stream_export(), the stream runs on its own session: the request's
+session is closed before a StreamingResponse body is sent.
+
+Usage in a router:
+    return StreamingResponse(
+        stream_prescription_batch(hospital_id, lang, ids=ids, status="finalized"),
+        media_type="text/html",
+    )
+"""
+import logging
+import uuid
+from datetime import date
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query, Session, joinedload, selectinload
+
+from ..database import SessionLocal
+from ..models.invoice import Invoice
+from ..models.prescription import Prescription
+from ..utils.prescription_translations import SUPPORTED_LANGUAGES
+from .invoice_service import _filtered_invoices
+from .pdf_service import invoice_print_fields
+from .prescription_print_service import _template, enrich_prescriptions_for_print
+from .prescription_service import _filtered_prescriptions
+
+logger = logging.getLogger(__name__)
+
+PRINT_BATCH_CHUNK = 50
+FLUSH_BYTES = 64 * 1024
+
+PRESCRIPTION_BATCH_TEMPLATE = "prescription_print_batch.html"
+INVOICE_BATCH_TEMPLATE = "invoice_print_batch.html"
+
+
+def _chunks(
+    query: Query, model, ids: Optional[list[uuid.UUID]], chunk: int = PRINT_BATCH_CHUNK,
+) -> Iterator[list]:
+    """Rows of query in chunks: the given ids in order, or everything oldest first."""
+    if ids is not None:
+        for start in range(0, len(ids), chunk):
+            wanted = ids[start:start + chunk]
+            rows = {row.id: row for row in query.filter(model.id.in_(wanted))}
+            found = [rows[i] for i in wanted if i in rows]
+            if found:
+                yield found
+        return
+    last = None
+    while True:
+        page = query
+        if last is not None:
+            page = page.filter(tuple_(model.created_at, model.id) > last)
+        rows = page.order_by(model.created_at, model.id).limit(chunk).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk:
+            return
+        last = (rows[-1].created_at, rows[-1].id)
+
+
+def _stream(
+    template_name: str,
+    lang: str,
+    title: str,
+    documents: Callable[[Session], Iterator[dict]],
+) -> Iterator[str]:
+    db = SessionLocal()
+    try:
+        count = 0
+
+        def counted() -> Iterator[dict]:
+            nonlocal count
+            for document in documents(db):
+                count += 1
+                yield document
+
+        buffer: list[str] = []
+        size = 0
+        for piece in _template(lang, template_name).generate(title=title, documents=counted()):
+            buffer.append(piece)
+            size += len(piece)
+            if size >= FLUSH_BYTES:
+                yield "".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer)
+        logger.info(f"Printed {count} documents as {template_name}")
+    finally:
+        db.close()
+
+
+def stream_prescription_batch(
+    hospital_id: uuid.UUID,
+    lang: str = "en",
+    ids: Optional[list[uuid.UUID]] = None,
+    doctor_id: Optional[uuid.UUID] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> Iterator[str]:
+    """Printable HTML of the selected prescriptions, yielded as it is rendered."""
+    if lang not in SUPPORTED_LANGUAGES:
+        lang = "en"
+
+    def documents(db: Session) -> Iterator[dict]:
+        query = _filtered_prescriptions(
+            db, hospital_id=hospital_id, doctor_id=doctor_id, status=status,
+            date_from=date_from, date_to=date_to,
+        )
+        for rows in _chunks(query, Prescription, ids):
+            yield from enrich_prescriptions_for_print(db, rows)
+
+    title = f"{len(ids)} selected" if ids is not None else _filter_title(date_from, date_to, status)
+    return _stream(PRESCRIPTION_BATCH_TEMPLATE, lang, title, documents)
+
+
+def stream_invoice_batch(
+    hospital_id: uuid.UUID,
+    ids: Optional[list[uuid.UUID]] = None,
+    status: Optional[str] = None,
+    invoice_type: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> Iterator[str]:
+    """Printable HTML of the selected invoices, yielded as it is rendered."""
+
+    def documents(db: Session) -> Iterator[dict]:
+        query = _filtered_invoices(
+            db, hospital_id, status=status, invoice_type=invoice_type, date_from=date_from, date_to=date_to,
+        ).options(joinedload(Invoice.patient), selectinload(Invoice.items))
+        for rows in _chunks(query, Invoice, ids):
+            for invoice in rows:
+                yield invoice_print_fields(invoice)
+
+    title = f"{len(ids)} selected" if ids is not None else _filter_title(date_from, date_to, status)
+    return _stream(INVOICE_BATCH_TEMPLATE, "en", title, documents)
+
+
+def _filter_title(date_from: Optional[date], date_to: Optional[date], status: Optional[str]) -> str:
+    parts = []
+    if date_from or date_to:
+        parts.append(" to ".join(str(d) for d in (date_from, date_to) if d))
+    if status:
+        parts.append(status)
+    return ", ".join(parts) or "all"
@@ -0,0 +1,261 @@
+"""
+Queue service — read paths for the walk-in / doctor queue screens.
+Loads a whole day's queue with its appointments, patients and doctor names
+in a fixed number of queries, independent of queue length.
+"""
+import uuid
+import logging
+from datetime import date
+from typing import Optional
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import case
+
+from ..models.appointment import Appointment, AppointmentQueue, Doctor
+from ..models.patient import Patient
+from ..models.user import User
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_WAITING_STATUSES = ("waiting", "called", "sent_to_doctor")
+
+
+def _patient_age(patient: Optional[Patient], today: date) -> Optional[int]:
+    """Age in whole years from date_of_birth, falling back to stored age_years."""
+    if not patient:
+        return None
+    if patient.date_of_birth:
+        return (today - patient.date_of_birth).days // 365
+    if patient.age_years is not None:
+        return patient.age_years
+    return None
+
+
+def _load_patients(db: Session, patient_ids: set) -> dict:
+    """Batch load patients keyed by id."""
+    if not patient_ids:
+        return {}
+    return {p.id: p for p in db.query(Patient).filter(Patient.id.in_(patient_ids)).all()}
+
+
+def load_doctor_names(db: Session, doctor_ids: set) -> dict:
+    """Batch load doctor display names (Doctor -> User) keyed by doctor id."""
+    if not doctor_ids:
+        return {}
+    rows = (
+        db.query(Doctor.id, User.first_name, User.last_name)
+        .join(User, User.id == Doctor.user_id)
+        .filter(Doctor.id.in_(doctor_ids))
+        .all()
+    )
+    return {row.id: f"{row.first_name} {row.last_name}".strip() for row in rows}
+
+
+def _queue_item(
+    qe: AppointmentQueue,
+    appt: Optional[Appointment],
+    patient: Optional[Patient],
+    doctor_name: Optional[str],
+    today: date,
+) -> dict:
+    """Build the queue item payload used by GET /walk-ins/queue."""
+    return {
+        "queue_id": str(qe.id),
+        "appointment_id": str(qe.appointment_id),
+        "queue_number": qe.queue_number,
+        "position": qe.position,
+        "status": qe.status,
+        "priority": (appt.priority or "normal") if appt else "normal",
+        "patient_name": patient.full_name if patient else None,
+        "patient_id": str(patient.id) if patient else None,
+        "patient_reference_number": patient.patient_reference_number if patient else None,
+        "patient_phone": patient.phone_number if patient else None,
+        "patient_gender": patient.gender if patient else None,
+        "patient_date_of_birth": patient.date_of_birth.isoformat() if patient and patient.date_of_birth else None,
+        "patient_age": _patient_age(patient, today),
+        "patient_blood_group": patient.blood_group if patient else None,
+        "patient_email": patient.email if patient else None,
+        "patient_known_allergies": patient.known_allergies if patient else None,
+        "patient_chronic_conditions": patient.chronic_conditions if patient else None,
+        "patient_emergency_contact_name": patient.emergency_contact_name if patient else None,
+        "patient_emergency_contact_phone": patient.emergency_contact_phone if patient else None,
+        "patient_emergency_contact_relation": patient.emergency_contact_relation if patient else None,
+        "doctor_id": str(appt.doctor_id) if appt and appt.doctor_id else None,
+        "doctor_name": doctor_name,
+        "chief_complaint": appt.chief_complaint if appt else None,
+        "check_in_at": appt.check_in_at.isoformat() if appt and appt.check_in_at else None,
+        "called_at": qe.called_at.isoformat() if qe.called_at else None,
+        "consultation_start_at": appt.consultation_start_at.isoformat() if appt and appt.consultation_start_at else None,
+        "consultation_end_at": appt.consultation_end_at.isoformat() if appt and appt.consultation_end_at else None,
+    }
+
+
+def build_queue_items(db: Session, rows: list[tuple[AppointmentQueue, Appointment]]) -> list[dict]:
+    """
+    Enrich (queue entry, appointment) pairs with patient and doctor details.
+    Costs two extra queries (patients, doctor names) for any number of rows.
+    """
+    if not rows:
+        return []
+
+    patients = _load_patients(db, {appt.patient_id for _, appt in rows if appt and appt.patient_id})
+    doctor_names = load_doctor_names(db, {appt.doctor_id for _, appt in rows if appt and appt.doctor_id})
+
+    today = date.today()
+    return [
+        _queue_item(
+            qe,
+            appt,
+            patients.get(appt.patient_id) if appt else None,
+            doctor_names.get(appt.doctor_id) if appt and appt.doctor_id else None,
+            today,
+        )
+        for qe, appt in rows
+    ]
+
+
+def get_queue_items(
+    db: Session,
+    target_date: date,
+    doctor_id: Optional[uuid.UUID] = None,
+    hospital_id: Optional[uuid.UUID] = None,
+) -> list[dict]:
+    """
+    Return the queue for a date in display order: urgency priority
+    (emergency > urgent > normal), then queue_number.
+    Three queries in total: queue+appointment, patients, doctor names.
+    """
+    query = (
+        db.query(AppointmentQueue, Appointment)
+        .join(Appointment, Appointment.id == AppointmentQueue.appointment_id)
+        .filter(
+            AppointmentQueue.queue_date == target_date,
+            Appointment.appointment_date == target_date,
+        )
+    )
+    if doctor_id:
+        query = query.filter(AppointmentQueue.doctor_id == doctor_id)
+    if hospital_id:
+        query = query.filter(Appointment.hospital_id == hospital_id)
+
+    priority_order = case(
+        (Appointment.priority == "emergency", 0),
+        (Appointment.priority == "urgent", 1),
+        else_=2,
+    )
+    rows = query.order_by(priority_order, AppointmentQueue.queue_number.asc()).all()
+    return build_queue_items(db, rows)
+
+
+def get_queue_status(
+    db: Session,
+    target_date: date,
+    doctor_id: Optional[uuid.UUID] = None,
+    hospital_id: Optional[uuid.UUID] = None,
+) -> dict:
+    """Full queue payload for GET /walk-ins/queue (items plus status totals)."""
+    items = get_queue_items(db, target_date, doctor_id, hospital_id)
+    return {
+        "doctor_id": str(doctor_id) if doctor_id else None,
+        "queue_date": target_date.isoformat(),
+        "total_waiting": sum(1 for i in items if i["status"] in ACTIVE_WAITING_STATUSES),
+        "total_in_progress": sum(1 for i in items if i["status"] == "in_consultation"),
+        "total_completed": sum(1 for i in items if i["status"] == "completed"),
+        "items": items,
+    }
+
+
+def get_upcoming_queue(
+    db: Session,
+    date_from: date,
+    date_to: date,
+    doctor_id: Optional[uuid.UUID] = None,
+) -> list[dict]:
+    """
+    Upcoming queue entries in (date_from, date_to], grouped by date.
+    Referring doctor names come from the parent appointment in the same query.
+    """
+    parent = aliased(Appointment)
+    query = (
+        db.query(AppointmentQueue, Appointment, parent.doctor_id)
+        .join(Appointment, Appointment.id == AppointmentQueue.appointment_id)
+        .outerjoin(parent, parent.id == Appointment.parent_appointment_id)
+        .filter(
+            AppointmentQueue.queue_date > date_from,
+            AppointmentQueue.queue_date <= date_to,
+            AppointmentQueue.status.notin_(["completed", "skipped"]),
+        )
+    )
+    if doctor_id:
+        query = query.filter(AppointmentQueue.doctor_id == doctor_id)
+
+    rows = query.order_by(
+        AppointmentQueue.queue_date.asc(),
+        AppointmentQueue.queue_number.asc(),
+    ).all()
+    if not rows:
+        return []
+
+    patients = _load_patients(db, {appt.patient_id for _, appt, _ in rows})
+    doctor_names = load_doctor_names(
+        db,
+        {appt.doctor_id for _, appt, _ in rows if appt.doctor_id}
+        | {parent_doctor_id for _, _, parent_doctor_id in rows if parent_doctor_id},
+    )
+
+    today = date.today()
+    grouped: dict[str, list] = {}
+    for qe, appt, parent_doctor_id in rows:
+        patient = patients.get(appt.patient_id)
+        grouped.setdefault(qe.queue_date.isoformat(), []).append({
+            "queue_id": str(qe.id),
+            "appointment_id": str(qe.appointment_id),
+            "queue_number": qe.queue_number,
+            "status": qe.status,
+            "appointment_type": appt.appointment_type,
+            "priority": appt.priority or "normal",
+            "patient_name": patient.full_name if patient else None,
+            "patient_id": str(patient.id) if patient else None,
+            "patient_reference_number": patient.patient_reference_number if patient else None,
+            "patient_gender": patient.gender if patient else None,
+            "patient_age": _patient_age(patient, today),
+            "chief_complaint": appt.chief_complaint,
+            "doctor_id": str(appt.doctor_id) if appt.doctor_id else None,
+            "doctor_name": doctor_names.get(appt.doctor_id) if appt.doctor_id else None,
+            "referring_doctor_name": doctor_names.get(parent_doctor_id) if parent_doctor_id else None,
+        })
+
+    return [
+        {"date": d, "count": len(grouped[d]), "items": grouped[d]}
+        for d in sorted(grouped.keys())
+    ]
+
+
+def build_queue_event(
+    db: Session,
+    queue_id: uuid.UUID,
+    event_type: str = "queue.updated",
+    previous_doctor_id: Optional[uuid.UUID] = None,
+) -> Optional[dict]:
+    """
+    Build a live-feed event for one queue entry, carrying the same item
+    payload GET /walk-ins/queue returns so clients can patch in place.
+    """
+    row = (
+        db.query(AppointmentQueue, Appointment)
+        .join(Appointment, Appointment.id == AppointmentQueue.appointment_id)
+        .filter(AppointmentQueue.id == queue_id)
+        .first()
+    )
+    if not row:
+        return None
+    qe, appt = row
+    return {
+        "event": event_type,
+        "hospital_id": str(appt.hospital_id),
+        "doctor_id": str(qe.doctor_id),
+        "previous_doctor_id": str(previous_doctor_id) if previous_doctor_id else None,
+        "queue_date": qe.queue_date.isoformat(),
+        "queue_id": str(qe.id),
+        "status": qe.status,
+        "item": build_queue_items(db, [row])[0],
+    }
@@ -10,8 +10,8 @@ from math import ceil
 from datetime import date, datetime, timezone
 from typing import Optional
 
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_
+from sqlalchemy.orm import Session, aliased, joinedload
+from sqlalchemy import func, or_
 
 from ..models.refund import Refund
 from ..models.payment import Payment
@@ -192,24 +192,17 @@ def process_refund(
     return refund
 
 
-def list_refunds(
+def _filtered_refunds(
     db: Session,
     hospital_id: uuid.UUID,
-    page: int = 1,
-    limit: int = 10,
     status: Optional[str] = None,
     invoice_id: Optional[str] = None,
     patient_id: Optional[str] = None,
-) -> PaginatedRefundResponse:
-    query = (
-        db.query(Refund)
-        .options(
-            joinedload(Refund.invoice),
-            joinedload(Refund.payment),
-            joinedload(Refund.patient),
-        )
-        .filter(Refund.hospital_id == hospital_id)
-    )
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """Refund query with the list / export filters applied."""
+    query = db.query(Refund).filter(Refund.hospital_id == hospital_id)
     if status:
         query = query.filter(Refund.status == status)
     if invoice_id:
@@ -222,6 +215,29 @@ def list_refunds(
             query = query.filter(Refund.patient_id == uuid.UUID(patient_id))
         except (ValueError, AttributeError):
             pass
+    if date_from:
+        query = query.filter(func.date(Refund.created_at) >= date_from)
+    if date_to:
+        query = query.filter(func.date(Refund.created_at) <= date_to)
+    return query
+
+
+def list_refunds(
+    db: Session,
+    hospital_id: uuid.UUID,
+    page: int = 1,
+    limit: int = 10,
+    status: Optional[str] = None,
+    invoice_id: Optional[str] = None,
+    patient_id: Optional[str] = None,
+) -> PaginatedRefundResponse:
+    query = _filtered_refunds(
+        db, hospital_id, status=status, invoice_id=invoice_id, patient_id=patient_id,
+    ).options(
+        joinedload(Refund.invoice),
+        joinedload(Refund.payment),
+        joinedload(Refund.patient),
+    )
     total = query.count()
     rows = query.order_by(Refund.created_at.desc()).offset((page - 1) * limit).limit(limit).all()
 
@@ -254,5 +270,34 @@ def list_refunds(
     )
 
 
+def export_refunds(db: Session, hospital_id: uuid.UUID, **filters):
+    """Column query for the refund export, oldest first; takes the _filtered_refunds filters."""
+    invoice = aliased(Invoice)
+    payment = aliased(Payment)
+    patient = aliased(Patient)
+    return (
+        _filtered_refunds(db, hospital_id, **filters)
+        .outerjoin(invoice, Refund.invoice_id == invoice.id)
+        .outerjoin(payment, Refund.payment_id == payment.id)
+        .outerjoin(patient, Refund.patient_id == patient.id)
+        .with_entities(
+            Refund.refund_number,
+            invoice.invoice_number,
+            payment.payment_number,
+            patient.patient_reference_number,
+            func.concat_ws(" ", patient.first_name, patient.last_name).label("patient_name"),
+            Refund.amount,
+            Refund.reason_code,
+            Refund.reason_detail,
+            Refund.status,
+            Refund.refund_mode,
+            Refund.refund_reference,
+            Refund.processed_at,
+            Refund.created_at,
+        )
+        .order_by(Refund.created_at, Refund.id)
+    )
+
+
 def get_refund_by_id(db: Session, refund_id: str | uuid.UUID) -> Optional[Refund]:
     return _load_refund(db, refund_id)
@@ -8,6 +8,7 @@ from typing import Optional
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
 
+from ..core.config_cache import HOSPITAL_SETTINGS, CachedRow, config_cache
 from ..models.hospital_settings import HospitalSettings
 
 logger = logging.getLogger(__name__)
@@ -68,6 +69,22 @@ def get_hospital_settings(db: Session, hospital_id: str | uuid.UUID) -> Optional
     ).first()
 
 
+def get_cached_hospital_settings(db: Session, hospital_id: str | uuid.UUID) -> Optional[CachedRow]:
+    """
+    Read-only snapshot of a hospital's settings from the config cache.
+    prescription_sequence is advanced without invalidating the cache, so read
+    it (and anything being edited) through get_hospital_settings instead.
+    """
+    if isinstance(hospital_id, str):
+        hospital_id = uuid.UUID(hospital_id)
+
+    def load() -> Optional[CachedRow]:
+        row = get_hospital_settings(db, hospital_id)
+        return CachedRow(row) if row else None
+
+    return config_cache.get(HOSPITAL_SETTINGS, hospital_id, load)
+
+
 def get_setting_value(
     db: Session,
     hospital_id: str | uuid.UUID,
@@ -75,7 +92,7 @@ def get_setting_value(
     default: str = ""
 ) -> str:
     """Get a specific setting value by key name."""
-    settings = get_hospital_settings(db, hospital_id)
+    settings = get_cached_hospital_settings(db, hospital_id)
     if not settings:
         return default
 
@@ -87,19 +104,19 @@ def get_setting_value(
 
 def get_appointment_slot_duration(db: Session, hospital_id: uuid.UUID) -> int:
     """Get appointment slot duration in minutes."""
-    settings = get_hospital_settings(db, hospital_id)
+    settings = get_cached_hospital_settings(db, hospital_id)
     return settings.appointment_slot_duration_minutes if settings else 15
 
 
 def get_appointment_buffer_minutes(db: Session, hospital_id: uuid.UUID) -> int:
     """Get buffer time between appointments in minutes."""
-    settings = get_hospital_settings(db, hospital_id)
+    settings = get_cached_hospital_settings(db, hospital_id)
     return settings.appointment_buffer_minutes if settings else 5
 
 
 def is_walk_in_allowed(db: Session, hospital_id: uuid.UUID) -> bool:
     """Check if walk-in appointments are allowed."""
-    settings = get_hospital_settings(db, hospital_id)
+    settings = get_cached_hospital_settings(db, hospital_id)
     return settings.allow_walk_in if settings else True
 
 
@@ -120,6 +137,7 @@ def update_hospital_settings(
         if hasattr(settings, key) and value is not None:
             setattr(settings, key, value)
 
+    config_cache.notify(db, HOSPITAL_SETTINGS, hospital_id)
     db.commit()
     db.refresh(settings)
     return settings
@@ -138,6 +156,7 @@ def create_hospital_settings(
         **kwargs,
     )
     db.add(settings)
+    config_cache.notify(db, HOSPITAL_SETTINGS, hospital_id)
     db.commit()
     db.refresh(settings)
     return settings
@@ -188,6 +207,7 @@ def update_setting(db: Session, key: str, value: str, user_id=None) -> Optional[
         typed_value = value
 
     setattr(settings, column, typed_value)
+    config_cache.notify(db, HOSPITAL_SETTINGS, settings.hospital_id)
     db.commit()
     db.refresh(settings)
 
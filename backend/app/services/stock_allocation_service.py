@@ -0,0 +1,305 @@
+"""
+Stock allocation service — FEFO batch allocation for every stock-out path.
+
+Counter sales, prescription dispensing, invoice issue and inventory
+adjustments all take stock out of medicine_batches. allocate_stock() does
+it for a whole request at once: the demands go to PostgreSQL as arrays and
+one statement locks the candidate batches, spreads each demand over them
+First-Expiry-First-Out, decrements the batches and returns the per-batch
+allocation. If any demand cannot be met nothing is changed and
+InsufficientStock is raised.
+
+A demand may name a batch to take from first (the batch the pharmacist
+picked) or only (invoice lines, explicit adjustments); named batches are
+served first. What the other demands still need covers an interval of
+their medicine's FEFO-ordered remaining stock, as each batch does, so the
+allocation is the overlap of the two — window sums and a join instead of a
+Python loop over ORM objects.
+
+Only the batches a demand needs are locked, with FOR UPDATE SKIP LOCKED,
+so a counter never waits on a batch another counter is selling from while
+it can use the next batch instead (under contention FEFO order is
+relaxed, never the expiry rule). Only when that leaves a demand
+short does it retry, locking every usable batch in id order and waiting,
+so stock that is merely busy is never reported as missing.
+
+The statement bypasses the ORM, so the medicine_stock_summary deltas are
+applied here and any loaded MedicineBatch is expired.
+"""
+import logging
+import uuid
+from collections import Counter
+from datetime import date
+from decimal import Decimal
+from typing import NamedTuple, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from ..models.pharmacy import MedicineBatch
+from .stock_summary_service import apply_stock_deltas, get_medicine_stock_map
+
+logger = logging.getLogger(__name__)
+
+
+class StockDemand(NamedTuple):
+    """Stock to take for one line. batch_id is taken from first, or only with batch_only."""
+    medicine_id: uuid.UUID
+    quantity: int
+    batch_id: Optional[uuid.UUID] = None
+    batch_only: bool = False
+
+
+class BatchAllocation(NamedTuple):
+    """Quantity taken from one batch for demands[line]."""
+    line: int
+    medicine_id: uuid.UUID
+    batch_id: uuid.UUID
+    batch_number: str
+    quantity: int
+    selling_price: Optional[Decimal]
+    expiry_date: date
+
+
+class Shortage(NamedTuple):
+    line: int
+    medicine_id: uuid.UUID
+    requested: int
+    available: int
+
+
+class InsufficientStock(ValueError):
+    """Some demands could not be met; no stock was taken."""
+
+    def __init__(self, shortages: list[Shortage]):
+        self.shortages = shortages
+        first = shortages[0]
+        super().__init__(
+            f"Insufficient stock for medicine {first.medicine_id}: "
+            f"requested {first.requested}, available {first.available}"
+        )
+
+
+def usable_batch_conditions() -> list:
+    """Filters for batches that can be sold or dispensed today (active, in stock, not expired)."""
+    return [
+        MedicineBatch.is_active == True,
+        MedicineBatch.quantity > 0,
+        MedicineBatch.is_expired.isnot(True),
+        MedicineBatch.expiry_date >= date.today(),
+    ]
+
+
+_USABLE = """b.is_active AND b.current_quantity > 0
+          AND (CAST(:include_expired AS boolean)
+               OR (b.is_expired IS NOT TRUE AND b.expiry_date >= CURRENT_DATE))"""
+
+_LOCKED_COLUMNS = "b.id, b.medicine_id, b.current_quantity AS qty, b.expiry_date, b.created_at"
+
+# Fast pass: per medicine, only the FEFO batches the demand needs by the
+# statement's snapshot, skipping any another transaction holds (the next
+# batches take their place); plus the named batches, also skipped if held.
+_LOCK_NEEDED = f"""SELECT x.*
+    FROM (
+        SELECT medicine_id, count(*) AS batches
+        FROM (
+            SELECT b.medicine_id, n.need,
+                   sum(b.current_quantity) OVER (
+                       PARTITION BY b.medicine_id ORDER BY b.expiry_date, b.created_at, b.id
+                   ) - b.current_quantity AS before
+            FROM medicine_batches b
+            JOIN (SELECT medicine_id, sum(qty) AS need FROM demand GROUP BY medicine_id) n
+              ON n.medicine_id = b.medicine_id
+            WHERE {_USABLE}
+        ) prefix
+        WHERE before < need
+        GROUP BY medicine_id
+    ) p
+    CROSS JOIN LATERAL (
+        SELECT {_LOCKED_COLUMNS}
+        FROM medicine_batches b
+        WHERE b.medicine_id = p.medicine_id AND {_USABLE}
+        ORDER BY b.expiry_date, b.created_at, b.id
+        LIMIT p.batches
+        FOR UPDATE SKIP LOCKED
+    ) x
+    UNION
+    SELECT named.*
+    FROM (
+        SELECT {_LOCKED_COLUMNS}
+        FROM medicine_batches b
+        WHERE b.id IN (SELECT batch_id FROM demand) AND {_USABLE}
+        FOR UPDATE SKIP LOCKED
+    ) named"""
+
+# Complete pass: every usable batch of the demanded medicines, waiting for
+# held ones, locked in id order.
+_LOCK_ALL = f"""SELECT {_LOCKED_COLUMNS}
+    FROM medicine_batches b
+    WHERE b.medicine_id IN (SELECT medicine_id FROM demand) AND {_USABLE}
+    ORDER BY b.id
+    FOR UPDATE"""
+
+
+_ALLOCATE_SQL = """
+WITH demand AS (
+    SELECT *
+    FROM unnest(
+        CAST(:lines AS int[]), CAST(:medicine_ids AS uuid[]), CAST(:quantities AS int[]),
+        CAST(:batch_ids AS uuid[]), CAST(:batch_only AS boolean[])
+    ) AS d(line, medicine_id, qty, batch_id, batch_only)
+),
+locked AS (
+    {locked}
+),
+-- lines naming a batch take from it first, in line order
+named_lines AS (
+    SELECT line, medicine_id, batch_id, qty,
+           sum(qty) OVER (PARTITION BY batch_id ORDER BY line) - qty AS start
+    FROM demand
+    WHERE batch_id IS NOT NULL
+),
+named_take AS (
+    SELECT n.line, l.id AS batch_id, -1 AS position,
+           LEAST(n.qty, GREATEST(l.qty - n.start, 0)) AS qty
+    FROM named_lines n
+    JOIN locked l ON l.id = n.batch_id AND l.medicine_id = n.medicine_id
+),
+-- the rest of every other line is spread FEFO over what is left
+pool_ranges AS (
+    SELECT id, medicine_id, sum(qty) OVER w - qty AS start, sum(qty) OVER w AS stop
+    FROM (
+        SELECT l.id, l.medicine_id, l.expiry_date, l.created_at,
+               l.qty - COALESCE((SELECT sum(t.qty) FROM named_take t WHERE t.batch_id = l.id), 0) AS qty
+        FROM locked l
+    ) pool
+    WHERE qty > 0
+    WINDOW w AS (PARTITION BY medicine_id ORDER BY expiry_date, created_at, id)
+),
+fefo_lines AS (
+    SELECT line, medicine_id, sum(qty) OVER w - qty AS start, sum(qty) OVER w AS stop
+    FROM (
+        SELECT d.line, d.medicine_id,
+               d.qty - COALESCE((SELECT sum(t.qty) FROM named_take t WHERE t.line = d.line), 0) AS qty
+        FROM demand d
+        WHERE NOT d.batch_only
+    ) rest
+    WHERE qty > 0
+    WINDOW w AS (PARTITION BY medicine_id ORDER BY line)
+),
+fefo_take AS (
+    SELECT f.line, p.id AS batch_id, p.start AS position,
+           LEAST(f.stop, p.stop) - GREATEST(f.start, p.start) AS qty
+    FROM fefo_lines f
+    JOIN pool_ranges p ON p.medicine_id = f.medicine_id AND p.start < f.stop AND f.start < p.stop
+),
+takes AS (
+    SELECT * FROM named_take WHERE qty > 0
+    UNION ALL
+    SELECT * FROM fefo_take
+),
+short AS (
+    SELECT d.line, d.medicine_id, d.qty AS requested, COALESCE(sum(t.qty), 0) AS available
+    FROM demand d
+    LEFT JOIN takes t ON t.line = d.line
+    GROUP BY d.line, d.medicine_id, d.qty
+    HAVING COALESCE(sum(t.qty), 0) < d.qty
+),
+updated AS (
+    UPDATE medicine_batches b
+    SET current_quantity = b.current_quantity - t.qty, updated_at = now()
+    FROM (SELECT batch_id, sum(qty) AS qty FROM takes GROUP BY batch_id) t
+    WHERE b.id = t.batch_id AND NOT EXISTS (SELECT 1 FROM short)
+    RETURNING b.id
+)
+SELECT TRUE AS allocated, t.line, b.medicine_id, b.id, b.batch_number, t.qty,
+       b.selling_price, b.expiry_date, t.position
+FROM takes t
+JOIN medicine_batches b ON b.id = t.batch_id
+WHERE NOT EXISTS (SELECT 1 FROM short)
+UNION ALL
+SELECT FALSE, line, medicine_id, NULL, NULL, requested, NULL, NULL, available
+FROM short
+ORDER BY 2, 9
+"""
+
+
+def _run_allocation(db: Session, params: dict, wait: bool) -> tuple[list[BatchAllocation], list[Shortage]]:
+    sql = text(_ALLOCATE_SQL.format(locked=_LOCK_ALL if wait else _LOCK_NEEDED))
+    allocations: list[BatchAllocation] = []
+    shortages: list[Shortage] = []
+    for row in db.execute(sql, params):
+        if row.allocated:
+            allocations.append(BatchAllocation(
+                row.line, row.medicine_id, row.id, row.batch_number,
+                int(row.qty), row.selling_price, row.expiry_date,
+            ))
+        else:
+            shortages.append(Shortage(row.line, row.medicine_id, int(row.qty), int(row.position)))
+    return allocations, shortages
+
+
+def allocate_stock(
+    db: Session,
+    demands: Sequence[StockDemand],
+    include_expired: bool = False,
+) -> list[BatchAllocation]:
+    """
+    Take every demand's quantity from its medicine's batches, FEFO, in one
+    statement. Returns the allocations in demand order (a demand spanning
+    several batches gets one allocation per batch). Raises InsufficientStock
+    without changing anything if any demand falls short. include_expired
+    lets adjustments write off expired batches.
+    """
+    if not demands:
+        return []
+    for demand in demands:
+        if demand.quantity <= 0:
+            raise ValueError("Allocation quantity must be positive")
+        if demand.batch_only and demand.batch_id is None:
+            raise ValueError("batch_only allocation needs a batch_id")
+
+    db.flush()  # sessions do not autoflush; batches written in this session must be visible
+    params = {
+        "lines": list(range(len(demands))),
+        "medicine_ids": [str(d.medicine_id) for d in demands],
+        "quantities": [int(d.quantity) for d in demands],
+        "batch_ids": [str(d.batch_id) if d.batch_id else None for d in demands],
+        "batch_only": [bool(d.batch_only) for d in demands],
+        "include_expired": include_expired,
+    }
+    savepoint = db.begin_nested()
+    allocations, shortages = _run_allocation(db, params, wait=False)
+    if shortages:
+        # Release the fast pass's locks (taken in FEFO, not id, order) before
+        # waiting on every batch, so two counters cannot deadlock.
+        savepoint.rollback()
+        logger.debug("Stock allocation short on unlocked batches; retrying with a waiting lock")
+        allocations, shortages = _run_allocation(db, params, wait=True)
+    else:
+        savepoint.commit()
+    if shortages:
+        raise InsufficientStock(shortages)
+
+    deltas: Counter = Counter()
+    for allocation in allocations:
+        deltas[allocation.medicine_id] -= allocation.quantity
+        batch = db.identity_map.get(identity_key(MedicineBatch, allocation.batch_id))
+        if batch is not None:
+            db.expire(batch, ["quantity", "updated_at"])
+    apply_stock_deltas(db, deltas)
+    return allocations
+
+
+def balances_after(db: Session, allocations: Sequence[BatchAllocation]) -> list[int]:
+    """Medicine stock left after each allocation, in order — for StockMovement.balance_after."""
+    stock = get_medicine_stock_map(db, {a.medicine_id for a in allocations})
+    still_to_apply: Counter = Counter()
+    for allocation in allocations:
+        still_to_apply[allocation.medicine_id] += allocation.quantity
+    balances = []
+    for allocation in allocations:
+        still_to_apply[allocation.medicine_id] -= allocation.quantity
+        balances.append(stock.get(allocation.medicine_id, 0) + still_to_apply[allocation.medicine_id])
+    return balances
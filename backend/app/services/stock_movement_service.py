@@ -0,0 +1,176 @@
+"""
+Stock movement service — latest balances and monthly partition upkeep.
+
+stock_movements is range-partitioned by month on created_at (see
+01_schema.sql). Each month gets a stock_movements_YYYY_MM partition,
+created ahead of time by stock_movements_ensure_partition(); rows outside
+every monthly partition land in stock_movements_default and are moved out
+when their month's partition is created.
+
+Closed months older than the retention period are archived: their rows are
+rolled into stock_movement_monthly_snapshots (per item: movement count,
+quantities in and out, closing balance) and the partition is detached from
+stock_movements — kept as a standalone table, or dropped. Lookups and
+listings then only touch the months still attached, and last_balance()
+falls back to the snapshots for items idle since their months were archived.
+
+Run from backend/ (monthly, e.g. from cron):
+    python -m app.cli ensure-stock-movement-partitions [--months-ahead N]
+    python -m app.cli archive-stock-movements --keep-months N [--drop]
+"""
+import logging
+import re
+import uuid
+from datetime import date
+from typing import NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..models.inventory import StockMovement, StockMovementMonthlySnapshot
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MONTHS_AHEAD = 2
+_PARTITION_NAME = re.compile(r"^stock_movements_(\d{4})_(\d{2})$")
+
+
+class ArchivedMonth(NamedTuple):
+    partition: str
+    month: date
+    movements: int
+    snapshots: int
+    dropped: bool
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+# ── Balances ───────────────────────────────────────────────────────────────
+
+def last_balance(db: Session, hospital_id: uuid.UUID, item_type: str, item_id: uuid.UUID) -> int:
+    """
+    balance_after of the item's latest movement, or the closing balance of
+    its latest archived month if no attached month has one; 0 if neither.
+    """
+    balance = (
+        db.query(StockMovement.balance_after)
+        .filter(
+            StockMovement.hospital_id == hospital_id,
+            StockMovement.item_type == item_type,
+            StockMovement.item_id == item_id,
+        )
+        .order_by(StockMovement.created_at.desc())
+        .limit(1)
+        .scalar()
+    )
+    if balance is not None:
+        return balance
+    balance = (
+        db.query(StockMovementMonthlySnapshot.closing_balance)
+        .filter(
+            StockMovementMonthlySnapshot.hospital_id == hospital_id,
+            StockMovementMonthlySnapshot.item_type == item_type,
+            StockMovementMonthlySnapshot.item_id == item_id,
+        )
+        .order_by(StockMovementMonthlySnapshot.month.desc())
+        .limit(1)
+        .scalar()
+    )
+    return balance or 0
+
+
+# ── Partitions ─────────────────────────────────────────────────────────────
+
+def list_partitions(db: Session) -> list[tuple[str, date]]:
+    """Monthly partitions attached to stock_movements, oldest first."""
+    rows = db.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'stock_movements'::regclass
+    """)).scalars()
+    partitions = []
+    for name in rows:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match[1]), int(match[2]), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def ensure_partitions(db: Session, months_ahead: int = DEFAULT_MONTHS_AHEAD, today: Optional[date] = None) -> list[str]:
+    """
+    Create the partitions for this month and the next months_ahead, and for
+    every month with rows in the default partition. Returns their names.
+    """
+    this_month = (today or date.today()).replace(day=1)
+    months = {_add_months(this_month, n) for n in range(months_ahead + 1)}
+    months.update(db.execute(text("""
+        SELECT DISTINCT CAST(date_trunc('month', created_at) AS date) FROM stock_movements_default
+    """)).scalars())
+    names = [
+        db.execute(text("SELECT stock_movements_ensure_partition(:month)"), {"month": month}).scalar()
+        for month in sorted(months)
+    ]
+    return names
+
+
+# ── Archive ────────────────────────────────────────────────────────────────
+
+_SNAPSHOT_SQL = """
+INSERT INTO stock_movement_monthly_snapshots (
+    hospital_id, item_type, item_id, month,
+    movements, quantity_in, quantity_out, closing_balance, last_movement_at
+)
+SELECT hospital_id, item_type, item_id, CAST(:month AS date),
+       count(*), sum(GREATEST(quantity, 0)), sum(GREATEST(-quantity, 0)),
+       (array_agg(balance_after ORDER BY created_at DESC))[1],
+       max(created_at)
+FROM "{partition}"
+GROUP BY hospital_id, item_type, item_id
+ON CONFLICT (hospital_id, item_type, item_id, month) DO UPDATE SET
+    movements = EXCLUDED.movements,
+    quantity_in = EXCLUDED.quantity_in,
+    quantity_out = EXCLUDED.quantity_out,
+    closing_balance = EXCLUDED.closing_balance,
+    last_movement_at = EXCLUDED.last_movement_at
+"""
+
+
+def archive_stock_movements(
+    db: Session,
+    keep_months: int,
+    drop: bool = False,
+    today: Optional[date] = None,
+) -> list[ArchivedMonth]:
+    """
+    Roll every attached month older than the last keep_months (the current
+    month counts as one) into monthly snapshots and detach its partition;
+    drop=True also drops the detached table. Each month is committed on
+    its own, so an interrupted run can simply be repeated.
+    """
+    if keep_months < 1:
+        raise ValueError("keep_months must be at least 1; the current month is never archived")
+    cutoff = _add_months((today or date.today()).replace(day=1), 1 - keep_months)
+
+    ensure_partitions(db, today=today)  # old rows still in the default partition get their month
+    db.commit()
+
+    archived = []
+    for partition, month in list_partitions(db):
+        if month >= cutoff:
+            break
+        movements = db.execute(text(f'SELECT count(*) FROM "{partition}"')).scalar()
+        snapshots = db.execute(text(_SNAPSHOT_SQL.format(partition=partition)), {"month": month}).rowcount
+        db.execute(text(f'ALTER TABLE stock_movements DETACH PARTITION "{partition}"'))
+        if drop:
+            db.execute(text(f'DROP TABLE "{partition}"'))
+        db.commit()
+        logger.info(
+            f"Archived {partition}: {movements} movements into {snapshots} snapshots"
+            f"{' (dropped)' if drop else ' (detached)'}"
+        )
+        archived.append(ArchivedMonth(partition, month, movements, snapshots, drop))
+    return archived
@@ -0,0 +1,195 @@
+"""
+Stock summary service — maintains medicine_stock_summary.
+
+medicine_stock_summary holds, per medicine, the sum of active batch
+quantities that stock reads used to recompute with SUM(medicine_batches).
+A flush hook turns every inserted / changed / deleted MedicineBatch into a
+quantity delta for its medicine and applies it in the same transaction, so
+inventory adjustments, invoice deductions, counter sales, dispensing, PO
+receipts and GRN acceptance all keep it current without extra calls.
+
+`reconcile_stock_summary` compares the summary with the batch table and can
+repair drift; run it with `python -m app.cli reconcile-stock-summary`.
+"""
+import logging
+import uuid
+from collections import Counter
+from typing import Iterable, Optional
+
+from sqlalchemy import event, func, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from ..models.pharmacy import MedicineBatch, MedicineStockSummary
+from ..models.prescription import Medicine
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "stock_summary_deltas"
+
+
+# ── Reads ──────────────────────────────────────────────────────────────────
+
+def get_medicine_stock(db: Session, medicine_id: uuid.UUID) -> int:
+    """Current stock of one medicine (sum of active batch quantities)."""
+    db.flush()  # sessions do not autoflush; count this session's batch writes
+    quantity = db.query(MedicineStockSummary.quantity).filter(
+        MedicineStockSummary.medicine_id == medicine_id,
+    ).scalar()
+    return int(quantity or 0)
+
+
+def get_medicine_stock_map(db: Session, medicine_ids: Iterable[uuid.UUID]) -> dict[uuid.UUID, int]:
+    """Current stock keyed by medicine id; medicines without batches are omitted."""
+    medicine_ids = list(medicine_ids)
+    if not medicine_ids:
+        return {}
+    db.flush()
+    rows = db.query(MedicineStockSummary.medicine_id, MedicineStockSummary.quantity).filter(
+        MedicineStockSummary.medicine_id.in_(medicine_ids),
+    ).all()
+    return {medicine_id: int(quantity or 0) for medicine_id, quantity in rows}
+
+
+# ── Incremental maintenance ────────────────────────────────────────────────
+
+def _contribution(quantity, is_active) -> int:
+    """What one batch adds to its medicine's stock."""
+    if is_active is False:
+        return 0
+    return int(quantity or 0)
+
+
+def _stored_batches(session: Session, batch_ids: list) -> dict:
+    """(medicine_id, contribution) of batches as currently stored (before this flush)."""
+    if not batch_ids:
+        return {}
+    rows = session.execute(
+        select(MedicineBatch.id, MedicineBatch.medicine_id, MedicineBatch.quantity, MedicineBatch.is_active)
+        .where(MedicineBatch.id.in_(batch_ids))
+    ).all()
+    return {row[0]: (row[1], _contribution(row[2], row[3])) for row in rows}
+
+
+_APPLY_DELTAS_SQL = text("""
+INSERT INTO medicine_stock_summary (medicine_id, hospital_id, quantity)
+SELECT m.id, m.hospital_id, d.delta
+FROM unnest(CAST(:medicine_ids AS uuid[]), CAST(:deltas AS int[])) AS d(medicine_id, delta)
+JOIN medicines m ON m.id = d.medicine_id
+ORDER BY m.id
+ON CONFLICT (medicine_id) DO UPDATE
+SET quantity = medicine_stock_summary.quantity + EXCLUDED.quantity, updated_at = now()
+""")
+
+
+def apply_stock_deltas(session: Session, deltas: Counter) -> None:
+    """Add each medicine's delta to its summary row, creating rows as needed."""
+    # One statement for every medicine; rows are locked in medicine id order
+    # so concurrent writers cannot deadlock.
+    changes = sorted(
+        ((medicine_id, delta) for medicine_id, delta in deltas.items() if medicine_id is not None and delta),
+        key=lambda item: str(item[0]),
+    )
+    if not changes:
+        return
+    session.execute(_APPLY_DELTAS_SQL, {
+        "medicine_ids": [str(medicine_id) for medicine_id, _ in changes],
+        "deltas": [int(delta) for _, delta in changes],
+    })
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_batch_changes(session: Session, flush_context, instances) -> None:
+    # Old values are read here, while the database still holds them; the
+    # deltas are applied after the flush so new medicines already exist.
+    session.info.pop(_PENDING_KEY, None)
+    new = [o for o in session.new if isinstance(o, MedicineBatch)]
+    dirty = [o for o in session.dirty if isinstance(o, MedicineBatch) and session.is_modified(o)]
+    deleted = [o for o in session.deleted if isinstance(o, MedicineBatch)]
+    if not (new or dirty or deleted):
+        return
+
+    deltas: Counter = Counter()
+    for batch in new:
+        deltas[batch.medicine_id] += _contribution(batch.quantity, batch.is_active)
+
+    stored = _stored_batches(session, [b.id for b in dirty + deleted if b.id is not None])
+    for batch in dirty:
+        if batch.id in stored:
+            old_medicine_id, old_contribution = stored[batch.id]
+            deltas[old_medicine_id] -= old_contribution
+        deltas[batch.medicine_id] += _contribution(batch.quantity, batch.is_active)
+    for batch in deleted:
+        if batch.id in stored:
+            old_medicine_id, old_contribution = stored[batch.id]
+            deltas[old_medicine_id] -= old_contribution
+
+    session.info[_PENDING_KEY] = deltas
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_batch_changes(session: Session, flush_context) -> None:
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if deltas:
+        apply_stock_deltas(session, deltas)
+
+
+# ── Reconciliation ─────────────────────────────────────────────────────────
+
+def reconcile_stock_summary(
+    db: Session,
+    hospital_id: Optional[uuid.UUID] = None,
+    repair: bool = False,
+) -> list[dict]:
+    """
+    Compare medicine_stock_summary with SUM(active batch quantity) per medicine.
+    Returns the medicines that disagree; with repair=True their summary rows
+    are rewritten from the batch table (caller commits).
+    """
+    if repair:
+        # Hold off incremental updates so the comparison and the fix agree.
+        db.execute(text("LOCK TABLE medicine_stock_summary IN SHARE ROW EXCLUSIVE MODE"))
+
+    batch_totals = (
+        select(MedicineBatch.medicine_id, func.sum(MedicineBatch.quantity).label("quantity"))
+        .where(MedicineBatch.is_active == True)
+        .group_by(MedicineBatch.medicine_id)
+        .subquery()
+    )
+    actual = func.coalesce(batch_totals.c.quantity, 0)
+    recorded = func.coalesce(MedicineStockSummary.quantity, 0)
+    query = (
+        db.query(Medicine.id, Medicine.hospital_id, MedicineStockSummary.quantity, actual)
+        .outerjoin(batch_totals, batch_totals.c.medicine_id == Medicine.id)
+        .outerjoin(MedicineStockSummary, MedicineStockSummary.medicine_id == Medicine.id)
+        .filter(recorded != actual)
+    )
+    if hospital_id:
+        query = query.filter(Medicine.hospital_id == hospital_id)
+
+    mismatches = [
+        {
+            "medicine_id": medicine_id,
+            "hospital_id": med_hospital_id,
+            "summary_quantity": summary_quantity,
+            "batch_quantity": int(batch_quantity),
+        }
+        for medicine_id, med_hospital_id, summary_quantity, batch_quantity in query.all()
+    ]
+
+    for row in mismatches:
+        logger.warning(
+            "Stock summary drift medicine=%s summary=%s batches=%s",
+            row["medicine_id"], row["summary_quantity"], row["batch_quantity"],
+        )
+        if repair:
+            stmt = pg_insert(MedicineStockSummary).values(
+                medicine_id=row["medicine_id"],
+                hospital_id=row["hospital_id"],
+                quantity=row["batch_quantity"],
+            )
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[MedicineStockSummary.medicine_id],
+                set_={"quantity": stmt.excluded.quantity, "updated_at": func.now()},
+            ))
+    return mismatches
@@ -8,6 +8,7 @@ from math import ceil
 from datetime import date
 from typing import Optional
 
+from ..core.config_cache import TAX_CONFIGURATIONS, CachedRow, config_cache
 from ..models.tax_config import TaxConfiguration
 from ..schemas.tax_config import (
     TaxConfigCreate, TaxConfigUpdate, TaxConfigResponse, PaginatedTaxConfigResponse
@@ -25,18 +26,39 @@ def get_tax_config_by_id(db: Session, tax_id: str | uuid.UUID) -> Optional[TaxCo
     return db.query(TaxConfiguration).filter(TaxConfiguration.id == tax_id).first()
 
 
-def get_active_tax_configs(db: Session, hospital_id: uuid.UUID) -> list[TaxConfiguration]:
-    today = date.today()
-    return (
-        db.query(TaxConfiguration)
-        .filter(
-            TaxConfiguration.hospital_id == hospital_id,
-            TaxConfiguration.is_active == True,
-            TaxConfiguration.effective_from <= today,
+def _cached_tax_configs(db: Session, hospital_id: uuid.UUID) -> dict[uuid.UUID, CachedRow]:
+    """All of a hospital's tax configurations, by id in name order, from the config cache."""
+
+    def load() -> dict[uuid.UUID, CachedRow]:
+        rows = (
+            db.query(TaxConfiguration)
+            .filter(TaxConfiguration.hospital_id == hospital_id)
+            .order_by(TaxConfiguration.name)
+            .all()
         )
-        .order_by(TaxConfiguration.name)
-        .all()
-    )
+        return {r.id: CachedRow(r) for r in rows}
+
+    return config_cache.get(TAX_CONFIGURATIONS, hospital_id, load)
+
+
+def get_cached_tax_config(
+    db: Session, hospital_id: uuid.UUID, tax_id: str | uuid.UUID
+) -> Optional[CachedRow]:
+    """Read-only snapshot of one of the hospital's tax configurations."""
+    if isinstance(tax_id, str):
+        try:
+            tax_id = uuid.UUID(tax_id)
+        except ValueError:
+            return None
+    return _cached_tax_configs(db, hospital_id).get(tax_id)
+
+
+def get_active_tax_configs(db: Session, hospital_id: uuid.UUID) -> list[CachedRow]:
+    today = date.today()
+    return [
+        tc for tc in _cached_tax_configs(db, hospital_id).values()
+        if tc.is_active and tc.effective_from <= today
+    ]
 
 
 def list_tax_configs(
@@ -83,6 +105,7 @@ def create_tax_config(
         effective_to=data.effective_to,
     )
     db.add(record)
+    config_cache.notify(db, TAX_CONFIGURATIONS, hospital_id)
     db.commit()
     db.refresh(record)
     logger.info(f"Created tax config {record.code} (id={record.id})")
@@ -93,6 +116,7 @@ def update_tax_config(db: Session, record: TaxConfiguration, data: TaxConfigUpda
     update_data = data.model_dump(exclude_unset=True)
     for k, v in update_data.items():
         setattr(record, k, v)
+    config_cache.notify(db, TAX_CONFIGURATIONS, record.hospital_id)
     db.commit()
     db.refresh(record)
     return record
@@ -100,6 +124,7 @@ def update_tax_config(db: Session, record: TaxConfiguration, data: TaxConfigUpda
 
 def toggle_tax_config(db: Session, record: TaxConfiguration) -> TaxConfiguration:
     record.is_active = not record.is_active
+    config_cache.notify(db, TAX_CONFIGURATIONS, record.hospital_id)
     db.commit()
     db.refresh(record)
     return record
@@ -3,8 +3,8 @@ User service — works with new hms_db UUID/RBAC schema.
 """
 import logging
 import os
-import shutil
 import uuid
+from concurrent.futures import Future
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import or_
 from math import ceil
@@ -14,22 +14,17 @@ from fastapi import UploadFile, HTTPException, status
 from ..models.user import User, UserRole, Role, Hospital
 from ..models.appointment import Doctor
 from ..utils.security import get_password_hash
+from ..core.image_pool import image_processor
+from ..core.principal_cache import principal_cache
 from ..services.patient_id_service import generate_staff_id
 
 logger = logging.getLogger(__name__)
 
-# Upload directory configuration
-UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "uploads", "photos")
-ALLOWED_PHOTO_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif"}
+# Photo upload limits (processing and storage: core/image_pool.py)
+ALLOWED_PHOTO_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
 MAX_PHOTO_SIZE_MB = 2
 
 
-def ensure_upload_directory():
-    """Create upload directory if it doesn't exist"""
-    if not os.path.exists(UPLOAD_DIR):
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
-
-
 def list_users(
     db: Session,
     page: int = 1,
@@ -202,6 +197,7 @@ def update_user(db: Session, user_id: str | uuid.UUID, **kwargs) -> Optional[Use
             setattr(user, key, value)
     
     db.commit()
+    principal_cache.invalidate_user(user.id)
     db.refresh(user)
     logger.info("Updated user: %s (fields: %s)", user.username, list(kwargs.keys()))
     return user
@@ -215,6 +211,7 @@ def reset_password(db: Session, user_id: str | uuid.UUID, new_password: str) ->
         return None
     user.password_hash = get_password_hash(new_password)
     db.commit()
+    principal_cache.invalidate_user(user.id)
     db.refresh(user)
     logger.info("Password reset for user: %s", user.username)
     return user
@@ -229,16 +226,14 @@ def delete_user(db: Session, user_id: str | uuid.UUID) -> Optional[User]:
     user.is_deleted = True
     user.deleted_at = datetime.now()
     db.commit()
+    principal_cache.invalidate_user(user.id)
     
     logger.info(f"Soft deleted user: {user.username}")
     return user
 
 
-def save_user_photo(db: Session, user_id: str | uuid.UUID, file: UploadFile) -> dict:
-    """Save user photo file and update database"""
-    ensure_upload_directory()
-
-    # Validate file extension
+def process_user_photo(file: UploadFile) -> Future:
+    """Validate a photo upload and queue it for processing; Future of the avatar URL."""
     file_ext = os.path.splitext(file.filename)[1].lower()
     if file_ext not in ALLOWED_PHOTO_EXTENSIONS:
         raise HTTPException(
@@ -246,10 +241,6 @@ def save_user_photo(db: Session, user_id: str | uuid.UUID, file: UploadFile) ->
             detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_PHOTO_EXTENSIONS)}"
         )
 
-    # Normalize extension: .jpeg -> .jpg for consistency
-    if file_ext == '.jpeg':
-        file_ext = '.jpg'
-
     # Check file size
     file.file.seek(0, 2)
     file_size_bytes = file.file.tell()
@@ -262,36 +253,29 @@ def save_user_photo(db: Session, user_id: str | uuid.UUID, file: UploadFile) ->
             detail=f"File too large. Maximum size: {MAX_PHOTO_SIZE_MB}MB"
         )
 
+    # Decoded, stripped of metadata and resized in the image worker processes
+    return image_processor.submit("photo", file.file.read())
+
+
+def save_user_photo(db: Session, user_id: str | uuid.UUID, avatar_url: str) -> dict:
+    """Point the user at a processed photo (process_user_photo) and drop the old one"""
     user = get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    # Delete old photo if exists
-    if user.avatar_url:
-        old_photo_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), user.avatar_url.lstrip('/'))
-        if os.path.exists(old_photo_path):
-            try:
-                os.remove(old_photo_path)
-            except Exception:
-                pass
-
-    # Generate unique filename with normalized extension
-    filename = f"user_{user.id}_{int(datetime.now().timestamp())}{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to save photo: {str(e)}"
-        )
-
-    user.avatar_url = f"/uploads/photos/{filename}"
+    old_avatar_url = user.avatar_url
+    user.avatar_url = avatar_url
     db.commit()
     db.refresh(user)
+    principal_cache.invalidate_user(user.id)
+
+    # Identical uploads share files, so only remove the old photo once nobody uses it
+    if old_avatar_url and old_avatar_url != avatar_url:
+        in_use = db.query(User.id).filter(User.avatar_url == old_avatar_url).first()
+        if not in_use:
+            image_processor.discard(old_avatar_url)
 
+    filename = os.path.basename(avatar_url)
     logger.info(f"Saved photo for user {user.id}: {filename}")
 
     return {
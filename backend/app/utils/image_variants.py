@@ -0,0 +1,100 @@
+"""
+Pillow pipeline for uploaded images: user photos and the hospital logo.
+
+process() decodes an upload, applies its EXIF orientation, drops all
+metadata (EXIF/GPS, ICC profiles, comments) by re-encoding bare pixels,
+and writes every size of VARIANTS[kind] in the kind's fallback format and
+as WebP. It runs in the image worker processes (core/image_pool.py), so
+it must not touch the database or any other app state.
+
+Files are named <digest>[-<size>].<ext> under <uploads>/<dir>/<2 hex>/;
+the unsuffixed fallback file is the main variant and is written last, so
+its presence means the whole set is on disk.
+
+Bump PIPELINE_VERSION whenever the output changes: it is part of the
+content address, so images processed the old way stop matching.
+"""
+import io
+import os
+
+from PIL import Image, ImageOps
+
+PIPELINE_VERSION = 1
+
+VARIANTS: dict[str, dict] = {
+    # Profile pages and ID cards use the main size; staff lists and the
+    # header avatar ask for ?size=thumb.
+    "photo": {"dir": "photos", "format": "JPEG", "ext": "jpg", "sizes": {"": 512, "small": 192, "thumb": 96}},
+    "logo": {"dir": "hospital", "format": "PNG", "ext": "png", "sizes": {"": 512, "thumb": 128}},
+}
+
+_SAVE_OPTIONS = {
+    "JPEG": {"quality": 85, "optimize": True, "progressive": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 80, "method": 4},
+}
+
+
+def file_name(digest: str, size: str, ext: str) -> str:
+    return f"{digest}-{size}.{ext}" if size else f"{digest}.{ext}"
+
+
+def relative_dir(kind: str, digest: str) -> str:
+    return f"{VARIANTS[kind]['dir']}/{digest[:2]}"
+
+
+def _decode(content: bytes, max_pixels: int) -> Image.Image:
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            image.seek(0)  # first frame of an animated GIF
+            oriented = ImageOps.exif_transpose(image)
+            oriented.load()
+    except Image.DecompressionBombError:
+        raise ValueError("Image dimensions are too large")
+    except (OSError, SyntaxError, EOFError):
+        raise ValueError("File is not a valid image")
+    return oriented
+
+
+def _normalize(image: Image.Image, keep_alpha: bool) -> Image.Image:
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if has_alpha:
+        image = image.convert("RGBA")
+        if keep_alpha:
+            return image
+        flat = Image.new("RGB", image.size, (255, 255, 255))
+        flat.paste(image, mask=image.getchannel("A"))
+        return flat
+    return image.convert("RGB")
+
+
+def _write(image: Image.Image, path: str, fmt: str) -> int:
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **_SAVE_OPTIONS[fmt])
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(buffer.getvalue())
+    os.replace(temporary, path)
+    return buffer.tell()
+
+
+def process(kind: str, content: bytes, uploads_dir: str, digest: str, max_pixels: int) -> dict:
+    """Write every variant of one upload; returns {"width", "height", "bytes"} of the output."""
+    spec = VARIANTS[kind]
+    image = _normalize(_decode(content, max_pixels), keep_alpha=spec["format"] == "PNG")
+    directory = os.path.join(uploads_dir, relative_dir(kind, digest))
+    os.makedirs(directory, exist_ok=True)
+
+    written = 0
+    main = None
+    # Smallest first: the unsuffixed main file must be the last one written.
+    for size, edge in sorted(spec["sizes"].items(), key=lambda s: s[1]):
+        variant = image.copy()
+        variant.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        variant.info = {}
+        written += _write(variant, os.path.join(directory, file_name(digest, size, "webp")), "WEBP")
+        written += _write(variant, os.path.join(directory, file_name(digest, size, spec["ext"])), spec["format"])
+        if not size:
+            main = variant
+    return {"width": main.width, "height": main.height, "bytes": written}
@@ -0,0 +1,114 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+OFFSET pagination reads and throws away every row before the requested
+page, and the page count needs a full COUNT(*); both get slower as the
+table grows. Cursor mode orders by (created_at DESC, id DESC) and continues
+after the last row of the previous page with a row-value comparison, which
+an index on (..., created_at DESC, id DESC) answers at any depth. id breaks
+ties between rows created in the same transaction.
+
+Cursors are opaque to clients. Send an empty cursor (?cursor=) for the
+first page, then the next_cursor of each response; it is None on the last
+page.
+
+The count is chosen separately with ?count=:
+  exact     COUNT(*) over the filtered rows (offset mode's only option)
+  estimate  the planner's row estimate for the filtered query, read from
+            pg_class / pg_statistic; instant but approximate
+  none      skip counting, total is None (cursor mode default)
+"""
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import Select, tuple_
+from sqlalchemy.orm import Query, Session
+from sqlalchemy.sql.elements import ColumnElement
+
+COUNT_EXACT = "exact"
+COUNT_ESTIMATE = "estimate"
+COUNT_NONE = "none"
+COUNT_PATTERN = "^(exact|estimate|none)$"
+
+
+class InvalidCursor(ValueError):
+    """The cursor was not issued by this API (or has been tampered with)."""
+
+
+def encode_cursor(created_at: datetime, row_id: uuid.UUID) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, _, row_id = raw.partition("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Invalid pagination cursor") from None
+
+
+def resolve_count_mode(cursor: Optional[str], count: Optional[str]) -> str:
+    """Default count mode: exact for offset pages, none for cursor pages."""
+    if count:
+        return count
+    return COUNT_EXACT if cursor is None else COUNT_NONE
+
+
+def keyset_condition(created_col, id_col, cursor: str) -> Optional[ColumnElement]:
+    """WHERE clause for the rows after cursor; None for the first page."""
+    if not cursor:
+        return None
+    created_at, row_id = decode_cursor(cursor)
+    return tuple_(created_col, id_col) < tuple_(created_at, row_id)
+
+
+def keyset_order(created_col, id_col) -> list[ColumnElement]:
+    return [created_col.desc(), id_col.desc()]
+
+
+def split_page(rows: Sequence[Any], limit: int, created_col, id_col) -> tuple[list, Optional[str]]:
+    """Trim a limit + 1 fetch to the page and build next_cursor from its last row."""
+    rows = list(rows)
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
+
+
+def keyset_page(query: Query, created_col, id_col, cursor: str, limit: int) -> tuple[list, Optional[str]]:
+    """One cursor page of an ORM query: (rows, next_cursor)."""
+    condition = keyset_condition(created_col, id_col, cursor)
+    if condition is not None:
+        query = query.filter(condition)
+    rows = query.order_by(*keyset_order(created_col, id_col)).limit(limit + 1).all()
+    return split_page(rows, limit, created_col, id_col)
+
+
+def estimate_count(db: Session, statement: Select) -> int:
+    """Planner row estimate for a SELECT, without running it."""
+    compiled = statement.order_by(None).compile(
+        dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+    plan = db.connection().exec_driver_sql(
+        "EXPLAIN (FORMAT JSON) " + str(compiled).replace("%", "%%")
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_query(query: Query, mode: str) -> Optional[int]:
+    """Row count of an ORM query in the requested count mode."""
+    if mode == COUNT_NONE:
+        return None
+    if mode == COUNT_ESTIMATE:
+        return estimate_count(query.session, query.statement)
+    return query.count()
+
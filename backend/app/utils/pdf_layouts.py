@@ -0,0 +1,303 @@
+"""
+ReportLab page layouts for printable documents.
+
+Each layout turns a JSON-safe dict (built by services/pdf_service.py) into
+PDF bytes. Layouts run in the PDF worker processes (core/pdf_pool.py), so
+they must not touch the database or any other app state — everything they
+draw is in the dict, and the same dict always gives the same document.
+
+Bump LAYOUT_VERSION whenever a layout's output changes: it is part of the
+content address, so cached files drawn by the old layout stop matching.
+"""
+import io
+import os
+from typing import Callable
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+LAYOUT_VERSION = 1
+
+PRIMARY = colors.HexColor("#137fec")
+ID_CARD_BLUE = colors.HexColor("#0284c7")
+MUTED = colors.HexColor("#64748b")
+TEXT = colors.HexColor("#1e293b")
+RULE = colors.HexColor("#e2e8f0")
+PANEL = colors.HexColor("#f1f5f9")
+ALERT = "#dc2626"
+
+ID_CARD_SIZE = (85.6 * mm, 54 * mm)  # ISO/IEC 7810 ID-1
+
+_fonts: dict[str, tuple[str, str]] = {}
+
+
+def fonts(font_path: str = "") -> tuple[str, str]:
+    """(regular, bold) font names; font_path registers a TTF for non-Latin text."""
+    if not font_path:
+        return "Helvetica", "Helvetica-Bold"
+    if font_path not in _fonts:
+        bold_path = font_path.replace("Regular", "Bold")
+        pdfmetrics.registerFont(TTFont("Body", font_path))
+        bold = "Body"
+        if bold_path != font_path and os.path.exists(bold_path):
+            pdfmetrics.registerFont(TTFont("Body-Bold", bold_path))
+            bold = "Body-Bold"
+        _fonts[font_path] = ("Body", bold)
+    return _fonts[font_path]
+
+
+def _styles(font_path: str) -> dict[str, ParagraphStyle]:
+    regular, bold = fonts(font_path)
+    base = ParagraphStyle("body", fontName=regular, fontSize=9.5, leading=12.5, textColor=TEXT)
+    return {
+        "body": base,
+        "bold": ParagraphStyle("bold", parent=base, fontName=bold),
+        "small": ParagraphStyle("small", parent=base, fontSize=8, leading=10, textColor=MUTED),
+        "title": ParagraphStyle("title", parent=base, fontName=bold, fontSize=17, leading=21,
+                                textColor=PRIMARY, alignment=1),
+        "center": ParagraphStyle("center", parent=base, textColor=MUTED, alignment=1),
+        "right": ParagraphStyle("right", parent=base, alignment=2),
+        "right_bold": ParagraphStyle("right_bold", parent=base, fontName=bold, alignment=2),
+        "th": ParagraphStyle("th", parent=base, fontName=bold),
+    }
+
+
+def _p(text, style: ParagraphStyle) -> Paragraph:
+    return Paragraph(escape(str(text if text not in (None, "") else "—")), style)
+
+
+def _labelled(label: str, value, s: dict) -> Paragraph:
+    value = value if value not in (None, "") else "—"
+    return Paragraph(f'<font name="{s["th"].fontName}">{escape(label)}:</font> {escape(str(value))}', s["body"])
+
+
+def _letterhead(hospital: dict, labels: dict, s: dict) -> list:
+    return [
+        _p(hospital["name"], s["title"]),
+        Spacer(1, 3),
+        _p(f"{hospital['address']}, {hospital['city']}", s["center"]),
+        _p(f"{labels['phone']}: {hospital['phone']} | {labels['email']}: {hospital['email']}", s["center"]),
+        Spacer(1, 6),
+        Table([[""]], colWidths=["100%"], rowHeights=[2],
+              style=[("LINEBELOW", (0, 0), (-1, -1), 2, PRIMARY)]),
+        Spacer(1, 10),
+    ]
+
+
+def _panel(rows: list, background) -> Table:
+    table = Table([[row] for row in rows], colWidths=["100%"])
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, -1), background),
+        ("LEFTPADDING", (0, 0), (-1, -1), 10),
+        ("RIGHTPADDING", (0, 0), (-1, -1), 10),
+        ("TOPPADDING", (0, 0), (0, 0), 8),
+        ("BOTTOMPADDING", (0, -1), (-1, -1), 8),
+    ]))
+    return table
+
+
+def _build(story: list, pagesize=A4, margin: float = 15 * mm, title: str = "") -> bytes:
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=pagesize, title=title,
+        leftMargin=margin, rightMargin=margin, topMargin=margin, bottomMargin=margin,
+        # Fixed metadata keeps the bytes a pure function of the input.
+        invariant=1,
+    )
+    doc.build(story)
+    return buffer.getvalue()
+
+
+# ── Prescription ──────────────────────────────────────────────────────────
+
+def prescription_pdf(data: dict) -> bytes:
+    s = _styles(data.get("font_path", ""))
+    t, rx, hospital = data["labels"], data["rx"], data["hospital"]
+    story = _letterhead(hospital, t, s)
+
+    info = Table([[
+        [_labelled(t["prn"], rx["patient_reference_number"], s), _labelled(t["date"], rx["date"], s)],
+        [Paragraph(f'{escape(t["status"])}: {escape(rx["status"].upper())}', s["right"]),
+         Paragraph(f'{escape(t["valid_until"])}: {escape(rx["valid_until"])}', s["right"])],
+    ]], colWidths=["50%", "50%"])
+    info.setStyle(TableStyle([("LEFTPADDING", (0, 0), (-1, -1), 0), ("RIGHTPADDING", (0, 0), (-1, -1), 0)]))
+    story += [info, Spacer(1, 8)]
+
+    patient = [
+        _labelled(t["patient"], rx["patient_name"], s),
+        Paragraph(" | ".join(
+            f'{escape(label)}: {escape(str(value or "—"))}' for label, value in (
+                (t["prn"], rx["patient_reference_number"]), (t["age"], rx["patient_age"]),
+                (t["gender"], rx["patient_gender"]), (t["blood_group"], rx["patient_blood_group"]),
+            )
+        ), s["body"]),
+    ]
+    if rx["patient_known_allergies"]:
+        patient.append(Paragraph(
+            f'{escape(t["allergies"])}: <font color="{ALERT}">{escape(rx["patient_known_allergies"])}</font>',
+            s["body"],
+        ))
+    story += [_panel(patient, PANEL), Spacer(1, 8)]
+
+    for key in ("diagnosis", "clinical_notes"):
+        if rx[key]:
+            story += [_panel([_labelled(t[key], rx[key], s)], colors.HexColor("#eff6ff")), Spacer(1, 8)]
+
+    rows = [[_p(t[key], s["th"]) for key in ("sl_no", "medicine", "dosage", "frequency", "duration", "instructions")]]
+    for index, item in enumerate(rx["items"], 1):
+        medicine = [_p(item["medicine_name"], s["bold"])]
+        if item["generic_name"]:
+            medicine.append(_p(item["generic_name"], s["small"]))
+        rows.append([
+            _p(index, s["body"]), medicine, _p(item["dosage"], s["body"]), _p(item["frequency"], s["body"]),
+            _p(item["duration"], s["body"]), _p(item["instructions"], s["body"]),
+        ])
+    items = Table(rows, colWidths=["6%", "30%", "13%", "13%", "14%", "24%"], repeatRows=1)
+    items.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), PANEL),
+        ("LINEBELOW", (0, 0), (-1, 0), 1.5, RULE),
+        ("LINEBELOW", (0, 1), (-1, -1), 0.5, RULE),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]))
+    story += [items, Spacer(1, 10)]
+
+    if rx["advice"]:
+        story += [_panel([_labelled(t["advice"], rx["advice"], s)], colors.HexColor("#f0fdf4")), Spacer(1, 8)]
+
+    signature = [
+        Spacer(1, 24),
+        _p(t["prescribing_doctor"], s["right_bold"]),
+        Spacer(1, 28),
+        _p(f"Dr. {rx['doctor_name'] or '—'}", s["right_bold"]),
+        Paragraph(escape(rx["doctor_specialization"] or ""), s["right"]),
+        Paragraph(f"{escape(t['reg_no'])} {escape(rx['doctor_registration_number'] or '')}", s["right"]),
+    ]
+    footer = Table([[_p(t["computer_generated"], s["small"]), signature]], colWidths=["50%", "50%"])
+    footer.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "BOTTOM")]))
+    story.append(footer)
+    return _build(story, title=f"{t['prescription']} - {rx['prescription_number']}")
+
+
+# ── Invoice ───────────────────────────────────────────────────────────────
+
+def invoice_pdf(data: dict) -> bytes:
+    s = _styles(data.get("font_path", ""))
+    inv, hospital = data["invoice"], data["hospital"]
+    labels = {"phone": "Phone", "email": "Email"}
+    story = _letterhead(hospital, labels, s)
+
+    header = Table([[
+        [_p("TAX INVOICE", s["th"]), _labelled("Invoice No", inv["invoice_number"], s),
+         _labelled("Type", inv["invoice_type"].upper(), s)],
+        [Paragraph(f"Date: {escape(inv['invoice_date'])}", s["right"]),
+         Paragraph(f"Due: {escape(inv['due_date'])}", s["right"]),
+         Paragraph(f"Status: {escape(inv['status'].upper())}", s["right"])],
+    ]], colWidths=["50%", "50%"])
+    header.setStyle(TableStyle([("LEFTPADDING", (0, 0), (-1, -1), 0), ("RIGHTPADDING", (0, 0), (-1, -1), 0)]))
+    story += [header, Spacer(1, 8)]
+    story += [_panel([
+        _labelled("Patient", inv["patient_name"], s),
+        _labelled("PRN", inv["patient_reference_number"], s),
+    ], PANEL), Spacer(1, 8)]
+
+    currency = inv["currency"]
+    rows = [[_p(h, s["th"]) for h in ("#", "Description", "Qty", "Rate", "Discount", "Tax", "Amount")]]
+    for index, item in enumerate(inv["items"], 1):
+        rows.append([
+            _p(index, s["body"]), _p(item["description"], s["body"]), _p(item["quantity"], s["right"]),
+            _p(item["unit_price"], s["right"]), _p(item["discount_amount"], s["right"]),
+            _p(item["tax_amount"], s["right"]), _p(item["total_price"], s["right"]),
+        ])
+    items = Table(rows, colWidths=["6%", "36%", "9%", "12%", "12%", "11%", "14%"], repeatRows=1)
+    items.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), PANEL),
+        ("LINEBELOW", (0, 0), (-1, 0), 1.5, RULE),
+        ("LINEBELOW", (0, 1), (-1, -1), 0.5, RULE),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]))
+    story += [items, Spacer(1, 10)]
+
+    totals = [
+        ("Subtotal", inv["subtotal"]), ("Discount", inv["discount_amount"]), ("Tax", inv["tax_amount"]),
+        (f"Total ({currency})", inv["total_amount"]), ("Paid", inv["paid_amount"]), ("Balance", inv["balance_amount"]),
+    ]
+    summary = Table(
+        [[_p(label, s["th"] if label.startswith(("Total", "Balance")) else s["body"]), _p(value, s["right"])]
+         for label, value in totals],
+        colWidths=[40 * mm, 35 * mm], hAlign="RIGHT",
+    )
+    summary.setStyle(TableStyle([("LINEABOVE", (0, 3), (-1, 3), 1, TEXT)]))
+    story.append(summary)
+    if inv["notes"]:
+        story += [Spacer(1, 10), _labelled("Notes", inv["notes"], s)]
+    story += [Spacer(1, 24), _p("This is a computer-generated invoice.", s["small"])]
+    return _build(story, title=f"Invoice {inv['invoice_number']}")
+
+
+# ── Patient ID card ───────────────────────────────────────────────────────
+
+def patient_id_card_pdf(data: dict) -> bytes:
+    """Two ID-1 pages: the card front and its back."""
+    s = _styles(data.get("font_path", ""))
+    patient, hospital = data["patient"], data["hospital"]
+    small = ParagraphStyle("card", parent=s["body"], fontSize=7, leading=9)
+    label = ParagraphStyle("card-label", parent=small, textColor=MUTED)
+    band = ParagraphStyle("band", parent=s["th"], fontSize=9, leading=11, textColor=colors.white)
+    width = ID_CARD_SIZE[0] - 8 * mm
+
+    def banner(left: str, right: str = "") -> Table:
+        table = Table([[_p(left, band), Paragraph(escape(right), ParagraphStyle("band-r", parent=band, alignment=2))]],
+                      colWidths=[width * 0.65, width * 0.35])
+        table.setStyle(TableStyle([("BACKGROUND", (0, 0), (-1, -1), ID_CARD_BLUE)]))
+        return table
+
+    front = [
+        ("DOB", f"{patient['date_of_birth']} ({patient['age']})"),
+        ("Gender", patient["gender"]),
+        ("Blood", patient["blood_group"]),
+        ("Mobile", patient["mobile"]),
+    ]
+    if patient["emergency"]:
+        front.append(("Emergency", patient["emergency"]))
+    details = Table([[_p(k, label), _p(v, small)] for k, v in front], colWidths=[width * 0.28, width * 0.72])
+    details.setStyle(TableStyle([("TOPPADDING", (0, 0), (-1, -1), 0.5), ("BOTTOMPADDING", (0, 0), (-1, -1), 0.5)]))
+
+    back = [
+        ("Address", f"{hospital['address']}, {hospital['city']}, {hospital['state']}"),
+        ("", f"{hospital['country']} - {hospital['pin_code']}"),
+        ("Phone", hospital["phone"]),
+        ("Email", hospital["email"]),
+        ("Website", hospital["website"]),
+    ]
+    contact = Table([[_p(k, label) if k else "", _p(v, small)] for k, v in back],
+                    colWidths=[width * 0.22, width * 0.78])
+    contact.setStyle(TableStyle([("TOPPADDING", (0, 0), (-1, -1), 0.5), ("BOTTOMPADDING", (0, 0), (-1, -1), 0.5)]))
+
+    story = [
+        banner(hospital["name"], patient["patient_reference_number"]),
+        Spacer(1, 3),
+        _p(patient["full_name"], ParagraphStyle("name", parent=s["th"], fontSize=10, leading=12)),
+        Spacer(1, 2),
+        details,
+        PageBreak(),
+        banner(hospital["name"]),
+        Spacer(1, 3),
+        contact,
+        Spacer(1, 3),
+        _p(f"This card is the property of {hospital['name']}. If found, please return to the above address.",
+           ParagraphStyle("note", parent=small, fontSize=6, leading=7.5, textColor=MUTED)),
+    ]
+    return _build(story, pagesize=ID_CARD_SIZE, margin=4 * mm, title=f"ID card {patient['patient_reference_number']}")
+
+
+LAYOUTS: dict[str, Callable[[dict], bytes]] = {
+    "prescription": prescription_pdf,
+    "invoice": invoice_pdf,
+    "patient_id_card": patient_id_card_pdf,
+}
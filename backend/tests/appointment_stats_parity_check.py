@@ -0,0 +1,296 @@
+"""Parity check: SQL-aggregated appointment stats vs. the original Python loops.
+
+Seeds a synthetic mix of appointments (statuses, types, doctors, departments,
+hours, cancel reasons) for the dev hospital plus a second hospital inside a
+transaction that is rolled back, then compares `get_appointment_stats` and
+`get_enhanced_stats` with the reference implementation below, which is the
+pre-aggregation code that loaded every appointment and counted in Python.
+The same comparisons run against appointment_daily_rollup after the seed,
+after status changes / reschedules / deletions, and after a full rebuild.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import sys
+import uuid
+from datetime import date, time, timedelta
+
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.appointment import Appointment, Doctor
+from app.models.department import Department
+from app.models.patient import Patient
+from app.models.user import Hospital
+from app.services.appointment_rollup_service import rebuild_rollup
+from app.services.appointment_service import get_appointment_stats, get_enhanced_stats
+
+
+# A range no real appointment uses, so only seeded rows are counted.
+RANGE_FROM = date(2098, 1, 1)
+RANGE_TO = date(2098, 3, 31)
+SEED_ROWS = 600
+
+STATUSES = ["scheduled", "confirmed", "pending", "completed", "cancelled", "no-show", "no_show", "in-progress"]
+TYPES = ["scheduled", "walk-in", "walk_in", "follow-up", "referral"]
+REASONS = ["Patient request", "Doctor unavailable", "Emergency", "", None]
+
+
+def _reference_appointment_stats(appointments: list[Appointment]) -> dict:
+    total = len(appointments)
+    completed = sum(1 for a in appointments if a.status == "completed")
+    cancelled = sum(1 for a in appointments if a.status == "cancelled")
+    no_shows = sum(1 for a in appointments if a.status == "no_show")
+    pending = sum(1 for a in appointments if a.status in ("scheduled", "confirmed"))
+    return {
+        "total_appointments": total,
+        "total_scheduled": sum(1 for a in appointments if a.appointment_type == "scheduled"),
+        "total_walk_ins": sum(1 for a in appointments if a.appointment_type == "walk_in"),
+        "total_completed": completed,
+        "total_cancelled": cancelled,
+        "total_no_shows": no_shows,
+        "total_pending": pending,
+        "completion_rate": round(completed / total * 100, 1) if total else 0,
+        "cancellation_rate": round(cancelled / total * 100, 1) if total else 0,
+        "no_show_rate": round(no_shows / total * 100, 1) if total else 0,
+    }
+
+
+def _reference_enhanced_stats(appointments: list[Appointment]) -> dict:
+    total = len(appointments)
+    completed = sum(1 for a in appointments if a.status == "completed")
+    cancelled = sum(1 for a in appointments if a.status == "cancelled")
+    no_shows = sum(1 for a in appointments if a.status == "no-show")
+    pending = sum(1 for a in appointments if a.status in ("pending", "confirmed", "scheduled"))
+
+    doctor_map: dict = {}
+    dept_map: dict = {}
+    daily_map: dict = {}
+    hour_map: dict = {}
+    reason_map: dict = {}
+    for a in appointments:
+        did = str(a.doctor_id) if a.doctor_id else "unassigned"
+        doc = doctor_map.setdefault(did, {"doctor_id": did, "total": 0, "completed": 0, "cancelled": 0})
+        doc["total"] += 1
+        dep_id = str(a.department_id) if a.department_id else "unassigned"
+        dep = dept_map.setdefault(dep_id, {"department_id": dep_id, "total": 0, "completed": 0})
+        dep["total"] += 1
+        day = daily_map.setdefault(str(a.appointment_date), {"date": str(a.appointment_date), "total": 0, "completed": 0, "cancelled": 0})
+        day["total"] += 1
+        if a.status == "completed":
+            doc["completed"] += 1
+            dep["completed"] += 1
+            day["completed"] += 1
+        elif a.status == "cancelled":
+            doc["cancelled"] += 1
+            day["cancelled"] += 1
+        if a.start_time:
+            hour_map.setdefault(a.start_time.hour, {"hour": a.start_time.hour, "count": 0})["count"] += 1
+        if a.status == "cancelled" and a.cancel_reason:
+            reason_map.setdefault(a.cancel_reason, {"reason": a.cancel_reason, "count": 0})["count"] += 1
+
+    return {
+        "total_appointments": total,
+        "total_scheduled": sum(1 for a in appointments if a.appointment_type == "scheduled"),
+        "total_walk_ins": sum(1 for a in appointments if a.appointment_type == "walk-in"),
+        "total_completed": completed,
+        "total_cancelled": cancelled,
+        "total_no_shows": no_shows,
+        "total_pending": pending,
+        "completion_rate": round(completed / total * 100, 1) if total else 0.0,
+        "cancellation_rate": round(cancelled / total * 100, 1) if total else 0.0,
+        "no_show_rate": round(no_shows / total * 100, 1) if total else 0.0,
+        "average_wait_time": 0.0,
+        "doctor_stats": list(doctor_map.values()),
+        "department_stats": list(dept_map.values()),
+        "daily_trends": sorted(daily_map.values(), key=lambda x: x["date"]),
+        "peak_hours": sorted(hour_map.values(), key=lambda x: x["hour"]),
+        "cancellation_reasons": list(reason_map.values()),
+    }
+
+
+def _canonical(stats: dict) -> dict:
+    """Unordered breakdowns are compared as sorted lists."""
+    out = dict(stats)
+    for key, sort_key in (
+        ("doctor_stats", "doctor_id"),
+        ("department_stats", "department_id"),
+        ("cancellation_reasons", "reason"),
+    ):
+        if key in out:
+            out[key] = sorted(out[key], key=lambda row: row[sort_key])
+    return out
+
+
+def _seed(db: Session) -> tuple[uuid.UUID, uuid.UUID]:
+    rng = random.Random(20260301)
+    doctors = db.query(Doctor).filter(Doctor.is_deleted == False).all()
+    if not doctors:
+        raise RuntimeError("No doctor found for stats parity check")
+    hospital_id = doctors[0].hospital_id
+    departments = [d.id for d in db.query(Department).filter(Department.hospital_id == hospital_id).all()]
+
+    other = Hospital(name="Stats Parity Hospital", code=f"SP{uuid.uuid4().hex[:8].upper()}", country="IND")
+    db.add(other)
+    db.flush()
+
+    patients = {}
+    for hid in (hospital_id, other.id):
+        patient = Patient(
+            hospital_id=hid,
+            patient_reference_number=f"SP{uuid.uuid4().hex[:10].upper()}",
+            first_name="Stats",
+            last_name="Parity",
+            gender="Female",
+            phone_country_code="+91",
+            phone_number="9000000000",
+        )
+        db.add(patient)
+        patients[hid] = patient
+    db.flush()
+
+    days = (RANGE_TO - RANGE_FROM).days
+    for i in range(SEED_ROWS):
+        hid = hospital_id if i % 5 else other.id
+        status = rng.choice(STATUSES)
+        db.add(
+            Appointment(
+                hospital_id=hid,
+                appointment_number=f"SPAR-{uuid.uuid4().hex[:12].upper()}",
+                patient_id=patients[hid].id,
+                doctor_id=rng.choice(doctors).id,
+                department_id=rng.choice(departments) if departments and rng.random() > 0.3 else None,
+                appointment_date=RANGE_FROM + timedelta(days=rng.randint(0, days)),
+                start_time=time(rng.randint(7, 20), rng.choice((0, 15, 30, 45))),
+                appointment_type=rng.choice(TYPES),
+                status=status,
+                cancel_reason=rng.choice(REASONS) if status == "cancelled" else None,
+            )
+        )
+    db.flush()
+    return hospital_id, other.id
+
+
+def _mutate(db: Session) -> None:
+    """Exercise the rollup's update path: status, date, hour and deletion changes."""
+    rng = random.Random(20260302)
+    rows = (
+        db.query(Appointment)
+        .filter(Appointment.appointment_date >= RANGE_FROM, Appointment.appointment_date <= RANGE_TO)
+        .all()
+    )
+    for appt in rng.sample(rows, 120):
+        choice = rng.randrange(5)
+        if choice == 0:
+            appt.status = "cancelled"
+            appt.cancel_reason = rng.choice(REASONS)
+        elif choice == 1:
+            appt.status = "completed"
+        elif choice == 2:
+            appt.appointment_date = RANGE_FROM + timedelta(days=rng.randint(0, (RANGE_TO - RANGE_FROM).days))
+            appt.start_time = time(rng.randint(7, 20), 0)
+        elif choice == 3:
+            appt.is_deleted = True
+        else:
+            db.delete(appt)
+    db.flush()
+
+
+def _collect_checks(db: Session, hospital_ids: tuple, doctor_id: uuid.UUID, use_rollup: bool) -> list:
+    source = "rollup" if use_rollup else "raw"
+    checks = []
+    for hid in hospital_ids:
+        rows = (
+            db.query(Appointment)
+            .filter(
+                Appointment.is_deleted == False,
+                Appointment.hospital_id == hid,
+                Appointment.appointment_date >= RANGE_FROM,
+                Appointment.appointment_date <= RANGE_TO,
+            )
+            .all()
+        )
+        checks.append((
+            f"{source} enhanced hospital={hid}",
+            _reference_enhanced_stats(rows),
+            get_enhanced_stats(db, RANGE_FROM, RANGE_TO, hospital_id=hid, use_rollup=use_rollup),
+        ))
+        checks.append((
+            f"{source} summary hospital={hid}",
+            _reference_appointment_stats(rows),
+            get_appointment_stats(db, hospital_id=hid, date_from=RANGE_FROM, date_to=RANGE_TO, use_rollup=use_rollup),
+        ))
+        doctor_rows = [a for a in rows if a.doctor_id == doctor_id]
+        checks.append((
+            f"{source} summary hospital={hid} doctor={doctor_id}",
+            _reference_appointment_stats(doctor_rows),
+            get_appointment_stats(
+                db, hospital_id=hid, date_from=RANGE_FROM, date_to=RANGE_TO,
+                doctor_id=doctor_id, use_rollup=use_rollup,
+            ),
+        ))
+
+    empty_from = RANGE_TO + timedelta(days=1)
+    checks.append((
+        f"{source} enhanced empty range",
+        _reference_enhanced_stats([]),
+        get_enhanced_stats(db, empty_from, empty_from, hospital_id=hospital_ids[0], use_rollup=use_rollup),
+    ))
+    return checks
+
+
+def _report(stage: str, checks: list) -> bool:
+    failed = False
+    for label, expected, actual in checks:
+        if _canonical(expected) != _canonical(actual):
+            failed = True
+            print(f"FAIL: [{stage}] {label}")
+            for key in expected:
+                if _canonical(expected).get(key) != _canonical(actual).get(key):
+                    print(f"  {key}: expected={expected[key]!r} actual={actual.get(key)!r}")
+        else:
+            print(f"ok   [{stage}] {label} (total={expected['total_appointments']})")
+    return failed
+
+
+def main() -> int:
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    try:
+        hospital_ids = _seed(db)
+        doctor_id = db.query(Doctor.id).filter(Doctor.hospital_id == hospital_ids[0]).first()[0]
+
+        failed = _report("seeded", _collect_checks(db, hospital_ids, doctor_id, use_rollup=False))
+        failed |= _report("seeded", _collect_checks(db, hospital_ids, doctor_id, use_rollup=True))
+
+        _mutate(db)
+        db.expire_all()
+        failed |= _report("mutated", _collect_checks(db, hospital_ids, doctor_id, use_rollup=False))
+        failed |= _report("mutated", _collect_checks(db, hospital_ids, doctor_id, use_rollup=True))
+
+        for hid in hospital_ids:
+            rebuild_rollup(db, hospital_id=hid, date_from=RANGE_FROM, date_to=RANGE_TO)
+        failed |= _report("rebuilt", _collect_checks(db, hospital_ids, doctor_id, use_rollup=True))
+
+        if failed:
+            return 1
+        print("PASS: SQL-aggregated and rollup appointment stats match the Python reference")
+        return 0
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
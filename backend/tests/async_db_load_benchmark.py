@@ -0,0 +1,146 @@
+"""Load benchmark for the endpoints served from AsyncSession.
+
+Starts the API with a single uvicorn worker, logs in, and drives the
+walk-in queue, appointment list, notifications and pharmacy dashboard
+endpoints with CONCURRENCY parallel clients for DURATION seconds each,
+reporting requests per second per worker and the error count.
+
+Pass --baseline-dir pointing at another checkout of backend/ (for example
+a `git worktree` of the previous commit) to run the same load against it
+and print both results side by side.
+
+Credentials come from HMS_BENCH_USERNAME / HMS_BENCH_PASSWORD.
+This script runs against local dev data and exits non-zero if any request fails.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+CONCURRENCY = 32
+DURATION = 10.0  # seconds per endpoint
+ENDPOINTS = [
+    "/api/v1/walk-ins/queue",
+    "/api/v1/appointments?page=1&limit=20",
+    "/api/v1/notifications?page=1&limit=20",
+    "/api/v1/pharmacy/dashboard",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(app_dir: str, port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", "1", "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=app_dir,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"Server in {app_dir} did not start")
+
+
+async def _login(client: httpx.AsyncClient) -> dict[str, str]:
+    resp = await client.post(
+        "/api/v1/auth/login",
+        json={
+            "username": os.environ.get("HMS_BENCH_USERNAME", ""),
+            "password": os.environ.get("HMS_BENCH_PASSWORD", ""),
+        },
+    )
+    if resp.status_code != 200:
+        raise RuntimeError(f"Login failed: {resp.status_code} {resp.text}")
+    return {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+
+async def _hammer(client: httpx.AsyncClient, path: str, headers: dict[str, str]) -> tuple[int, int]:
+    ok = errors = 0
+    deadline = time.monotonic() + DURATION
+
+    async def loop():
+        nonlocal ok, errors
+        while time.monotonic() < deadline:
+            resp = await client.get(path, headers=headers)
+            if resp.status_code == 200:
+                ok += 1
+            else:
+                errors += 1
+
+    await asyncio.gather(*(loop() for _ in range(CONCURRENCY)))
+    return ok, errors
+
+
+async def _bench(base_url: str) -> dict[str, tuple[float, int]]:
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        headers = await _login(client)
+        results = {}
+        for path in ENDPOINTS:
+            await client.get(path, headers=headers)  # warm up
+            ok, errors = await _hammer(client, path, headers)
+            results[path] = (ok / DURATION, errors)
+        return results
+
+
+def _run(app_dir: str) -> dict[str, tuple[float, int]]:
+    port = _free_port()
+    proc = _start_server(app_dir, port)
+    try:
+        return asyncio.run(_bench(f"http://127.0.0.1:{port}"))
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--baseline-dir", default=None, help="backend/ directory to compare against")
+    args = parser.parse_args()
+
+    current = _run(ROOT_DIR)
+    baseline = _run(os.path.abspath(args.baseline_dir)) if args.baseline_dir else None
+
+    failed = False
+    print(f"{'endpoint':<42} {'req/s':>8} {'errors':>7}" + (f" {'baseline':>9} {'change':>7}" if baseline else ""))
+    for path in ENDPOINTS:
+        rate, errors = current[path]
+        line = f"{path:<42} {rate:>8.1f} {errors:>7}"
+        if baseline:
+            base_rate, _ = baseline[path]
+            line += f" {base_rate:>9.1f} {(rate / base_rate - 1) * 100 if base_rate else 0:>+6.0f}%"
+        print(line)
+        failed = failed or errors > 0
+
+    if failed:
+        print("FAIL: some requests returned errors")
+        return 1
+    print("PASS: async endpoints served without errors")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Connection budget and event-loop check for the sync and async pools.
+
+It checks that:
+1. the sync and asyncpg pools together stay within DB_POOL_SIZE +
+   DB_MAX_OVERFLOW connections per worker;
+2. AsyncSessionLocal keeps working across successive event loops when the
+   caller disposes the async pool before its loop closes (asyncpg
+   connections only work on the loop that opened them);
+3. lifespan-managed TestClients get 200 from the AsyncSession endpoints
+   (GET /notifications, GET /walk-ins/queue), also after an earlier client
+   has shut down, because app shutdown disposes the async pool.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.config import settings
+from app.core.security import create_access_token
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, engine
+from app.main import app
+from app.models.user import User
+
+LOOPS = 3
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+async def _backend_pid() -> int:
+    try:
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(text("SELECT pg_backend_pid()"))).scalar()
+    finally:
+        await async_engine.dispose()
+
+
+def main() -> int:
+    failures: list[str] = []
+
+    sync_pool, async_pool = engine.pool, async_engine.pool
+    kept = sync_pool.size() + async_pool.size()
+    most = kept + sync_pool._max_overflow + async_pool._max_overflow
+    _check(
+        failures,
+        kept == settings.DB_POOL_SIZE and most == settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW,
+        f"pools keep {kept} and open at most {most} connections per worker "
+        f"(sync {sync_pool.size()}+{sync_pool._max_overflow}, async {async_pool.size()}+{async_pool._max_overflow})",
+    )
+
+    pids = [asyncio.run(_backend_pid()) for _ in range(LOOPS)]
+    _check(
+        failures, len(pids) == LOOPS and async_pool.checkedout() == 0,
+        f"AsyncSession on {LOOPS} successive event loops: backends {pids}",
+    )
+
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.username == "admin", User.is_deleted == False).first()
+    if not user:
+        raise RuntimeError("Dev data needs the admin user")
+    headers = {"Authorization": f"Bearer {create_access_token({'user_id': str(user.id)})}"}
+    statuses = []
+    for _ in range(LOOPS):
+        with TestClient(app) as client:
+            statuses += [
+                client.get(path, headers=headers).status_code
+                for path in ("/api/v1/notifications", "/api/v1/walk-ins/queue")
+            ]
+    _check(failures, set(statuses) == {200}, f"{LOOPS} successive TestClients on AsyncSession endpoints: {statuses}")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("PASS: sync and async pools share one connection budget and are reusable across event loops")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""Outbox, retry and wake-up check for the background job runner.
+
+Jobs are committed rows run by other sessions, so this runs against a
+throwaway hospital (deleted afterwards). It checks that:
+1. queuing inventory notifications costs the request one INSERT and creates
+   no notification until the job runs, and that running it notifies the
+   recipients and removes the job;
+2. a job rolled back with its transaction is never run;
+3. a failing job is retried until it succeeds, and one that keeps failing
+   is kept as 'dead' with its last error;
+4. a started runner picks a committed job up at once (not at the next
+   poll), runs submit()ted callables, and reports depth and latency.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+import uuid
+
+from sqlalchemy import event, text
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core import background_jobs as jobs
+from app.database import SessionLocal, engine
+from app.main import app  # noqa: F401  (registers all models and job handlers)
+from app.models.background_job import BackgroundJob
+from app.models.notification import Notification
+from app.models.user import Hospital, User
+from app.services.inventory_service import NOTIFY_USERS_JOB, _notify_hospital_users
+
+WAKE_TIMEOUT = 5.0
+_flaky_calls: list[str] = []
+
+
+@jobs.job_handler("check.flaky")
+def _flaky(db, payload: dict) -> None:
+    _flaky_calls.append(payload["key"])
+    if _flaky_calls.count(payload["key"]) < 3:
+        raise RuntimeError("temporary failure")
+
+
+@jobs.job_handler("check.broken")
+def _broken(db, payload: dict) -> None:
+    raise RuntimeError("permanent failure")
+
+
+class _QueryCounter:
+    def __init__(self) -> None:
+        self.statements: list[str] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.statements.append(statement.split(None, 1)[0].upper())
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def _jobs(db, hospital_id: uuid.UUID, job_type: str) -> list[BackgroundJob]:
+    db.expire_all()
+    return db.query(BackgroundJob).filter(
+        BackgroundJob.hospital_id == hospital_id, BackgroundJob.job_type == job_type,
+    ).all()
+
+
+def _notifications(db, hospital_id: uuid.UUID) -> int:
+    return db.query(Notification).filter(Notification.hospital_id == hospital_id).count()
+
+
+def _notify(db, hospital_id: uuid.UUID, user_id: uuid.UUID, title: str) -> None:
+    _notify_hospital_users(
+        db, hospital_id, title=title, message="Background job check",
+        reference_type="purchase_order", reference_id=uuid.uuid4(),
+        role_names=["no_such_role"], extra_user_ids=[user_id],
+    )
+
+
+def _run(hospital_id: uuid.UUID, user_id: uuid.UUID, failures: list[str]) -> None:
+    runner = jobs.job_runner
+    runner.retry_seconds = 0
+
+    with SessionLocal() as db:
+        counter = _QueryCounter()
+        event.listen(engine, "before_cursor_execute", counter)
+        try:
+            _notify(db, hospital_id, user_id, "Queued")
+        finally:
+            event.remove(engine, "before_cursor_execute", counter)
+        queued = _jobs(db, hospital_id, NOTIFY_USERS_JOB)
+        _check(
+            failures,
+            counter.statements == ["INSERT"] and len(queued) == 1 and _notifications(db, hospital_id) == 0,
+            f"request only queues the notification: {counter.statements}",
+        )
+
+        runner.run_pending()
+        _check(
+            failures,
+            _notifications(db, hospital_id) == 1 and not _jobs(db, hospital_id, NOTIFY_USERS_JOB),
+            "running the job notifies the recipient and removes the job",
+        )
+
+        jobs.enqueue(db, "check.flaky", {"key": "rolled back"}, hospital_id=hospital_id)
+        db.rollback()
+        _check(failures, not _jobs(db, hospital_id, "check.flaky"), "rolled-back job is never stored")
+
+        jobs.enqueue(db, "check.flaky", {"key": "flaky"}, hospital_id=hospital_id)
+        jobs.enqueue(db, "check.broken", {}, hospital_id=hospital_id, max_attempts=2)
+        db.commit()
+        for _ in range(3):
+            runner.run_pending()
+        broken = _jobs(db, hospital_id, "check.broken")
+        _check(
+            failures,
+            _flaky_calls == ["flaky"] * 3 and not _jobs(db, hospital_id, "check.flaky"),
+            f"failing job retried until it succeeds ({len(_flaky_calls)} attempts)",
+        )
+        _check(
+            failures,
+            [(j.status, j.attempts, j.last_error) for j in broken] == [("dead", 2, "permanent failure")],
+            f"job failing every attempt is kept as dead: {[(j.status, j.attempts) for j in broken]}",
+        )
+
+    runner.poll_seconds = 60  # a prompt pick-up can only come from the commit hook
+    runner.start()
+    try:
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            _notify(db, hospital_id, user_id, "Woken")
+            while _jobs(db, hospital_id, NOTIFY_USERS_JOB) and time.perf_counter() - started < WAKE_TIMEOUT:
+                time.sleep(0.02)
+            elapsed = time.perf_counter() - started
+            _check(
+                failures, _notifications(db, hospital_id) == 2 and elapsed < WAKE_TIMEOUT,
+                f"started runner picks a committed job up in {elapsed * 1000:.0f} ms",
+            )
+
+            ran = threading.Event()
+            runner.submit(ran.set)
+            _check(failures, ran.wait(WAKE_TIMEOUT), "submit() runs a callable on the pool")
+
+            stats = runner.stats(db)
+            print(f"info {stats}")
+            _check(
+                failures,
+                stats["running"] and stats["completed"] >= 3 and stats["dead"] >= 1
+                and stats["depth"]["dead"] >= 1 and "wait_ms_p95" in stats,
+                "stats report counters, outbox depth and latency",
+            )
+    finally:
+        runner.stop()
+
+
+def main() -> int:
+    failures: list[str] = []
+    with SessionLocal() as db:
+        hospital = Hospital(name="Background Jobs Hospital", code=f"BJ{uuid.uuid4().hex[:8].upper()}", country="IND")
+        db.add(hospital)
+        db.commit()
+        hospital_id = hospital.id
+        user_id = db.query(User.id).first()[0]
+
+    try:
+        _run(hospital_id, user_id, failures)
+    finally:
+        with engine.begin() as conn:
+            params = {"h": hospital_id}
+            conn.execute(text("DELETE FROM background_jobs WHERE hospital_id = :h"), params)
+            conn.execute(text("DELETE FROM notifications WHERE hospital_id = :h"), params)
+            conn.execute(text("DELETE FROM hospitals WHERE id = :h"), params)
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("PASS: side effects run from the outbox with retries, dead-lettering and prompt wake-up")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
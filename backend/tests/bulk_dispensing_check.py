@@ -0,0 +1,235 @@
+"""Query-count and correctness check for bulk prescription dispensing.
+
+Inside transactions that are rolled back, seeds a throwaway hospital with
+finalized two-item prescriptions and:
+1. dispenses PRESCRIPTION_COUNTS prescriptions per request and checks the
+   query count does not grow with the number of prescriptions, that every
+   prescription is dispensed with its items and stock movements, and that
+   the batches lost exactly what was dispensed;
+2. leaves stock for all but the last prescription and checks that
+   per_prescription mode dispenses the others and reports the short one,
+   while all_or_nothing mode dispenses nothing;
+3. dispenses one prescription through dispense_prescription().
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.appointment import Doctor
+from app.models.inventory import StockMovement
+from app.models.patient import Patient
+from app.models.pharmacy import MedicineBatch, PharmacySale, PharmacySaleItem
+from app.models.prescription import Medicine, Prescription, PrescriptionItem
+from app.models.user import Hospital, User
+from app.services import dispensing_service as svc
+
+
+PRESCRIPTION_COUNTS = (5, 20, 50)
+PER_ITEM = 10  # 1-0-1 for 5 days
+
+
+class _QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.count += 1
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def _seed(db: Session, prescriptions: int, stock: int) -> tuple[uuid.UUID, list[dict], list[uuid.UUID]]:
+    """Two medicines with `stock` units each over two batches; returns the dispense requests."""
+    doctor = db.query(Doctor).filter(Doctor.is_deleted == False).first()
+    if not doctor:
+        raise RuntimeError("Dev data needs a doctor")
+    hospital = Hospital(name="Bulk Dispensing Hospital", code=f"BD{uuid.uuid4().hex[:8].upper()}", country="IND")
+    db.add(hospital)
+    db.flush()
+
+    medicines, first_batches = [], []
+    for m in range(2):
+        medicine = Medicine(
+            hospital_id=hospital.id, name=f"Bulk Med {m}", generic_name="Generic",
+            unit_of_measure="strip", selling_price=Decimal("2.50"),
+        )
+        db.add(medicine)
+        db.flush()
+        # The selected batch is small, so lines spill over to the next FEFO batch.
+        small = min(stock, 7)
+        for number, quantity, days in (("SMALL", small, 20), ("LARGE", stock - small, 60)):
+            batch = MedicineBatch(
+                medicine_id=medicine.id, batch_number=number,
+                expiry_date=date.today() + timedelta(days=days),
+                initial_quantity=quantity, quantity=quantity,
+                purchase_price=Decimal("1.00"), selling_price=Decimal("2.50"),
+            )
+            db.add(batch)
+            db.flush()
+            if number == "SMALL":
+                first_batches.append(batch.id)
+        medicines.append(medicine)
+
+    requests = []
+    for i in range(prescriptions):
+        patient = Patient(
+            hospital_id=hospital.id,
+            patient_reference_number=f"BD{uuid.uuid4().hex[:10].upper()}",
+            first_name=f"Bulk{i}", last_name="Dispense", gender="Female",
+            phone_country_code="+91", phone_number=f"7{i:09d}", age_years=30,
+        )
+        db.add(patient)
+        db.flush()
+        rx = Prescription(
+            hospital_id=hospital.id, prescription_number=f"RXBD-{uuid.uuid4().hex[:12].upper()}",
+            patient_id=patient.id, doctor_id=doctor.id, status="finalized", is_finalized=True,
+        )
+        db.add(rx)
+        db.flush()
+        items = []
+        for order, (medicine, batch_id) in enumerate(zip(medicines, first_batches)):
+            item = PrescriptionItem(
+                prescription_id=rx.id, medicine_id=medicine.id, medicine_name=medicine.name,
+                dosage="1 tab", frequency="1-0-1", duration_value=5, duration_unit="days",
+                display_order=order,
+            )
+            db.add(item)
+            db.flush()
+            items.append({
+                "prescription_item_id": str(item.id), "medicine_id": str(medicine.id),
+                "batch_id": str(batch_id), "quantity": PER_ITEM, "unit_price": 2.5,
+            })
+        requests.append({"prescription_id": str(rx.id), "items": items, "skipped_items": [], "notes": None})
+    db.flush()
+    return hospital.id, requests, [m.id for m in medicines]
+
+
+def _stock(db: Session, medicine_ids: list[uuid.UUID]) -> int:
+    return db.query(func.sum(MedicineBatch.quantity)).filter(MedicineBatch.medicine_id.in_(medicine_ids)).scalar()
+
+
+def _in_transaction(run):
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    try:
+        return run(db)
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+
+def _bulk(db: Session, count: int) -> tuple[int, bool]:
+    hospital_id, requests, medicine_ids = _seed(db, count, stock=count * PER_ITEM)
+    user_id = db.query(User.id).first()[0]
+    db.expunge_all()
+
+    counter = _QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        result = svc.dispense_prescriptions(db, hospital_id, user_id, requests)
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+    sale_ids = [uuid.UUID(r["dispensing_id"]) for r in result["dispensed"]]
+    lines = db.query(PharmacySaleItem).filter(PharmacySaleItem.sale_id.in_(sale_ids)).all()
+    movements = db.query(StockMovement).filter(StockMovement.reference_id.in_(sale_ids)).all()
+    statuses = {s for (s,) in db.query(Prescription.status).filter(Prescription.hospital_id == hospital_id)}
+    dispensed_units = 2 * count * PER_ITEM
+    ok = (
+        len(result["dispensed"]) == count and not result["failed"]
+        and all(r["total_amount"] == 2 * PER_ITEM * 2.5 for r in result["dispensed"])
+        and sum(line.quantity for line in lines) == dispensed_units
+        and -sum(m.quantity for m in movements) == dispensed_units
+        and min(m.balance_after for m in movements) == 0
+        and statuses == {"dispensed"}
+        and _stock(db, medicine_ids) == 0
+    )
+    return counter.count, ok
+
+
+def _short(db: Session, mode: str) -> dict | str:
+    # Stock for all but the last prescription.
+    hospital_id, requests, medicine_ids = _seed(db, 3, stock=2 * PER_ITEM)
+    user_id = db.query(User.id).first()[0]
+    try:
+        result = svc.dispense_prescriptions(db, hospital_id, user_id, requests, mode=mode)
+    except ValueError as e:
+        return {"error": str(e), "stock": _stock(db, medicine_ids),
+                "sales": db.query(PharmacySale).filter(PharmacySale.hospital_id == hospital_id).count()}
+    result["stock"] = _stock(db, medicine_ids)
+    result["short_id"] = requests[-1]["prescription_id"]
+    return result
+
+
+def _single(db: Session) -> dict:
+    hospital_id, requests, _ = _seed(db, 1, stock=PER_ITEM)
+    user_id = db.query(User.id).first()[0]
+    request = requests[0]
+    return svc.dispense_prescription(
+        db, request["prescription_id"], hospital_id, user_id, request["items"],
+    )
+
+
+def main() -> int:
+    failures: list[str] = []
+
+    counts = set()
+    for count in PRESCRIPTION_COUNTS:
+        queries, ok = _in_transaction(lambda db: _bulk(db, count))
+        counts.add(queries)
+        _check(failures, ok, f"prescriptions={count:<3} queries={queries:<3} dispensed with items and movements")
+    _check(failures, len(counts) == 1, f"query count independent of prescription count {sorted(counts)}")
+
+    result = _in_transaction(lambda db: _short(db, "per_prescription"))
+    _check(
+        failures,
+        len(result["dispensed"]) == 2 and [f["prescription_id"] for f in result["failed"]] == [result["short_id"]]
+        and "Insufficient stock" in result["failed"][0]["error"] and result["stock"] == 0,
+        f"per_prescription dispenses the others and reports the short one: {result['failed']}",
+    )
+
+    result = _in_transaction(lambda db: _short(db, "all_or_nothing"))
+    _check(
+        failures,
+        "Insufficient stock" in result.get("error", "") and result["stock"] == 4 * PER_ITEM and result["sales"] == 0,
+        f"all_or_nothing dispenses nothing: {result.get('error')}",
+    )
+
+    result = _in_transaction(_single)
+    _check(
+        failures, result["dispensing_id"] and result["status"] == "dispensed" and result["items_dispensed"] == 2,
+        f"dispense_prescription still dispenses one prescription: {result['status']}",
+    )
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print(f"PASS: bulk dispensing in {counts.pop()} queries whatever the number of prescriptions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
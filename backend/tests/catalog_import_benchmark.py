@@ -0,0 +1,214 @@
+"""Throughput and correctness benchmark for the medicine catalog import.
+
+The import commits chunk by chunk, so this runs against a throwaway
+hospital (deleted afterwards). It builds a ROWS-row CSV catalog (default
+30,000) with an opening batch per medicine and a few broken rows, imports
+it and checks that:
+- every valid row is imported and every broken row is reported by number;
+- the stock summary matches the batches and every opening batch has one
+  stock_in movement;
+- importing the same file again updates the medicines and batches without
+  adding stock;
+- a small XLSX catalog imports the same way (when openpyxl is installed);
+- medicines saved from the form with a blank SKU store NULL and never
+  collide, while reusing an imported SKU is a ValueError (a 400).
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+import uuid
+from datetime import date, timedelta
+
+from sqlalchemy import func, text
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import SessionLocal, engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.inventory import StockMovement
+from app.models.pharmacy import MedicineBatch
+from app.models.prescription import Medicine
+from app.models.user import Hospital, User
+from app.schemas.pharmacy import MedicineCreate, MedicineUpdate
+from app.services import pharmacy_service
+from app.services.catalog_import_service import import_medicine_catalog
+from app.services.stock_summary_service import reconcile_stock_summary
+
+ROWS = 30_000
+BROKEN_EVERY = 1000
+MAX_SECONDS = 60.0
+COLUMNS = [
+    "SKU", "Name", "Generic Name", "Strength", "Unit", "Selling Price", "Purchase Price",
+    "Batch Number", "Expiry Date", "Quantity",
+]
+
+
+def _catalog(rows: int, price: str = "12.50") -> tuple[bytes, set[int]]:
+    """CSV bytes with a BOM, and the row numbers that must be rejected."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    expiry = (date.today() + timedelta(days=365)).isoformat()
+    broken = set()
+    for i in range(rows):
+        row = [f"SKU{i:06d}", f"Import Med {i}", f"Generic {i % 500}", "500 mg", "strip",
+               price, "8.00", f"OB{i:06d}", expiry, str(10 + i % 7)]
+        if i % BROKEN_EVERY == 7:
+            row[5] = "-1"  # selling_price must be positive
+            broken.add(i + 2)
+        elif i % BROKEN_EVERY == 8:
+            row[8] = ""  # batch without expiry
+            broken.add(i + 2)
+        writer.writerow(row)
+    return ("﻿" + buffer.getvalue()).encode("utf-8"), broken
+
+
+def _xlsx(rows: int) -> bytes | None:
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        return None
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(COLUMNS)
+    for i in range(rows):
+        sheet.append([900000 + i, f"Sheet Med {i}", "Generic", "5 ml", "bottle", 40, 25.5,
+                      f"XB{i}", date.today() + timedelta(days=200), 3])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=ROWS)
+    args = parser.parse_args()
+    failures: list[str] = []
+
+    with SessionLocal() as db:
+        hospital = Hospital(name="Catalog Import Hospital", code=f"CI{uuid.uuid4().hex[:8].upper()}", country="IND")
+        db.add(hospital)
+        db.commit()
+        hospital_id = hospital.id
+        user_id = db.query(User.id).first()[0]
+
+    try:
+        data, broken = _catalog(args.rows)
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            report = import_medicine_catalog(db, hospital_id, user_id, io.BytesIO(data), "catalog.csv")
+            elapsed = time.perf_counter() - started
+        valid = args.rows - len(broken)
+        print(f"info {args.rows} rows imported in {elapsed:.1f}s ({args.rows / elapsed:.0f} rows/s)")
+        _check(
+            failures,
+            report["imported_rows"] == valid and report["medicines_created"] == valid
+            and report["batches_created"] == valid and {e["row"] for e in report["errors"]} == broken,
+            f"{report['imported_rows']} rows imported, {report['error_count']} rejected by row number",
+        )
+        _check(failures, elapsed < MAX_SECONDS, f"import within {MAX_SECONDS:.0f}s")
+
+        with SessionLocal() as db:
+            movements = db.query(func.count(StockMovement.id), func.sum(StockMovement.quantity)).filter(
+                StockMovement.hospital_id == hospital_id, StockMovement.reference_type == "opening_stock",
+            ).one()
+            _check(
+                failures, movements == (valid, report["opening_stock_units"]),
+                f"one opening-stock movement per batch: {movements[0]} for {movements[1]} units",
+            )
+            _check(failures, not reconcile_stock_summary(db, hospital_id), "stock summary matches the batches")
+
+        data, _ = _catalog(args.rows, price="13.75")
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            again = import_medicine_catalog(db, hospital_id, user_id, io.BytesIO(data), "catalog.csv")
+            elapsed = time.perf_counter() - started
+            price = db.query(Medicine.selling_price).filter(
+                Medicine.hospital_id == hospital_id, Medicine.sku == "SKU000001",
+            ).scalar()
+            stock = db.query(func.sum(MedicineBatch.quantity)).join(
+                Medicine, Medicine.id == MedicineBatch.medicine_id,
+            ).filter(Medicine.hospital_id == hospital_id).scalar()
+        _check(
+            failures,
+            again["medicines_updated"] == valid and again["batches_updated"] == valid
+            and again["medicines_created"] == again["batches_created"] == again["opening_stock_units"] == 0
+            and str(price) == "13.75" and stock == report["opening_stock_units"],
+            f"re-import updates {again['medicines_updated']} medicines in {elapsed:.1f}s without adding stock",
+        )
+
+        workbook = _xlsx(50)
+        if workbook is None:
+            print("info openpyxl not installed; XLSX import not checked")
+        else:
+            with SessionLocal() as db:
+                sheet = import_medicine_catalog(db, hospital_id, user_id, io.BytesIO(workbook), "catalog.xlsx")
+                sku = db.query(Medicine.sku).filter(
+                    Medicine.hospital_id == hospital_id, Medicine.name == "Sheet Med 0",
+                ).scalar()
+            _check(
+                failures,
+                sheet["medicines_created"] == 50 and sheet["opening_stock_units"] == 150
+                and not sheet["errors"] and sku == "900000",
+                f"XLSX catalog imports with numeric SKUs: {sheet['errors'][:1]}",
+            )
+
+        with SessionLocal() as db:
+            form = [MedicineCreate(name=f"Form Med {n}", sku=sku, selling_price="5").model_dump() for n, sku in
+                    enumerate(("", "  ", ""))]
+            blank = [pharmacy_service.create_medicine(db, hospital_id, data, user_id).sku for data in form]
+            first = db.query(Medicine).filter(Medicine.hospital_id == hospital_id, Medicine.name == "Form Med 0").one()
+            pharmacy_service.update_medicine(db, first.id, MedicineUpdate(sku="FORM-SKU-1").model_dump(exclude_unset=True))
+            cleared = pharmacy_service.update_medicine(
+                db, first.id, MedicineUpdate(sku="").model_dump(exclude_unset=True),
+            ).sku
+            duplicate = None
+            try:
+                pharmacy_service.create_medicine(
+                    db, hospital_id, MedicineCreate(name="Dup", sku="SKU000001", selling_price="5").model_dump(), user_id,
+                )
+            except ValueError as e:
+                duplicate = str(e)
+        _check(
+            failures,
+            blank == [None, None, None] and cleared is None
+            and duplicate is not None and "SKU000001" in duplicate,
+            f"blank SKUs saved as NULL; duplicate SKU rejected: {duplicate!r}",
+        )
+    finally:
+        with engine.begin() as conn:
+            params = {"h": hospital_id}
+            conn.execute(text("DELETE FROM stock_movements WHERE hospital_id = :h"), params)
+            conn.execute(text("DELETE FROM medicine_stock_summary WHERE hospital_id = :h"), params)
+            conn.execute(text(
+                "DELETE FROM medicine_batches WHERE medicine_id IN (SELECT id FROM medicines WHERE hospital_id = :h)"
+            ), params)
+            conn.execute(text("DELETE FROM medicines WHERE hospital_id = :h"), params)
+            conn.execute(text("DELETE FROM hospitals WHERE id = :h"), params)
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print(f"PASS: {args.rows}-row catalog imported with a per-row error report")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
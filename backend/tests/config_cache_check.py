@@ -0,0 +1,174 @@
+"""Behaviour check for the hospital settings / tax configuration cache.
+
+Inside a transaction that is rolled back: repeat reads of hospital settings
+and tax configurations must not query the database, and every write path
+(settings update, appointment setting update, tax create / update / toggle)
+must be visible on the next read. Then checks that a pg_notify committed by
+one session invalidates a listening worker's cache.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.config import settings
+from app.core.config_cache import (
+    HOSPITAL_SETTINGS,
+    TAX_CONFIGURATIONS,
+    ConfigCache,
+    ConfigCacheListener,
+    config_cache,
+)
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.hospital_settings import HospitalSettings
+from app.schemas.tax_config import TaxConfigCreate, TaxConfigUpdate
+from app.services import settings_service, tax_service
+from app.services.invoice_service import _is_opd_credit_allowed
+
+
+class _QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.count += 1
+
+
+def _check_notify(failures: list[str], hospital_id: uuid.UUID) -> None:
+    """A committed notify() reaches another worker's cache via LISTEN."""
+    remote = ConfigCache(ttl_seconds=60)
+    listener = ConfigCacheListener(remote, settings.DATABASE_URL, poll_seconds=0.1)
+    listener.start()
+    previous = settings.CONFIG_CACHE_NOTIFY
+    settings.CONFIG_CACHE_NOTIFY = True
+    try:
+        time.sleep(0.5)  # let the listener connect
+        remote.get(HOSPITAL_SETTINGS, hospital_id, lambda: "old")
+        with Session(engine) as db:
+            config_cache.notify(db, HOSPITAL_SETTINGS, hospital_id)
+            db.commit()
+        deadline = time.time() + 5
+        while time.time() < deadline and remote.stats()["remote_invalidations"] == 0:
+            time.sleep(0.05)
+        value = remote.get(HOSPITAL_SETTINGS, hospital_id, lambda: "new")
+        ok = value == "new"
+        print(f"{'ok  ' if ok else 'FAIL'} LISTEN/NOTIFY invalidation: {remote.stats()}")
+        if not ok:
+            failures.append("notify: listening cache kept the old value")
+    finally:
+        settings.CONFIG_CACHE_NOTIFY = previous
+        listener.stop()
+
+
+def main() -> int:
+    failures: list[str] = []
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    counter = _QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    config_cache.clear()
+
+    def read(step: str, fn, expect_queries: bool, expected) -> None:
+        before = counter.count
+        value = fn()
+        issued = counter.count - before
+        ok = value == expected and (issued > 0) == expect_queries
+        if not ok:
+            failures.append(f"{step}: value={value!r} expected={expected!r} queries={issued}")
+        print(f"{'ok  ' if ok else 'FAIL'} {step}: queries={issued}")
+
+    try:
+        row = db.query(HospitalSettings).first()
+        if row is None:
+            raise RuntimeError("No hospital_settings row found")
+        hospital_id = row.hospital_id
+        credit = bool(row.allow_opd_credit)
+
+        read("opd credit first read", lambda: _is_opd_credit_allowed(db, hospital_id), True, credit)
+        read("opd credit cached", lambda: _is_opd_credit_allowed(db, hospital_id), False, credit)
+        settings_service.update_hospital_settings(db, hospital_id, {"allow_opd_credit": not credit})
+        read("after settings update", lambda: _is_opd_credit_allowed(db, hospital_id), True, not credit)
+
+        # update_setting() edits whichever settings row comes first
+        first_id = db.query(HospitalSettings).first().hospital_id
+        buffer = settings_service.get_appointment_buffer_minutes(db, first_id)
+        settings_service.update_setting(db, "appointment_buffer_minutes", str(buffer + 7))
+        read(
+            "after appointment setting update",
+            lambda: settings_service.get_appointment_buffer_minutes(db, first_id),
+            True, buffer + 7,
+        )
+
+        def active_codes() -> list[str]:
+            return [tc.code for tc in tax_service.get_active_tax_configs(db, hospital_id)]
+
+        codes = active_codes()
+        read("tax configs cached", active_codes, False, codes)
+        code = f"T{uuid.uuid4().hex[:6].upper()}"
+        record = tax_service.create_tax_config(
+            db,
+            TaxConfigCreate(
+                name=f"Cache check {code}",
+                code=code,
+                rate_percentage=Decimal("5.00"),
+                applies_to="both",
+                effective_from=date(2000, 1, 1),
+            ),
+            hospital_id,
+        )
+        read("after tax create", lambda: code in active_codes(), True, True)
+        tax_service.update_tax_config(db, record, TaxConfigUpdate(rate_percentage=Decimal("12.00")))
+        read(
+            "after tax update",
+            lambda: tax_service.get_cached_tax_config(db, hospital_id, record.id).rate_percentage,
+            True, Decimal("12.00"),
+        )
+        tax_service.toggle_tax_config(db, record)
+        read("after tax toggle", lambda: code in active_codes(), True, False)
+        read("tax lookup cached", lambda: tax_service.get_cached_tax_config(db, hospital_id, record.id).is_active, False, False)
+
+        # A load that started before an invalidation must not be stored.
+        racing = ConfigCache(ttl_seconds=60)
+        racing.get(TAX_CONFIGURATIONS, hospital_id, lambda: racing.invalidate(TAX_CONFIGURATIONS, hospital_id) or "stale")
+        if racing.get(TAX_CONFIGURATIONS, hospital_id, lambda: "fresh") != "fresh":
+            failures.append("race: value loaded across an invalidation was cached")
+
+        stats = config_cache.stats()
+        print(f"stats: {stats}")
+        if stats["hits"] < 3 or stats["invalidations"] < 5:
+            failures.append(f"counters not updated: {stats}")
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+        config_cache.clear()
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+    _check_notify(failures, hospital_id)
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("PASS: settings and tax caches are reused and invalidated on every write")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
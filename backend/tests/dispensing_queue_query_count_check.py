@@ -0,0 +1,185 @@
+"""Query-count benchmark for the pharmacy dispensing queue.
+
+Seeds finalized prescriptions (three items each, some already linked to a
+dispensing record) for a throwaway hospital inside a transaction that is
+rolled back, then checks that a pending-queue page costs the same number of
+queries whatever its size, and that every row carries its items, stock and
+dispensing records.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.appointment import Doctor
+from app.models.patient import Patient
+from app.models.pharmacy import MedicineBatch, PharmacySale, PharmacySaleItem
+from app.models.prescription import Prescription, PrescriptionItem
+from app.models.user import Hospital
+from app.services import dispensing_service
+
+
+PAGE_SIZES = (5, 20, 50, 100)
+ITEMS_PER_PRESCRIPTION = 3
+
+
+class _QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.count += 1
+
+
+def _seed(db: Session, size: int) -> tuple[uuid.UUID, set]:
+    doctor = db.query(Doctor).filter(Doctor.is_deleted == False).first()
+    batches = (
+        db.query(MedicineBatch)
+        .filter(MedicineBatch.is_active == True, MedicineBatch.quantity > 0)
+        .limit(ITEMS_PER_PRESCRIPTION)
+        .all()
+    )
+    if not doctor or len(batches) < ITEMS_PER_PRESCRIPTION:
+        raise RuntimeError("Dev data needs a doctor and in-stock medicine batches")
+
+    hospital = Hospital(name="Dispensing Bench Hospital", code=f"DB{uuid.uuid4().hex[:8].upper()}", country="IND")
+    db.add(hospital)
+    db.flush()
+
+    linked = set()
+    for i in range(size):
+        patient = Patient(
+            hospital_id=hospital.id,
+            patient_reference_number=f"DB{uuid.uuid4().hex[:10].upper()}",
+            first_name=f"Rx{i}",
+            last_name="Bench",
+            gender="Male",
+            phone_country_code="+91",
+            phone_number=f"8{i:09d}",
+            age_years=40,
+        )
+        db.add(patient)
+        db.flush()
+
+        rx = Prescription(
+            hospital_id=hospital.id,
+            prescription_number=f"RXB-{uuid.uuid4().hex[:12].upper()}",
+            patient_id=patient.id,
+            doctor_id=doctor.id,
+            status="finalized",
+            is_finalized=True,
+        )
+        db.add(rx)
+        db.flush()
+
+        items = []
+        for order, batch in enumerate(batches):
+            item = PrescriptionItem(
+                prescription_id=rx.id,
+                medicine_id=batch.medicine_id,
+                medicine_name=f"Bench medicine {order}",
+                dosage="1 tab",
+                frequency="1-0-1",
+                duration_value=5,
+                duration_unit="days",
+                display_order=order,
+            )
+            db.add(item)
+            items.append(item)
+        db.flush()
+
+        if i % 4 == 0:
+            sale = PharmacySale(
+                hospital_id=hospital.id,
+                invoice_number=f"DISP-B{uuid.uuid4().hex[:10].upper()}",
+                patient_id=patient.id,
+                sale_type="prescription",
+            )
+            db.add(sale)
+            db.flush()
+            db.add(
+                PharmacySaleItem(
+                    sale_id=sale.id,
+                    prescription_item_id=items[0].id,
+                    medicine_id=batches[0].medicine_id,
+                    batch_id=batches[0].id,
+                    quantity=1,
+                    unit_price=Decimal("1.00"),
+                    total_price=Decimal("1.00"),
+                )
+            )
+            linked.add(str(rx.id))
+    db.flush()
+    return hospital.id, linked
+
+
+def _measure(size: int) -> tuple[int, float, list[str]]:
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    counter = _QueryCounter()
+    try:
+        hospital_id, linked = _seed(db, size)
+        db.expunge_all()
+
+        event.listen(engine, "before_cursor_execute", counter)
+        start = time.perf_counter()
+        payload = dispensing_service.get_pending_prescriptions(db, hospital_id, page=1, limit=size)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        event.remove(engine, "before_cursor_execute", counter)
+
+        problems = []
+        if len(payload["data"]) != size:
+            problems.append(f"returned {len(payload['data'])} rows, expected {size}")
+        for row in payload["data"]:
+            if row["total_items"] != ITEMS_PER_PRESCRIPTION or not row["doctor_name"] or not row["patient_name"]:
+                problems.append(f"incomplete row {row['prescription_number']}")
+            if any(not item["available_batches"] or item["available_quantity"] <= 0 for item in row["items"]):
+                problems.append(f"missing stock on {row['prescription_number']}")
+            if bool(row["dispensing_records"]) != (row["id"] in linked):
+                problems.append(f"wrong dispensing records on {row['prescription_number']}")
+        return counter.count, elapsed_ms, problems
+    finally:
+        if event.contains(engine, "before_cursor_execute", counter):
+            event.remove(engine, "before_cursor_execute", counter)
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+
+def main() -> int:
+    results = []
+    for size in PAGE_SIZES:
+        queries, elapsed_ms, problems = _measure(size)
+        if problems:
+            print(f"FAIL: page_size={size}", problems[:5])
+            return 1
+        results.append((size, queries, elapsed_ms))
+        print(f"page_size={size:<4} queries={queries:<3} elapsed={elapsed_ms:.1f}ms")
+
+    query_counts = {queries for _, queries, _ in results}
+    if len(query_counts) != 1:
+        print("FAIL: query count grows with page size", results)
+        return 1
+
+    print(f"PASS: dispensing queue page built in {query_counts.pop()} queries for every page size")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
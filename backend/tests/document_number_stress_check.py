@@ -0,0 +1,139 @@
+"""Concurrency stress check for the document number allocator.
+
+Several worker processes, each running several threads, allocate numbers
+from the same counters at full speed, with and without block pre-allocation.
+Every allocated number must be unique and the counter must end at or above
+the highest number handed out. With block pre-allocation (the production
+setting) throughput must stay above MIN_RATE per second; the one-number-per-
+round-trip run is reported for comparison. A single allocator then runs
+through PERIODS daily periods of one scope; it must restart each period's
+numbering and keep one cached block and lock for the scope, not one per day.
+Counters use throwaway scopes that are deleted afterwards.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+PROCESSES = 4
+THREADS_PER_PROCESS = 8
+ALLOCATIONS_PER_THREAD = 60
+MIN_RATE = 300  # allocations per second, across all workers
+PERIODS = 30
+
+
+def _worker(scope: str, block_size: int, results) -> None:
+    from app.database import engine
+    from app.services.document_number_service import DocumentNumberAllocator
+
+    engine.dispose(close=False)  # fresh pool in this process
+    allocator = DocumentNumberAllocator(block_size)
+
+    def run(_):
+        return [allocator.next_value(engine, scope, "STRESS") for _ in range(ALLOCATIONS_PER_THREAD)]
+
+    with ThreadPoolExecutor(THREADS_PER_PROCESS) as pool:
+        started = time.time()
+        numbers = [n for chunk in pool.map(run, range(THREADS_PER_PROCESS)) for n in chunk]
+        finished = time.time()
+    results.put((numbers, allocator.reservations, started, finished))
+
+
+def _run(block_size: int) -> tuple[list[int], int, float, str]:
+    scope = f"STRESS-{uuid.uuid4().hex[:12]}"
+    ctx = mp.get_context("fork")
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_worker, args=(scope, block_size, results)) for _ in range(PROCESSES)]
+    for w in workers:
+        w.start()
+    collected = [results.get(timeout=120) for _ in workers]
+    for w in workers:
+        w.join()
+    numbers = [n for chunk, _, _, _ in collected for n in chunk]
+    reservations = sum(r for _, r, _, _ in collected)
+    # Allocation window only: from the first worker starting to the last finishing.
+    elapsed = max(f for _, _, _, f in collected) - min(s for _, _, s, _ in collected)
+    return numbers, reservations, elapsed, scope
+
+
+def _rollover(scope: str) -> tuple[list[int], int, int]:
+    """Allocate a few numbers per period over PERIODS periods from one allocator."""
+    from app.database import engine
+    from app.services.document_number_service import DocumentNumberAllocator
+
+    allocator = DocumentNumberAllocator(20)
+    firsts = []
+    for day in range(PERIODS):
+        period = (date(2000, 1, 1) + timedelta(days=day)).strftime("%Y%m%d")
+        firsts.append(allocator.next_value(engine, scope, period))
+        allocator.next_value(engine, scope, period)
+    return firsts, len(allocator._blocks), len(allocator._locks)
+
+
+def main() -> int:
+    from app.database import engine
+
+    expected = PROCESSES * THREADS_PER_PROCESS * ALLOCATIONS_PER_THREAD
+    failed = False
+    scopes = []
+    try:
+        for block_size in (1, 20):
+            numbers, reservations, elapsed, scope = _run(block_size)
+            scopes.append(scope)
+            with engine.connect() as conn:
+                last_value = conn.execute(
+                    text("SELECT last_value FROM document_sequences WHERE scope = :s AND period = 'STRESS'"),
+                    {"s": scope},
+                ).scalar()
+            rate = len(numbers) / elapsed
+            print(
+                f"block_size={block_size:<3} allocations={len(numbers)} unique={len(set(numbers))} "
+                f"reservations={reservations} counter={last_value} rate={rate:.0f}/s"
+            )
+            if len(numbers) != expected or len(set(numbers)) != len(numbers):
+                print("FAIL: duplicate or missing document numbers")
+                failed = True
+            if last_value is None or last_value < max(numbers):
+                print("FAIL: counter is behind the numbers handed out")
+                failed = True
+            if block_size > 1 and rate < MIN_RATE:
+                print(f"FAIL: allocation rate below {MIN_RATE}/s")
+                failed = True
+
+        scope = f"STRESS-{uuid.uuid4().hex[:12]}"
+        scopes.append(scope)
+        firsts, blocks, locks = _rollover(scope)
+        print(f"periods={PERIODS} first numbers={sorted(set(firsts))} cached blocks={blocks} locks={locks}")
+        if firsts != [1] * PERIODS:
+            print("FAIL: a new period did not start its own numbering")
+            failed = True
+        if blocks != 1 or locks != 1:
+            print("FAIL: the allocator keeps blocks or locks for past periods")
+            failed = True
+    finally:
+        with engine.begin() as conn:
+            for scope in scopes:
+                conn.execute(text("DELETE FROM document_sequences WHERE scope = :s"), {"s": scope})
+
+    if failed:
+        return 1
+    print("PASS: document numbers stay unique under concurrent allocation")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""Worker-pool, metadata and variant-serving check for uploaded images.
+
+Processes generated photos and a logo into a temporary uploads directory
+and serves it through UploadFiles. It checks that:
+1. a large camera photo is decoded in the worker processes, turned upright
+   from its EXIF orientation and written at every size as JPEG and WebP
+   with no EXIF/GPS metadata left;
+2. the event loop keeps ticking while PHOTOS uploads are processed;
+3. the same upload again is a cache hit with the same URL, and concurrent
+   uploads of one image share a single run;
+4. files that are not images are rejected with a 400-style error;
+5. /uploads serves the requested size, WebP to browsers that accept it,
+   KB-sized thumbnails and immutable cache headers, while legacy files are
+   served as before;
+6. save_user_photo points the user at the new photo and removes the old
+   one's files, and logos keep transparency;
+7. when the worker processes are killed mid-upload, the pool is replaced
+   and the upload is still processed.
+Database changes run inside a transaction that is rolled back.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI, HTTPException, UploadFile
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.image_pool import IMMUTABLE, ImageProcessor, UploadFiles
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.user import User
+from app.services import hospital_service, user_service
+
+PHOTOS = 6
+MAX_TICK_GAP = 0.25
+THUMB_MAX_BYTES = 10 * 1024
+GPS_IFD = 0x8825
+ORIENTATION = 0x0112
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def _camera_photo(seed: int, size: tuple[int, int] = (3000, 2000)) -> bytes:
+    """Noisy landscape JPEG shot rotated (orientation 6), with GPS metadata."""
+    image = Image.effect_noise((size[0] // 8, size[1] // 8), 40 + seed).resize(size, Image.Resampling.BICUBIC)
+    image = Image.merge("RGB", (image, Image.linear_gradient("L").resize(size), image))
+    exif = Image.Exif()
+    exif[ORIENTATION] = 6
+    exif[0x010F] = "HMS Test Camera"
+    exif.get_ifd(GPS_IFD)[2] = (12.0, 58.0, 10.0)
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90, exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+def _logo() -> bytes:
+    image = Image.new("RGBA", (1200, 400), (0, 0, 0, 0))
+    image.paste((19, 127, 236, 255), (100, 100, 1100, 300))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def _upload(content: bytes, filename: str) -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename)
+
+
+def _variants(processor: ImageProcessor, url: str) -> list[str]:
+    directory = os.path.dirname(processor.path_for(url))
+    digest = os.path.basename(url).split(".")[0]
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.startswith(digest))
+
+
+async def _process_while_ticking(photos: list[bytes]) -> tuple[list[str], float]:
+    gaps: list[float] = []
+    done = asyncio.Event()
+
+    async def tick() -> None:
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    ticker = asyncio.create_task(tick())
+    urls = await asyncio.gather(
+        *(asyncio.wrap_future(user_service.process_user_photo(_upload(p, "camera.jpg"))) for p in photos)
+    )
+    done.set()
+    await ticker
+    return list(urls), max(gaps or [0.0])
+
+
+def _run(processor: ImageProcessor, failures: list[str]) -> None:
+    photo = _camera_photo(0)
+    url = user_service.process_user_photo(_upload(photo, "camera.jpg")).result(60)  # also starts the pool
+    files = _variants(processor, url)
+    metadata_free = True
+    for path in files:
+        with Image.open(path) as image:
+            if image.getexif() or "exif" in image.info or "icc_profile" in image.info:
+                metadata_free = False
+    with Image.open(processor.path_for(url)) as main:
+        main_size = main.size
+    _check(
+        failures,
+        len(files) == 6 and main_size == (341, 512) and metadata_free,
+        f"{len(photo) // 1024} KiB 3000x2000 photo -> {len(files)} files, main {main_size[0]}x{main_size[1]} "
+        f"upright, no metadata",
+    )
+
+    photos = [_camera_photo(n) for n in range(1, PHOTOS + 1)]
+    started = time.perf_counter()
+    urls, worst_gap = asyncio.run(_process_while_ticking(photos))
+    elapsed = time.perf_counter() - started
+    _check(
+        failures, len(set(urls)) == PHOTOS and worst_gap < MAX_TICK_GAP,
+        f"{PHOTOS} uploads processed in {elapsed:.2f}s on {processor.workers} worker process(es); "
+        f"longest event-loop stall {worst_gap * 1000:.0f} ms",
+    )
+
+    processed = processor.processed
+    again = user_service.process_user_photo(_upload(photo, "again.jpg")).result(60)
+    shared_photo = _camera_photo(99)
+    futures = [processor.submit("photo", shared_photo) for _ in range(4)]
+    shared = {f.result(60) for f in futures}
+    _check(
+        failures, again == url and len(shared) == 1 and processor.processed == processed + 1,
+        f"re-upload is a cache hit; 4 concurrent uploads of one image ran {processor.processed - processed} time",
+    )
+
+    rejected = []
+    try:
+        user_service.process_user_photo(_upload(b"not an image at all", "fake.jpg")).result(60)
+    except ValueError as e:
+        rejected.append(str(e))
+    try:
+        user_service.process_user_photo(_upload(photo, "photo.bmp"))
+    except HTTPException as e:
+        rejected.append(e.status_code)
+    _check(failures, len(rejected) == 2 and rejected[1] == 400, f"non-images rejected: {rejected}")
+
+    served = FastAPI()
+    served.mount("/uploads", UploadFiles(directory=processor.uploads_dir), name="uploads")
+    legacy = os.path.join(processor.uploads_dir, "photos", "user_legacy.jpg")
+    shutil.copyfile(processor.path_for(url), legacy)
+    with TestClient(served) as client:
+        thumb = client.get(f"{url}?size=thumb", headers={"Accept": "image/avif,image/webp,*/*"})
+        fallback = client.get(f"{url}?size=thumb")
+        full = client.get(url)
+        old = client.get("/uploads/photos/user_legacy.jpg")
+        revalidated = client.get(f"{url}?size=thumb", headers={
+            "Accept": "image/webp", "If-None-Match": thumb.headers.get("etag", ""),
+        })
+    _check(
+        failures,
+        thumb.headers["content-type"] == "image/webp" and len(thumb.content) < THUMB_MAX_BYTES
+        and thumb.headers.get("cache-control") == IMMUTABLE and thumb.headers.get("vary") == "Accept"
+        and fallback.headers["content-type"] == "image/jpeg" and len(fallback.content) < len(full.content),
+        f"thumb served as WebP ({len(thumb.content)} bytes) or JPEG ({len(fallback.content)} bytes); "
+        f"main {len(full.content)} bytes; uploaded {len(photo)} bytes",
+    )
+    _check(
+        failures,
+        old.status_code == 200 and old.headers.get("cache-control") != IMMUTABLE
+        and revalidated.status_code == 304,
+        f"legacy file served without immutable caching; revalidation -> {revalidated.status_code}",
+    )
+
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    try:
+        user = db.query(User).filter(User.is_deleted == False).first()
+        if not user:
+            raise RuntimeError("Dev data needs a user")
+        user.avatar_url = urls[0]
+        db.flush()
+        result = user_service.save_user_photo(db, user.id, urls[1])
+        db.refresh(user)
+        old_files = _variants(processor, urls[0])
+        _check(
+            failures, user.avatar_url == urls[1] == result["avatar_url"] and not old_files,
+            f"save_user_photo switched the avatar and removed the old photo's files ({len(old_files)} left)",
+        )
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+    logo_url = hospital_service.process_hospital_logo(_upload(_logo(), "logo.png")).result(60)
+    svg_url = hospital_service.process_hospital_logo(_upload(b"<svg xmlns='http://www.w3.org/2000/svg'/>", "l.svg")).result(5)
+    with Image.open(processor.path_for(logo_url)) as logo:
+        logo_mode, logo_size = logo.mode, logo.size
+    _check(
+        failures,
+        logo_mode == "RGBA" and logo_size == (512, 171) and svg_url.endswith(".svg")
+        and os.path.exists(processor.path_for(svg_url)),
+        f"logo kept transparency at {logo_size[0]}x{logo_size[1]}; SVG stored as uploaded",
+    )
+
+    pending = processor.submit("photo", _camera_photo(7))
+    for process in list(processor._executor._processes.values()):
+        process.kill()
+    try:
+        recovered = pending.result(60)
+    except Exception as e:
+        recovered = f"{type(e).__name__}: {e}"
+    _check(
+        failures, os.path.exists(processor.path_for(recovered)) and processor.restarts == 1,
+        f"killed workers: pool restarted {processor.restarts} time(s), upload retried -> {os.path.basename(recovered)}",
+    )
+    print(f"info {processor.stats()}")
+
+
+def main() -> int:
+    failures: list[str] = []
+    uploads_dir = tempfile.mkdtemp(prefix="uploads-")
+    processor = ImageProcessor(uploads_dir, workers=1)
+    originals = user_service.image_processor, hospital_service.image_processor
+    user_service.image_processor = hospital_service.image_processor = processor
+    try:
+        _run(processor, failures)
+    finally:
+        processor.close()
+        user_service.image_processor, hospital_service.image_processor = originals
+        shutil.rmtree(uploads_dir, ignore_errors=True)
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("PASS: uploads are processed off the event loop into content-addressed, cacheable variants")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""Query-count check for item names on inventory list responses.
+
+Inside a transaction that is rolled back, seeds a throwaway hospital with
+purchase orders, GRNs and stock movements of increasing line counts, and
+checks that listing and formatting each page costs the same number of
+queries however many lines it holds. Every line must carry its medicine's
+name, including a legacy line whose item_id matches no medicine and is
+resolved by its unique purchase price.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import uuid
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.inventory import (
+    GoodsReceiptNote, GRNItem, PurchaseOrder, PurchaseOrderItem, StockMovement, Supplier,
+)
+from app.models.prescription import Medicine
+from app.models.user import Hospital
+from app.services import inventory_service as svc
+
+
+LINE_COUNTS = (5, 25, 100)
+DOCUMENTS = 4
+LEGACY_NAME = "Legacy Price Match"
+LEGACY_PRICE = Decimal("987.65")
+
+
+class _QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.count += 1
+
+
+def _seed(db: Session, lines: int) -> tuple[uuid.UUID, dict[uuid.UUID, str]]:
+    hospital = Hospital(name="Item Names Hospital", code=f"IN{uuid.uuid4().hex[:8].upper()}", country="IND")
+    db.add(hospital)
+    db.flush()
+    supplier = Supplier(hospital_id=hospital.id, name="Item Names Supplier", code="INS")
+    db.add(supplier)
+
+    medicines = [
+        Medicine(
+            hospital_id=hospital.id, name=f"Names Med {i}", generic_name="Generic",
+            unit_of_measure="strip", purchase_price=Decimal(10 + i), selling_price=Decimal(20 + i),
+        )
+        for i in range(lines)
+    ]
+    legacy = Medicine(
+        hospital_id=hospital.id, name=LEGACY_NAME, generic_name="Generic",
+        unit_of_measure="strip", purchase_price=LEGACY_PRICE, selling_price=LEGACY_PRICE + 1,
+    )
+    db.add_all([*medicines, legacy])
+    db.flush()
+    expected = {m.id: m.name for m in medicines}
+
+    for d in range(DOCUMENTS):
+        po = PurchaseOrder(
+            hospital_id=hospital.id, po_number=f"PO-IN-{uuid.uuid4().hex[:12]}",
+            supplier_id=supplier.id, order_date=date.today(),
+        )
+        grn = GoodsReceiptNote(
+            hospital_id=hospital.id, grn_number=f"GRN-IN-{uuid.uuid4().hex[:12]}",
+            supplier_id=supplier.id, receipt_date=date.today(),
+        )
+        for m in medicines:
+            po.items.append(PurchaseOrderItem(
+                item_type="medicine", item_id=m.id, quantity_ordered=1,
+                unit_price=m.purchase_price, total_price=m.purchase_price,
+            ))
+            grn.items.append(GRNItem(
+                item_type="medicine", item_id=m.id, quantity_received=1,
+                unit_price=m.purchase_price, total_price=m.purchase_price,
+            ))
+            db.add(StockMovement(
+                hospital_id=hospital.id, item_type="medicine", item_id=m.id,
+                movement_type="stock_in", quantity=1, balance_after=d + 1,
+            ))
+        # A line left behind by an old import: its item_id points nowhere.
+        po.items.append(PurchaseOrderItem(
+            item_type="medicine", item_id=uuid.uuid4(), quantity_ordered=1,
+            unit_price=LEGACY_PRICE, total_price=LEGACY_PRICE,
+        ))
+        db.add_all([po, grn])
+    db.flush()
+    return hospital.id, expected
+
+
+def _names_ok(payload: list[dict], expected: dict[uuid.UUID, str]) -> bool:
+    for row in payload:
+        for item in row.get("items", [row]):
+            want = expected.get(uuid.UUID(item["item_id"]), LEGACY_NAME)
+            if item["item_name"] != want:
+                return False
+    return True
+
+
+def _measure(lines: int) -> dict[str, tuple[int, bool]]:
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    results: dict[str, tuple[int, bool]] = {}
+    try:
+        hospital_id, expected = _seed(db, lines)
+        db.expunge_all()
+        pages = {
+            "purchase orders": lambda: svc._format_po_responses(
+                svc.list_purchase_orders(db, hospital_id, limit=DOCUMENTS)["data"], db
+            ),
+            "GRNs": lambda: svc._format_grn_responses(
+                svc.list_grns(db, hospital_id, limit=DOCUMENTS)["data"], db
+            ),
+            "stock movements": lambda: svc._format_movement_responses(
+                svc.list_stock_movements(db, hospital_id, limit=100)["data"], db
+            ),
+        }
+        for label, build in pages.items():
+            counter = _QueryCounter()
+            event.listen(engine, "before_cursor_execute", counter)
+            try:
+                payload = build()
+            finally:
+                event.remove(engine, "before_cursor_execute", counter)
+            results[label] = (counter.count, _names_ok(payload, expected))
+            db.expunge_all()
+        return results
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+
+def main() -> int:
+    failures: list[str] = []
+    counts: dict[str, set[int]] = {}
+    for lines in LINE_COUNTS:
+        for label, (queries, names_ok) in _measure(lines).items():
+            counts.setdefault(label, set()).add(queries)
+            print(f"lines={lines:<4} {label:<16} queries={queries:<3} names={'ok' if names_ok else 'WRONG'}")
+            if not names_ok:
+                failures.append(f"{label} with {lines} lines: wrong item names")
+
+    for label, seen in counts.items():
+        if len(seen) != 1:
+            failures.append(f"{label}: query count grows with line count {sorted(seen)}")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    summary = ", ".join(f"{label} {seen.pop()}" for label, seen in counts.items())
+    print(f"PASS: item names resolved in a fixed number of queries per page ({summary})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
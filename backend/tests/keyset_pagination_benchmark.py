@@ -0,0 +1,175 @@
+"""Correctness check and latency benchmark for cursor (keyset) pagination.
+
+Inside a transaction that is rolled back:
+  1. Walks a small hospital's stock movements page by page with cursors.
+     All rows share one created_at, so only the id tie-break keeps pages
+     apart; every row must appear exactly once, in (created_at, id) DESC
+     order. Count modes and a malformed cursor are checked too.
+  2. Seeds ROWS stock movements (default 1,000,000) for a second hospital
+     and times a page near the end of the history with OFFSET + COUNT(*)
+     against the same page with a cursor and no count. The cursor page must
+     stay under MAX_MS.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.inventory import StockMovement
+from app.models.user import Hospital
+from app.services.inventory_service import list_stock_movements
+from app.utils.pagination import InvalidCursor, encode_cursor
+
+ROWS = 1_000_000
+PAGE = 25
+REPEAT = 5
+MAX_MS = 50.0
+
+_SEED_SQL = text("""
+    INSERT INTO stock_movements (
+        hospital_id, item_type, item_id, movement_type, quantity, balance_after, created_at
+    )
+    SELECT
+        :hospital_id, 'medicine', :item_id,
+        CASE WHEN i % 3 = 0 THEN 'sale' ELSE 'stock_in' END,
+        1 + i % 20, i,
+        -- several movements per second, like a busy pharmacy
+        now() - ((i / 4) * interval '1 second')
+    FROM generate_series(1, :rows) AS i
+""")
+
+
+def _hospital(db: Session, name: str) -> Hospital:
+    hospital = Hospital(name=name, code=f"KP{uuid.uuid4().hex[:8].upper()}", country="IND")
+    db.add(hospital)
+    db.flush()
+    return hospital
+
+
+def _check_walk(db: Session, failures: list[str]) -> None:
+    hospital = _hospital(db, "Keyset Walk Hospital")
+    db.execute(_SEED_SQL.bindparams(rows=57), {"hospital_id": hospital.id, "item_id": uuid.uuid4()})
+    db.execute(text(
+        "UPDATE stock_movements SET created_at = now() WHERE hospital_id = :h"
+    ), {"h": hospital.id})
+    expected = [
+        row.id for row in db.query(StockMovement.id)
+        .filter(StockMovement.hospital_id == hospital.id)
+        .order_by(StockMovement.created_at.desc(), StockMovement.id.desc())
+    ]
+
+    seen: list[uuid.UUID] = []
+    cursor, pages = "", 0
+    while cursor is not None:
+        result = list_stock_movements(db, hospital.id, limit=10, cursor=cursor)
+        seen.extend(m.id for m in result["data"])
+        cursor = result["next_cursor"]
+        pages += 1
+        if result["total"] is not None:
+            failures.append("walk: cursor mode counted without ?count=")
+    ok = seen == expected
+    print(f"{'ok  ' if ok else 'FAIL'} walked {len(seen)}/{len(expected)} tied rows in {pages} pages")
+    if not ok:
+        failures.append("walk: cursor pages skipped, repeated or reordered rows")
+
+    exact = list_stock_movements(db, hospital.id, limit=10, cursor="", count="exact")["total"]
+    estimate = list_stock_movements(db, hospital.id, limit=10, cursor="", count="estimate")["total"]
+    ok = exact == len(expected) and isinstance(estimate, int)
+    print(f"{'ok  ' if ok else 'FAIL'} count modes: exact={exact} estimate={estimate}")
+    if not ok:
+        failures.append(f"count modes: exact={exact} estimate={estimate}")
+
+    try:
+        list_stock_movements(db, hospital.id, cursor="not-a-cursor")
+        failures.append("malformed cursor was accepted")
+    except InvalidCursor:
+        print("ok   malformed cursor rejected")
+
+
+def _median_ms(fn) -> float:
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def _benchmark(db: Session, rows: int, failures: list[str]) -> None:
+    hospital = _hospital(db, "Keyset Bench Hospital")
+    started = time.perf_counter()
+    db.execute(_SEED_SQL, {"hospital_id": hospital.id, "item_id": uuid.uuid4(), "rows": rows})
+    db.execute(text("ANALYZE stock_movements"))
+    print(f"seeded {rows} stock movements in {time.perf_counter() - started:.1f}s")
+
+    # The page starting 90% of the way through the history.
+    depth = (rows * 9 // 10) // PAGE * PAGE
+    anchor = (
+        db.query(StockMovement.created_at, StockMovement.id)
+        .filter(StockMovement.hospital_id == hospital.id)
+        .order_by(StockMovement.created_at.desc(), StockMovement.id.desc())
+        .offset(depth - 1)
+        .first()
+    )
+    cursor = encode_cursor(anchor.created_at, anchor.id)
+    page = depth // PAGE + 1
+
+    offset_ms = _median_ms(lambda: list_stock_movements(db, hospital.id, page, PAGE))
+    cursor_ms = _median_ms(lambda: list_stock_movements(db, hospital.id, limit=PAGE, cursor=cursor))
+    estimate_ms = _median_ms(
+        lambda: list_stock_movements(db, hospital.id, limit=PAGE, cursor=cursor, count="estimate")
+    )
+    ok = cursor_ms < MAX_MS
+    print(f"info offset page {page} + COUNT(*)     {offset_ms:9.2f} ms")
+    print(f"{'ok  ' if ok else 'FAIL'} cursor page, no count       {cursor_ms:9.2f} ms")
+    print(f"info cursor page, estimated count {estimate_ms:9.2f} ms")
+    if not ok:
+        failures.append(f"cursor page took {cursor_ms:.2f} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=ROWS)
+    args = parser.parse_args()
+
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    failures: list[str] = []
+    try:
+        _check_walk(db, failures)
+        _benchmark(db, args.rows, failures)
+    finally:
+        db.close()
+        transaction.rollback()
+        # pg_class.reltuples is updated in place and survives the rollback.
+        connection.execute(text("ANALYZE stock_movements"))
+        connection.commit()
+        connection.close()
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print(f"PASS: cursor pages are complete and stay under {MAX_MS:.0f} ms at {args.rows} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""Consistency check for medicine_stock_summary.
+
+Drives the real stock write paths (batch creation, inventory adjustments,
+FEFO deductions, counter sales, deactivation, deletion) for a throwaway
+hospital inside a transaction that is rolled back, and after every step
+checks the maintained summary against SUM(active batch quantity). Finally
+injects drift and checks that reconciliation finds and repairs it.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.pharmacy import MedicineBatch
+from app.models.prescription import Medicine
+from app.models.user import Hospital, User
+from app.services import pharmacy_service
+from app.services.inventory_service import _apply_medicine_batch_delta
+from app.services.stock_summary_service import get_medicine_stock, reconcile_stock_summary
+
+
+def _batch_sum(db: Session, medicine_id: uuid.UUID) -> int:
+    return int(
+        db.query(func.coalesce(func.sum(MedicineBatch.quantity), 0))
+        .filter(MedicineBatch.medicine_id == medicine_id, MedicineBatch.is_active == True)
+        .scalar()
+    )
+
+
+def _batch(medicine_id: uuid.UUID, number: str, quantity: int, days: int) -> MedicineBatch:
+    return MedicineBatch(
+        medicine_id=medicine_id,
+        batch_number=number,
+        expiry_date=date.today() + timedelta(days=days),
+        initial_quantity=quantity,
+        quantity=quantity,
+        purchase_price=Decimal("1.00"),
+        selling_price=Decimal("2.00"),
+    )
+
+
+def main() -> int:
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    failures: list[str] = []
+
+    def check(step: str, hospital_id: uuid.UUID, medicine_ids: list) -> None:
+        for medicine_id in medicine_ids:
+            summary, actual = get_medicine_stock(db, medicine_id), _batch_sum(db, medicine_id)
+            if summary != actual:
+                failures.append(f"{step}: medicine={medicine_id} summary={summary} batches={actual}")
+        drift = reconcile_stock_summary(db, hospital_id=hospital_id)
+        if drift:
+            failures.append(f"{step}: reconcile reported {drift}")
+        print(f"{'ok  ' if not failures else 'FAIL'} {step}: " + ", ".join(
+            f"{get_medicine_stock(db, m)}" for m in medicine_ids
+        ))
+
+    try:
+        user = db.query(User).first()
+        hospital = Hospital(name="Stock Summary Hospital", code=f"SS{uuid.uuid4().hex[:8].upper()}", country="IND")
+        db.add(hospital)
+        db.flush()
+
+        # Medicine and its batches created in a single flush.
+        medicines = []
+        for name in ("Summary Tab A", "Summary Syrup B"):
+            med = Medicine(
+                id=uuid.uuid4(),
+                hospital_id=hospital.id,
+                name=name,
+                generic_name=name,
+                unit_of_measure="strip",
+                selling_price=Decimal("2.00"),
+            )
+            db.add(med)
+            medicines.append(med)
+        first, second = (m.id for m in medicines)
+        db.add_all([
+            _batch(first, "SS-A1", 40, 30),
+            _batch(first, "SS-A2", 25, 400),
+            _batch(second, "SS-B1", 10, 200),
+        ])
+        db.flush()
+        check("created", hospital.id, [first, second])
+
+        batch_a1 = db.query(MedicineBatch).filter_by(medicine_id=first, batch_number="SS-A1").one()
+        _apply_medicine_batch_delta(db, first, 5, batch_a1.id)
+        check("adjust +5 explicit batch", hospital.id, [first])
+        _apply_medicine_batch_delta(db, first, 7)
+        check("adjust +7 system batch", hospital.id, [first])
+        _apply_medicine_batch_delta(db, first, -50)
+        check("adjust -50 FEFO", hospital.id, [first])
+
+        pharmacy_service.create_sale(
+            db,
+            hospital.id,
+            {"items": [{"medicine_id": str(second), "quantity": 3, "unit_price": "2.00"}]},
+            user.id,
+        )
+        check("counter sale -3", hospital.id, [second])
+
+        # Quantity changed on an expired (unloaded) instance.
+        db.expire_all()
+        batch_b1 = db.query(MedicineBatch).filter_by(medicine_id=second, batch_number="SS-B1").one()
+        db.expire(batch_b1)
+        batch_b1.quantity = 100
+        db.flush()
+        check("direct quantity write", hospital.id, [second])
+
+        batch_b1.is_active = False
+        db.flush()
+        check("batch deactivated", hospital.id, [second])
+        batch_b1.is_active = True
+        db.flush()
+        check("batch reactivated", hospital.id, [second])
+
+        extra = _batch(second, "SS-B2", 9, 90)
+        db.add(extra)
+        db.flush()
+        db.delete(extra)
+        db.flush()
+        check("batch deleted", hospital.id, [second])
+
+        # Drift injected behind the ORM's back must be found and repaired.
+        db.execute(
+            text("UPDATE medicine_stock_summary SET quantity = quantity + 11 WHERE medicine_id = :m"),
+            {"m": first},
+        )
+        drift = reconcile_stock_summary(db, hospital_id=hospital.id, repair=True)
+        if [row["medicine_id"] for row in drift] != [first]:
+            failures.append(f"reconcile: expected drift on {first}, got {drift}")
+        check("drift repaired", hospital.id, [first, second])
+
+        if failures:
+            for failure in failures:
+                print(f"FAIL: {failure}")
+            return 1
+        print("PASS: medicine_stock_summary matches medicine_batches after every write path")
+        return 0
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
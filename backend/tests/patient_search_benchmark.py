@@ -0,0 +1,139 @@
+"""Latency benchmark for indexed patient search.
+
+Inside a transaction that is rolled back, creates a throwaway hospital with
+ROWS synthetic patients (default 1,000,000), analyzes the table and times
+patient_service.list_patients for the searches the registration desk runs:
+a full name, first name plus a last name prefix, a PRN prefix, a partial
+phone number, and the exact phone / PRN / email fast paths. Each search's
+median time (count + first page) must stay under MAX_MS. A two-letter
+prefix that matches a large share of the table is reported for reference
+but not gated.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.user import Hospital
+from app.services import patient_service
+
+ROWS = 1_000_000
+REPEAT = 7
+MAX_MS = 50.0
+
+# 30 x 30 syllable pairs -> 900 distinct first and last names.
+_SYLLABLES = [
+    "ka", "ra", "mi", "to", "su", "ne", "lo", "vi", "da", "pe",
+    "jo", "ha", "ri", "an", "el", "mo", "sa", "ti", "ba", "ku",
+    "ze", "fa", "no", "gi", "wa", "ye", "ch", "li", "or", "us",
+]
+
+_SEED_SQL = text("""
+    INSERT INTO patients (
+        hospital_id, patient_reference_number, first_name, last_name,
+        gender, phone_number, email
+    )
+    SELECT
+        :hospital_id,
+        'BNC26' || lpad(i::text, 7, '0'),
+        initcap(s[1 + (i * 7) % 30] || s[1 + (i * 13 / 30) % 30] || 'n'),
+        initcap(s[1 + (i * 11) % 30] || s[1 + (i / 900) % 30] || 'ar'),
+        CASE WHEN i % 2 = 0 THEN 'Male' ELSE 'Female' END,
+        (3000000000 + i * 7)::text,
+        CASE WHEN i % 4 = 0 THEN 'patient' || i || '@bench.example' END
+    FROM generate_series(1, :rows) AS i, (SELECT CAST(:syllables AS text[]) AS s) AS syl
+""")
+
+
+def _time_search(db: Session, hospital_id: uuid.UUID, search: str) -> tuple[float, int]:
+    samples = []
+    total = 0
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        result = patient_service.list_patients(db, 1, 10, search, hospital_id=hospital_id)
+        samples.append((time.perf_counter() - started) * 1000)
+        total = result.total
+    return statistics.median(samples), total
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=ROWS)
+    args = parser.parse_args()
+
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    failures: list[str] = []
+    try:
+        hospital = Hospital(name="Search Bench Hospital", code=f"SB{uuid.uuid4().hex[:8].upper()}", country="IND")
+        db.add(hospital)
+        db.flush()
+
+        started = time.perf_counter()
+        db.execute(_SEED_SQL, {"hospital_id": hospital.id, "rows": args.rows, "syllables": _SYLLABLES})
+        db.execute(text("ANALYZE patients"))
+        print(f"seeded {args.rows} patients in {time.perf_counter() - started:.1f}s")
+
+        sample = db.execute(
+            text(
+                "SELECT first_name, last_name, patient_reference_number, phone_number, email "
+                "FROM patients WHERE hospital_id = :h AND email IS NOT NULL "
+                "ORDER BY patient_reference_number OFFSET :n LIMIT 1"
+            ),
+            {"h": hospital.id, "n": args.rows // 8},
+        ).one()
+        first, last, prn, phone, email = sample
+
+        gated = [
+            ("full name", f"{first} {last}"),
+            ("first name + last prefix", f"{first} {last[:3]}"),
+            ("PRN prefix", prn[:10]),
+            ("partial phone", phone[:7]),
+            ("exact phone", f"+1 ({phone[:3]}) {phone[3:6]}-{phone[6:]}"),
+            ("exact PRN", prn.lower()),
+            ("exact email", email.upper()),
+        ]
+        for label, search in gated:
+            ms, total = _time_search(db, hospital.id, search)
+            ok = ms < MAX_MS and total > 0
+            print(f"{'ok  ' if ok else 'FAIL'} {label:<26} {search!r:<34} {total:>7} rows  {ms:7.2f} ms")
+            if not ok:
+                failures.append(f"{label}: {ms:.2f} ms, {total} rows")
+
+        ms, total = _time_search(db, hospital.id, first[:2])
+        print(f"info broad prefix{'':<14} {first[:2]!r:<34} {total:>7} rows  {ms:7.2f} ms")
+    finally:
+        db.close()
+        transaction.rollback()
+        # pg_class.reltuples is updated in place and survives the rollback.
+        connection.execute(text("ANALYZE patients"))
+        connection.commit()
+        connection.close()
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print(f"PASS: patient searches over {args.rows} rows finish under {MAX_MS:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""Worker-pool and disk-cache check for PDF rendering.
+
+Inside a transaction that is rolled back, seeds a throwaway hospital with a
+patient, a finalized prescription and an invoice, and renders them into a
+temporary cache directory. It checks that:
+1. prescription, invoice and two-page ID card PDFs are produced;
+2. the event loop keeps ticking while RENDERS documents are drawn, i.e. the
+   layout runs in the worker processes;
+3. printing the same document again is served from the cached file (a
+   finalized prescription without any query), while a change produces a
+   new file;
+4. concurrent requests for one document share a single render;
+5. the cache is pruned back under its size cap;
+6. when the worker processes are killed mid-render, the pool is replaced
+   and the document still renders, as do later ones.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.pdf_pool import PDFRenderer
+from app.core.print_cache import print_cache
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.appointment import Doctor
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.patient import Patient
+from app.models.prescription import Prescription, PrescriptionItem
+from app.models.user import Hospital
+from app.services import pdf_service as svc
+from app.services.invoice_service import get_invoice_by_id
+
+RENDERS = 8
+MAX_TICK_GAP = 0.25
+
+
+class _QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.count += 1
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def _pages(path: str) -> int:
+    with open(path, "rb") as f:
+        content = f.read()
+    return content.count(b"/Type /Page\n") + content.count(b"/Type /Page ")
+
+
+def _seed(db: Session) -> tuple[Prescription, Invoice, Patient]:
+    doctor = db.query(Doctor).filter(Doctor.is_deleted == False).first()
+    if not doctor:
+        raise RuntimeError("Dev data needs a doctor")
+    hospital = Hospital(name="PDF Hospital", code=f"PD{uuid.uuid4().hex[:8].upper()}", country="IND")
+    db.add(hospital)
+    db.flush()
+    patient = Patient(
+        hospital_id=hospital.id,
+        patient_reference_number=f"PD{uuid.uuid4().hex[:10].upper()}",
+        title="Ms", first_name="Kavya", last_name="Render", gender="Female", blood_group="O+",
+        date_of_birth=date(1990, 5, 17), phone_country_code="+91", phone_number="7000000002",
+        emergency_contact_name="Ravi Render", emergency_contact_relation="Brother",
+        emergency_contact_phone="7000000003", known_allergies="Sulfa",
+    )
+    db.add(patient)
+    db.flush()
+
+    rx = Prescription(
+        hospital_id=hospital.id, prescription_number=f"RXPD-{uuid.uuid4().hex[:12].upper()}",
+        patient_id=patient.id, doctor_id=doctor.id, status="finalized", is_finalized=True,
+        diagnosis="Viral fever <b>&</b> body ache", advice="Rest, fluids",
+        valid_until=date.today() + timedelta(days=30),
+    )
+    db.add(rx)
+    db.flush()
+    for order in range(12):
+        db.add(PrescriptionItem(
+            prescription_id=rx.id, medicine_name=f"Medicine {order}", generic_name="Generic",
+            dosage="1 tab", frequency="1-0-1", duration_value=5, duration_unit="days",
+            instructions="After food", display_order=order,
+        ))
+
+    invoice = Invoice(
+        hospital_id=hospital.id, invoice_number=f"INVPD-{uuid.uuid4().hex[:10].upper()}",
+        patient_id=patient.id, invoice_type="pharmacy", invoice_date=date.today(), status="issued",
+        subtotal=Decimal("250.00"), tax_amount=Decimal("12.50"), total_amount=Decimal("262.50"),
+        paid_amount=Decimal("100.00"), balance_amount=Decimal("162.50"),
+    )
+    db.add(invoice)
+    db.flush()
+    for order in range(3):
+        db.add(InvoiceItem(
+            invoice_id=invoice.id, item_type="medicine", description=f"Medicine {order}",
+            quantity=Decimal("2"), unit_price=Decimal("41.67"), tax_amount=Decimal("4.17"),
+            total_price=Decimal("87.50"), display_order=order,
+        ))
+    db.flush()
+    db.refresh(rx)
+    db.expire(invoice)
+    return rx, get_invoice_by_id(db, invoice.id), patient
+
+
+async def _render_while_ticking(renderer: PDFRenderer, documents: list[dict]) -> tuple[list[str], float]:
+    """Render documents concurrently; returns the paths and the longest event-loop stall."""
+    gaps: list[float] = []
+    done = asyncio.Event()
+
+    async def tick() -> None:
+        last = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    ticker = asyncio.create_task(tick())
+    paths = await asyncio.gather(*(asyncio.wrap_future(renderer.submit("prescription", d)) for d in documents))
+    done.set()
+    await ticker
+    return list(paths), max(gaps or [0.0])
+
+
+def _run(db: Session, renderer: PDFRenderer, failures: list[str]) -> None:
+    rx, invoice, patient = _seed(db)
+
+    rx_path = svc.prescription_pdf(db, rx, "en").result(60)  # the first render also starts the pool
+    invoice_path = svc.invoice_pdf(invoice).result(60)
+    card_path = svc.patient_id_card_pdf(patient).result(60)
+    pdfs = [rx_path, invoice_path, card_path]
+    _check(
+        failures,
+        all(open(p, "rb").read(5) == b"%PDF-" for p in pdfs) and _pages(card_path) == 2,
+        f"prescription, invoice and ID card PDFs rendered (card pages: {_pages(card_path)})",
+    )
+
+    base = svc.prescription_pdf_data(db, rx, "en")
+    documents = []
+    for n in range(RENDERS):
+        data = {**base, "rx": {**base["rx"], "advice": f"Variant {n}"}}
+        documents.append(data)
+    started = time.perf_counter()
+    paths, worst_gap = asyncio.run(_render_while_ticking(renderer, documents))
+    elapsed = time.perf_counter() - started
+    _check(
+        failures, len(set(paths)) == RENDERS and worst_gap < MAX_TICK_GAP,
+        f"{RENDERS} renders in {elapsed:.2f}s on {renderer.workers} worker processes; "
+        f"longest event-loop stall {worst_gap * 1000:.0f} ms",
+    )
+
+    renders = renderer.renders
+    counter = _QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        again = svc.prescription_pdf(db, rx, "en").result(60)
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+    invoice_again = svc.invoice_pdf(invoice).result(60)
+    _check(
+        failures,
+        again == rx_path and invoice_again == invoice_path and renderer.renders == renders and counter.count == 0,
+        f"reprints served from the cached files ({counter.count} queries for the finalized prescription)",
+    )
+
+    invoice.notes = "Balance due on discharge"
+    changed = svc.invoice_pdf(invoice).result(60)
+    _check(failures, changed != invoice_path and os.path.exists(changed), "changed invoice renders a new file")
+
+    shared_data = {**base, "rx": {**base["rx"], "advice": "Shared"}}
+    futures = [renderer.submit("prescription", shared_data) for _ in range(5)]
+    shared = {f.result(60) for f in futures}
+    _check(
+        failures, len(shared) == 1 and renderer.renders == renders + 2,
+        f"5 concurrent requests for one document share {renderer.renders - renders - 1} render",
+    )
+
+    size = renderer._size()
+    renderer.max_bytes = size // 2
+    renderer.prune()
+    remaining = renderer._size()
+    _check(
+        failures, remaining <= size * 0.4 and os.path.exists(svc.prescription_pdf(db, rx, "en").result(60)),
+        f"cache pruned from {size} to {remaining} bytes; pruned files render again",
+    )
+
+    killed = {**base, "rx": {**base["rx"], "advice": "Worker killed"}}
+    pending = renderer.submit("prescription", killed)
+    for process in list(renderer._executor._processes.values()):
+        process.kill()
+    try:
+        recovered = pending.result(60)
+        after = renderer.render("prescription", {**base, "rx": {**base["rx"], "advice": "After restart"}}, 60)
+    except Exception as e:
+        recovered = after = f"{type(e).__name__}: {e}"
+    _check(
+        failures,
+        os.path.exists(recovered) and os.path.exists(after) and renderer.restarts == 1,
+        f"killed workers: pool restarted {renderer.restarts} time(s), render retried -> {os.path.basename(recovered)}",
+    )
+    print(f"info {renderer.stats()}")
+
+
+def main() -> int:
+    failures: list[str] = []
+    cache_dir = tempfile.mkdtemp(prefix="pdf-cache-")
+    renderer = PDFRenderer(cache_dir, workers=2)
+    original = svc.pdf_renderer
+    svc.pdf_renderer = renderer
+    print_cache.clear()
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    try:
+        _run(db, renderer, failures)
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+        renderer.close()
+        svc.pdf_renderer = original
+        print_cache.clear()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("PASS: PDFs render in worker processes into a content-addressed disk cache")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""Rendering and cache check for the prescription print.
+
+Inside a transaction that is rolled back, seeds a throwaway hospital with a
+patient and a finalized two-item prescription, and checks that:
+1. the Hindi print carries the translated labels, patient, doctor and item
+   details, and escapes HTML in free-text fields;
+2. reprinting the finalized prescription issues no queries and returns the
+   same document, while a draft is rendered on every print;
+3. a changed updated_at (any later write) renders afresh;
+4. each language's template is compiled once.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.print_cache import print_cache
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.appointment import Doctor
+from app.models.patient import Patient
+from app.models.prescription import Prescription, PrescriptionItem
+from app.models.user import Hospital
+from app.services import prescription_print_service as svc
+from app.utils.prescription_translations import get_labels
+
+
+class _QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.count += 1
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def _render_counted(db: Session, rx: Prescription, lang: str) -> tuple[str, int]:
+    counter = _QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        return svc.render_prescription_html(db, rx, lang), counter.count
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+
+def _seed(db: Session) -> tuple[Prescription, Prescription, Doctor]:
+    doctor = db.query(Doctor).filter(Doctor.is_deleted == False).first()
+    if not doctor:
+        raise RuntimeError("Dev data needs a doctor")
+    hospital = Hospital(name="Print Hospital", code=f"PR{uuid.uuid4().hex[:8].upper()}", country="IND")
+    db.add(hospital)
+    db.flush()
+    patient = Patient(
+        hospital_id=hospital.id,
+        patient_reference_number=f"PR{uuid.uuid4().hex[:10].upper()}",
+        first_name="Asha", last_name="Print", gender="Female", blood_group="B+",
+        phone_country_code="+91", phone_number="7000000001", age_years=41,
+        known_allergies="Penicillin",
+    )
+    db.add(patient)
+    db.flush()
+
+    prescriptions = []
+    for finalized in (True, False):
+        rx = Prescription(
+            hospital_id=hospital.id, prescription_number=f"RXPR-{uuid.uuid4().hex[:12].upper()}",
+            patient_id=patient.id, doctor_id=doctor.id,
+            status="finalized" if finalized else "draft", is_finalized=finalized,
+            diagnosis="Fever <b>&</b> cough", advice="Rest",
+            valid_until=date.today() + timedelta(days=30),
+        )
+        db.add(rx)
+        db.flush()
+        for order, (name, generic) in enumerate((("Paracetamol 500", "Paracetamol"), ("Cetirizine", None))):
+            db.add(PrescriptionItem(
+                prescription_id=rx.id, medicine_name=name, generic_name=generic,
+                dosage="1 tab", frequency="1-0-1", duration_value=5, duration_unit="days",
+                display_order=order,
+            ))
+        prescriptions.append(rx)
+    db.flush()
+    for rx in prescriptions:
+        db.refresh(rx)
+    return prescriptions[0], prescriptions[1], doctor
+
+
+def _run(db: Session, failures: list[str]) -> None:
+    finalized, draft, doctor = _seed(db)
+    t = get_labels("hi")
+    prn = db.query(Patient.patient_reference_number).filter(Patient.id == finalized.patient_id).scalar()
+
+    html, first_queries = _render_counted(db, finalized, "hi")
+    expected = [
+        t["diagnosis"], t["prescribing_doctor"], "Asha Print", prn, "Penicillin", "Paracetamol 500", "5 days",
+        f"Dr. {doctor.user.full_name}", '<html lang="hi">', "FINALIZED",
+    ]
+    missing = [text for text in expected if text not in html]
+    _check(failures, not missing, f"Hindi print has labels, patient, doctor and items (missing: {missing})")
+    _check(
+        failures, "Fever &lt;b&gt;&amp;&lt;/b&gt; cough" in html and "<b>&</b>" not in html,
+        "free text is HTML-escaped",
+    )
+
+    again, reprint_queries = _render_counted(db, finalized, "hi")
+    _check(
+        failures, again == html and reprint_queries == 0,
+        f"finalized reprint served from memory: {first_queries} queries first, {reprint_queries} on reprint",
+    )
+
+    _render_counted(db, draft, "hi")
+    _, draft_queries = _render_counted(db, draft, "hi")
+    _check(failures, draft_queries > 0, f"draft re-rendered on every print ({draft_queries} queries)")
+
+    finalized.advice = "Rest and fluids"
+    finalized.updated_at = datetime.now(timezone.utc) + timedelta(seconds=1)
+    db.flush()
+    changed, changed_queries = _render_counted(db, finalized, "hi")
+    _check(
+        failures, changed_queries > 0 and "Rest and fluids" in changed,
+        "changed updated_at renders afresh",
+    )
+
+    english, _ = _render_counted(db, finalized, "en")
+    _check(
+        failures,
+        svc._template("hi") is svc._template("hi") and svc._template("en") is not svc._template("hi")
+        and get_labels("en")["diagnosis"] in english and t["diagnosis"] not in english,
+        "one compiled template per language",
+    )
+    print(f"info {print_cache.stats()}")
+
+
+def main() -> int:
+    failures: list[str] = []
+    print_cache.clear()
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    try:
+        _run(db, failures)
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+        print_cache.clear()
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("PASS: prescriptions print from compiled templates and finalized reprints come from memory")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
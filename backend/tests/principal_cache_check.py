@@ -0,0 +1,167 @@
+"""Behaviour check for the authenticated-user cache in get_current_user.
+
+Creates a throwaway user inside a transaction that is rolled back and
+resolves its token through the real dependency: repeat requests must not
+query the database, and update_user / role changes / deactivation /
+reset_password / delete_user must be visible on the very next request.
+Also checks TTL expiry, LRU eviction and that a load racing with an
+invalidation is not cached.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.principal_cache import Principal, PrincipalCache, principal_cache
+from app.core.security import create_access_token
+from app.database import engine
+from app.dependencies import get_current_user
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.user import Role, User, UserRole
+from app.services import user_service
+
+
+class _QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.count += 1
+
+
+def _resolve(db: Session, token: str, counter: _QueryCounter):
+    """Run get_current_user; return (principal or HTTP status, queries issued)."""
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    before = counter.count
+    try:
+        result = asyncio.run(get_current_user(credentials, db))
+    except HTTPException as exc:
+        result = exc.status_code
+    return result, counter.count - before
+
+
+def _unit_checks(failures: list[str]) -> None:
+    user_id = uuid.uuid4()
+    principal = Principal(user_id, uuid.uuid4(), "unit", ("doctor",), (), True)
+
+    expiring = PrincipalCache(ttl_seconds=0.05, max_entries=10)
+    expiring.put(1, principal, expiring.version(user_id))
+    if expiring.get(user_id, 1) is None:
+        failures.append("ttl: entry missing right after put")
+    time.sleep(0.1)
+    if expiring.get(user_id, 1) is not None:
+        failures.append("ttl: entry served after expiry")
+
+    bounded = PrincipalCache(ttl_seconds=60, max_entries=2)
+    for issued_at in (1, 2, 3):
+        bounded.put(issued_at, principal, bounded.version(user_id))
+    if bounded.get(user_id, 1) is not None or bounded.stats()["evictions"] != 1:
+        failures.append(f"lru: oldest entry not evicted ({bounded.stats()})")
+
+    racing = PrincipalCache(ttl_seconds=60, max_entries=10)
+    version = racing.version(user_id)
+    racing.invalidate_user(user_id)  # user updated while the request was loading
+    racing.put(1, principal, version)
+    if racing.get(user_id, 1) is not None:
+        failures.append("race: principal loaded before an invalidation was cached")
+
+
+def main() -> int:
+    failures: list[str] = []
+    _unit_checks(failures)
+
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    counter = _QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    principal_cache.clear()
+
+    def expect(step: str, token: str, queries: bool, check) -> None:
+        result, issued = _resolve(db, token, counter)
+        ok = check(result) and (issued > 0) == queries
+        if not ok:
+            failures.append(f"{step}: result={result} queries={issued}")
+        print(f"{'ok  ' if ok else 'FAIL'} {step}: queries={issued}")
+
+    try:
+        admin = db.query(User).filter(User.is_deleted == False).first()
+        roles = {r.name: r for r in db.query(Role).filter(Role.name.in_(("doctor", "receptionist"))).all()}
+        if len(roles) < 2:
+            raise RuntimeError("doctor and receptionist roles are required")
+
+        user = User(
+            hospital_id=admin.hospital_id,
+            reference_number=f"PC{uuid.uuid4().hex[:10].upper()}",
+            email=f"cache-{uuid.uuid4().hex[:8]}@example.com",
+            username=f"cache_{uuid.uuid4().hex[:8]}",
+            password_hash="x",
+            first_name="Cache",
+            last_name="Check",
+        )
+        db.add(user)
+        db.flush()
+        db.add(UserRole(user_id=user.id, role_id=roles["doctor"].id))
+        db.commit()
+
+        token = create_access_token({"user_id": str(user.id)})
+        expect("first request", token, True, lambda p: p.roles == ("doctor",))
+        expect("repeat request", token, False, lambda p: p.id == user.id)
+
+        user_service.update_user(db, user.id, first_name="Renamed")
+        expect("after update_user", token, True, lambda p: isinstance(p, Principal))
+
+        # Role change the way the users router does it, committed by update_user
+        db.query(UserRole).filter(UserRole.user_id == user.id).delete()
+        db.add(UserRole(user_id=user.id, role_id=roles["receptionist"].id))
+        user_service.update_user(db, user.id)
+        expect("after role change", token, True, lambda p: p.roles == ("receptionist",))
+
+        user_service.update_user(db, user.id, is_active=False)
+        expect("after deactivation", token, True, lambda status: status == 403)
+        user_service.update_user(db, user.id, is_active=True)
+        expect("after reactivation", token, True, lambda p: isinstance(p, Principal))
+
+        user_service.reset_password(db, user.id, "Cache@12345")
+        expect("after reset_password", token, True, lambda p: isinstance(p, Principal))
+
+        user_service.delete_user(db, user.id)
+        expect("after delete_user", token, True, lambda status: status == 401)
+        expect("deleted user again", token, True, lambda status: status == 401)
+
+        stats = principal_cache.stats()
+        print(f"stats: {stats}")
+        if stats["hits"] < 1 or stats["invalidations"] < 6:
+            failures.append(f"counters not updated: {stats}")
+
+        if failures:
+            for failure in failures:
+                print(f"FAIL: {failure}")
+            return 1
+        print("PASS: cached principals are reused and invalidated on every user change")
+        return 0
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+        principal_cache.clear()
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""Query-count, streaming and memory check for batch printing.
+
+The batch stream reads committed data on its own session, so this runs
+against a throwaway hospital (deleted afterwards) with PRESCRIPTIONS
+finalized prescriptions and INVOICES invoices. It checks that:
+1. a filtered prescription batch prints every match, one page each, in a
+   fixed number of queries per chunk of PRINT_BATCH_CHUNK;
+2. output is streamed: the first piece arrives before the last chunk is
+   read;
+3. an id list prints in the given order and skips unknown ids;
+4. each page is the same markup as the single prescription print;
+5. peak memory does not grow with the number of documents;
+6. invoice batches print every invoice with its items in batched queries.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import re
+import sys
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event, text
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import SessionLocal, engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.appointment import Doctor
+from app.models.invoice import Invoice, InvoiceItem
+from app.models.patient import Patient
+from app.models.prescription import Prescription, PrescriptionItem
+from app.models.user import Hospital
+from app.services import print_batch_service as svc
+from app.services.prescription_print_service import render_prescription_html
+
+PRESCRIPTIONS = 300
+INVOICES = 120
+SMALL_BATCH = 60
+QUERIES_PER_CHUNK = 4  # page + patients + doctors + items
+
+
+class _QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.count += 1
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def _consume(stream) -> tuple[str, int, int, int]:
+    """(document, pieces, queries before the first piece, total queries)."""
+    counter = _QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    pieces, first = [], None
+    try:
+        for piece in stream:
+            if first is None:
+                first = counter.count
+            pieces.append(piece)
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+    return "".join(pieces), len(pieces), first or 0, counter.count
+
+
+def _peak_memory(stream) -> int:
+    tracemalloc.start()
+    try:
+        for _ in stream:
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _numbers(document: str, prefix: str) -> list[str]:
+    return re.findall(rf"({prefix}-[0-9A-F]+)", document)
+
+
+def _diagnoses(document: str) -> list[int]:
+    """Seeded prescription indexes in print order (the page shows the diagnosis, not the number)."""
+    return [int(n) for n in re.findall(r"Diagnosis (\d+)</div>", document)]
+
+
+def _seed() -> tuple[uuid.UUID, uuid.UUID, list[uuid.UUID]]:
+    with SessionLocal() as db:
+        doctor = db.query(Doctor).filter(Doctor.is_deleted == False).first()
+        if not doctor:
+            raise RuntimeError("Dev data needs a doctor")
+        hospital = Hospital(name="Batch Print Hospital", code=f"BP{uuid.uuid4().hex[:8].upper()}", country="IND")
+        db.add(hospital)
+        db.flush()
+        patients = []
+        for i in range(5):
+            patient = Patient(
+                hospital_id=hospital.id, patient_reference_number=f"BP{uuid.uuid4().hex[:10].upper()}",
+                first_name=f"Batch{i}", last_name="Print", gender="Male", phone_country_code="+91",
+                phone_number=f"71{i:08d}", age_years=30 + i,
+            )
+            db.add(patient)
+            patients.append(patient)
+        db.flush()
+
+        rx_ids = []
+        for i in range(PRESCRIPTIONS):
+            rx = Prescription(
+                hospital_id=hospital.id, prescription_number=f"RXBP-{uuid.uuid4().hex[:12].upper()}",
+                patient_id=patients[i % 5].id, doctor_id=doctor.id, status="finalized", is_finalized=True,
+                diagnosis=f"Diagnosis {i}", advice="Rest", valid_until=date.today() + timedelta(days=30),
+            )
+            db.add(rx)
+            db.flush()
+            rx_ids.append(rx.id)
+            db.add_all([
+                PrescriptionItem(
+                    prescription_id=rx.id, medicine_name=f"Medicine {n}", dosage="1 tab",
+                    frequency="1-0-1", duration_value=5, duration_unit="days", display_order=n,
+                )
+                for n in range(3)
+            ])
+        for i in range(INVOICES):
+            invoice = Invoice(
+                hospital_id=hospital.id, invoice_number=f"INVBP-{uuid.uuid4().hex[:10].upper()}",
+                patient_id=patients[i % 5].id, invoice_type="pharmacy", invoice_date=date.today(),
+                status="issued", subtotal=Decimal("100"), total_amount=Decimal("100"),
+                balance_amount=Decimal("100"),
+            )
+            db.add(invoice)
+            db.flush()
+            db.add_all([
+                InvoiceItem(
+                    invoice_id=invoice.id, item_type="medicine", description=f"Line {n}",
+                    quantity=Decimal("1"), unit_price=Decimal("50"), total_price=Decimal("50"), display_order=n,
+                )
+                for n in range(2)
+            ])
+        db.commit()
+        return hospital.id, doctor.id, rx_ids
+
+
+def _run(hospital_id: uuid.UUID, doctor_id: uuid.UUID, rx_ids: list[uuid.UUID], failures: list[str]) -> None:
+    chunks = math.ceil(PRESCRIPTIONS / svc.PRINT_BATCH_CHUNK)
+    document, pieces, first, queries = _consume(
+        svc.stream_prescription_batch(hospital_id, "en", status="finalized", doctor_id=doctor_id)
+    )
+    printed = _diagnoses(document)
+    _check(
+        failures,
+        sorted(printed) == list(range(PRESCRIPTIONS)) and document.count('<section class="page">') == PRESCRIPTIONS
+        and queries <= QUERIES_PER_CHUNK * chunks + 1,
+        f"{len(printed)} filtered prescriptions printed in {queries} queries ({chunks} chunks)",
+    )
+    _check(
+        failures, pieces > 1 and first < queries,
+        f"streamed in {pieces} pieces; first piece after {first} of {queries} queries",
+    )
+
+    wanted = list(reversed(rx_ids[:5])) + [uuid.uuid4()]
+    document, _, _, _ = _consume(svc.stream_prescription_batch(hospital_id, "en", ids=wanted))
+    _check(
+        failures, _diagnoses(document) == [4, 3, 2, 1, 0],
+        "id list printed in the given order, unknown id skipped",
+    )
+
+    with SessionLocal() as db:
+        rx = db.get(Prescription, rx_ids[0])
+        single = render_prescription_html(db, rx, "hi")
+    page = single[single.index("<body>") + len("<body>\n"):single.index("</body>")].strip()
+    document, _, _, _ = _consume(svc.stream_prescription_batch(hospital_id, "hi", ids=[rx_ids[0]]))
+    _check(failures, page in document, "batch page matches the single print markup")
+
+    small = _peak_memory(svc.stream_prescription_batch(hospital_id, "en", ids=rx_ids[:SMALL_BATCH]))
+    large = _peak_memory(svc.stream_prescription_batch(hospital_id, "en", ids=rx_ids))
+    _check(
+        failures, large < small * 1.5,
+        f"peak memory {small / 1024:.0f} KiB for {SMALL_BATCH} documents, {large / 1024:.0f} KiB for {PRESCRIPTIONS}",
+    )
+
+    invoice_chunks = math.ceil(INVOICES / svc.PRINT_BATCH_CHUNK)
+    document, _, _, queries = _consume(svc.stream_invoice_batch(hospital_id, status="issued", invoice_type="pharmacy"))
+    _check(
+        failures,
+        len(_numbers(document, "INVBP")) == INVOICES and document.count("Line 1") == INVOICES
+        and queries <= 2 * invoice_chunks + 1,
+        f"{INVOICES} invoices printed in {queries} queries ({invoice_chunks} chunks)",
+    )
+
+
+def main() -> int:
+    failures: list[str] = []
+    hospital_id, doctor_id, rx_ids = _seed()
+    try:
+        _run(hospital_id, doctor_id, rx_ids, failures)
+    finally:
+        with engine.begin() as conn:
+            params = {"h": hospital_id}
+            conn.execute(text(
+                "DELETE FROM prescription_items WHERE prescription_id IN "
+                "(SELECT id FROM prescriptions WHERE hospital_id = :h)"
+            ), params)
+            conn.execute(text("DELETE FROM prescriptions WHERE hospital_id = :h"), params)
+            conn.execute(text(
+                "DELETE FROM invoice_items WHERE invoice_id IN (SELECT id FROM invoices WHERE hospital_id = :h)"
+            ), params)
+            conn.execute(text("DELETE FROM invoices WHERE hospital_id = :h"), params)
+            conn.execute(text("DELETE FROM patients WHERE hospital_id = :h"), params)
+            conn.execute(text("DELETE FROM hospitals WHERE id = :h"), params)
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("PASS: batch prints stream page by page from batched queries in bounded memory")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""Live queue event check for GET /walk-ins/queue/stream.
+
+Drives the walk-in handlers against dev data with four subscribers open: the
+reception desk, doctor A's screen, doctor B's screen and a desk in another
+hospital. It checks that:
+1. registering, calling, sending, starting and completing a walk-in reach
+   the desk and doctor A as queue.added then queue.updated events carrying
+   the same item payload as GET /queue;
+2. reassigning a walk-in from doctor A to doctor B sends queue.removed to
+   doctor A and queue.added to both, and doctor B only sees its own queue;
+3. no event crosses into another hospital's stream;
+4. the stream's queue.snapshot only lists the caller's hospital;
+5. a subscriber that falls max_pending events behind gets one queue.resync,
+   also when events are published from a worker thread.
+Database changes run inside a transaction that is rolled back.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sys
+import threading
+import uuid
+from datetime import date, time as dt_time
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.core.queue_events import RESYNC_EVENT, QueueEventHub, queue_event_hub
+from app.core.security import create_access_token
+from app.database import engine
+from app.dependencies import get_current_user
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.appointment import Appointment, AppointmentQueue, Doctor
+from app.models.patient import Patient
+from app.models.user import Hospital, User
+from app.routers import walk_ins
+from app.schemas.appointment import WalkInAssignDoctor, WalkInRegister
+from app.services import queue_service
+
+MAX_PENDING = 5
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def _patient(db: Session, hospital_id, n: int) -> Patient:
+    patient = Patient(
+        hospital_id=hospital_id,
+        patient_reference_number=f"QE{uuid.uuid4().hex[:10].upper()}",
+        first_name=f"Stream{n}",
+        last_name="Check",
+        gender="Female",
+        phone_country_code="+91",
+        phone_number=f"8{n:09d}",
+        age_years=40,
+    )
+    db.add(patient)
+    db.flush()
+    return patient
+
+
+async def _principal(db: Session, username: str = None, user_id=None):
+    query = db.query(User).filter(User.is_deleted == False)
+    user = query.filter(User.username == username).first() if username else query.filter(User.id == user_id).first()
+    if not user:
+        raise RuntimeError(f"Dev data needs user {username or user_id}")
+    token = create_access_token({"user_id": str(user.id)})
+    return await get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), db)
+
+
+async def _drain(sub) -> list[dict]:
+    events = []
+    while (event := await sub.get(timeout=0.05)) is not None:
+        events.append(event)
+    return events
+
+
+def _summary(events: list[dict]) -> list[tuple]:
+    return [(e["event"], e.get("queue_id"), e.get("status")) for e in events]
+
+
+async def _drive(db: Session, failures: list[str]) -> None:
+    doctor_a, doctor_b = db.query(Doctor).filter(Doctor.is_deleted == False).order_by(Doctor.id).limit(2).all()
+    hospital_id = doctor_a.hospital_id
+    desk_user = await _principal(db, "receptionist")
+    admin_user = await _principal(db, "admin")
+    doctor_a_user = await _principal(db, user_id=doctor_a.user_id)
+    if desk_user.hospital_id != hospital_id:
+        raise RuntimeError("Dev receptionist and doctors must share a hospital")
+
+    desk = queue_event_hub.subscribe(hospital_id)
+    screen_a = queue_event_hub.subscribe(hospital_id, doctor_a.id)
+    screen_b = queue_event_hub.subscribe(hospital_id, doctor_b.id)
+    elsewhere = queue_event_hub.subscribe(uuid.uuid4())
+    try:
+        first = await walk_ins.register_walk_in(
+            WalkInRegister(patient_id=str(_patient(db, hospital_id, 1).id), doctor_id=str(doctor_a.id)),
+            db=db, current_user=desk_user,
+        )
+        if first.get("waitlisted"):
+            raise RuntimeError(f"Doctor {doctor_a.id} has no free slot today")
+        q1 = str(db.query(AppointmentQueue.id).filter(AppointmentQueue.appointment_id == first["id"]).scalar())
+        await walk_ins.call_patient(q1, db=db, current_user=doctor_a_user)
+        await walk_ins.send_to_doctor_queue(q1, db=db, current_user=desk_user)
+        await walk_ins.start_consultation(q1, db=db, current_user=doctor_a_user)
+        await walk_ins.complete_patient(q1, db=db, current_user=doctor_a_user)
+
+        second = await walk_ins.register_walk_in(
+            WalkInRegister(patient_id=str(_patient(db, hospital_id, 2).id), doctor_id=str(doctor_a.id)),
+            db=db, current_user=desk_user,
+        )
+        q2 = str(db.query(AppointmentQueue.id).filter(AppointmentQueue.appointment_id == second["id"]).scalar())
+        await walk_ins.assign_doctor_to_walkin(
+            str(second["id"]), WalkInAssignDoctor(doctor_id=str(doctor_b.id)), db=db, current_user=desk_user,
+        )
+        q3 = str(db.query(AppointmentQueue.id).filter(AppointmentQueue.appointment_id == second["id"]).scalar())
+        await walk_ins.skip_patient(q3, db=db, current_user=admin_user)
+
+        desk_events, a_events, b_events, other_events = [
+            await _drain(sub) for sub in (desk, screen_a, screen_b, elsewhere)
+        ]
+    finally:
+        for sub in (desk, screen_a, screen_b, elsewhere):
+            queue_event_hub.unsubscribe(sub)
+
+    consultation = [
+        ("queue.added", q1, "waiting"), ("queue.updated", q1, "called"),
+        ("queue.updated", q1, "sent_to_doctor"), ("queue.updated", q1, "in_consultation"),
+        ("queue.updated", q1, "completed"), ("queue.added", q2, "waiting"),
+    ]
+    reassigned = [("queue.removed", q2, None), ("queue.added", q3, "waiting")]
+    skipped = [("queue.updated", q3, "skipped")]
+    added = desk_events[0] if desk_events else {}
+    item = added.get("item") or {}
+    _check(
+        failures,
+        _summary(desk_events) == consultation + reassigned + skipped
+        and item.get("queue_id") == q1 and item.get("status") == "waiting"
+        and (item.get("patient_name") or "").startswith("Stream1"),
+        f"desk received {len(desk_events)} events in order: {[e[0] + ':' + str(e[2]) for e in _summary(desk_events)]}",
+    )
+    _check(
+        failures,
+        _summary(a_events) == consultation + reassigned
+        and a_events[-1].get("previous_doctor_id") == str(doctor_a.id),
+        f"doctor A received {len(a_events)} events, ending with the reassignment away from it",
+    )
+    _check(
+        failures, _summary(b_events) == [("queue.added", q3, "waiting")] + skipped,
+        f"doctor B received only its own queue: {_summary(b_events)}",
+    )
+    _check(failures, other_events == [], f"other hospital's stream received {len(other_events)} events")
+
+    other_hospital = db.query(Hospital.id).filter(Hospital.id != hospital_id).limit(1).scalar()
+    if other_hospital is None:
+        raise RuntimeError("Dev data needs a second hospital")
+    stray_appt = Appointment(
+        hospital_id=other_hospital,
+        appointment_number=f"QEVT-{uuid.uuid4().hex[:12].upper()}",
+        patient_id=_patient(db, other_hospital, 3).id,
+        doctor_id=doctor_a.id,
+        appointment_date=date.today(),
+        start_time=dt_time(9, 0),
+        appointment_type="walk-in",
+        priority="normal",
+        status="scheduled",
+    )
+    db.add(stray_appt)
+    db.flush()
+    stray = AppointmentQueue(
+        appointment_id=stray_appt.id, doctor_id=doctor_a.id, queue_date=date.today(),
+        queue_number=999, position=999, status="waiting",
+    )
+    db.add(stray)
+    db.flush()
+
+    original = walk_ins.SessionLocal
+    walk_ins.SessionLocal = lambda: Session(bind=db.connection())
+    try:
+        token = create_access_token({"user_id": str(desk_user.id)})
+        response = await walk_ins.stream_queue_events(
+            None, None, HTTPAuthorizationCredentials(scheme="Bearer", credentials=token),
+        )
+        frame = await response.body_iterator.__anext__()
+        await response.body_iterator.aclose()
+    finally:
+        walk_ins.SessionLocal = original
+    snapshot = json.loads(frame.split("data: ", 1)[1])
+    listed = {i["queue_id"] for i in snapshot["items"]}
+    unscoped = {i["queue_id"] for i in queue_service.get_queue_items(db, date.today())}
+    _check(
+        failures,
+        frame.startswith("event: queue.snapshot") and {q1, q3} <= listed and str(stray.id) not in listed
+        and str(stray.id) in unscoped,
+        f"snapshot lists {len(listed)} entries of the caller's hospital, none from another hospital",
+    )
+
+
+async def _overflow() -> list[dict]:
+    hub = QueueEventHub(max_pending=MAX_PENDING)
+    sub = hub.subscribe("h1")
+    worker = threading.Thread(
+        target=lambda: [hub.publish({"event": "queue.updated", "hospital_id": "h1", "n": n}) for n in range(MAX_PENDING + 1)]
+    )
+    worker.start()
+    worker.join()
+    events = await _drain(sub)
+    hub.publish({"event": "queue.updated", "hospital_id": "h1", "n": "after"})
+    return events + await _drain(sub)
+
+
+def main() -> int:
+    failures: list[str] = []
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    try:
+        asyncio.run(_drive(db, failures))
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+    events = asyncio.run(_overflow())
+    _check(
+        failures,
+        events[:1] == [RESYNC_EVENT] and [e.get("n") for e in events[1:]] == ["after"],
+        f"{MAX_PENDING + 1} events from a worker thread into a {MAX_PENDING}-event buffer -> "
+        f"{[e['event'] for e in events]}",
+    )
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("PASS: queue changes reach exactly the streams whose hospital and doctor they concern")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
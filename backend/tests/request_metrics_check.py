@@ -0,0 +1,213 @@
+"""Per-request query counting, pool timing and exposition check for /metrics.
+
+Serves a few probe routes through MetricsMiddleware with a fresh registry,
+then scrapes the real app. It checks that:
+1. a route's per-request query count and DB time are recorded under its
+   route template, for sync handlers (threadpool) and AsyncSession alike;
+2. queries made while a streamed body is sent belong to that request;
+3. the in-flight gauge counts a request while it is served;
+4. pool checkout time includes waiting for a busy pool (POOL_HOLD seconds),
+   and the timed pools log under sqlalchemy.pool so SQLAlchemy's WARN cap
+   keeps per-checkout DEBUG lines out of the app log;
+5. GET /metrics is valid Prometheus text covering requests, the pools and
+   the core caches; it is not served without a METRICS_TOKEN and refuses
+   scrapers that do not send it.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# Metrics are off by default; the app and its engines are wired at import.
+os.environ["METRICS_ENABLED"] = "true"
+
+from app.config import settings
+from app.core.metrics import Metrics, MetricsMiddleware, TimedQueuePool, current_request, metrics
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, engine
+from app.main import app
+
+N_PLUS_ONE = 12
+STREAM_CHUNKS = 4
+POOL_HOLD = 0.3
+
+_SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{([a-zA-Z_]+="([^"\\]|\\.)*",?)*\})? [-+0-9.eEInf]+$')
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def _sample(exposition: str, name: str, **labels: str) -> float:
+    wanted = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    for line in exposition.splitlines():
+        if line.startswith(f"{name}{{{wanted}}} ") or (not labels and line.startswith(f"{name} ")):
+            return float(line.rsplit(" ", 1)[1])
+    return float("nan")
+
+
+def _probe_app(registry: Metrics) -> FastAPI:
+    probe = FastAPI()
+    probe.add_middleware(MetricsMiddleware, registry=registry)
+
+    @probe.get("/probe/items/{count}")
+    def items(count: int):
+        with SessionLocal() as db:
+            for n in range(count):
+                db.execute(text("SELECT :n"), {"n": n})
+        return {"count": count}
+
+    @probe.get("/probe/async")
+    async def async_items():
+        async with AsyncSessionLocal() as db:
+            for n in range(3):
+                await db.execute(text("SELECT CAST(:n AS integer)"), {"n": n})
+        return {"count": 3}
+
+    @probe.get("/probe/stream")
+    def stream():
+        def body():
+            with SessionLocal() as db:
+                for n in range(STREAM_CHUNKS):
+                    yield f"{db.execute(text('SELECT :n'), {'n': n}).scalar()}\n"
+        return StreamingResponse(body(), media_type="text/plain")
+
+    @probe.get("/probe/gauges")
+    async def gauges():
+        stats = current_request()
+        return PlainTextResponse(f"{registry.render()}# in-request {stats is not None}\n")
+
+    return probe
+
+
+def _pool_wait() -> float:
+    """Seconds a checkout waited for the only connection of a busy pool."""
+    small = create_engine(settings.DATABASE_URL, poolclass=TimedQueuePool, pool_size=1, max_overflow=0)
+    try:
+        small.connect().close()  # open the connection up front
+        held = threading.Event()
+
+        def hold() -> None:
+            with small.connect():
+                held.set()
+                time.sleep(POOL_HOLD)
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        held.wait(5)
+        before = _sample(metrics.render(), "hms_db_pool_checkout_seconds_sum", pool="sync")
+        with small.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        holder.join()
+        return _sample(metrics.render(), "hms_db_pool_checkout_seconds_sum", pool="sync") - before
+    finally:
+        small.dispose()
+
+
+def _run(failures: list[str]) -> None:
+    registry = Metrics()
+    with TestClient(_probe_app(registry)) as client:
+        for count in (1, N_PLUS_ONE, N_PLUS_ONE):
+            client.get(f"/probe/items/{count}")
+        client.get("/probe/async")
+        streamed = client.get("/probe/stream")
+        gauges = client.get("/probe/gauges").text
+    exposition = registry.render()
+
+    route = {"method": "GET", "route": "/probe/items/{count}"}
+    queries = _sample(exposition, "hms_http_request_db_queries_sum", **route)
+    requests = _sample(exposition, "hms_http_request_db_queries_count", **route)
+    over_ten = requests - _sample(exposition, "hms_http_request_db_queries_bucket", **route, le="10")
+    db_seconds = _sample(exposition, "hms_http_request_db_seconds_sum", **route)
+    _check(
+        failures,
+        queries == 1 + 2 * N_PLUS_ONE and requests == 3 and over_ten == 2 and db_seconds > 0,
+        f"sync route: {queries:.0f} queries over {requests:.0f} requests under its template, "
+        f"{over_ten:.0f} above 10, {db_seconds * 1000:.1f} ms DB time",
+    )
+    async_queries = _sample(exposition, "hms_http_request_db_queries_sum", method="GET", route="/probe/async")
+    _check(failures, async_queries == 3, f"AsyncSession route: {async_queries:.0f} queries")
+
+    stream_queries = _sample(exposition, "hms_http_request_db_queries_sum", method="GET", route="/probe/stream")
+    _check(
+        failures, streamed.text.count("\n") == STREAM_CHUNKS and stream_queries == STREAM_CHUNKS,
+        f"streamed body: {stream_queries:.0f} queries counted after the response started",
+    )
+
+    in_flight = _sample(gauges, "hms_http_requests_in_flight", method="GET")
+    _check(
+        failures, in_flight == 1 and "# in-request True" in gauges
+        and _sample(exposition, "hms_http_requests_in_flight", method="GET") == 0,
+        f"in-flight gauge {in_flight:.0f} while serving, 0 afterwards",
+    )
+
+    waited = _pool_wait()
+    _check(failures, waited >= POOL_HOLD * 0.8, f"checkout on a busy pool waited {waited * 1000:.0f} ms")
+    pool_loggers = [getattr(pool.logger, "logger", pool.logger).name for pool in (engine.pool, async_engine.pool)]
+    _check(
+        failures, all(name.startswith("sqlalchemy.pool.") for name in pool_loggers),
+        f"timed pools log as {pool_loggers}",
+    )
+
+    original = settings.METRICS_TOKEN
+    try:
+        with TestClient(app) as client:
+            client.get("/health")
+            settings.METRICS_TOKEN = ""
+            tokenless = client.get("/metrics")
+            settings.METRICS_TOKEN = "scrape-secret"
+            refused = client.get("/metrics", headers={"Authorization": "Bearer wrong"})
+            scraped = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    finally:
+        settings.METRICS_TOKEN = original
+    lines = [line for line in scraped.text.splitlines() if line and not line.startswith("#")]
+    invalid = [line for line in lines if not _SAMPLE.match(line)]
+    names = {line.split("{")[0].split(" ")[0] for line in lines}
+    expected = {
+        "hms_http_requests_total", "hms_http_request_duration_seconds_bucket", "hms_db_pool_connections",
+        "hms_principal_cache_hits", "hms_config_cache_hits", "hms_jobs_completed", "hms_pdf_renders",
+        "hms_images_processed", "hms_print_cache_hits", "hms_smtp_pool_sent",
+    }
+    _check(
+        failures,
+        scraped.status_code == 200 and scraped.headers["content-type"].startswith("text/plain; version=0.0.4")
+        and not invalid and expected <= names,
+        f"/metrics: {len(lines)} samples in {len(names)} series, {len(invalid)} malformed, "
+        f"missing {sorted(expected - names)}",
+    )
+    _check(
+        failures, tokenless.status_code == 404 and refused.status_code == 401,
+        f"/metrics without METRICS_TOKEN configured -> {tokenless.status_code}; wrong token -> {refused.status_code}",
+    )
+
+
+def main() -> int:
+    failures: list[str] = []
+    _run(failures)
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("PASS: requests report route latency, DB queries and pool waits on /metrics")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Session reuse, retry and rate-limit check for the SMTP pool.
+
+Runs a small SMTP stand-in server on localhost (no mail leaves the
+machine). Opening a session on it takes GREETING_DELAY, standing in for
+the TLS handshake and AUTH round trips of a real server. It checks that:
+1. credential emails sent one after another reuse one session per 100
+   messages, and are much faster per message than opening a session each;
+2. when the server drops the session after a few messages, the next send
+   carries on over a fresh one;
+3. a 4xx reply is retried and a 5xx reply fails only that message, keeping
+   the session;
+4. concurrent senders never hold more sessions than the pool size;
+5. the send rate cap holds.
+Needs no database; exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import os
+import smtplib
+import socketserver
+import sys
+import threading
+import time
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.config import settings
+from app.core.smtp_pool import SMTPPool
+from app.services import email_service
+
+GREETING_DELAY = 0.05
+BATCH = 200
+BASELINE = 20
+
+
+class _StandInHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        server: _StandInSMTP = self.server
+        with server.lock:
+            server.sessions += 1
+            server.open_sessions += 1
+            server.peak_sessions = max(server.peak_sessions, server.open_sessions)
+        try:
+            time.sleep(server.greeting_delay)
+            self._reply("220 stand-in ESMTP")
+            delivered, recipient = 0, None
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    return
+                command = line.decode().strip()
+                verb = command[:4].upper()
+                if verb in ("EHLO", "HELO", "MAIL", "RSET", "NOOP"):
+                    self._reply("250 OK")
+                elif verb == "RCPT":
+                    address = command.split(":", 1)[1].strip().strip("<>")
+                    with server.lock:
+                        temporary = address in server.fail_once
+                        server.fail_once.discard(address)
+                    if address.startswith("reject"):
+                        self._reply("550 No such user")
+                    elif temporary:
+                        self._reply("451 Try again later")
+                    else:
+                        recipient = address
+                        self._reply("250 OK")
+                elif verb == "DATA":
+                    self._reply("354 End data with <CR><LF>.<CR><LF>")
+                    while self.rfile.readline() not in (b".\r\n", b""):
+                        pass
+                    with server.lock:
+                        server.delivered.append(recipient)
+                    delivered += 1
+                    self._reply("250 Queued")
+                    if server.session_limit and delivered >= server.session_limit:
+                        return  # drop the session, as servers capping messages per session do
+                elif verb == "QUIT":
+                    self._reply("221 Bye")
+                    return
+                else:
+                    self._reply("502 Command not implemented")
+        finally:
+            with server.lock:
+                server.open_sessions -= 1
+
+
+class _StandInSMTP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _StandInHandler)
+        self.lock = threading.Lock()
+        self.greeting_delay = GREETING_DELAY
+        self.session_limit = 0
+        self.fail_once: set[str] = set()
+        self.delivered: list[str] = []
+        self.sessions = 0
+        self.open_sessions = 0
+        self.peak_sessions = 0
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def _accounts(count: int, prefix: str = "staff") -> list[dict]:
+    return [
+        {"to_email": f"{prefix}{i}@example.test", "username": f"{prefix}{i}",
+         "password": "Temp#2026", "full_name": f"Staff {i}"}
+        for i in range(count)
+    ]
+
+
+def _baseline_per_message(server: _StandInSMTP) -> float:
+    """A session per message, as send_email used to do."""
+    started = time.perf_counter()
+    for i in range(BASELINE):
+        smtp = smtplib.SMTP("127.0.0.1", server.port, timeout=10)
+        smtp.sendmail(settings.SMTP_FROM_EMAIL, [f"baseline{i}@example.test"], "Subject: x\r\n\r\nbody")
+        smtp.quit()
+    return (time.perf_counter() - started) / BASELINE
+
+
+def _run(server: _StandInSMTP, failures: list[str]) -> None:
+    pool = SMTPPool("127.0.0.1", server.port, starttls=False, size=2, retry_seconds=0.01)
+    email_service.smtp_pool = pool
+
+    baseline = _baseline_per_message(server)
+    sessions = server.sessions
+    started = time.perf_counter()
+    results = [email_service.send_password_email(**account) for account in _accounts(BATCH)]
+    pooled = (time.perf_counter() - started) / BATCH
+    _check(
+        failures,
+        all(results) and server.sessions - sessions == BATCH // pool.max_per_session and pooled * 5 < baseline,
+        f"{BATCH} credential emails over {server.sessions - sessions} sessions: {pooled * 1000:.1f} ms/message "
+        f"vs {baseline * 1000:.1f} ms/message with a session each",
+    )
+
+    server.session_limit = 50
+    sessions, retried = server.sessions, pool.retried
+    results = [
+        email_service.send_patient_id_card_email(f"patient{i}@example.test", f"Patient {i}", "<div>card</div>")
+        for i in range(120)
+    ]
+    _check(
+        failures,
+        all(results) and server.sessions - sessions == 3 and pool.retried - retried == 2,
+        f"ID card emails survive the server dropping sessions: {server.sessions - sessions} sessions, "
+        f"{pool.retried - retried} reconnects",
+    )
+    server.session_limit = 0
+
+    server.fail_once.add("busy@example.test")
+    before, sessions = len(server.delivered), server.sessions
+    results = [
+        email_service.send_email(to_email, "Hello", "<p>hi</p>")
+        for to_email in ("first@example.test", "reject@example.test", "busy@example.test", "last@example.test")
+    ]
+    _check(
+        failures,
+        results == [True, False, True, True]
+        and server.delivered[before:] == ["first@example.test", "busy@example.test", "last@example.test"]
+        and server.sessions - sessions == 1,
+        f"4xx retried, 5xx fails only its message: {results} over {server.sessions - sessions} new session",
+    )
+
+    server.peak_sessions = server.open_sessions
+    outcomes: list[bool] = []
+    threads = [
+        threading.Thread(target=lambda n=n: outcomes.extend(
+            email_service.send_password_email(**account) for account in _accounts(25, f"t{n}-")
+        ))
+        for n in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    _check(
+        failures, len(outcomes) == 100 and all(outcomes) and server.peak_sessions <= pool.size,
+        f"4 concurrent senders share at most {pool.size} sessions (peak {server.peak_sessions})",
+    )
+    pool.close()
+
+    limited = SMTPPool("127.0.0.1", server.port, starttls=False, max_per_second=100)
+    started = time.perf_counter()
+    errors = [limited.send(settings.SMTP_FROM_EMAIL, f"rate{i}@example.test", "Subject: x\r\n\r\nbody") for i in range(31)]
+    elapsed = time.perf_counter() - started
+    limited.close()
+    _check(
+        failures, not any(errors) and elapsed >= 0.3,
+        f"31 messages at 100/s take {elapsed:.2f}s",
+    )
+    print(f"info {pool.stats()}")
+
+
+def main() -> int:
+    failures: list[str] = []
+    server = _StandInSMTP()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    original_pool, original_host = email_service.smtp_pool, settings.SMTP_HOST
+    settings.SMTP_HOST = "127.0.0.1"
+    try:
+        _run(server, failures)
+    finally:
+        email_service.smtp_pool, settings.SMTP_HOST = original_pool, original_host
+        server.shutdown()
+        server.server_close()
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("PASS: emails reuse pooled SMTP sessions with retries and a rate cap")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
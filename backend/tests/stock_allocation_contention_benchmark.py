@@ -0,0 +1,231 @@
+"""Correctness check and contention benchmark for FEFO stock allocation.
+
+1. Inside a transaction that is rolled back, allocates against a small
+   set of batches and checks FEFO order, preferred and batch-only demands,
+   that expired batches are skipped unless include_expired, and that a
+   short request changes nothing.
+2. Commits a throwaway hospital with two medicines (BATCHES batches each;
+   deleted afterwards) and runs COUNTERS threads that each ring up SALES
+   two-medicine sales, in random line order, with allocate_stock on their
+   own sessions. Every unit must be taken exactly once (no lost updates,
+   no negative batches), the stock summary must match the batches, and no
+   sale may deadlock. Latency percentiles are reported.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import SessionLocal, engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.pharmacy import MedicineBatch
+from app.models.prescription import Medicine
+from app.models.user import Hospital
+from app.services.stock_allocation_service import InsufficientStock, StockDemand, allocate_stock
+from app.services.stock_summary_service import reconcile_stock_summary
+
+COUNTERS = 8
+SALES = 50
+BATCHES = 20
+BATCH_QUANTITY = 150
+
+
+def _medicine(db: Session, hospital_id: uuid.UUID, name: str) -> Medicine:
+    medicine = Medicine(
+        hospital_id=hospital_id, name=name, generic_name="Generic",
+        unit_of_measure="strip", selling_price=Decimal("10.00"),
+    )
+    db.add(medicine)
+    db.flush()
+    return medicine
+
+
+def _batch(db: Session, medicine_id: uuid.UUID, number: str, quantity: int, days: int) -> MedicineBatch:
+    batch = MedicineBatch(
+        medicine_id=medicine_id, batch_number=number,
+        expiry_date=date.today() + timedelta(days=days),
+        initial_quantity=quantity, quantity=quantity,
+        purchase_price=Decimal("5.00"), selling_price=Decimal("10.00"),
+    )
+    db.add(batch)
+    return batch
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def _check_semantics(failures: list[str]) -> None:
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    try:
+        hospital = Hospital(name="Allocation Hospital", code=f"AL{uuid.uuid4().hex[:8].upper()}", country="IND")
+        db.add(hospital)
+        db.flush()
+        medicine = _medicine(db, hospital.id, "Allocation Med")
+        late = _batch(db, medicine.id, "LATE", 10, 90)
+        early = _batch(db, medicine.id, "EARLY", 4, 10)
+        middle = _batch(db, medicine.id, "MIDDLE", 6, 40)
+        expired = _batch(db, medicine.id, "EXPIRED", 5, -1)
+        db.flush()
+
+        def taken(allocations):
+            return [(a.line, a.batch_number, a.quantity) for a in allocations]
+
+        got = taken(allocate_stock(db, [StockDemand(medicine.id, 7)]))
+        _check(failures, got == [(0, "EARLY", 4), (0, "MIDDLE", 3)], f"FEFO across batches: {got}")
+
+        got = taken(allocate_stock(db, [
+            StockDemand(medicine.id, 2),
+            StockDemand(medicine.id, 4, late.id),
+            StockDemand(medicine.id, 1, middle.id, batch_only=True),
+        ]))
+        want = [(0, "MIDDLE", 2), (1, "LATE", 4), (2, "MIDDLE", 1)]
+        _check(failures, got == want, f"preferred and batch-only demands: {got}")
+
+        before = [b.quantity for b in (late, early, middle, expired)]
+        try:
+            allocate_stock(db, [StockDemand(medicine.id, 1), StockDemand(medicine.id, 50)])
+            _check(failures, False, "short request raised InsufficientStock")
+        except InsufficientStock as e:
+            after = [b.quantity for b in (late, early, middle, expired)]
+            shortage = e.shortages[0]
+            _check(
+                failures, after == before and (shortage.line, shortage.available) == (1, 5),
+                f"short request changes nothing: {shortage}",
+            )
+
+        got = taken(allocate_stock(db, [StockDemand(medicine.id, 8)], include_expired=True))
+        _check(failures, got == [(0, "EXPIRED", 5), (0, "LATE", 3)], f"include_expired writes off first: {got}")
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+
+def _counter(medicine_ids: list[uuid.UUID], sales: int, seed: int, results: dict, lock: threading.Lock) -> None:
+    rng = random.Random(seed)
+    latencies, taken, errors = [], {m: 0 for m in medicine_ids}, []
+    for _ in range(sales):
+        demands = [StockDemand(m, rng.randint(1, 5)) for m in medicine_ids]
+        rng.shuffle(demands)
+        db = SessionLocal()
+        started = time.perf_counter()
+        try:
+            allocations = allocate_stock(db, demands)
+            db.commit()
+            latencies.append((time.perf_counter() - started) * 1000)
+            for allocation in allocations:
+                taken[allocation.medicine_id] += allocation.quantity
+        except Exception as e:  # deadlocks and the like are what this benchmark looks for
+            db.rollback()
+            errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            db.close()
+    with lock:
+        results["latencies"].extend(latencies)
+        results["errors"].extend(errors)
+        for medicine_id, quantity in taken.items():
+            results["taken"][medicine_id] += quantity
+
+
+def _benchmark(counters: int, sales: int, failures: list[str]) -> None:
+    with SessionLocal() as db:
+        hospital = Hospital(name="Allocation Bench Hospital", code=f"AB{uuid.uuid4().hex[:8].upper()}", country="IND")
+        db.add(hospital)
+        db.flush()
+        medicines = [_medicine(db, hospital.id, f"Contended Med {i}") for i in range(2)]
+        for medicine in medicines:
+            for i in range(BATCHES):
+                _batch(db, medicine.id, f"CB{i:03d}", BATCH_QUANTITY, 30 + i)
+        db.commit()
+        hospital_id = hospital.id
+        medicine_ids = [m.id for m in medicines]
+
+    try:
+        results = {"latencies": [], "errors": [], "taken": {m: 0 for m in medicine_ids}}
+        lock = threading.Lock()
+        threads = [
+            threading.Thread(target=_counter, args=(medicine_ids, sales, i, results, lock))
+            for i in range(counters)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(results["latencies"])
+        if latencies:
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(
+                f"info {len(latencies)} sales by {counters} counters in {elapsed:.1f}s "
+                f"({len(latencies) / elapsed:.0f}/s), p50 {statistics.median(latencies):.1f} ms, p95 {p95:.1f} ms"
+            )
+        _check(failures, not results["errors"], f"no failed sales ({results['errors'][:1]})")
+
+        with SessionLocal() as db:
+            for medicine_id in medicine_ids:
+                remaining, lowest = db.query(
+                    func.sum(MedicineBatch.quantity), func.min(MedicineBatch.quantity),
+                ).filter(MedicineBatch.medicine_id == medicine_id).one()
+                taken = results["taken"][medicine_id]
+                _check(
+                    failures, remaining + taken == BATCHES * BATCH_QUANTITY and lowest >= 0,
+                    f"every unit taken once: {taken} taken + {remaining} left",
+                )
+            drift = reconcile_stock_summary(db, hospital_id)
+            _check(failures, not drift, "stock summary matches the batches")
+    finally:
+        with engine.begin() as conn:
+            params = {"h": hospital_id}
+            conn.execute(text("DELETE FROM medicine_stock_summary WHERE hospital_id = :h"), params)
+            conn.execute(text(
+                "DELETE FROM medicine_batches WHERE medicine_id IN (SELECT id FROM medicines WHERE hospital_id = :h)"
+            ), params)
+            conn.execute(text("DELETE FROM medicines WHERE hospital_id = :h"), params)
+            conn.execute(text("DELETE FROM hospitals WHERE id = :h"), params)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--counters", type=int, default=COUNTERS)
+    parser.add_argument("--sales", type=int, default=SALES)
+    args = parser.parse_args()
+    failures: list[str] = []
+
+    _check_semantics(failures)
+    _benchmark(args.counters, args.sales, failures)
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print(f"PASS: FEFO allocation is exact under {args.counters} concurrent counters")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
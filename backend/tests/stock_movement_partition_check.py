@@ -0,0 +1,166 @@
+"""Partition routing, pruning and archive check for stock_movements.
+
+Partition DDL is transactional, so everything here runs inside one
+transaction that is rolled back. It seeds a throwaway hospital with
+movements in January, February and March 2001 (months no real data uses)
+and checks that:
+1. rows written before their month has a partition land in the default
+   partition and ensure_partitions() moves them into their month;
+2. a date-filtered movement listing only scans the matching partition;
+3. archiving with March 2001 as the current month snapshots January and
+   February per item and detaches their partitions, and last_balance()
+   then answers from the snapshots for items idle since, and from the
+   attached March partition for the rest;
+4. archiving again is a no-op.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import uuid
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.inventory import StockMovement, StockMovementMonthlySnapshot
+from app.models.user import Hospital
+from app.services import stock_movement_service as svc
+from app.services.inventory_service import _filtered_stock_movements
+
+TODAY = date(2001, 3, 15)
+# (item, day of month, quantity) per month; balances run on per item.
+MOVEMENTS = {
+    1: [("a", 5, 100), ("a", 20, -30), ("b", 9, 40)],
+    2: [("a", 3, -20), ("b", 11, -15), ("b", 27, 5)],
+    3: [("b", 2, -10)],
+}
+
+
+def _check(failures: list[str], ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        failures.append(label)
+
+
+def _seed(db: Session) -> tuple[uuid.UUID, dict[str, uuid.UUID]]:
+    hospital = Hospital(name="Partition Check Hospital", code=f"PC{uuid.uuid4().hex[:8].upper()}", country="IND")
+    db.add(hospital)
+    db.flush()
+    items = {"a": uuid.uuid4(), "b": uuid.uuid4()}
+    balances = {"a": 0, "b": 0}
+    for month, rows in MOVEMENTS.items():
+        for item, day, quantity in rows:
+            balances[item] += quantity
+            db.add(StockMovement(
+                hospital_id=hospital.id, item_type="optical_product", item_id=items[item],
+                movement_type="stock_in" if quantity > 0 else "stock_out",
+                quantity=quantity, balance_after=balances[item],
+                created_at=datetime(2001, month, day, 10, tzinfo=timezone.utc),
+            ))
+    db.flush()
+    return hospital.id, items
+
+
+def _count(db: Session, table: str, hospital_id: uuid.UUID) -> int:
+    return db.execute(text(f"SELECT count(*) FROM {table} WHERE hospital_id = :h"), {"h": hospital_id}).scalar()
+
+
+def _scanned_partitions(db: Session, query) -> set[str]:
+    compiled = query.statement.compile(dialect=engine.dialect)
+    params = {k: str(v) if isinstance(v, uuid.UUID) else v for k, v in compiled.params.items()}
+    plan = db.connection().exec_driver_sql(f"EXPLAIN {compiled}", params).scalars().all()
+    return {
+        word for line in plan for word in line.replace("(", " ").split()
+        if word == "stock_movements_default" or svc._PARTITION_NAME.match(word)
+    }
+
+
+def _run(db: Session, failures: list[str]) -> None:
+    hospital_id, items = _seed(db)
+    _check(failures, _count(db, "stock_movements_default", hospital_id) == 7, "rows without a partition go to default")
+
+    names = svc.ensure_partitions(db, months_ahead=0, today=TODAY)
+    _check(
+        failures,
+        {"stock_movements_2001_01", "stock_movements_2001_02", "stock_movements_2001_03"} <= set(names)
+        and _count(db, "stock_movements_default", hospital_id) == 0
+        and _count(db, "stock_movements_2001_01", hospital_id) == 3,
+        f"ensure_partitions moves them into their months: {sorted(names)}",
+    )
+
+    query = _filtered_stock_movements(db, hospital_id, date_from=date(2001, 2, 1), date_to=date(2001, 2, 28))
+    scanned = _scanned_partitions(db, query)
+    _check(
+        failures, scanned == {"stock_movements_2001_02"} and query.count() == 3,
+        f"February listing scans one partition: {sorted(scanned)}",
+    )
+
+    archived = svc.archive_stock_movements(db, keep_months=1, today=TODAY)
+    attached = {name for name, _ in svc.list_partitions(db)}
+    _check(
+        failures,
+        [(m.partition, m.movements, m.snapshots) for m in archived]
+        == [("stock_movements_2001_01", 3, 2), ("stock_movements_2001_02", 3, 2)]
+        and not attached & {m.partition for m in archived} and "stock_movements_2001_03" in attached
+        and _count(db, "stock_movements", hospital_id) == 1,
+        f"January and February detached: {[m.partition for m in archived]}",
+    )
+
+    snapshots = {
+        (s.item_id, s.month): (s.movements, s.quantity_in, s.quantity_out, s.closing_balance)
+        for s in db.query(StockMovementMonthlySnapshot).filter(StockMovementMonthlySnapshot.hospital_id == hospital_id)
+    }
+    _check(
+        failures,
+        snapshots == {
+            (items["a"], date(2001, 1, 1)): (2, 100, 30, 70),
+            (items["b"], date(2001, 1, 1)): (1, 40, 0, 40),
+            (items["a"], date(2001, 2, 1)): (1, 0, 20, 50),
+            (items["b"], date(2001, 2, 1)): (2, 5, 15, 30),
+        },
+        "monthly snapshots hold counts, quantities and closing balances",
+    )
+
+    balances = (
+        svc.last_balance(db, hospital_id, "optical_product", items["a"]),
+        svc.last_balance(db, hospital_id, "optical_product", items["b"]),
+        svc.last_balance(db, hospital_id, "optical_product", uuid.uuid4()),
+    )
+    _check(failures, balances == (50, 20, 0), f"last_balance from snapshot, partition, nothing: {balances}")
+
+    again = svc.archive_stock_movements(db, keep_months=1, today=TODAY)
+    _check(failures, again == [], "archiving again is a no-op")
+
+
+def main() -> int:
+    failures: list[str] = []
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    try:
+        _run(db, failures)
+    finally:
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print("PASS: stock movements route, prune and archive by month")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
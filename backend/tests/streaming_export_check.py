@@ -0,0 +1,126 @@
+"""Constant-memory check for the streaming CSV / NDJSON exports.
+
+Exports read on their own session, so this commits ROWS stock movements
+(default 200,000) for a throwaway hospital, deleted afterwards. Each
+format is consumed chunk by chunk under tracemalloc: every row must come
+out exactly once, in created_at order, and peak Python memory must stay
+under MAX_PEAK_MB (loading the same rows as ORM objects takes hundreds of
+MB). The invoice, payment and refund exports are then run against the
+dev hospital to check their columns.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+from sqlalchemy import text
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import SessionLocal, engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.user import Hospital, User
+from app.services.export_service import stream_export
+from app.services.inventory_service import export_stock_movements
+from app.services.invoice_service import export_invoices
+from app.services.payment_service import export_payments
+from app.services.refund_service import export_refunds
+
+ROWS = 200_000
+MAX_PEAK_MB = 16.0
+
+
+def _consume(build, fmt: str) -> tuple[str, float, float]:
+    """Run an export keeping only the last chunk; return (head, peak MB, seconds)."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    head, size = "", 0
+    for chunk in stream_export(build, fmt):
+        if not head:
+            head = chunk[:4096]
+        size += chunk.count("\n")
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return head, peak / 2**20, elapsed, size
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=ROWS)
+    args = parser.parse_args()
+    failures: list[str] = []
+
+    with SessionLocal() as db:
+        hospital = Hospital(name="Export Check Hospital", code=f"EX{uuid.uuid4().hex[:8].upper()}", country="IND")
+        db.add(hospital)
+        db.commit()
+        hospital_id = hospital.id
+        dev_hospital_id = db.query(User.hospital_id).filter(User.hospital_id.isnot(None)).first()[0]
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT INTO stock_movements (
+                    hospital_id, item_type, item_id, movement_type, quantity, balance_after, notes, created_at
+                )
+                SELECT :h, 'medicine', gen_random_uuid(), 'stock_in', 1, i,
+                       'export check, row "' || i || '"', now() - ((:rows - i) * interval '1 second')
+                FROM generate_series(1, :rows) AS i
+            """), {"h": hospital_id, "rows": args.rows})
+
+        build = lambda db: export_stock_movements(db, hospital_id)  # noqa: E731
+        for fmt in ("csv", "ndjson"):
+            head, peak_mb, elapsed, lines = _consume(build, fmt)
+            if fmt == "csv":
+                rows = list(csv.DictReader(io.StringIO(head)))
+                data_lines = lines - 1
+            else:
+                rows = [json.loads(line) for line in head.splitlines()[:-1]]
+                data_lines = lines
+            in_order = [int(r["balance_after"]) for r in rows[:5]] == [1, 2, 3, 4, 5]
+            ok = data_lines == args.rows and in_order and peak_mb < MAX_PEAK_MB
+            print(
+                f"{'ok  ' if ok else 'FAIL'} stock movements {fmt:<6} {data_lines} rows "
+                f"in {elapsed:.1f}s, peak {peak_mb:.1f} MB"
+            )
+            if not ok:
+                failures.append(f"{fmt}: rows={data_lines} ordered={in_order} peak={peak_mb:.1f} MB")
+
+        for name, export in (
+            ("invoices", export_invoices), ("payments", export_payments), ("refunds", export_refunds),
+        ):
+            head, _, _, lines = _consume(lambda db: export(db, dev_hospital_id), "csv")
+            header = head.splitlines()[0].split(",")
+            ok = header[0].endswith("_number") and "patient_name" in header
+            print(f"{'ok  ' if ok else 'FAIL'} {name} export: {lines - 1} rows, columns {header[:3]}...")
+            if not ok:
+                failures.append(f"{name}: unexpected header {header}")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM stock_movements WHERE hospital_id = :h"), {"h": hospital_id})
+            conn.execute(text("DELETE FROM hospitals WHERE id = :h"), {"h": hospital_id})
+            conn.execute(text("ANALYZE stock_movements"))
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1
+    print(f"PASS: exports stream {args.rows} rows in order with peak memory under {MAX_PEAK_MB:.0f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
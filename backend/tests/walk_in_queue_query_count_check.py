@@ -0,0 +1,136 @@
+"""Query-count benchmark for the walk-in queue read path.
+
+Seeds synthetic queues of increasing size inside a transaction that is rolled
+back, and checks that building the queue payload costs the same number of
+queries no matter how many patients are waiting.
+This script runs against local dev data and exits non-zero on failure.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import time
+import uuid
+from datetime import date, time as dt_time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from app.database import engine
+from app.main import app  # noqa: F401  (registers all models)
+from app.models.appointment import Appointment, AppointmentQueue, Doctor
+from app.models.patient import Patient
+from app.services import queue_service
+
+
+QUEUE_SIZES = (10, 50, 120, 300)
+# A date no real queue uses, so seeded rows never mix with dev data.
+BENCH_DATE = date(2099, 1, 1)
+
+
+class _QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        self.count += 1
+
+
+def _seed_queue(db: Session, size: int) -> None:
+    doctors = db.query(Doctor).filter(Doctor.is_deleted == False).limit(3).all()
+    if not doctors:
+        raise RuntimeError("No doctor found for queue benchmark")
+
+    for i in range(size):
+        doctor = doctors[i % len(doctors)]
+        patient = Patient(
+            hospital_id=doctor.hospital_id,
+            patient_reference_number=f"QB{uuid.uuid4().hex[:10].upper()}",
+            first_name=f"Queue{i}",
+            last_name="Bench",
+            gender="Male",
+            phone_country_code="+91",
+            phone_number=f"9{i:09d}",
+            age_years=30,
+        )
+        db.add(patient)
+        db.flush()
+
+        appt = Appointment(
+            hospital_id=doctor.hospital_id,
+            appointment_number=f"QBENCH-{uuid.uuid4().hex[:12].upper()}",
+            patient_id=patient.id,
+            doctor_id=doctor.id,
+            appointment_date=BENCH_DATE,
+            start_time=dt_time(9 + (i // 60) % 10, i % 60),
+            appointment_type="walk-in",
+            priority=("emergency", "urgent", "normal")[i % 3],
+            status="scheduled",
+        )
+        db.add(appt)
+        db.flush()
+
+        db.add(
+            AppointmentQueue(
+                appointment_id=appt.id,
+                doctor_id=doctor.id,
+                queue_date=BENCH_DATE,
+                queue_number=i + 1,
+                position=i + 1,
+                status="waiting",
+            )
+        )
+    db.flush()
+
+
+def _measure(size: int) -> tuple[int, float, int]:
+    connection = engine.connect()
+    transaction = connection.begin()
+    db = Session(bind=connection)
+    counter = _QueryCounter()
+    try:
+        _seed_queue(db, size)
+        db.expunge_all()
+
+        event.listen(engine, "before_cursor_execute", counter)
+        start = time.perf_counter()
+        payload = queue_service.get_queue_status(db, BENCH_DATE)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        event.remove(engine, "before_cursor_execute", counter)
+
+        return counter.count, elapsed_ms, len(payload["items"])
+    finally:
+        if event.contains(engine, "before_cursor_execute", counter):
+            event.remove(engine, "before_cursor_execute", counter)
+        db.close()
+        transaction.rollback()
+        connection.close()
+
+
+def main() -> int:
+    results = []
+    for size in QUEUE_SIZES:
+        queries, elapsed_ms, items = _measure(size)
+        if items != size:
+            print("FAIL: queue payload size mismatch", {"seeded": size, "returned": items})
+            return 1
+        results.append((size, queries, elapsed_ms))
+        print(f"queue_size={size:<4} queries={queries:<3} elapsed={elapsed_ms:.1f}ms")
+
+    query_counts = {queries for _, queries, _ in results}
+    if len(query_counts) != 1:
+        print("FAIL: query count grows with queue size", results)
+        return 1
+
+    print(f"PASS: walk-in queue built in {query_counts.pop()} queries for every queue size")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -266,6 +266,11 @@ CREATE TABLE patients (
     updated_by                  UUID        REFERENCES users(id),
     is_deleted                  BOOLEAN     DEFAULT false,
     deleted_at                  TIMESTAMPTZ,
+    -- Patient search (names weighted A, PRN + phone weighted B); see idx_patients_search
+    search_vector               TSVECTOR    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', first_name || ' ' || last_name), 'A') ||
+        setweight(to_tsvector('simple', patient_reference_number || ' ' || phone_number), 'B')
+    ) STORED,
     UNIQUE (hospital_id, patient_reference_number)
 );
 
@@ -475,6 +480,25 @@ CREATE TABLE waitlists (
     is_deleted              BOOLEAN     DEFAULT false
 );
 
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 5.5 appointment_daily_rollup  (report aggregates, maintained by the backend)
+-- ─────────────────────────────────────────────────────────────────────────────
+CREATE TABLE appointment_daily_rollup (
+    id                 UUID         PRIMARY KEY DEFAULT gen_random_uuid(),
+    hospital_id        UUID         NOT NULL REFERENCES hospitals(id),
+    appointment_date   DATE         NOT NULL,
+    doctor_id          UUID,
+    department_id      UUID,
+    status             VARCHAR(20)  NOT NULL,
+    appointment_type   VARCHAR(20)  NOT NULL,
+    start_hour         SMALLINT,
+    cancel_reason      VARCHAR(255),                              -- only for status = 'cancelled'
+    appointment_count  INTEGER      NOT NULL DEFAULT 0,
+    updated_at         TIMESTAMPTZ  DEFAULT NOW(),
+    CONSTRAINT uq_appointment_daily_rollup UNIQUE NULLS NOT DISTINCT
+        (hospital_id, appointment_date, doctor_id, department_id, status, appointment_type, start_hour, cancel_reason)
+);
+
 -- ═══════════════════════════════════════════════════════════════════════════════
 -- PHASE 2 — CLINICAL (Prescriptions, Pharmacy, Optical)
 -- ═══════════════════════════════════════════════════════════════════════════════
@@ -996,6 +1020,16 @@ CREATE TABLE pharmacy_return_items (
     created_at        TIMESTAMPTZ   DEFAULT NOW()
 );
 
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 7.7 medicine_stock_summary  (sum of active batch quantities, maintained by the backend)
+-- ─────────────────────────────────────────────────────────────────────────────
+CREATE TABLE medicine_stock_summary (
+    medicine_id       UUID          PRIMARY KEY REFERENCES medicines(id),
+    hospital_id       UUID          NOT NULL REFERENCES hospitals(id),
+    quantity          INTEGER       NOT NULL DEFAULT 0,
+    updated_at        TIMESTAMPTZ   DEFAULT NOW()
+);
+
 -- ─────────────────────────────────────────────────────────────────────────────
 -- 8.3 optical_orders
 -- ─────────────────────────────────────────────────────────────────────────────
@@ -1172,10 +1206,13 @@ CREATE TABLE grn_items (
 );
 
 -- ─────────────────────────────────────────────────────────────────────────────
--- 11.6 stock_movements
+-- 11.6 stock_movements  (range-partitioned by month on created_at)
 -- ─────────────────────────────────────────────────────────────────────────────
+-- Monthly partitions are created by stock_movements_ensure_partition()
+-- (see HELPER FUNCTION below); rows outside every monthly partition land in
+-- stock_movements_default until their month's partition is created.
 CREATE TABLE stock_movements (
-    id             UUID          PRIMARY KEY DEFAULT gen_random_uuid(),
+    id             UUID          NOT NULL DEFAULT gen_random_uuid(),
     hospital_id    UUID          NOT NULL REFERENCES hospitals(id),
     item_type      VARCHAR(20)   NOT NULL,          -- 'medicine','optical_product'
     item_id        UUID          NOT NULL,
@@ -1188,7 +1225,29 @@ CREATE TABLE stock_movements (
     unit_cost      DECIMAL(12,2),
     notes          VARCHAR(255),
     performed_by   UUID          REFERENCES users(id),
-    created_at     TIMESTAMPTZ   DEFAULT NOW()
+    created_at     TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE stock_movements_default PARTITION OF stock_movements DEFAULT;
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 11.6a stock_movement_monthly_snapshots  (archived months, one row per item and month)
+-- ─────────────────────────────────────────────────────────────────────────────
+-- Written by `python -m app.cli archive-stock-movements` when a closed
+-- month's partition is detached from stock_movements.
+CREATE TABLE stock_movement_monthly_snapshots (
+    hospital_id      UUID          NOT NULL REFERENCES hospitals(id),
+    item_type        VARCHAR(20)   NOT NULL,
+    item_id          UUID          NOT NULL,
+    month            DATE          NOT NULL,          -- first day of the month
+    movements        INTEGER       NOT NULL,
+    quantity_in      INTEGER       NOT NULL,
+    quantity_out     INTEGER       NOT NULL,
+    closing_balance  INTEGER       NOT NULL,          -- balance_after of the month's last movement
+    last_movement_at TIMESTAMPTZ   NOT NULL,
+    created_at       TIMESTAMPTZ   DEFAULT NOW(),
+    PRIMARY KEY (hospital_id, item_type, item_id, month)
 );
 
 -- ─────────────────────────────────────────────────────────────────────────────
@@ -1299,6 +1358,23 @@ CREATE TABLE notification_queue (
     created_at      TIMESTAMPTZ  DEFAULT NOW()
 );
 
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 12.4 background_jobs  (durable outbox for in-app notifications and emails)
+-- ─────────────────────────────────────────────────────────────────────────────
+CREATE TABLE background_jobs (
+    id            UUID         PRIMARY KEY DEFAULT gen_random_uuid(),
+    hospital_id   UUID         REFERENCES hospitals(id),
+    job_type      VARCHAR(50)  NOT NULL,
+    payload       JSONB        NOT NULL DEFAULT '{}',
+    status        VARCHAR(20)  NOT NULL DEFAULT 'pending',  -- 'pending','running','dead' (done jobs are deleted)
+    attempts      INTEGER      NOT NULL DEFAULT 0,
+    max_attempts  INTEGER      NOT NULL DEFAULT 5,
+    run_after     TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+    locked_at     TIMESTAMPTZ,
+    last_error    TEXT,
+    created_at    TIMESTAMPTZ  NOT NULL DEFAULT NOW()
+);
+
 -- ─────────────────────────────────────────────────────────────────────────────
 -- 13.1 audit_logs
 -- ─────────────────────────────────────────────────────────────────────────────
@@ -1339,6 +1415,17 @@ CREATE TABLE id_sequences (
     UNIQUE (hospital_id, entity_type, role_gender_code, year_code, month_code)
 );
 
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 14.2a document_sequences  (PO/GRN/ADJ/CC, pharmacy invoice and prescription counters)
+-- ─────────────────────────────────────────────────────────────────────────────
+CREATE TABLE document_sequences (
+    scope        VARCHAR(60)  NOT NULL,              -- e.g. 'PO', 'RX:<hospital_id>'
+    period       VARCHAR(8)   NOT NULL DEFAULT '',   -- 'YYYYMMDD' for daily numbers, '' otherwise
+    last_value   BIGINT       NOT NULL DEFAULT 0,
+    updated_at   TIMESTAMPTZ  DEFAULT NOW(),
+    CONSTRAINT pk_document_sequences PRIMARY KEY (scope, period)
+);
+
 -- ─────────────────────────────────────────────────────────────────────────────
 -- 14.3 id_cards
 -- ─────────────────────────────────────────────────────────────────────────────
@@ -1390,6 +1477,13 @@ CREATE INDEX idx_patients_phone ON patients(phone_country_code, phone_number) WH
 CREATE INDEX idx_patients_name  ON patients(hospital_id, first_name, last_name) WHERE is_deleted = false;
 CREATE INDEX idx_patients_prn   ON patients(patient_reference_number);
 CREATE INDEX idx_patients_active ON patients(hospital_id, is_active) WHERE is_deleted = false;
+CREATE INDEX idx_patients_search ON patients USING GIN (search_vector) WHERE is_deleted = false;
+CREATE INDEX idx_patients_phone_number ON patients(phone_number) WHERE is_deleted = false;
+-- Not partial: the planner only uses an expression index's statistics when
+-- the index has no WHERE clause, and exact email lookups need them to be
+-- preferred over walking idx_patients_keyset.
+CREATE INDEX idx_patients_email ON patients(lower(email));
+CREATE INDEX idx_patients_keyset ON patients(hospital_id, created_at DESC, id DESC) WHERE is_deleted = false;
 
 -- Doctors
 CREATE INDEX idx_doctors_hospital ON doctors(hospital_id, is_active);
@@ -1399,6 +1493,8 @@ CREATE INDEX idx_doctors_dept     ON doctors(department_id);
 CREATE INDEX idx_appointments_doctor_date ON appointments(doctor_id, appointment_date) WHERE is_deleted = false;
 CREATE INDEX idx_appointments_patient     ON appointments(patient_id, appointment_date DESC) WHERE is_deleted = false;
 CREATE INDEX idx_appointments_status      ON appointments(hospital_id, appointment_date, status) WHERE is_deleted = false;
+CREATE INDEX idx_appointments_keyset      ON appointments(hospital_id, created_at DESC, id DESC) WHERE is_deleted = false;
+CREATE INDEX idx_appointment_rollup_date  ON appointment_daily_rollup(hospital_id, appointment_date);
 
 -- Queue
 CREATE INDEX idx_queue_doctor_date ON appointment_queue(doctor_id, queue_date, position);
@@ -1408,10 +1504,12 @@ CREATE INDEX idx_queue_status      ON appointment_queue(doctor_id, queue_date, s
 CREATE INDEX idx_medicines_name    ON medicines(hospital_id, name);
 CREATE INDEX idx_medicines_generic ON medicines(generic_name);
 CREATE INDEX idx_medicines_barcode ON medicines(barcode) WHERE barcode IS NOT NULL;
+CREATE UNIQUE INDEX uq_medicines_hospital_sku ON medicines(hospital_id, sku) WHERE sku IS NOT NULL AND sku <> '';
 
 -- Medicine batches
 CREATE INDEX idx_batches_expiry ON medicine_batches(expiry_date) WHERE is_active = true;
 CREATE INDEX idx_batches_stock  ON medicine_batches(medicine_id, is_active, current_quantity);
+CREATE INDEX idx_stock_summary_hospital ON medicine_stock_summary(hospital_id);
 
 -- Prescriptions
 CREATE INDEX idx_prescriptions_patient     ON prescriptions(patient_id);
@@ -1419,6 +1517,7 @@ CREATE INDEX idx_prescriptions_doctor      ON prescriptions(doctor_id);
 CREATE INDEX idx_prescriptions_appointment ON prescriptions(appointment_id);
 CREATE INDEX idx_prescriptions_status      ON prescriptions(status);
 CREATE INDEX idx_prescriptions_created     ON prescriptions(created_at);
+CREATE INDEX idx_prescriptions_keyset      ON prescriptions(hospital_id, created_at DESC, id DESC) WHERE is_deleted = false;
 CREATE INDEX idx_prescription_items_rx     ON prescription_items(prescription_id);
 CREATE INDEX idx_prescription_templates_doctor ON prescription_templates(doctor_id);
 CREATE INDEX idx_prescription_versions_rx  ON prescription_versions(prescription_id);
@@ -1432,12 +1531,16 @@ CREATE INDEX idx_waitlist_status      ON waitlists(status);
 CREATE INDEX idx_invoices_patient     ON invoices(patient_id, invoice_date DESC) WHERE is_deleted = false;
 CREATE INDEX idx_invoices_date_status ON invoices(hospital_id, invoice_date, status) WHERE is_deleted = false;
 CREATE INDEX idx_invoices_status      ON invoices(status);
+CREATE INDEX idx_invoices_keyset      ON invoices(hospital_id, created_at DESC, id DESC) WHERE is_deleted = false;
 
 -- Stock movements
-CREATE INDEX idx_stock_movements_item ON stock_movements(item_type, item_id, created_at DESC);
+CREATE INDEX idx_stock_movements_item ON stock_movements(hospital_id, item_type, item_id, created_at DESC);
+CREATE INDEX idx_stock_movements_keyset ON stock_movements(hospital_id, created_at DESC, id DESC);
 
 -- Notifications
 CREATE INDEX idx_notifications_user ON notifications(user_id, is_read, created_at DESC);
+CREATE INDEX idx_notifications_keyset ON notifications(user_id, created_at DESC, id DESC);
+CREATE INDEX idx_background_jobs_due ON background_jobs(run_after) WHERE status IN ('pending', 'running');
 
 -- Audit logs
 CREATE INDEX idx_audit_entity   ON audit_logs(entity_type, entity_id, created_at DESC);
@@ -1524,6 +1627,47 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- ═══════════════════════════════════════════════════════════════════════════════
+-- HELPER FUNCTION: Create the monthly stock_movements partition for a date
+-- ═══════════════════════════════════════════════════════════════════════════════
+-- Idempotent. Rows of that month already in stock_movements_default are
+-- moved into the new partition before it is attached.
+CREATE OR REPLACE FUNCTION stock_movements_ensure_partition(p_month DATE)
+RETURNS TEXT AS $$
+DECLARE
+    v_from DATE := date_trunc('month', p_month)::DATE;
+    v_to   DATE := (date_trunc('month', p_month) + INTERVAL '1 month')::DATE;
+    v_name TEXT := 'stock_movements_' || to_char(p_month, 'YYYY_MM');
+BEGIN
+    IF to_regclass(v_name) IS NOT NULL THEN
+        RETURN v_name;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE stock_movements INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', v_name
+    );
+    EXECUTE format(
+        'WITH moved AS (
+             DELETE FROM stock_movements_default
+             WHERE created_at >= %L AND created_at < %L
+             RETURNING *
+         )
+         INSERT INTO %I SELECT * FROM moved',
+        v_from, v_to, v_name
+    );
+    EXECUTE format(
+        'ALTER TABLE stock_movements ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        v_name, v_from, v_to
+    );
+    RETURN v_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- This month and the next two; `python -m app.cli ensure-stock-movement-partitions`
+-- keeps creating them ahead.
+SELECT stock_movements_ensure_partition((date_trunc('month', CURRENT_DATE) + make_interval(months => m))::DATE)
+FROM generate_series(0, 2) AS m;
+
 -- ═══════════════════════════════════════════════════════════════════════════════
 -- DONE — Schema complete (62+ tables, all indexes, helper functions)
 -- ═══════════════════════════════════════════════════════════════════════════════
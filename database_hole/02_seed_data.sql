@@ -450,6 +450,16 @@ VALUES
      'walk_in', 'new', 'completed', 'Sore throat and cough', 150.00,
      '10000000-0000-0000-0000-000000000006');
 
+-- Report rollup for the bookings above (the backend maintains it from here on)
+INSERT INTO appointment_daily_rollup (hospital_id, appointment_date, doctor_id, department_id, status, appointment_type, start_hour, cancel_reason, appointment_count)
+SELECT hospital_id, appointment_date, doctor_id, department_id, status, appointment_type,
+       EXTRACT(HOUR FROM start_time)::SMALLINT,
+       CASE WHEN status = 'cancelled' THEN NULLIF(cancel_reason, '') END,
+       COUNT(*)
+FROM appointments
+WHERE is_deleted = false
+GROUP BY 1, 2, 3, 4, 5, 6, 7, 8;
+
 -- ─────────────────────────────────────────────────────────────────────────────
 -- 15. APPOINTMENT STATUS LOG
 -- ─────────────────────────────────────────────────────────────────────────────
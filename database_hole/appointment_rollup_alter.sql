@@ -0,0 +1,69 @@
+-- ============================================================================
+-- HMS - Appointment Alter Script: Add appointment_daily_rollup
+-- ============================================================================
+-- Pre-aggregated appointment counts used by the appointment reports
+-- (/reports/appointments/*) for long date ranges. The backend keeps the
+-- table current on every appointment write; this script creates and
+-- backfills it on databases built before it was added to 01_schema.sql.
+-- ============================================================================
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 1. CREATE TABLE: appointment_daily_rollup
+-- ─────────────────────────────────────────────────────────────────────────────
+-- One row per (hospital, date, doctor, department, status, type, start hour,
+-- cancel reason) with the number of non-deleted appointments under that key.
+-- NULLS NOT DISTINCT needs PostgreSQL 15 or later.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE TABLE IF NOT EXISTS appointment_daily_rollup (
+    id                 UUID         PRIMARY KEY DEFAULT gen_random_uuid(),
+    hospital_id        UUID         NOT NULL REFERENCES hospitals(id),
+    appointment_date   DATE         NOT NULL,
+    doctor_id          UUID,
+    department_id      UUID,
+    status             VARCHAR(20)  NOT NULL,
+    appointment_type   VARCHAR(20)  NOT NULL,
+    start_hour         SMALLINT,
+    cancel_reason      VARCHAR(255),
+    appointment_count  INTEGER      NOT NULL DEFAULT 0,
+    updated_at         TIMESTAMPTZ  DEFAULT NOW(),
+    CONSTRAINT uq_appointment_daily_rollup UNIQUE NULLS NOT DISTINCT
+        (hospital_id, appointment_date, doctor_id, department_id, status, appointment_type, start_hour, cancel_reason)
+);
+
+CREATE INDEX IF NOT EXISTS idx_appointment_rollup_date
+    ON appointment_daily_rollup(hospital_id, appointment_date);
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 2. BACKFILL from appointments
+-- ─────────────────────────────────────────────────────────────────────────────
+-- Reports over long ranges read only this table, so it must hold every
+-- existing appointment before the backend serves them. Same key as the
+-- backend's rollup (appointment_rollup_service._rollup_key). Safe to re-run:
+-- the table is locked against concurrent incremental updates and rebuilt.
+--
+-- `python -m app.cli rebuild-appointment-rollup` (from backend/, optionally
+-- with --hospital-id / --from / --to) repairs a range the same way if the
+-- rollup is ever suspected to have drifted.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+BEGIN;
+
+LOCK TABLE appointment_daily_rollup IN SHARE ROW EXCLUSIVE MODE;
+
+DELETE FROM appointment_daily_rollup;
+
+INSERT INTO appointment_daily_rollup (
+    hospital_id, appointment_date, doctor_id, department_id,
+    status, appointment_type, start_hour, cancel_reason, appointment_count
+)
+SELECT hospital_id, appointment_date, doctor_id, department_id,
+       status, appointment_type,
+       EXTRACT(HOUR FROM start_time)::SMALLINT,
+       CASE WHEN status = 'cancelled' THEN NULLIF(cancel_reason, '') END,
+       COUNT(*)
+FROM appointments
+WHERE is_deleted = false
+GROUP BY 1, 2, 3, 4, 5, 6, 7, 8;
+
+COMMIT;
@@ -0,0 +1,31 @@
+-- ============================================================================
+-- HMS - Background Jobs Alter Script: Durable job outbox
+-- ============================================================================
+-- In-app notifications and emails are no longer produced inside the request
+-- that triggers them. The request inserts a background_jobs row in its own
+-- transaction and the backend's job runner (app/core/background_jobs.py)
+-- executes it afterwards, retrying with backoff and parking jobs that keep
+-- failing as 'dead'. This script adds the table on databases created before
+-- it was added to 01_schema.sql.
+-- ============================================================================
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS background_jobs (
+    id            UUID         PRIMARY KEY DEFAULT gen_random_uuid(),
+    hospital_id   UUID         REFERENCES hospitals(id),
+    job_type      VARCHAR(50)  NOT NULL,
+    payload       JSONB        NOT NULL DEFAULT '{}',
+    status        VARCHAR(20)  NOT NULL DEFAULT 'pending',  -- 'pending','running','dead' (done jobs are deleted)
+    attempts      INTEGER      NOT NULL DEFAULT 0,
+    max_attempts  INTEGER      NOT NULL DEFAULT 5,
+    run_after     TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+    locked_at     TIMESTAMPTZ,
+    last_error    TEXT,
+    created_at    TIMESTAMPTZ  NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_background_jobs_due
+    ON background_jobs(run_after) WHERE status IN ('pending', 'running');
+
+COMMIT;
@@ -0,0 +1,29 @@
+-- ============================================================================
+-- HMS - Catalog Import Alter Script: Unique medicine SKU per hospital
+-- ============================================================================
+-- The medicine catalog import upserts medicines on (hospital_id, sku) with
+-- INSERT ... ON CONFLICT, which needs a unique index on those columns.
+-- Medicines without a SKU (NULL or blank) are not constrained. This script
+-- adds the index on databases built before it was added to 01_schema.sql,
+-- and replaces the earlier version that only excluded NULL; resolve any
+-- duplicate non-blank SKUs within a hospital first.
+-- CONCURRENTLY avoids blocking writes; run it outside a transaction block.
+-- ============================================================================
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 1. Blank SKUs are stored as NULL (the backend now does this on save)
+-- ─────────────────────────────────────────────────────────────────────────────
+
+UPDATE medicines SET sku = NULL WHERE btrim(sku) = '';
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 2. Unique index, built under a temporary name so the old one keeps
+--    serving imports until it is swapped
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_medicines_hospital_sku_new
+    ON medicines(hospital_id, sku) WHERE sku IS NOT NULL AND sku <> '';
+
+DROP INDEX CONCURRENTLY IF EXISTS uq_medicines_hospital_sku;
+
+ALTER INDEX uq_medicines_hospital_sku_new RENAME TO uq_medicines_hospital_sku;
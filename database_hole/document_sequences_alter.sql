@@ -0,0 +1,16 @@
+-- ============================================================================
+-- HMS - Alter Script: Add document_sequences
+-- ============================================================================
+-- Counters used by the backend to allocate PO / GRN / ADJ / CC numbers,
+-- pharmacy invoice numbers and prescription numbers. Counters are created on
+-- first use and start after the highest number already issued, so no
+-- backfill is needed.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS document_sequences (
+    scope        VARCHAR(60)  NOT NULL,
+    period       VARCHAR(8)   NOT NULL DEFAULT '',
+    last_value   BIGINT       NOT NULL DEFAULT 0,
+    updated_at   TIMESTAMPTZ  DEFAULT NOW(),
+    CONSTRAINT pk_document_sequences PRIMARY KEY (scope, period)
+);
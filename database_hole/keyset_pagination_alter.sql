@@ -0,0 +1,40 @@
+-- ============================================================================
+-- HMS - Keyset Pagination Alter Script: Add (created_at, id) list indexes
+-- ============================================================================
+-- List endpoints accept ?cursor= and page by (created_at DESC, id DESC),
+-- continuing after the last row of the previous page. These indexes let
+-- each page start directly at the cursor instead of scanning and sorting
+-- every earlier row. This script adds them on databases built before they
+-- were added to 01_schema.sql.
+-- CONCURRENTLY avoids blocking writes; run it outside a transaction block.
+-- ============================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_patients_keyset
+    ON patients(hospital_id, created_at DESC, id DESC) WHERE is_deleted = false;
+
+-- Exact email searches are unranked, so they sort by created_at and the
+-- planner would walk idx_patients_keyset unless it knows lower(email) is
+-- selective. It only uses an expression index's statistics when the index
+-- is not partial, so the partial idx_patients_email_lower is replaced.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_patients_email
+    ON patients(lower(email));
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_patients_email_lower;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_appointments_keyset
+    ON appointments(hospital_id, created_at DESC, id DESC) WHERE is_deleted = false;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_prescriptions_keyset
+    ON prescriptions(hospital_id, created_at DESC, id DESC) WHERE is_deleted = false;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_invoices_keyset
+    ON invoices(hospital_id, created_at DESC, id DESC) WHERE is_deleted = false;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_stock_movements_keyset
+    ON stock_movements(hospital_id, created_at DESC, id DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_notifications_keyset
+    ON notifications(user_id, created_at DESC, id DESC);
+
+-- Collect statistics for the new expression index.
+ANALYZE patients;
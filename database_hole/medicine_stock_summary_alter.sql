@@ -0,0 +1,40 @@
+-- ============================================================================
+-- HMS - Inventory Alter Script: Add medicine_stock_summary
+-- ============================================================================
+-- Per-medicine stock total (sum of active batch quantities). The backend
+-- updates it in the same transaction as every batch quantity change and
+-- reads stock from it instead of summing medicine_batches on each request.
+-- This script creates and backfills it on databases built before it was
+-- added to 01_schema.sql.
+-- ============================================================================
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 1. CREATE TABLE: medicine_stock_summary
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE TABLE IF NOT EXISTS medicine_stock_summary (
+    medicine_id       UUID          PRIMARY KEY REFERENCES medicines(id),
+    hospital_id       UUID          NOT NULL REFERENCES hospitals(id),
+    quantity          INTEGER       NOT NULL DEFAULT 0,
+    updated_at        TIMESTAMPTZ   DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_stock_summary_hospital
+    ON medicine_stock_summary(hospital_id);
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 2. BACKFILL from medicine_batches
+-- ─────────────────────────────────────────────────────────────────────────────
+-- Safe to re-run: existing rows are overwritten with the batch totals.
+-- Afterwards, `python -m app.cli reconcile-stock-summary` (from backend/)
+-- reports any drift; add --repair to fix it.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+INSERT INTO medicine_stock_summary (medicine_id, hospital_id, quantity)
+SELECT m.id, m.hospital_id, COALESCE(SUM(b.current_quantity), 0)
+FROM medicines m
+JOIN medicine_batches b ON b.medicine_id = m.id AND b.is_active = true
+GROUP BY m.id, m.hospital_id
+ON CONFLICT (medicine_id) DO UPDATE
+    SET quantity   = EXCLUDED.quantity,
+        updated_at = NOW();
@@ -0,0 +1,39 @@
+-- ============================================================================
+-- HMS - Patient Alter Script: Add patient search index
+-- ============================================================================
+-- patients.search_vector is a generated tsvector over first/last name, PRN
+-- and phone number, searched through a GIN index by the backend's
+-- patient_search_service (word-prefix matching, ranked). Exact phone and
+-- email lookups get their own btree indexes.
+-- This script adds them on databases built before they were added to
+-- 01_schema.sql.
+-- ============================================================================
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 1. ADD COLUMN: patients.search_vector
+-- ─────────────────────────────────────────────────────────────────────────────
+-- Adding a stored generated column rewrites the patients table and holds an
+-- ACCESS EXCLUSIVE lock while it does; run it in a maintenance window on
+-- large databases.
+-- ─────────────────────────────────────────────────────────────────────────────
+
+ALTER TABLE patients
+    ADD COLUMN IF NOT EXISTS search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', first_name || ' ' || last_name), 'A') ||
+        setweight(to_tsvector('simple', patient_reference_number || ' ' || phone_number), 'B')
+    ) STORED;
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 2. INDEXES
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE INDEX IF NOT EXISTS idx_patients_search
+    ON patients USING GIN (search_vector) WHERE is_deleted = false;
+
+CREATE INDEX IF NOT EXISTS idx_patients_phone_number
+    ON patients(phone_number) WHERE is_deleted = false;
+
+CREATE INDEX IF NOT EXISTS idx_patients_email
+    ON patients(lower(email));
+
+ANALYZE patients;
@@ -0,0 +1,134 @@
+-- ============================================================================
+-- HMS - Inventory Alter Script: Partition stock_movements by month
+-- ============================================================================
+-- stock_movements becomes range-partitioned by month on created_at, with a
+-- default partition for rows outside every monthly partition, and gets the
+-- (hospital_id, item_type, item_id, created_at DESC) index that latest-
+-- balance lookups use. Closed months can then be rolled into
+-- stock_movement_monthly_snapshots and detached with
+-- `python -m app.cli archive-stock-movements` (from backend/).
+-- This script converts a table built before partitioning was added to
+-- 01_schema.sql, copying every row; run it after keyset_pagination_alter.sql,
+-- in a maintenance window (the old table is locked while it is copied).
+-- ============================================================================
+
+BEGIN;
+
+LOCK TABLE stock_movements IN ACCESS EXCLUSIVE MODE;
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 1. Move the unpartitioned table aside
+-- ─────────────────────────────────────────────────────────────────────────────
+
+ALTER TABLE stock_movements RENAME TO stock_movements_unpartitioned;
+ALTER TABLE stock_movements_unpartitioned RENAME CONSTRAINT stock_movements_pkey TO stock_movements_unpartitioned_pkey;
+ALTER TABLE stock_movements_unpartitioned RENAME CONSTRAINT stock_movements_hospital_id_fkey TO stock_movements_unpartitioned_hospital_id_fkey;
+ALTER TABLE stock_movements_unpartitioned RENAME CONSTRAINT stock_movements_performed_by_fkey TO stock_movements_unpartitioned_performed_by_fkey;
+ALTER INDEX IF EXISTS idx_stock_movements_item RENAME TO idx_stock_movements_unpartitioned_item;
+ALTER INDEX IF EXISTS idx_stock_movements_keyset RENAME TO idx_stock_movements_unpartitioned_keyset;
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 2. CREATE TABLE: stock_movements (partitioned) and its snapshots
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE TABLE stock_movements (
+    id             UUID          NOT NULL DEFAULT gen_random_uuid(),
+    hospital_id    UUID          NOT NULL REFERENCES hospitals(id),
+    item_type      VARCHAR(20)   NOT NULL,
+    item_id        UUID          NOT NULL,
+    batch_id       UUID,
+    movement_type  VARCHAR(20)   NOT NULL,
+    reference_type VARCHAR(30),
+    reference_id   UUID,
+    quantity       INTEGER       NOT NULL,
+    balance_after  INTEGER       NOT NULL,
+    unit_cost      DECIMAL(12,2),
+    notes          VARCHAR(255),
+    performed_by   UUID          REFERENCES users(id),
+    created_at     TIMESTAMPTZ   NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE stock_movements_default PARTITION OF stock_movements DEFAULT;
+
+CREATE INDEX idx_stock_movements_item ON stock_movements(hospital_id, item_type, item_id, created_at DESC);
+CREATE INDEX idx_stock_movements_keyset ON stock_movements(hospital_id, created_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS stock_movement_monthly_snapshots (
+    hospital_id      UUID          NOT NULL REFERENCES hospitals(id),
+    item_type        VARCHAR(20)   NOT NULL,
+    item_id          UUID          NOT NULL,
+    month            DATE          NOT NULL,
+    movements        INTEGER       NOT NULL,
+    quantity_in      INTEGER       NOT NULL,
+    quantity_out     INTEGER       NOT NULL,
+    closing_balance  INTEGER       NOT NULL,
+    last_movement_at TIMESTAMPTZ   NOT NULL,
+    created_at       TIMESTAMPTZ   DEFAULT NOW(),
+    PRIMARY KEY (hospital_id, item_type, item_id, month)
+);
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 3. HELPER FUNCTION: stock_movements_ensure_partition (as in 01_schema.sql)
+-- ─────────────────────────────────────────────────────────────────────────────
+
+CREATE OR REPLACE FUNCTION stock_movements_ensure_partition(p_month DATE)
+RETURNS TEXT AS $$
+DECLARE
+    v_from DATE := date_trunc('month', p_month)::DATE;
+    v_to   DATE := (date_trunc('month', p_month) + INTERVAL '1 month')::DATE;
+    v_name TEXT := 'stock_movements_' || to_char(p_month, 'YYYY_MM');
+BEGIN
+    IF to_regclass(v_name) IS NOT NULL THEN
+        RETURN v_name;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I (LIKE stock_movements INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', v_name
+    );
+    EXECUTE format(
+        'WITH moved AS (
+             DELETE FROM stock_movements_default
+             WHERE created_at >= %L AND created_at < %L
+             RETURNING *
+         )
+         INSERT INTO %I SELECT * FROM moved',
+        v_from, v_to, v_name
+    );
+    EXECUTE format(
+        'ALTER TABLE stock_movements ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        v_name, v_from, v_to
+    );
+    RETURN v_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ─────────────────────────────────────────────────────────────────────────────
+-- 4. Partitions for every month with movements and the next two, then copy
+-- ─────────────────────────────────────────────────────────────────────────────
+
+SELECT stock_movements_ensure_partition(month)
+FROM (
+    SELECT DISTINCT date_trunc('month', created_at)::DATE AS month
+    FROM stock_movements_unpartitioned
+    WHERE created_at IS NOT NULL
+    UNION
+    SELECT (date_trunc('month', CURRENT_DATE) + make_interval(months => m))::DATE
+    FROM generate_series(0, 2) AS m
+) months
+ORDER BY month;
+
+INSERT INTO stock_movements (
+    id, hospital_id, item_type, item_id, batch_id, movement_type, reference_type,
+    reference_id, quantity, balance_after, unit_cost, notes, performed_by, created_at
+)
+SELECT id, hospital_id, item_type, item_id, batch_id, movement_type, reference_type,
+       reference_id, quantity, balance_after, unit_cost, notes, performed_by,
+       COALESCE(created_at, NOW())
+FROM stock_movements_unpartitioned;
+
+DROP TABLE stock_movements_unpartitioned;
+
+COMMIT;
+
+ANALYZE stock_movements;
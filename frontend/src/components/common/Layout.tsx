@@ -784,7 +784,7 @@ const Layout: React.FC = () => {
           <div className="flex items-center gap-3 p-2 rounded-lg bg-slate-50">
             <div className="w-8 h-8 rounded-full overflow-hidden bg-primary/10 text-primary flex items-center justify-center text-xs font-bold shrink-0">
               {user?.avatar_url
-                ? <img src={userService.getPhotoUrl(user.avatar_url) ?? ''} alt={fullName} className="w-full h-full object-cover" />
+                ? <img src={userService.getPhotoUrl(user.avatar_url, 'thumb') ?? ''} alt={fullName} className="w-full h-full object-cover" />
                 : <span className="material-symbols-outlined text-[16px]">{ROLE_ICONS[user?.roles?.[0] || ''] || 'person'}</span>
               }
             </div>
@@ -997,7 +997,7 @@ const Layout: React.FC = () => {
               >
                 <div className="w-8 h-8 rounded-full bg-primary/10 text-primary flex items-center justify-center text-sm font-bold">
                   {user?.avatar_url ? (
-                    <img src={userService.getPhotoUrl(user.avatar_url) ?? ''} alt={fullName} className="w-full h-full object-cover rounded-full" />
+                    <img src={userService.getPhotoUrl(user.avatar_url, 'thumb') ?? ''} alt={fullName} className="w-full h-full object-cover rounded-full" />
                   ) : (
                     initials
                   )}
@@ -205,6 +205,7 @@ const PatientList: React.FC = () => {
                 onChange={(e) => { setSortBy(e.target.value); setPage(1); }}
                 className="w-full px-3 py-2 bg-background-light border-none rounded-lg focus:ring-2 focus:ring-primary/40 text-sm font-medium text-slate-700"
               >
+                {search && <option value="relevance">Best Match</option>}
                 <option value="created_at">Registration Date</option>
                 <option value="updated_at">Last Updated</option>
                 <option value="first_name">Name</option>
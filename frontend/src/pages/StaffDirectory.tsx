@@ -452,7 +452,7 @@ const StaffDirectory: React.FC = () => {
                     <td className="px-3 py-4">
                       <div className="flex items-center gap-3 cursor-pointer" onClick={() => setViewUser(user)}>
                         <div className="w-10 h-10 rounded-full bg-primary/10 text-primary flex items-center justify-center font-bold text-xs flex-shrink-0 overflow-hidden">
-                          {user.avatar_url ? <img src={userService.getPhotoUrl(user.avatar_url) || ''} alt={`${user.first_name} ${user.last_name}`} className="w-full h-full object-cover" /> : getInitials(`${user.first_name} ${user.last_name}`)}
+                          {user.avatar_url ? <img src={userService.getPhotoUrl(user.avatar_url, 'thumb') || ''} alt={`${user.first_name} ${user.last_name}`} className="w-full h-full object-cover" /> : getInitials(`${user.first_name} ${user.last_name}`)}
                         </div>
                         <div className="min-w-0">
                           <p className="text-sm font-semibold text-slate-900 truncate">{`${user.first_name} ${user.last_name}`}</p>
@@ -262,7 +262,7 @@ const UserManagement: React.FC = () => {
                         <div className="w-9 h-9 rounded-full bg-primary/10 flex items-center justify-center text-primary font-bold text-xs overflow-hidden flex-shrink-0">
                           {user.avatar_url ? (
                             <img 
-                              src={userService.getPhotoUrl(user.avatar_url) || ''} 
+                              src={userService.getPhotoUrl(user.avatar_url, 'thumb') || ''} 
                               alt={`${user.first_name} ${user.last_name}`} 
                               className="w-full h-full object-cover" 
                               onError={(e) => {
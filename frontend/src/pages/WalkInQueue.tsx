@@ -4,7 +4,7 @@ import { useAuth } from '../contexts/AuthContext';
 import { useToast } from '../contexts/ToastContext';
 import walkInService from '../services/walkInService';
 import appointmentService from '../services/appointmentService';
-import type { UnassignedWalkIn } from '../services/walkInService';
+import type { QueueStreamEvent, UnassignedWalkIn } from '../services/walkInService';
 import scheduleService from '../services/scheduleService';
 import type { QueueStatus as QueueStatusType, QueueItem, DoctorOption, Appointment } from '../types/appointment';
 import AppointmentStatusBadge from '../components/appointments/AppointmentStatusBadge';
@@ -42,6 +42,32 @@ function formatLocalDateISO(input: Date = new Date()): string {
   return `${year}-${month}-${day}`;
 }
 
+const PRIORITY_RANK: Record<string, number> = { emergency: 0, urgent: 1, normal: 2 };
+const WAITING_STATUSES = ['waiting', 'called', 'sent_to_doctor'];
+const STREAM_RETRY_MAX_MS = 30000;
+
+/** Patch a queue with one live event, keeping GET /walk-ins/queue's order and totals. */
+function applyQueueEvent(
+  queue: QueueStatusType,
+  event: Extract<QueueStreamEvent, { queue_id: string }>,
+): QueueStatusType {
+  if (event.queue_date !== queue.queue_date) return queue;
+  let items = queue.items.filter((i) => i.queue_id !== event.queue_id);
+  // A doctor-filtered view drops entries reassigned to another doctor.
+  const inView = !queue.doctor_id || event.doctor_id === queue.doctor_id;
+  if (event.event !== 'queue.removed' && event.item && inView) {
+    items = [...items, event.item].sort((a, b) =>
+      (PRIORITY_RANK[a.priority] ?? 3) - (PRIORITY_RANK[b.priority] ?? 3) || a.queue_number - b.queue_number);
+  }
+  return {
+    ...queue,
+    items,
+    total_waiting: items.filter((i) => WAITING_STATUSES.includes(i.status)).length,
+    total_in_progress: items.filter((i) => i.status === 'in_consultation').length,
+    total_completed: items.filter((i) => i.status === 'completed').length,
+  };
+}
+
 // ── Main Component ─────────────────────────────────────────────────
 const WalkInQueue: React.FC = () => {
   const { user } = useAuth();
@@ -163,7 +189,40 @@ const WalkInQueue: React.FC = () => {
     }
   }, [isDoctor]);
 
-  useEffect(() => { fetchQueue(); }, [fetchQueue]);
+  // Today's queue follows the live stream; other dates are fetched and polled.
+  const isLive = selectedDate === today;
+  useEffect(() => { if (!isLive) fetchQueue(); }, [fetchQueue, isLive]);
+
+  useEffect(() => {
+    if (!isLive) return;
+    const controller = new AbortController();
+    const docId = isDoctor ? undefined : (filterDoctor || undefined);
+    let retryMs = 1000;
+    const follow = async () => {
+      while (!controller.signal.aborted) {
+        try {
+          await walkInService.streamQueue(docId, (event) => {
+            retryMs = 1000;
+            if (event.event === 'queue.snapshot') {
+              setQueueData(event.snapshot);
+              setLoading(false);
+            } else if (event.event === 'queue.resync') {
+              fetchQueue();
+            } else {
+              setQueueData((current) => (current ? applyQueueEvent(current, event) : current));
+            }
+          }, controller.signal);
+        } catch {
+          if (controller.signal.aborted) return;
+          fetchQueue();  // keep the screen current while reconnecting
+        }
+        await new Promise((resolve) => setTimeout(resolve, retryMs));
+        retryMs = Math.min(retryMs * 2, STREAM_RETRY_MAX_MS);
+      }
+    };
+    follow();
+    return () => controller.abort();
+  }, [isLive, isDoctor, filterDoctor, fetchQueue]);
 
   // Fetch scheduled appointments for doctors
   useEffect(() => { fetchScheduledAppts(); }, [fetchScheduledAppts]);
@@ -174,11 +233,11 @@ const WalkInQueue: React.FC = () => {
     if (activeTab === 'upcoming' || receptionTab === 'upcoming') fetchUpcoming();
   }, [activeTab, receptionTab, fetchUpcoming]);
 
-  // Auto-refresh every 15s
+  // Auto-refresh every 15s (the queue itself only when not live)
   useEffect(() => {
-    const timer = setInterval(() => { fetchQueue(); fetchUnassigned(); fetchUpcoming(); if (isDoctor) fetchScheduledAppts(); }, 15000);
+    const timer = setInterval(() => { if (!isLive) fetchQueue(); fetchUnassigned(); fetchUpcoming(); if (isDoctor) fetchScheduledAppts(); }, 15000);
     return () => clearInterval(timer);
-  }, [fetchQueue, fetchUnassigned, fetchScheduledAppts, isDoctor]);
+  }, [fetchQueue, fetchUnassigned, fetchScheduledAppts, isDoctor, isLive]);
 
   // ── Queue actions ──────────────────────────────────────────────
   const handleCall = async (queueId: string) => {
@@ -25,6 +25,7 @@ export interface PendingPrescription {
   dispensed_items: number;
   pending_items: number;
   items: PrescriptionItemWithStock[];
+  dispensing_records?: { id: string; dispensing_number: string; dispensed_at?: string | null }[];
 }
 
 export interface PrescriptionItemWithStock {
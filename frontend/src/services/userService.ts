@@ -69,7 +69,7 @@ export const userService = {
     return response.data;
   },
 
-  getPhotoUrl(photoUrl: string | null): string | null {
+  getPhotoUrl(photoUrl: string | null, size?: 'thumb' | 'small'): string | null {
     if (!photoUrl) return null;
     // If already a full URL, return as is
     if (photoUrl.startsWith('http://') || photoUrl.startsWith('https://')) {
@@ -79,6 +79,11 @@ export const userService = {
     const baseUrl = (import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000').replace('/api/v1', '');
     // Remove leading slash if present to avoid double slashes
     const photoPath = photoUrl.startsWith('/') ? photoUrl.substring(1) : photoUrl;
+    // Processed uploads are content-addressed: a new photo gets a new URL, so the
+    // browser may cache them for good. The backend picks the size and WebP variant.
+    if (/\/[0-9a-f]{64}\.\w+$/.test(photoPath)) {
+      return `${baseUrl}/${photoPath}${size ? `?size=${size}` : ''}`;
+    }
     // Use a static cache-busting timestamp (session-based) to allow browser caching
     // This prevents the image from being requested on every render while still allowing cache invalidation on page reload
     const timestamp = sessionStorage.getItem('photo_cache_timestamp');
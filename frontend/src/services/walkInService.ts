@@ -1,5 +1,17 @@
-import api from './api';
-import type { Appointment, WalkInRegister, QueueStatus, WalkInResponse } from '../types/appointment';
+import api, { API_BASE_URL } from './api';
+import type { Appointment, WalkInRegister, QueueItem, QueueStatus, WalkInResponse } from '../types/appointment';
+
+/** One frame of GET /walk-ins/queue/stream. */
+export type QueueStreamEvent =
+  | { event: 'queue.snapshot'; snapshot: QueueStatus }
+  | {
+      event: 'queue.added' | 'queue.updated' | 'queue.removed';
+      queue_id: string;
+      queue_date: string;
+      doctor_id: string | null;
+      item?: QueueItem;
+    }
+  | { event: 'queue.resync' };
 
 export interface UnassignedWalkIn {
   appointment_id: string;
@@ -30,6 +42,43 @@ const walkInService = {
     return res.data;
   },
 
+  /**
+   * Follow today's queue over Server-Sent Events until `signal` aborts.
+   * Uses fetch rather than EventSource so the JWT goes in the Authorization
+   * header. Resolves when the server closes the stream; rejects on errors.
+   */
+  async streamQueue(
+    doctorId: string | undefined,
+    onEvent: (event: QueueStreamEvent) => void,
+    signal: AbortSignal,
+  ): Promise<void> {
+    const url = new URL(`${API_BASE_URL}/walk-ins/queue/stream`);
+    if (doctorId) url.searchParams.set('doctor_id', doctorId);
+    const token = localStorage.getItem('access_token');
+    const res = await fetch(url.toString(), {
+      headers: { Accept: 'text/event-stream', ...(token ? { Authorization: `Bearer ${token}` } : {}) },
+      signal,
+    });
+    if (!res.ok || !res.body) throw new Error(`Queue stream failed: ${res.status}`);
+
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) return;
+      buffer += value;
+      let end: number;
+      while ((end = buffer.indexOf('\n\n')) >= 0) {
+        const frame = buffer.slice(0, end);
+        buffer = buffer.slice(end + 2);
+        const data = frame.split('\n').find((line) => line.startsWith('data: '));
+        if (!data) continue; // keepalive comment
+        const payload = JSON.parse(data.slice(6));
+        onEvent(frame.startsWith('event: queue.snapshot') ? { event: 'queue.snapshot', snapshot: payload } : payload);
+      }
+    }
+  },
+
   async callPatient(queueId: string): Promise<void> {
     await api.patch(`/walk-ins/queue/${queueId}/call`);
   },